@@ -32,6 +32,7 @@ exit_code_coveralls=0
 echo "Changing current directory to: ${BASH_SOURCE%/*}"
 cd ${BASH_SOURCE%/*}
 export ANSIBLE_LIBRARY=library
+export ANSIBLE_MODULE_UTILS=library/module_utils
 
 # Checks PYTHON_SDK
 if [ -z ${PYTHON_SDK+x} ]; then
@@ -81,7 +82,7 @@ exit_code_tests=$?
 
 echo -e "\n${COLOR_START}Running flake8${COLOR_END}"
 if hash flake8 2>/dev/null; then
-  flake8 library test --max-line-length=120 --ignore=F403,F405
+  flake8 library test contrib --max-line-length=120 --ignore=F403,F405
   exit_code_flake8=$?
 else
   echo "ERROR:flake8 is not installed."
@@ -0,0 +1,73 @@
+###
+# Copyright (2017) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+"""
+Micro-benchmark of the resource comparators on large server profile documents.
+
+Usage, from the repository root:
+    PYTHONPATH=library python contrib/benchmark_resource_compare.py
+"""
+import timeit
+from copy import deepcopy
+
+from hpOneView.extras.comparators import resource_compare as sdk_resource_compare
+from module_utils.oneview import resource_compare
+
+REPEAT = 5
+NUMBER = 20
+
+
+def build_profile(connections=64, bios_settings=300, volumes=32):
+    return dict(
+        name='esxi-01',
+        uri='/rest/server-profiles/1',
+        eTag='2017-01-01T00:00:00.000Z/2017-01-01T00:00:00.000Z',
+        modified='2017-01-01T00:00:00.000Z',
+        status='OK',
+        serverHardwareUri='/rest/server-hardware/1',
+        connections=[dict(id=index, name='conn-{0}'.format(index), functionType='Ethernet',
+                          networkUri='/rest/ethernet-networks/{0}'.format(index), portId='Mezz 3:1-a',
+                          requestedMbps=2500, boot=dict(priority='NotBootable'))
+                     for index in range(connections)],
+        bios=dict(manageBios=True, overriddenSettings=[dict(id='setting-{0}'.format(index), value=str(index))
+                                                       for index in range(bios_settings)]),
+        sanStorage=dict(manageSanStorage=True, hostOSType='VMware (ESXi)',
+                        volumeAttachments=[dict(id=index, volumeUri='/rest/storage-volumes/{0}'.format(index),
+                                                lunType='Auto', storagePaths=[dict(connectionId=1, isEnabled=True),
+                                                                              dict(connectionId=2, isEnabled=True)])
+                                           for index in range(volumes)]))
+
+
+def run(name, comparator, first, second):
+    best = min(timeit.repeat(lambda: comparator(first, second), repeat=REPEAT, number=NUMBER)) / NUMBER
+    print('{0:<40} {1:>10.3f} ms'.format(name, best * 1000))
+
+
+def main():
+    profile = build_profile()
+
+    equivalent = deepcopy(profile)
+    equivalent['connections'].reverse()
+
+    different = deepcopy(profile)
+    different['bios']['overriddenSettings'][-1]['value'] = 'changed'
+
+    for case, other in (('equivalent', equivalent), ('different', different)):
+        run('hpOneView resource_compare, ' + case, sdk_resource_compare, profile, other)
+        run('module_utils resource_compare, ' + case, resource_compare, profile, other)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+"""
+Ansible dynamic inventory of the servers managed by HPE OneView.
+
+Each Server Profile is a host, named after the profile. The hosts are grouped by enclosure, enclosure group, server
+hardware type, server profile template and power state, and have the main attributes of the profile and of its
+Server Hardware as 'oneview_*' variables.
+
+The resources are cached in the same SQLite index used by the oneview_estate_snapshot module. Within the cache TTL the
+inventory is read from the index without querying the appliance. After it, only the resources changed since the
+previous refresh are requested, and a full refresh, which also drops the deleted profiles, is done once the last one
+is older than the max age.
+
+Configuration, through environment variables:
+    ONEVIEW_CONFIG: Path to the OneViewClient .json configuration file, the same used by the modules. When not set,
+        the ONEVIEWSDK_* environment variables are used.
+    ONEVIEW_INVENTORY_DATABASE: Path of the SQLite cache. Defaults to 'oneview-inventory-<appliance>.db' in the temp
+        directory, one file per appliance, readable only by its owner.
+    ONEVIEW_INVENTORY_CACHE_TTL: Seconds the cache is used without refreshing it. Defaults to 300.
+    ONEVIEW_INVENTORY_MAX_AGE: Seconds after which the refresh is a full refresh. Defaults to 3600.
+    ONEVIEW_INVENTORY_MAX_WORKERS: Maximum number of resource types fetched at the same time. Defaults to 8.
+
+Usage:
+    ansible-playbook -i contrib/oneview_inventory.py site.yml
+    contrib/oneview_inventory.py --list --refresh-cache
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'library'))
+
+from module_utils.oneview import DEFAULT_MAX_WORKERS, EstateIndex, govern  # noqa: E402
+
+try:
+    from hpOneView.oneview_client import OneViewClient
+    from hpOneView.exceptions import HPOneViewException
+
+    HAS_HPE_ONEVIEW = True
+except ImportError:
+    HAS_HPE_ONEVIEW = False
+
+DEFAULT_CACHE_TTL = 300
+DEFAULT_MAX_AGE = 3600
+
+# Resource types, named after the resource clients of the SDK
+INVENTORY_RESOURCE_TYPES = ['server_profiles', 'server_hardware', 'enclosures', 'enclosure_groups',
+                            'server_hardware_types', 'server_profile_templates']
+
+HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for the OneView inventory.'
+INVENTORY_REFRESH_FAILED = "The {0} could not be fetched: {1}"
+INVENTORY_CACHE_STALE = "Using the cached {0}, as they could not be refreshed: {1}"
+
+
+def to_group_name(prefix, name):
+    """
+    Builds a group name that is also a valid Ansible variable name, e.g. 'enclosure_group_EG_1' for 'EG #1'.
+    """
+    return prefix + '_' + re.sub(r'[^A-Za-z0-9_]+', '_', str(name)).strip('_')
+
+
+def get_appliance_host(config, environ):
+    """
+    Gets the address of the appliance from the OneViewClient configuration file, or from the ONEVIEWSDK_IP
+    environment variable when there is no file.
+    """
+    if not config:
+        return environ.get('ONEVIEWSDK_IP')
+    with open(config) as config_file:
+        return json.load(config_file).get('ip')
+
+
+def get_management_address(server_hardware):
+    addresses = (server_hardware.get('mpHostInfo') or {}).get('mpIpAddresses') or []
+    routable = [address for address in addresses if isinstance(address, dict) and address.get('type') != 'LinkLocal']
+    for address in routable or addresses:
+        return address.get('address') if isinstance(address, dict) else address
+    return None
+
+
+class OneViewInventory(object):
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        self.config = environ.get('ONEVIEW_CONFIG')
+        self.database = environ.get('ONEVIEW_INVENTORY_DATABASE') or self.__get_default_database(environ)
+        self.cache_ttl = int(environ.get('ONEVIEW_INVENTORY_CACHE_TTL') or DEFAULT_CACHE_TTL)
+        self.max_age = int(environ.get('ONEVIEW_INVENTORY_MAX_AGE') or DEFAULT_MAX_AGE)
+        self.max_workers = int(environ.get('ONEVIEW_INVENTORY_MAX_WORKERS') or DEFAULT_MAX_WORKERS)
+
+    def __get_default_database(self, environ):
+        # the resources of different appliances must not be cached in the same index
+        host = get_appliance_host(self.config, environ) or 'default'
+        file_name = 'oneview-inventory-{0}.db'.format(re.sub(r'[^A-Za-z0-9_.-]+', '_', host))
+        return os.path.join(tempfile.gettempdir(), file_name)
+
+    def get_inventory(self, refresh=False):
+        """
+        Builds the inventory in the format of the --list option of the dynamic inventory scripts.
+
+        Args:
+            refresh (bool): Whether the cache must be refreshed even within its TTL.
+        """
+        resources = self.__load(refresh)
+        names = dict((resource['uri'], resource.get('name'))
+                     for resource_type in INVENTORY_RESOURCE_TYPES for resource in resources[resource_type])
+        server_hardware = dict((resource['uri'], resource) for resource in resources['server_hardware'])
+
+        inventory = dict(oneview=dict(hosts=[]), _meta=dict(hostvars={}))
+        for profile in resources['server_profiles']:
+            hardware = server_hardware.get(profile.get('serverHardwareUri')) or {}
+            hostvars = self.__get_hostvars(profile, hardware, names)
+            inventory['oneview']['hosts'].append(profile['name'])
+            inventory['_meta']['hostvars'][profile['name']] = hostvars
+
+            for prefix, key in [('enclosure', 'oneview_enclosure'), ('enclosure_group', 'oneview_enclosure_group'),
+                                ('server_hardware_type', 'oneview_server_hardware_type'),
+                                ('profile_template', 'oneview_profile_template'), ('power', 'oneview_power_state')]:
+                if hostvars.get(key):
+                    group = inventory.setdefault(to_group_name(prefix, hostvars[key]), dict(hosts=[]))
+                    group['hosts'].append(profile['name'])
+
+        return inventory
+
+    def get_host(self, name):
+        """
+        Gets the variables of a host, in the format of the --host option of the dynamic inventory scripts.
+        """
+        return self.get_inventory()['_meta']['hostvars'].get(name, {})
+
+    def __load(self, refresh):
+        index = EstateIndex(self.database)
+        try:
+            syncs = dict((resource_type, index.get_sync(resource_type)) for resource_type in INVENTORY_RESOURCE_TYPES)
+            expired = [resource_type for resource_type, sync in syncs.items()
+                       if not sync or time.time() - (sync['refreshed'] or 0) >= self.cache_ttl]
+            if refresh or expired:
+                self.__refresh(index, syncs)
+
+            return dict((resource_type, index.find(type=resource_type))
+                        for resource_type in INVENTORY_RESOURCE_TYPES)
+        finally:
+            index.close()
+
+    def __refresh(self, index, syncs):
+        if not HAS_HPE_ONEVIEW:
+            raise RuntimeError(HPE_ONEVIEW_SDK_REQUIRED)
+
+        if self.config:
+            oneview_client = govern(OneViewClient.from_json_file(self.config))
+        else:
+            oneview_client = govern(OneViewClient.from_environment_variables())
+
+        results = index.refresh(INVENTORY_RESOURCE_TYPES, partial(getattr, oneview_client), max_age=self.max_age,
+                                max_workers=self.max_workers, errors=HPOneViewException)
+
+        for result in results:
+            if not result['error']:
+                continue
+            if not syncs[result['type']]:
+                raise RuntimeError(INVENTORY_REFRESH_FAILED.format(result['type'], result['error']))
+            sys.stderr.write(INVENTORY_CACHE_STALE.format(result['type'], result['error']) + '\n')
+
+    @staticmethod
+    def __get_hostvars(profile, hardware, names):
+        enclosure_uri = profile.get('enclosureUri')
+        if not enclosure_uri and (hardware.get('locationUri') or '').startswith('/rest/enclosures/'):
+            enclosure_uri = hardware['locationUri']
+
+        return dict(
+            oneview_uri=profile['uri'],
+            oneview_profile_state=profile.get('state'),
+            oneview_status=profile.get('status'),
+            oneview_profile_template=names.get(profile.get('serverProfileTemplateUri')),
+            oneview_server_hardware=hardware.get('name'),
+            oneview_server_hardware_uri=profile.get('serverHardwareUri'),
+            oneview_server_hardware_type=names.get(profile.get('serverHardwareTypeUri')),
+            oneview_enclosure=names.get(enclosure_uri),
+            oneview_enclosure_group=names.get(profile.get('enclosureGroupUri')),
+            oneview_enclosure_bay=profile.get('enclosureBay'),
+            oneview_serial_number=hardware.get('serialNumber') or profile.get('serialNumber'),
+            oneview_model=hardware.get('model'),
+            oneview_power_state=hardware.get('powerState'),
+            oneview_management_address=get_management_address(hardware)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ansible dynamic inventory of the servers managed by HPE OneView.')
+    parser.add_argument('--list', action='store_true', help='List all the hosts and groups (default).')
+    parser.add_argument('--host', help='Get the variables of a host.')
+    parser.add_argument('--refresh-cache', action='store_true', help='Refresh the cache even within its TTL.')
+    args = parser.parse_args()
+
+    inventory = OneViewInventory()
+    try:
+        if args.host:
+            result = inventory.get_host(args.host)
+        else:
+            result = inventory.get_inventory(refresh=args.refresh_cache)
+    except Exception as error:
+        sys.stderr.write('; '.join(str(e) for e in error.args) + '\n')
+        sys.exit(1)
+
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,13 +15,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import shutil
+import tempfile
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (ArtifactCache, DEFAULT_CACHE_MAX_SIZE, DEFAULT_MAX_WORKERS,
+                                          DEFAULT_UPLOAD_CHUNK_SIZE, TRANSFER_ERRORS, download_file, file_digest,
+                                          get_upload_task, govern, progress_logger, resource_compare, run_concurrently,
+                                          transfer_source, upload_file)
 import os.path
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
+    from hpOneView.image_streamer.image_streamer_client import ImageStreamerClient
     from hpOneView.exceptions import HPOneViewException
+    from hpOneView.resources.task_monitor import TaskMonitor
 
     HAS_HPE_ONEVIEW = True
 except ImportError:
@@ -56,13 +65,45 @@ options:
           'backup_created' will create a Backup for the Artifact Bundle.
           'extracted' will extract an Artifact Bundle.
           'backup_extracted' will extract an Artifact Bundle from the Backup.
+          'replicated' will copy the Artifact Bundle to each Image Streamer informed on 'targets' that does not have
+          it yet, and extract it there.
       choices: ['present', 'absent', 'downloaded', 'archive_downloaded',
-                'backup_uploaded', 'backup_created', 'extracted', 'backup_extracted']
+                'backup_uploaded', 'backup_created', 'extracted', 'backup_extracted', 'replicated']
       required: true
     data:
       description:
         - List with Artifact Bundle properties and its associated states.
       required: true
+    cache_dir:
+      description:
+        - Directory of a local content-addressed cache of the artifact bundles and archives. When informed, the
+          'downloaded' and 'archive_downloaded' states copy the file from the cache while the ETag, or the
+          modification time, of the appliance copy is unchanged, and the upload of an artifact bundle is skipped when
+          a file with the same SHA-256 digest was already uploaded to the same Image Streamer and is still there.
+          The cache can be shared by the Image Streamer modules and by several appliances.
+      required: false
+    cache_max_size:
+      description:
+        - Maximum number of bytes of the files kept in the cache. The least recently used files are evicted first.
+      required: false
+      default: 10737418240
+    targets:
+      description:
+        - "List of the Image Streamer appliances the Artifact Bundle is replicated to on the 'replicated' state. Each
+          item is the Image Streamer IP address, or a dict with the 'image_streamer_ip', an optional 'config' with
+          the path of the configuration file of the OneView managing it, when it is not the same OneView of the
+          source, and an optional 'max_bandwidth'."
+      required: false
+    max_bandwidth:
+      description:
+        - Maximum number of bytes per second sent to each target on the 'replicated' state. No limit is applied when
+          it is not informed.
+      required: false
+    max_workers:
+      description:
+        - Maximum number of targets the Artifact Bundle is sent to at the same time on the 'replicated' state.
+      required: false
+      default: 8
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -158,6 +199,39 @@ EXAMPLES = '''
     data:
       name: 'Artifact Bundle'
   delegate_to: localhost
+
+- name: Download the Artifact Bundle through the local cache
+  image_streamer_artifact_bundle:
+    config: "{{ config }}"
+    state: downloaded
+    cache_dir: '~/.cache/image-streamer'
+    data:
+      name: 'Artifact Bundle'
+      destinationFilePath: '~/downloaded_artifact.zip'
+  delegate_to: localhost
+
+- name: Upload an Artifact Bundle unless the same file was already uploaded to this Image Streamer
+  image_streamer_artifact_bundle:
+    config: "{{ config }}"
+    state: present
+    cache_dir: '~/.cache/image-streamer'
+    data:
+      localArtifactBundleFilePath: '~/uploaded_artifact.zip'
+  delegate_to: localhost
+
+- name: Replicate an Artifact Bundle to the Image Streamer appliances of other sites and extract it there
+  image_streamer_artifact_bundle:
+    config: "{{ config }}"
+    state: replicated
+    max_bandwidth: 52428800
+    targets:
+      - '172.18.15.2'
+      - image_streamer_ip: '172.20.15.1'
+        config: '{{ remote_site_config }}'
+        max_bandwidth: 10485760
+    data:
+      name: 'Artifact Bundle'
+  delegate_to: localhost
 '''
 
 RETURN = '''
@@ -170,6 +244,17 @@ artifact_bundle_deployment_group:
     description: Has the OneView facts about the Deployment Group.
     returned: On state 'backup_extracted', 'backup_uploaded', and 'backup_created'.
     type: complex
+
+artifact_bundle_transfer:
+    description: Has the source, size, SHA-256 digest and version of the file downloaded, and whether it was
+                 copied from the cache.
+    returned: On state 'downloaded' and 'archive_downloaded' when 'cache_dir' is informed.
+    type: complex
+
+artifact_bundle_replication:
+    description: Has the target, the message or error, and the URI of the Artifact Bundle, for each target.
+    returned: On state 'replicated'.
+    type: list
 '''
 
 ARTIFACT_BUNDLE_CREATED = 'Artifact Bundle created successfully.'
@@ -178,15 +263,26 @@ ARTIFACT_BUNDLE_DELETED = 'Artifact Bundle deleted successfully.'
 ARTIFACT_BUNDLE_ABSENT = 'Artifact Bundle is already absent.'
 ARTIFACT_BUNDLE_ALREADY_EXIST = 'Artifact Bundle already exists.'
 ARTIFACT_BUNDLE_DOWNLOADED = 'Artifact Bundle downloaded successfully.'
+ARTIFACT_BUNDLE_DOWNLOADED_FROM_CACHE = 'Artifact Bundle copied from the cache, the appliance copy is unchanged.'
 ARTIFACT_BUNDLE_UPLOADED = 'Artifact Bundle uploaded successfully.'
 BACKUP_UPLOADED = 'Backup for Artifact Bundle uploaded successfully.'
 ARCHIVE_DOWNLOADED = 'Archive of Artifact Bundle downloaded successfully.'
+ARCHIVE_DOWNLOADED_FROM_CACHE = 'Archive of Artifact Bundle copied from the cache, the appliance copy is unchanged.'
 BACKUP_CREATED = 'Backup of Artifact Bundle created successfully.'
 ARTIFACT_BUNDLE_EXTRACTED = 'Artifact Bundle extracted successfully.'
 BACKUP_EXTRACTED = 'Artifact Bundle extracted successfully.'
+ARTIFACT_BUNDLE_NOT_FOUND = 'Artifact Bundle not found.'
+ARTIFACT_BUNDLE_REPLICATED = 'Artifact Bundle replicated to {0} of {1} Image Streamer appliances.'
+ARTIFACT_BUNDLE_REPLICATION_FAILED = 'Artifact Bundle replication failed on {0} of {1} Image Streamer appliances.'
+ARTIFACT_BUNDLE_TRANSFER_FAILED = 'Artifact Bundle transfer failed: {0}'
+REPLICATION_TARGETS_REQUIRED = "The 'targets' option is required by the 'replicated' state."
 
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 
+DOWNLOAD_PATH = '/rest/artifact-bundles/download'
+BACKUP_ARCHIVE_PATH = '/rest/artifact-bundles/backups/archive'
+ARTIFACT_BUNDLES_URI = '/rest/artifact-bundles'
+
 
 class ArtifactBundleModule(object):
     argument_spec = dict(
@@ -194,9 +290,14 @@ class ArtifactBundleModule(object):
         state=dict(
             required=True,
             choices=['present', 'absent', 'downloaded', 'archive_downloaded', 'backup_created',
-                     'backup_uploaded', 'extracted', 'backup_extracted']
+                     'backup_uploaded', 'extracted', 'backup_extracted', 'replicated']
         ),
-        data=dict(required=True, type='dict')
+        data=dict(required=True, type='dict'),
+        cache_dir=dict(required=False, type='str'),
+        cache_max_size=dict(required=False, type='int', default=DEFAULT_CACHE_MAX_SIZE),
+        targets=dict(required=False, type='list'),
+        max_bandwidth=dict(required=False, type='int'),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS)
     )
 
     def __init__(self):
@@ -205,12 +306,17 @@ class ArtifactBundleModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.i3s_client = self.oneview_client.create_image_streamer_client()
 
+        self.cache = None
+        if self.module.params.get('cache_dir'):
+            self.cache = ArtifactCache(self.module.params['cache_dir'],
+                                       self.module.params.get('cache_max_size') or DEFAULT_CACHE_MAX_SIZE)
+
     def run(self):
         try:
             ansible_facts = {}
@@ -243,6 +349,9 @@ class ArtifactBundleModule(object):
             elif state == 'backup_extracted':
                 changed, msg, ansible_facts = self.__extract_backup(data)
 
+            elif state == 'replicated':
+                return self.__replicate(data, resource)
+
             self.module.exit_json(msg=msg, changed=changed, ansible_facts=ansible_facts)
 
         except HPOneViewException as exception:
@@ -298,20 +407,54 @@ class ArtifactBundleModule(object):
         return changed, msg, dict(artifact_bundle=resource)
 
     def __download(self, data, resource):
+        if self.cache:
+            uri = DOWNLOAD_PATH + '/' + resource['uri'].split('/')[-1]
+            return self.__download_cached(uri, data['destinationFilePath'], resource,
+                                          ARTIFACT_BUNDLE_DOWNLOADED, ARTIFACT_BUNDLE_DOWNLOADED_FROM_CACHE)
+
         self.i3s_client.artifact_bundles.download_artifact_bundle(resource['uri'], data['destinationFilePath'])
         return False, ARTIFACT_BUNDLE_DOWNLOADED, {}
 
     def __download_archive(self, data, resource):
+        if self.cache:
+            uri = BACKUP_ARCHIVE_PATH + '/' + resource['uri'].split('/')[-1]
+            return self.__download_cached(uri, data['destinationFilePath'], resource,
+                                          ARCHIVE_DOWNLOADED, ARCHIVE_DOWNLOADED_FROM_CACHE)
+
         self.i3s_client.artifact_bundles.download_archive_artifact_bundle(resource['uri'], data['destinationFilePath'])
         return False, ARCHIVE_DOWNLOADED, {}
 
+    def __download_cached(self, uri, file_path, resource, downloaded_msg, cached_msg):
+        file_path = os.path.expanduser(file_path)
+        version = resource.get('eTag') or resource.get('modified')
+        connection = self.i3s_client.connection
+
+        try:
+            manifest, downloaded = self.cache.fetch(transfer_source(connection, uri), version, file_path,
+                                                    partial(download_file, connection, uri, file_path,
+                                                            version=version))
+        except TRANSFER_ERRORS as error:
+            raise HPOneViewException(ARTIFACT_BUNDLE_TRANSFER_FAILED.format(error))
+
+        transfer = dict(source=uri, size=manifest['size'], sha256=manifest['sha256'], version=version,
+                        cached=not downloaded)
+        return False, downloaded_msg if downloaded else cached_msg, dict(artifact_bundle_transfer=transfer)
+
     def __upload(self, data):
         file_name = data['localArtifactBundleFilePath']
         file_name_path = os.path.basename(file_name)
         file_name_wo_ext = os.path.splitext(file_name_path)[0]
         artifact_bundle = self.__get_by_name(file_name_wo_ext)
+
+        digest = None
+        if artifact_bundle is None and self.cache:
+            digest = file_digest(file_name)
+            artifact_bundle = self.__get_uploaded(digest)
+
         if artifact_bundle is None:
             artifact_bundle = self.i3s_client.artifact_bundles.upload_bundle_from_file(file_name)
+            if self.cache:
+                self.cache.record_upload(self.i3s_client.connection.get_host(), digest, artifact_bundle.get('uri'))
             changed = True
             msg = ARTIFACT_BUNDLE_UPLOADED
         else:
@@ -319,6 +462,107 @@ class ArtifactBundleModule(object):
             msg = ARTIFACT_BUNDLE_ALREADY_EXIST
         return changed, msg, dict(artifact_bundle=artifact_bundle)
 
+    def __get_uploaded(self, digest):
+        target = self.i3s_client.connection.get_host()
+        uri = self.cache.get_upload(target, digest)
+        if not uri:
+            return None
+
+        try:
+            return self.i3s_client.artifact_bundles.get(uri)
+        except HPOneViewException:
+            # removed from the appliance since it was uploaded
+            self.cache.record_upload(target, digest, None)
+            return None
+
+    def __replicate(self, data, resource):
+        if not resource:
+            raise HPOneViewException(ARTIFACT_BUNDLE_NOT_FOUND)
+        if not self.module.params.get('targets'):
+            raise HPOneViewException(REPLICATION_TARGETS_REQUIRED)
+
+        targets = [target if isinstance(target, dict) else dict(image_streamer_ip=target)
+                   for target in self.module.params['targets']]
+
+        directory = tempfile.mkdtemp()
+        try:
+            # named after the bundle, since the appliance names an uploaded bundle after its file
+            file_path = os.path.join(directory, resource['name'] + '.zip')
+            uri = DOWNLOAD_PATH + '/' + resource['uri'].split('/')[-1]
+            connection = self.i3s_client.connection
+            version = resource.get('eTag') or resource.get('modified')
+            try:
+                if self.cache:
+                    self.cache.fetch(transfer_source(connection, uri), version, file_path,
+                                     partial(download_file, connection, uri, file_path, version=version))
+                else:
+                    download_file(connection, uri, file_path, version=version)
+            except TRANSFER_ERRORS as error:
+                # nothing was sent to the targets
+                results = [dict(target=target.get('image_streamer_ip') or target.get('config'), changed=False,
+                                msg=None, uri=None, error=str(error)) for target in targets]
+                self.module.fail_json(msg=ARTIFACT_BUNDLE_TRANSFER_FAILED.format(error),
+                                      artifact_bundle_replication=results)
+                return
+
+            tasks = [partial(self.__replicate_to, target, file_path, resource['name']) for target in targets]
+            results = run_concurrently(tasks, self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        failed = [result for result in results if result.get('error')]
+        if failed:
+            self.module.fail_json(msg=ARTIFACT_BUNDLE_REPLICATION_FAILED.format(len(failed), len(results)),
+                                  artifact_bundle_replication=results)
+        else:
+            changed = [result for result in results if result['changed']]
+            self.module.exit_json(changed=bool(changed),
+                                  msg=ARTIFACT_BUNDLE_REPLICATED.format(len(changed), len(results)),
+                                  ansible_facts=dict(artifact_bundle_replication=results))
+
+    def __replicate_to(self, target, file_path, name):
+        host = target.get('image_streamer_ip') or target.get('config')
+        try:
+            i3s_client = self.__get_target_client(target)
+            connection = i3s_client.connection
+            host = connection.get_host()
+
+            resource = (i3s_client.artifact_bundles.get_by('name', name) or [None])[0]
+            if resource:
+                return dict(target=host, changed=False, msg=ARTIFACT_BUNDLE_ALREADY_EXIST, uri=resource['uri'])
+
+            max_rate = target.get('max_bandwidth') or self.module.params.get('max_bandwidth')
+            response, body, digest = upload_file(connection, ARTIFACT_BUNDLES_URI, file_path,
+                                                 DEFAULT_UPLOAD_CHUNK_SIZE, progress_logger(host + ': ' + name),
+                                                 max_rate)
+            if response.status >= 400:
+                raise HPOneViewException(body)
+
+            task = get_upload_task(connection, response, body)
+            resource = TaskMonitor(connection).wait_for_task(task) if task else body
+            if self.cache:
+                self.cache.record_upload(host, digest, resource.get('uri'))
+
+            resource = i3s_client.artifact_bundles.extract_bundle(resource)
+            return dict(target=host, changed=True, msg=ARTIFACT_BUNDLE_EXTRACTED, uri=resource.get('uri'))
+        except HPOneViewException as exception:
+            return dict(target=host, changed=False, msg=None, uri=None,
+                        error='; '.join(str(e) for e in exception.args))
+        except TRANSFER_ERRORS as error:
+            return dict(target=host, changed=False, msg=None, uri=None, error=str(error))
+
+    def __get_target_client(self, target):
+        oneview_client = self.oneview_client
+        if target.get('config'):
+            oneview_client = govern(OneViewClient.from_json_file(target['config']))
+
+        if not target.get('image_streamer_ip'):
+            return oneview_client.create_image_streamer_client()
+
+        connection = oneview_client.connection
+        return govern(ImageStreamerClient(target['image_streamer_ip'], connection.get_session_id(),
+                                          connection._apiVersion))
+
     def __upload_backup(self, data):
         deployment_group = self.i3s_client.artifact_bundles.upload_backup_bundle_from_file(
             data['localBackupArtifactBundleFilePath'], data['deploymentGroupURI'])
@@ -16,6 +16,7 @@
 # limitations under the License.
 ###
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -113,9 +114,9 @@ class BuildPlanFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            oneview_client = OneViewClient.from_environment_variables()
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.i3s_client = oneview_client.create_image_streamer_client()
 
@@ -16,10 +16,10 @@
 # limitations under the License.
 ###
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, resource_compare
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
 
@@ -125,9 +125,9 @@ class DeploymentPlanModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.i3s_client = self.oneview_client.create_image_streamer_client()
 
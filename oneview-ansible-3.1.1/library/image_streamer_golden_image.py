@@ -15,14 +15,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import os
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (ArtifactCache, DEFAULT_CACHE_MAX_SIZE, DEFAULT_UPLOAD_CHUNK_SIZE,
+                                          TRANSFER_ERRORS, download_file, get_upload_task, govern, load_manifest,
+                                          progress_logger, resource_compare, save_manifest, transfer_source,
+                                          upload_file)
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
     from hpOneView.exceptions import HPOneViewValueError
+    from hpOneView.resources.task_monitor import TaskMonitor
 
     HAS_HPE_ONEVIEW = True
 except ImportError:
@@ -52,12 +64,44 @@ options:
               'absent' will remove the resource from OneView, if it exists.
               'downloaded' will download the Golden Image to the file path provided.
               'archive_downloaded' will download the Golden Image archive to the file path provided.
+              The downloads write a '<destination_file_path>.manifest.json' file with the source, size, SHA-256
+              digest and version of the Golden Image, and are skipped when the destination matches it. An
+              interrupted download is resumed from the bytes already received when the endpoint accepts ranges
+              and the Golden Image did not change since; otherwise it starts over.
         choices: ['present', 'absent', 'downloaded', 'archive_downloaded']
         required: true
     data:
         description:
             - List with Golden Image properties and its associated states.
         required: true
+    chunk_size:
+        description:
+            - Number of bytes read and written at a time on uploads and downloads.
+        required: false
+        default: 1048576
+    max_workers:
+        description:
+            - Number of ranges of the Golden Image downloaded in parallel, when the endpoint accepts ranges.
+        required: false
+        default: 1
+    transfer_retries:
+        description:
+            - Number of times an upload or download is resumed when the connection fails. Downloads continue from
+              the bytes already received. Uploads cannot be partial, so the appliance is checked for the Golden Image
+              before the file is sent again.
+        required: false
+        default: 0
+    cache_dir:
+        description:
+            - Directory of a local content-addressed cache, shared with the image_streamer_artifact_bundle module.
+              When informed, the downloads are copied from the cache while the ETag, or the modification time, of the
+              Golden Image is unchanged, so the same image is only downloaded once for several destinations.
+        required: false
+    cache_max_size:
+        description:
+            - Maximum number of bytes of the files kept in the cache. The least recently used files are evicted first.
+        required: false
+        default: 10737418240
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -124,6 +168,17 @@ EXAMPLES = '''
     data:
         name: 'Golden Image name'
   delegate_to: localhost
+
+- name: Download the Golden Image in 4 parallel ranges, resuming up to 5 times
+  image_streamer_golden_image:
+    config: "{{ config }}"
+    state: downloaded
+    max_workers: 4
+    transfer_retries: 5
+    data:
+      name: 'Demo Golden Image'
+      destination_file_path: '~/downloaded_image.zip'
+  delegate_to: localhost
 '''
 
 RETURN = '''
@@ -131,6 +186,11 @@ golden_image:
     description: Has the OneView facts about the Golden Image.
     returned: On state 'present'.
     type: complex
+
+golden_image_transfer:
+    description: Has the source, size, SHA-256 digest and version of the file transferred, and the attempts made.
+    returned: When a file is uploaded or downloaded.
+    type: complex
 '''
 
 GOLDEN_IMAGE_CREATED = 'Golden Image created successfully.'
@@ -140,6 +200,9 @@ GOLDEN_IMAGE_ALREADY_UPDATED = 'Golden Image is already present.'
 GOLDEN_IMAGE_DELETED = 'Golden Image deleted successfully.'
 GOLDEN_IMAGE_DOWNLOADED = 'Golden Image downloaded successfully.'
 GOLDEN_IMAGE_ARCHIVE_DOWNLOADED = 'Golden Image archive downloaded successfully.'
+GOLDEN_IMAGE_ALREADY_DOWNLOADED = 'Golden Image is already downloaded.'
+GOLDEN_IMAGE_ARCHIVE_ALREADY_DOWNLOADED = 'Golden Image archive is already downloaded.'
+GOLDEN_IMAGE_TRANSFER_FAILED = 'Golden Image transfer failed after {0} attempts: {1}'
 GOLDEN_IMAGE_ALREADY_ABSENT = 'Golden Image is already absent.'
 GOLDEN_IMAGE_WAS_NOT_FOUND = 'Golden Image was not found.'
 I3S_CANT_CREATE_AND_UPLOAD = "You can use an existent OS Volume or upload an Image, you cannot do both."
@@ -148,6 +211,8 @@ I3S_OS_VOLUME_WAS_NOT_FOUND = 'OS Volume was not found.'
 I3S_BUILD_PLAN_WAS_NOT_FOUND = 'OS Build Plan was not found.'
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 
+GOLDEN_IMAGES_URI = '/rest/golden-images'
+
 
 class GoldenImageModule(object):
     argument_spec = dict(
@@ -156,7 +221,12 @@ class GoldenImageModule(object):
             required=True,
             choices=['present', 'absent', 'downloaded', 'archive_downloaded']
         ),
-        data=dict(required=True, type='dict')
+        data=dict(required=True, type='dict'),
+        chunk_size=dict(required=False, type='int', default=DEFAULT_UPLOAD_CHUNK_SIZE),
+        max_workers=dict(required=False, type='int', default=1),
+        transfer_retries=dict(required=False, type='int', default=0),
+        cache_dir=dict(required=False, type='str'),
+        cache_max_size=dict(required=False, type='int', default=DEFAULT_CACHE_MAX_SIZE)
     )
 
     def __init__(self):
@@ -165,12 +235,17 @@ class GoldenImageModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.i3s_client = self.oneview_client.create_image_streamer_client()
 
+        self.cache = None
+        if self.module.params.get('cache_dir'):
+            self.cache = ArtifactCache(self.module.params['cache_dir'],
+                                       self.module.params.get('cache_max_size') or DEFAULT_CACHE_MAX_SIZE)
+
     def run(self):
         try:
             state = self.module.params['state']
@@ -222,9 +297,10 @@ class GoldenImageModule(object):
                 msg = GOLDEN_IMAGE_CREATED
                 changed = True
             elif file_path:
-                resource = self.i3s_client.golden_images.upload(file_path, data)
+                resource, transfer = self.__upload(file_path, data)
                 msg = GOLDEN_IMAGE_UPLOADED
                 changed = True
+                return changed, msg, dict(golden_image=resource, golden_image_transfer=transfer)
             else:
                 raise HPOneViewValueError(I3S_MISSING_MANDATORY_ATTRIBUTES)
         else:
@@ -271,12 +347,84 @@ class GoldenImageModule(object):
             return False, GOLDEN_IMAGE_ALREADY_ABSENT, {}
 
     def __download(self, data, resource):
-        self.i3s_client.golden_images.download(resource['uri'], data['destination_file_path'])
-        return True, GOLDEN_IMAGE_DOWNLOADED, {}
+        uri = GOLDEN_IMAGES_URI + '/download/' + resource['uri'].split('/')[-1]
+        changed, transfer = self.__transfer_download(uri, data['destination_file_path'], resource)
+        msg = GOLDEN_IMAGE_DOWNLOADED if changed else GOLDEN_IMAGE_ALREADY_DOWNLOADED
+        return changed, msg, dict(golden_image_transfer=transfer)
 
     def __download_archive(self, data, resource):
-        self.i3s_client.golden_images.download_archive(resource['uri'], data['destination_file_path'])
-        return True, GOLDEN_IMAGE_ARCHIVE_DOWNLOADED, {}
+        uri = GOLDEN_IMAGES_URI + '/archive/' + resource['uri'].split('/')[-1]
+        changed, transfer = self.__transfer_download(uri, data['destination_file_path'], resource)
+        msg = GOLDEN_IMAGE_ARCHIVE_DOWNLOADED if changed else GOLDEN_IMAGE_ARCHIVE_ALREADY_DOWNLOADED
+        return changed, msg, dict(golden_image_transfer=transfer)
+
+    def __transfer_download(self, uri, file_path, resource):
+        file_path = os.path.expanduser(file_path)
+        version = resource.get('eTag') or resource.get('modified')
+
+        manifest = load_manifest(file_path)
+        if manifest and manifest.get('source') == uri and manifest.get('version') == version:
+            return False, manifest
+
+        connection = self.i3s_client.connection
+        chunk_size = self.module.params.get('chunk_size') or DEFAULT_UPLOAD_CHUNK_SIZE
+        max_workers = self.module.params.get('max_workers') or 1
+        progress = progress_logger(os.path.basename(file_path))
+        attempts = [0]
+
+        def download():
+            manifest, attempts[0] = self.__retry_transfer(partial(download_file, connection, uri, file_path,
+                                                                  chunk_size, max_workers, progress, version))
+            return manifest
+
+        if self.cache:
+            manifest = self.cache.fetch(transfer_source(connection, uri), version, file_path, download)[0]
+        else:
+            manifest = download()
+
+        manifest = dict(manifest, source=uri, version=version)
+        save_manifest(file_path, manifest)
+
+        return True, dict(manifest, attempts=attempts[0])
+
+    def __upload(self, file_path, data):
+        connection = self.i3s_client.connection
+        uri = "{0}?name={1}&description={2}".format(GOLDEN_IMAGES_URI, quote(data.get('name', '')),
+                                                    quote(data.get('description', '')))
+        chunk_size = self.module.params.get('chunk_size') or DEFAULT_UPLOAD_CHUNK_SIZE
+        transfer = dict(source=file_path, size=os.path.getsize(file_path), sha256=None)
+
+        def upload():
+            response, body, transfer['sha256'] = upload_file(connection, uri, file_path, chunk_size,
+                                                             progress_logger(os.path.basename(file_path)))
+            if response.status >= 400:
+                raise HPOneViewException(body)
+
+            task = get_upload_task(connection, response, body)
+            return TaskMonitor(connection).wait_for_task(task) if task else body
+
+        def get_uploaded():
+            # the connection may drop after the appliance received the whole file
+            return (self.i3s_client.golden_images.get_by('name', data['name']) or [None])[0]
+
+        resource, transfer['attempts'] = self.__retry_transfer(upload, get_uploaded)
+        return resource, transfer
+
+    def __retry_transfer(self, transfer, get_completed=None):
+        retries = self.module.params.get('transfer_retries') or 0
+        attempts = 0
+
+        while True:
+            attempts += 1
+            try:
+                return transfer(), attempts
+            except TRANSFER_ERRORS as error:
+                if attempts > retries:
+                    raise HPOneViewException(GOLDEN_IMAGE_TRANSFER_FAILED.format(attempts, error))
+
+            completed = get_completed() if get_completed else None
+            if completed:
+                return completed, attempts
 
 
 def main():
@@ -0,0 +1,1971 @@
+# -*- coding: utf-8 -*-
+###
+# Copyright (2017) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+
+import errno
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from http.client import HTTPException
+except ImportError:
+    from httplib import HTTPException
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_WORKERS = 8
+MAP_WINDOW_FACTOR = 2
+DEFAULT_RESERVATION_LEASE = 120
+DEFAULT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_BOUNDARY = '----------ThIs_Is_tHe_bouNdaRY_$'
+MANIFEST_SUFFIX = '.manifest.json'
+PARTS_SUFFIX = '.parts.json'
+DEFAULT_CACHE_MAX_SIZE = 10 * 1024 ** 3
+DEFAULT_GOVERNOR_MAX_REQUESTS = 16
+DEFAULT_GOVERNOR_LEASE = 300
+DEFAULT_GOVERNOR_TASK_LEASE = 3600
+GOVERNOR_POLL_INTERVAL = 0.05
+GOVERNOR_TASK_CHECK_INTERVAL = 5
+DEFAULT_CONFLICT_RETRIES = 5
+DEFAULT_CONFLICT_BACKOFF = 0.5
+MAX_CONFLICT_BACKOFF = 8
+
+ETAG_CONFLICT_ERROR_CODES = frozenset(['PRECONDITION_FAILED', 'ETAG_MISMATCH', 'INVALID_ETAG',
+                                       'RESOURCE_ETAG_MISMATCH'])
+RESOURCE_CONFLICT = "The resource was changed by someone else at: {0}. Review the changes and run it again."
+RESOURCE_REMOVED = "The resource was removed by someone else while it was being updated."
+
+
+class TransferError(HTTPException):
+    """
+    Raised when the appliance answers a file transfer with an error status or the transfer ends before the expected
+    size.
+
+    Args:
+        status (int): HTTP status of the response.
+        body: Response body, or the reason when the transfer was truncated.
+    """
+
+    def __init__(self, status, body):
+        super(TransferError, self).__init__('HTTP {0}: {1}'.format(status, body))
+        self.status = status
+        self.body = body
+
+
+# Errors raised when the connection drops in the middle of a file transfer
+TRANSFER_ERRORS = (IOError, OSError, HTTPException)
+# Attributes changed by OneView itself, never by the user data
+SERVER_MANAGED_FIELDS = frozenset(['eTag', 'modified', 'created', 'status'])
+
+logger = logging.getLogger(__name__)
+
+
+def transform_fields(fields):
+    """
+    Normalizes the fields argument of the facts modules to a list of attribute paths.
+
+    Args:
+        fields: A list of attribute paths or a comma-separated string, e.g. "name,mpHostInfo.mpIpAddresses".
+
+    Returns:
+        list: Attribute paths, without empty entries. An empty list when no projection was requested.
+    """
+    if not fields:
+        return []
+
+    if isinstance(fields, string_types):
+        fields = fields.split(',')
+
+    return [field.strip() for field in fields if field and field.strip()]
+
+
+def project_resource(resource, fields):
+    """
+    Keeps only the requested attributes of a resource, or of each resource of a list.
+
+    Nested attributes are addressed with dots. When an intermediate attribute is a list, the remaining path is
+    applied to each of its items.
+
+    Args:
+        resource: A resource dict or a list of resources.
+        fields: List of attribute paths to keep.
+
+    Returns:
+        The projected resource (or list of resources). The resource itself when no fields are given.
+    """
+    if not fields:
+        return resource
+
+    if isinstance(resource, list):
+        return [project_resource(item, fields) for item in resource]
+
+    if not isinstance(resource, dict):
+        return resource
+
+    projected = {}
+    for field in fields:
+        _copy_path(resource, projected, field.split('.'))
+    return projected
+
+
+def _copy_path(source, target, keys):
+    key = keys[0]
+
+    if key not in source:
+        return
+
+    value = source[key]
+
+    if len(keys) == 1:
+        target[key] = value
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(key, {}), keys[1:])
+    elif isinstance(value, list):
+        items = target.setdefault(key, [{} if isinstance(item, dict) else item for item in value])
+        for index, item in enumerate(value):
+            if isinstance(item, dict):
+                _copy_path(item, items[index], keys[1:])
+
+
+def get_path(resource, path, default=None):
+    """
+    Gets the value of an attribute of a resource addressed with dots, e.g. 'associatedResource.resourceUri'.
+
+    Args:
+        resource (dict): The resource.
+        path: Attribute path.
+        default: Value returned when the attribute is not present.
+
+    Returns:
+        The attribute value.
+    """
+    value = resource
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
+
+
+def supports_argument(function, argument):
+    """
+    Checks whether a function of the OneView SDK accepts a named argument.
+
+    Args:
+        function: The function or bound method.
+        argument: Argument name.
+
+    Returns:
+        bool: True when the argument is explicitly declared by the function.
+    """
+    try:
+        getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+        return argument in getargspec(function).args
+    except TypeError:
+        return False
+
+
+def get_all_projected(resource_client, params, fields):
+    """
+    Gets all the resources from a resource client keeping only the requested fields.
+
+    When the get_all of the resource client supports the 'fields' query parameter, the projection is also requested
+    from the server, so the appliance only sends the top-level attributes required. The local projection is always
+    applied to trim nested attributes and attributes the server returns regardless of the query.
+
+    Args:
+        resource_client: OneView SDK resource client, e.g. oneview_client.server_hardware.
+        params (dict): Params to delimit, filter and sort the list of resources.
+        fields: List of attribute paths to keep.
+
+    Returns:
+        list: The resources found.
+    """
+    fields = transform_fields(fields)
+    params = _add_server_side_fields(resource_client, params, fields)
+
+    return project_resource(resource_client.get_all(**params), fields)
+
+
+def _add_server_side_fields(resource_client, params, fields):
+    params = dict(params or {})
+
+    if fields and 'fields' not in params and supports_argument(resource_client.get_all, 'fields'):
+        top_level_fields = []
+        for field in fields:
+            name = field.split('.')[0]
+            if name not in top_level_fields:
+                top_level_fields.append(name)
+        params['fields'] = ','.join(top_level_fields)
+
+    return params
+
+
+def iter_all_pages(get_all, params, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Iterates over a collection requesting one page at a time, so the whole collection is never held in memory.
+
+    The 'start' and 'count' params, when informed, delimit the items iterated as they do for get_all.
+
+    Args:
+        get_all: The get_all function of a resource client.
+        params (dict): Params to delimit, filter and sort the list of resources.
+        page_size (int): Number of items requested on each call.
+
+    Returns:
+        generator: The resources, one at a time.
+    """
+    params = dict(params or {})
+    start = params.pop('start', 0)
+    remaining = params.pop('count', -1)
+
+    while remaining != 0:
+        requested = page_size if remaining < 0 else min(page_size, remaining)
+        page = get_all(start=start, count=requested, **params)
+
+        if remaining > 0:
+            page = page[:remaining]
+            remaining -= len(page)
+
+        for resource in page:
+            yield resource
+
+        if len(page) < requested:
+            break
+
+        start += len(page)
+
+
+def load_json_file(file_path, default=None):
+    """
+    Loads a JSON document persisted by save_json_file.
+
+    Args:
+        file_path: File path.
+        default: Value returned when the file does not exist.
+
+    Returns:
+        The document loaded.
+    """
+    if not os.path.exists(file_path):
+        return default
+
+    with open(file_path) as stream:
+        return json.load(stream)
+
+
+def save_json_file(file_path, data):
+    """
+    Saves a JSON document. The file is written to a temporary path and moved to the destination at the end, so
+    concurrent readers never see a partial document.
+
+    Args:
+        file_path: File path.
+        data: The document.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path))
+    try:
+        with os.fdopen(fd, 'w') as stream:
+            json.dump(data, stream, separators=(',', ':'))
+        os.rename(temp_path, file_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def get_changed_since(resource_client, params, cursor, fields=None, timestamp_field='modified'):
+    """
+    Gets only the resources created or changed since the last call, according to a cursor.
+
+    The resources are requested with a server-side filter on the timestamp field and sorted by it in ascending
+    order, so a 'count' param limits how far each call advances. Resources with the same timestamp as the cursor
+    are requested again and skipped locally, so none is lost when several resources share the same timestamp.
+
+    Args:
+        resource_client: OneView SDK resource client, e.g. oneview_client.tasks.
+        params (dict): Params to delimit and filter the list of resources. The sort param is replaced.
+        cursor (dict): The cursor returned by the previous call, or None on the first call.
+        fields: List of attribute paths to keep. The uri and the timestamp field are always kept.
+        timestamp_field: Name of the timestamp attribute used as watermark.
+
+    Returns:
+        tuple: The resources created or changed since the cursor, and the new cursor.
+    """
+    fields = transform_fields(fields)
+    if fields:
+        fields += [field for field in ('uri', timestamp_field) if field not in fields]
+    params = _add_server_side_fields(resource_client, params, fields)
+    cursor = cursor or {}
+    watermark = cursor.get('watermark')
+    seen_uris = set(cursor.get('uris') or [])
+
+    if watermark:
+        filters = params.get('filter') or []
+        if isinstance(filters, string_types):
+            filters = [filters]
+        params['filter'] = list(filters) + ["{0} >= '{1}'".format(timestamp_field, watermark)]
+    params['sort'] = '{0}:ascending'.format(timestamp_field)
+
+    changed = [project_resource(resource, fields) for resource in resource_client.get_all(**params)
+               if not (resource.get(timestamp_field) == watermark and resource.get('uri') in seen_uris)]
+
+    if changed:
+        new_watermark = max(resource.get(timestamp_field) for resource in changed)
+        new_uris = set(resource.get('uri') for resource in changed if resource.get(timestamp_field) == new_watermark)
+        if new_watermark == watermark:
+            new_uris |= seen_uris
+        cursor = dict(watermark=new_watermark, uris=sorted(new_uris))
+
+    return changed, cursor
+
+
+def write_json_lines(file_path, resources, compress=False):
+    """
+    Writes each resource as a JSON line. The file is written to a temporary path and moved to the destination at the
+    end, so a failure never leaves a truncated file behind.
+
+    Args:
+        file_path: Destination file path.
+        resources: Iterable of resources.
+        compress (bool): Whether the file must be gzip-compressed.
+
+    Returns:
+        int: Number of resources written.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path))
+    os.close(fd)
+
+    count = 0
+    try:
+        with (gzip.open(temp_path, 'wb') if compress else open(temp_path, 'wb')) as stream:
+            for resource in resources:
+                stream.write((json.dumps(resource, separators=(',', ':')) + '\n').encode('utf-8'))
+                count += 1
+        os.rename(temp_path, file_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+    return count
+
+
+def export_all_projected(resource_client, params, fields, file_path, compress=False, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Pages through all the resources from a resource client writing them to a JSON lines file.
+
+    Args:
+        resource_client: OneView SDK resource client, e.g. oneview_client.server_hardware.
+        params (dict): Params to delimit, filter and sort the list of resources.
+        fields: List of attribute paths to keep. All attributes are kept when not informed.
+        file_path: Destination file path.
+        compress (bool): Whether the file must be gzip-compressed.
+        page_size (int): Number of resources requested on each call.
+
+    Returns:
+        dict: The destination path, whether it is compressed, and the number of resources written.
+    """
+    fields = transform_fields(fields)
+    params = _add_server_side_fields(resource_client, params, fields)
+
+    resources = (project_resource(resource, fields)
+                 for resource in iter_all_pages(resource_client.get_all, params, page_size or DEFAULT_PAGE_SIZE))
+    count = write_json_lines(file_path, resources, compress)
+
+    return dict(dest=file_path, compressed=bool(compress), count=count)
+
+
+def run_concurrently(functions, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls the functions on a bounded thread pool.
+
+    The OneView SDK opens a new HTTP connection for each request, so independent GETs can be issued in parallel.
+
+    Args:
+        functions (list): Functions without arguments. Use functools.partial to bind them.
+        max_workers (int): Maximum number of functions running at the same time.
+
+    Returns:
+        list: The results, in the same order as the functions. If any function raises an exception, the exception of
+        the first failing function in that order is raised.
+    """
+    if len(functions) <= 1 or max_workers <= 1:
+        return [function() for function in functions]
+
+    pool = ThreadPool(min(max_workers, len(functions)))
+    try:
+        async_results = [pool.apply_async(function) for function in functions]
+        return [async_result.get() for async_result in async_results]
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def map_concurrently(function, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Applies a function to each item on a bounded thread pool, yielding the results as they are needed.
+
+    Unlike run_concurrently, the results are not accumulated, so they can be streamed to a file. The items are also
+    consumed lazily: no more than 'max_workers * MAP_WINDOW_FACTOR' of them are in flight at a time, so a generator
+    of pages is not drained ahead of the results.
+
+    Args:
+        function: Function called with each item.
+        items: Iterable of items.
+        max_workers (int): Maximum number of calls running at the same time.
+
+    Returns:
+        generator: The results, in the same order as the items.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    pool = ThreadPool(max_workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(function, (item,)))
+            if len(pending) >= max_workers * MAP_WINDOW_FACTOR:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class RateLimiter(object):
+    """
+    Spaces out the calls made by several threads so that no more than 'rate' calls start per second.
+
+    Args:
+        rate (float): Maximum number of calls per second. No limit is applied when it is zero or not informed.
+    """
+
+    def __init__(self, rate=None):
+        self.__interval = 1.0 / rate if rate else 0
+        self.__lock = threading.Lock()
+        self.__next_call = 0
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to make the next call.
+        """
+        if not self.__interval:
+            return
+
+        with self.__lock:
+            now = time.time()
+            delay = self.__next_call - now
+            self.__next_call = max(now, self.__next_call) + self.__interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def limit(self, function):
+        """
+        Wraps a function so that each call waits for its turn.
+        """
+        def limited(*args, **kwargs):
+            self.wait()
+            return function(*args, **kwargs)
+
+        return limited
+
+
+def gather_option_facts(option_calls, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Gathers the facts of the requested options of a facts module concurrently.
+
+    Args:
+        option_calls (list): Tuples of (fact name, function). The function is called without arguments.
+        max_workers (int): Maximum number of requests running at the same time.
+
+    Returns:
+        dict: The facts, keyed by fact name.
+    """
+    names = [name for name, _ in option_calls]
+    results = run_concurrently([function for _, function in option_calls], max_workers)
+    return dict(zip(names, results))
+
+
+def rank_candidates(candidates, owner):
+    """
+    Orders the candidates by a hash of the owner and the candidate (rendezvous hashing). Each owner gets a stable
+    order of its own, so concurrent owners tend to prefer distinct candidates even without coordination.
+
+    Args:
+        candidates: List of candidate identifiers, e.g. server hardware URIs.
+        owner: Identifier of who is choosing, e.g. the server profile name.
+
+    Returns:
+        list: The candidates in order of preference.
+    """
+    def rank(candidate):
+        return hashlib.md5(u'{0}|{1}'.format(owner, candidate).encode('utf-8')).hexdigest()
+
+    return sorted(candidates, key=rank)
+
+
+class ResourceReservations(object):
+    """
+    Short-lived reservations of resources, so concurrent module runs on the same host never pick the same one.
+
+    The reservations are kept in a JSON file guarded by an exclusive lock, which is shared by all the processes that
+    use the same file. Each reservation expires after the lease, so a crashed run never holds a resource for long.
+    When no file is informed, the reservations are only shared by the threads of the current process.
+
+    Args:
+        file_path: Path of the reservations file.
+        lease (int): Reservation lease in seconds.
+    """
+
+    def __init__(self, file_path=None, lease=DEFAULT_RESERVATION_LEASE):
+        self.file_path = file_path
+        self.lease = lease
+        self.__lock = threading.Lock()
+        self.__reservations = {}
+
+    def reserve(self, candidates, owner):
+        """
+        Reserves the first candidate, in the order given by rank_candidates, that is not reserved yet.
+
+        Args:
+            candidates: List of candidate identifiers.
+            owner: Identifier of who is reserving.
+
+        Returns:
+            The reserved candidate, or None when all of them are reserved.
+        """
+        with self.__locked() as reservations:
+            now = time.time()
+            for candidate in rank_candidates(candidates, owner):
+                if candidate not in reservations:
+                    reservations[candidate] = dict(owner=owner, expires=now + self.lease)
+                    return candidate
+        return None
+
+    def release(self, candidate):
+        """
+        Releases a reservation before its lease expires.
+        """
+        with self.__locked() as reservations:
+            reservations.pop(candidate, None)
+
+    @contextmanager
+    def __locked(self):
+        with self.__lock:
+            if not self.file_path:
+                self.__remove_expired(self.__reservations)
+                yield self.__reservations
+                return
+
+            with open(self.file_path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    reservations = self.__remove_expired(load_json_file(self.file_path, default={}))
+                    yield reservations
+                    save_json_file(self.file_path, reservations)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __remove_expired(self, reservations):
+        now = time.time()
+        for candidate in [key for key, value in reservations.items() if value['expires'] <= now]:
+            del reservations[candidate]
+        return reservations
+
+
+def get_patch_operations(current, desired, path=''):
+    """
+    Computes the JSON PATCH operations that turn the current state of a resource into the desired one.
+
+    Dicts are compared attribute by attribute, so only the changed paths are emitted. Lists and other values are
+    replaced as a whole when they differ. Attributes missing from the desired state are kept.
+
+    Args:
+        current (dict): The current resource.
+        desired (dict): The desired resource, usually the current one merged with the user data.
+        path: JSON pointer of the compared dicts.
+
+    Returns:
+        list: Operations with 'op', 'path' and 'value'.
+    """
+    operations = []
+    for key in sorted(desired):
+        key_path = '{0}/{1}'.format(path, str(key).replace('~', '~0').replace('/', '~1'))
+        if key not in current:
+            operations.append(dict(op='add', path=key_path, value=desired[key]))
+        elif isinstance(current[key], dict) and isinstance(desired[key], dict):
+            operations.extend(get_patch_operations(current[key], desired[key], key_path))
+        elif current[key] != desired[key]:
+            operations.append(dict(op='replace', path=key_path, value=desired[key]))
+    return operations
+
+
+def is_etag_conflict(exception):
+    """
+    Checks whether an error of the OneView SDK is the rejection of a request whose ETag no longer matches the one of
+    the resource, i.e. the resource changed since it was read.
+
+    Only the error codes of ETAG_CONFLICT_ERROR_CODES and the HTTP status 412 are recognized, as other errors may
+    mention the ETag, e.g. a request with a malformed one, and retrying them would not help.
+    """
+    response = getattr(exception, 'oneview_response', None)
+    if not isinstance(response, dict):
+        response = {}
+    if response.get('errorCode') in ETAG_CONFLICT_ERROR_CODES:
+        return True
+    status = getattr(exception, 'status', None) or response.get('httpStatus') or response.get('statusCode')
+    if status:
+        return str(status) == '412'
+    message = u'{0}'.format(response.get('message') or getattr(exception, 'msg', None) or exception)
+    return bool(re.match(r'\s*(HTTP\s*)?412\b', message, re.IGNORECASE))
+
+
+def merge_and_update(resource_client, current, data, update=None, merge=None, ignore=SERVER_MANAGED_FIELDS,
+                     retries=DEFAULT_CONFLICT_RETRIES, backoff=DEFAULT_CONFLICT_BACKOFF):
+    """
+    Merges the data over the current resource and updates it, retrying when the resource was changed by someone else
+    between the read and the update, e.g. by another fork of the playbook.
+
+    On an ETag conflict the resource is read again and, after a backoff, the data is merged over the fresh copy, so
+    the changes made by others are kept. It fails only when the other changes touch the same attributes as the data
+    with different values, since either change would be lost.
+
+    Args:
+        resource_client: OneView SDK resource client, e.g. oneview_client.ethernet_networks.
+        current (dict): The resource as read before the update.
+        data (dict): The desired attributes.
+        update: Function called with the current and the merged resource, that updates it and returns the updated
+            resource. Defaults to the update of the resource client, with the merged resource.
+        merge: Function called with a resource and the data, that returns the merged resource. Defaults to a shallow
+            merge.
+        ignore: Attribute names not compared.
+        retries (int): Maximum number of retries after a conflict.
+        backoff (float): Seconds to wait before the first retry, doubled on each of the next ones.
+
+    Returns:
+        tuple: The updated resource, the current one when nothing changed, and whether it was updated.
+    """
+    merge = merge or _merge_shallow
+    update = update or (lambda current, merged: resource_client.update(merged))
+    desired = merge(current, data)
+    original = current
+
+    for attempt in range(retries + 1):
+        merged = desired if current is original else merge(current, data)
+        if resource_compare(current, merged, ignore=ignore):
+            return current, False
+        try:
+            return update(current, merged), True
+        except Exception as exception:
+            if attempt >= retries or not is_etag_conflict(exception):
+                raise
+            logger.debug('ETag conflict updating {0}, retrying'.format(current.get('uri')))
+            time.sleep(min(backoff * 2 ** attempt, MAX_CONFLICT_BACKOFF))
+
+            current = resource_client.get(original['uri'])
+            if not current:
+                raise exception.__class__(RESOURCE_REMOVED)
+            conflicts = _get_conflicting_paths(original, current, desired, ignore)
+            if conflicts:
+                raise exception.__class__(RESOURCE_CONFLICT.format(', '.join(conflicts)))
+
+
+def _merge_shallow(resource, data):
+    merged = resource.copy()
+    merged.update(data)
+    return merged
+
+
+def _get_conflicting_paths(original, current, desired, ignore):
+    # Three-way check: a path changed by the data conflicts when it was also changed by someone else to another value
+    conflicts = []
+    for operation in get_patch_operations(original, desired):
+        if operation['path'].strip('/').split('/')[-1] in ignore:
+            continue
+        before = canonical_json(_get_pointer(original, operation['path']), ignore)
+        now = canonical_json(_get_pointer(current, operation['path']), ignore)
+        if now != before and now != canonical_json(operation['value'], ignore):
+            conflicts.append(operation['path'])
+    return conflicts
+
+
+def _get_pointer(resource, pointer):
+    for key in pointer.strip('/').split('/'):
+        if not isinstance(resource, dict):
+            return None
+        resource = resource.get(key.replace('~1', '/').replace('~0', '~'))
+    return resource
+
+
+def canonicalize(resource, ignore=SERVER_MANAGED_FIELDS):
+    """
+    Builds a canonical form of a resource, where equivalent documents are equal.
+
+    Attributes in 'ignore', null or empty values are removed from dicts, since a missing attribute is equivalent to
+    an empty one. Lists are sorted, their order is not relevant in OneView resources. Scalars are converted to
+    strings, so 1, 1.0 and '1' are equivalent.
+
+    Args:
+        resource: A resource, list or value.
+        ignore: Attribute names removed from the dicts at any level.
+
+    Returns:
+        The canonical form, made of dicts, lists and strings.
+    """
+    return json.loads(canonical_json(resource, ignore))
+
+
+def canonical_json(resource, ignore=SERVER_MANAGED_FIELDS):
+    """
+    Serializes the canonical form of a resource, as described in canonicalize. The document is serialized bottom-up
+    in a single pass, so each level is visited only once, even to sort the lists.
+
+    Returns:
+        str: The canonical JSON. Equivalent resources have the same JSON.
+    """
+    if isinstance(resource, dict):
+        items = []
+        for key, value in resource.items():
+            if key not in ignore:
+                value = canonical_json(value, ignore)
+                if value not in _EMPTY_JSON:
+                    items.append((_encode_string(key), value))
+        items.sort()
+        return '{' + ','.join(key + ':' + value for key, value in items) + '}'
+
+    if isinstance(resource, (list, tuple)):
+        return '[' + ','.join(sorted(canonical_json(item, ignore) for item in resource)) + ']'
+
+    if resource is None:
+        return 'null'
+
+    if isinstance(resource, float) and resource.is_integer():
+        resource = int(resource)
+    return _encode_string(resource if isinstance(resource, string_types) else str(resource))
+
+
+_EMPTY_JSON = frozenset(['null', '""', '[]', '{}'])
+_encode_string = json.encoder.encode_basestring_ascii
+
+
+def canonical_hash(resource, ignore=SERVER_MANAGED_FIELDS):
+    """
+    Computes a hash of the canonical form of a resource.
+
+    Returns:
+        str: The hex digest. Equivalent resources have the same hash.
+    """
+    return hashlib.md5(canonical_json(resource, ignore).encode('utf-8')).hexdigest()
+
+
+def resource_compare(first_resource, second_resource, ignore=SERVER_MANAGED_FIELDS):
+    """
+    Checks whether two resources are equivalent, ignoring the attributes managed by OneView, the order of the lists
+    and the type of the values. Drop-in replacement of hpOneView.extras.comparators.resource_compare, which copies
+    and walks both documents once per level.
+
+    Each resource is serialized once in its canonical form and the serialized forms are compared, which is as precise
+    as comparing their hashes and saves hashing them. The differences are only computed, to be logged, when the
+    forms differ.
+
+    Args:
+        first_resource (dict): First resource.
+        second_resource (dict): Second resource.
+        ignore: Attribute names not compared.
+
+    Returns:
+        bool: True when equivalent, False when different.
+    """
+    if first_resource is second_resource:
+        return True
+
+    first = canonical_json(first_resource or {}, ignore)
+    second = canonical_json(second_resource or {}, ignore)
+
+    if first == second:
+        return True
+
+    if logger.isEnabledFor(logging.DEBUG):
+        first, second = json.loads(first), json.loads(second)
+        differences = [operation['path'] for operation in get_patch_operations(first, second)]
+        differences += [operation['path'] for operation in get_patch_operations(second, first)
+                        if operation['op'] == 'add']
+        logger.debug('Difference found at {0}'.format(', '.join(sorted(set(differences)))))
+    return False
+
+
+def file_digest(file_path, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE):
+    """
+    Computes the SHA-256 digest of a file, reading it in chunks so that multi-gigabyte files are not loaded in memory.
+
+    Args:
+        file_path (str): Path of the local file.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file_object:
+        chunk = file_object.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = file_object.read(chunk_size)
+    return digest.hexdigest()
+
+
+def progress_logger(description, step=10):
+    """
+    Creates a progress callback for upload_file that logs each time another 'step' percent of the file is sent.
+
+    Args:
+        description (str): Identifies the transfer on the log, e.g. the file name.
+        step (int): Percentage between two log entries.
+
+    Returns:
+        function: Callback receiving the bytes sent and the total bytes.
+    """
+    reported = [-step]
+
+    def log_progress(sent, total):
+        percentage = 100 * sent // total if total else 100
+        if percentage - reported[0] >= step or sent == total:
+            reported[0] = percentage
+            logger.info('{0}: {1} of {2} bytes sent ({3}%)'.format(description, sent, total, percentage))
+
+    return log_progress
+
+
+def upload_file(connection, uri, file_path, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE, progress=None, max_rate=None):
+    """
+    Uploads a file as multipart/form-data, streaming it straight from the disk.
+
+    The SDK writes an encoded copy of the whole file next to it before sending it, which doubles the disk usage and
+    the reads for multi-gigabyte ISOs. Here the file is read once, in chunks, and its digest is computed on the way.
+
+    Args:
+        connection: The connection of the OneView or Image Streamer client.
+        uri (str): URI of the upload endpoint.
+        file_path (str): Path of the local file.
+        chunk_size (int): Number of bytes read and sent at a time.
+        progress: Function called with the bytes sent and the total bytes after each chunk.
+        max_rate (int): Maximum number of bytes sent per second. No limit is applied when it is not informed.
+
+    Returns:
+        tuple: The HTTP response, the response body, parsed when it is JSON, and the SHA-256 digest of the file.
+
+    Raises:
+        One of TRANSFER_ERRORS when the connection fails.
+    """
+    file_name = os.path.basename(file_path)
+    file_size = os.path.getsize(file_path)
+    head = ('--' + UPLOAD_BOUNDARY + '\r\n'
+            'Content-Disposition: form-data; name="file"; filename="' + file_name + '"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+    tail = ('\r\n--' + UPLOAD_BOUNDARY + '--\r\n\r\n').encode('utf-8')
+    digest = hashlib.sha256()
+
+    with _governed_transfer(connection):
+        response, body = _send_upload(connection, uri, file_path, file_name, file_size, head, tail, digest,
+                                      chunk_size, progress, max_rate)
+
+    if body:
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+
+    return response, body, digest.hexdigest()
+
+
+def _send_upload(connection, uri, file_path, file_name, file_size, head, tail, digest, chunk_size, progress,
+                 max_rate):
+    http_connection = connection.get_connection()
+    try:
+        http_connection.connect()
+        http_connection.putrequest('POST', uri)
+        http_connection.putheader('uploadfilename', file_name)
+        http_connection.putheader('auth', connection._headers['auth'])
+        http_connection.putheader('Content-Type', 'multipart/form-data; boundary=' + UPLOAD_BOUNDARY)
+        http_connection.putheader('Content-Length', str(len(head) + file_size + len(tail)))
+        http_connection.putheader('X-API-Version', connection._apiVersion)
+        http_connection.endheaders()
+
+        http_connection.send(head)
+        sent = 0
+        started = time.time()
+        with open(file_path, 'rb') as file_object:
+            chunk = file_object.read(chunk_size)
+            while chunk:
+                http_connection.send(chunk)
+                digest.update(chunk)
+                sent += len(chunk)
+                if progress:
+                    progress(sent, file_size)
+                if max_rate:
+                    _throttle(started, sent, max_rate)
+                chunk = file_object.read(chunk_size)
+        http_connection.send(tail)
+
+        response = http_connection.getresponse()
+        return response, response.read().decode('utf-8')
+    finally:
+        http_connection.close()
+
+
+@contextmanager
+def _governed_transfer(connection):
+    # the transfers are made on raw HTTP connections, not through the governed do_http, so they hold a request
+    # ticket of the governor installed on the connection themselves
+    governor = getattr(connection, 'api_governor', None)
+    if isinstance(governor, ApiGovernor):
+        with governor.request(connection.get_host()):
+            yield
+    else:
+        yield
+
+
+def _throttle(started, sent, max_rate):
+    delay = started + float(sent) / max_rate - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def get_upload_task(connection, response, body):
+    """
+    Gets the task started by an upload, the same way the SDK does for its multipart requests.
+
+    Args:
+        connection: The connection used on the upload.
+        response: The HTTP response returned by upload_file.
+        body: The response body returned by upload_file.
+
+    Returns:
+        dict: The task, or None when the upload did not start a task and the body is the result.
+    """
+    if response.status == 202:
+        location = response.getheader('Location')
+        if location:
+            return connection.get(location)
+        if isinstance(body, dict) and 'taskState' in body:
+            return body
+        return None
+
+    if isinstance(body, dict) and body.get('category') == 'tasks':
+        return body
+    return None
+
+
+def download_file(connection, uri, file_path, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE, max_workers=1, progress=None,
+                  version=None):
+    """
+    Downloads a file, resuming the transfer left by a previous call and computing its SHA-256 digest.
+
+    When the endpoint answers a 'Range' request with its total size, the bytes already received are kept in
+    '<file_path>.part<index>of<count>' files between calls and only the missing ranges are requested. With
+    max_workers above 1, the file is split in that many ranges, downloaded in parallel and concatenated at the end.
+    Otherwise the file is downloaded from the start and hashed while streamed. The destination is only replaced
+    when the whole file is received.
+
+    The parts are only resumed when they belong to the same file: a '<file_path>.parts.json' sidecar records the URI,
+    the version, the total size and the ETag or Last-Modified header of the endpoint, and the parts are discarded when
+    any of them differs. The resumed ranges are also requested with an 'If-Range' header, so a file changed since is
+    never appended to the old bytes.
+
+    Args:
+        connection: The connection of the OneView or Image Streamer client.
+        uri (str): URI of the download endpoint.
+        file_path (str): Destination path.
+        chunk_size (int): Number of bytes read and written at a time.
+        max_workers (int): Maximum number of ranges downloaded at the same time.
+        progress: Function called with the bytes received and the total bytes, or None when unknown.
+        version (str): Version of the resource downloaded, e.g. its eTag or modified attribute.
+
+    Returns:
+        dict: The manifest of the downloaded file, with its source, size and sha256.
+
+    Raises:
+        One of TRANSFER_ERRORS when the connection fails. The partial ranges are kept for the next call.
+    """
+    total, validator = _get_ranged_size(connection, uri)
+
+    if total is None:
+        segments = [(0, None)]
+    else:
+        count = max(1, min(max_workers or 1, total // chunk_size))
+        size = -(-total // count) or 1
+        segments = [(start, min(start + size, total) - 1) for start in range(0, total, size)] or [(0, -1)]
+
+    part_paths = ['{0}.part{1}of{2}'.format(file_path, index, len(segments)) for index in range(len(segments))]
+    parts = dict(source=uri, version=version, size=total, validator=validator)
+    if total is None or load_json_file(file_path + PARTS_SUFFIX) != parts:
+        _remove_parts(file_path)
+        if total is not None:
+            save_json_file(file_path + PARTS_SUFFIX, parts)
+
+    for part_path, (start, end) in zip(part_paths, segments):
+        if end is not None and _get_file_size(part_path) > end - start + 1:
+            os.remove(part_path)
+
+    lock = threading.Lock()
+    received = [sum(_get_file_size(part_path) for part_path in part_paths)]
+
+    def report(length):
+        with lock:
+            received[0] += length
+            if progress:
+                progress(received[0], total)
+
+    digest = hashlib.sha256() if len(segments) == 1 else None
+    downloads = [partial(_download_segment, connection, uri, part_path, start, end, chunk_size, report, digest,
+                         validator)
+                 for part_path, (start, end) in zip(part_paths, segments)]
+    run_concurrently(downloads, max_workers or 1)
+
+    if total is not None and received[0] != total:
+        raise TransferError(206, 'received {0} of {1} bytes'.format(received[0], total))
+
+    if digest:
+        # nothing was written when the file is empty
+        open(part_paths[0], 'ab').close()
+        os.rename(part_paths[0], file_path)
+    else:
+        digest = _concatenate(part_paths, file_path, chunk_size)
+    _remove_parts(file_path)
+
+    return dict(source=uri, size=received[0], sha256=digest.hexdigest())
+
+
+def load_manifest(file_path):
+    """
+    Loads the sidecar manifest written with save_manifest for a downloaded file.
+
+    Returns:
+        dict: The manifest, or None when there is no manifest or the file does not exist or has another size.
+    """
+    manifest = load_json_file(file_path + MANIFEST_SUFFIX)
+    if not manifest or not os.path.exists(file_path) or os.path.getsize(file_path) != manifest.get('size'):
+        return None
+    return manifest
+
+
+def save_manifest(file_path, manifest):
+    """
+    Saves the manifest of a downloaded file to '<file_path>.manifest.json'.
+    """
+    save_json_file(file_path + MANIFEST_SUFFIX, manifest)
+
+
+def _get_file_size(file_path):
+    return os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+
+def _open_download(connection, uri, headers=None):
+    request_headers = connection._headers.copy()
+    request_headers.update(headers or {})
+
+    http_connection = connection.get_connection()
+    http_connection.request('GET', uri, '', request_headers)
+    response = http_connection.getresponse()
+
+    if response.status >= 400:
+        body = response.read()
+        http_connection.close()
+        raise TransferError(response.status, body)
+    return http_connection, response
+
+
+def _get_ranged_size(connection, uri):
+    with _governed_transfer(connection):
+        http_connection, response = _open_download(connection, uri, {'Range': 'bytes=0-0'})
+        http_connection.close()
+
+    total = (response.getheader('Content-Range') or '').rpartition('/')[2]
+    if response.status == 206 and total.isdigit():
+        return int(total), response.getheader('ETag') or response.getheader('Last-Modified')
+    return None, None
+
+
+def _remove_parts(file_path):
+    directory, name = os.path.split(os.path.abspath(file_path))
+    part_name = re.compile(re.escape(name) + r'\.part\d+of\d+$')
+    for file_name in os.listdir(directory):
+        if part_name.match(file_name) or file_name == name + PARTS_SUFFIX:
+            os.remove(os.path.join(directory, file_name))
+
+
+def _download_segment(connection, uri, part_path, start, end, chunk_size, report, digest=None, validator=None):
+    offset = _get_file_size(part_path)
+
+    if digest and offset:
+        with open(part_path, 'rb') as part:
+            chunk = part.read(chunk_size)
+            while chunk:
+                digest.update(chunk)
+                chunk = part.read(chunk_size)
+
+    if end is not None and start + offset > end:
+        return
+
+    headers = {'Range': 'bytes={0}-{1}'.format(start + offset, end)} if end is not None else {}
+    if headers and offset and validator:
+        headers['If-Range'] = validator
+    with _governed_transfer(connection):
+        _receive_segment(connection, uri, part_path, headers, chunk_size, report, digest)
+
+
+def _receive_segment(connection, uri, part_path, headers, chunk_size, report, digest):
+    http_connection, response = _open_download(connection, uri, headers)
+    try:
+        if headers and response.status != 206:
+            if 'If-Range' in headers:
+                # the file changed since the part was received, so it is downloaded again on the next call
+                os.remove(part_path)
+                raise TransferError(response.status, 'the file changed since the download started')
+            raise TransferError(response.status, 'the range request was not honored')
+
+        with open(part_path, 'ab') as part:
+            chunk = response.read(chunk_size)
+            while chunk:
+                part.write(chunk)
+                if digest:
+                    digest.update(chunk)
+                report(len(chunk))
+                chunk = response.read(chunk_size)
+    finally:
+        http_connection.close()
+
+
+def _concatenate(part_paths, file_path, chunk_size):
+    digest = hashlib.sha256()
+    temp_path = file_path + '.tmp'
+
+    with open(temp_path, 'wb') as destination:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as part:
+                chunk = part.read(chunk_size)
+                while chunk:
+                    destination.write(chunk)
+                    digest.update(chunk)
+                    chunk = part.read(chunk_size)
+
+    os.rename(temp_path, file_path)
+    for part_path in part_paths:
+        os.remove(part_path)
+    return digest
+
+
+def transfer_source(connection, uri):
+    """
+    Identifies a file of an appliance, so the same URI on two appliances is never mistaken for the same file.
+
+    Returns:
+        str: The appliance address followed by the URI.
+    """
+    return connection.get_host() + uri
+
+
+class ArtifactCache(object):
+    """
+    Local content-addressed cache of the files transferred to and from the appliances.
+
+    Each file is stored once under its SHA-256 digest, whatever the appliance or URI it came from. An index records the
+    digest and version of each downloaded source, and the digests already uploaded to each appliance. When the cached
+    files exceed the maximum size, the least recently used ones are evicted.
+
+    The index is a JSON file guarded by an exclusive lock, which is shared by all the processes that use the same
+    directory.
+
+    Args:
+        directory (str): Cache directory. It is created when it does not exist.
+        max_size (int): Maximum number of bytes of the cached files.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_MAX_SIZE):
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        self.__lock = threading.Lock()
+        self.__index_path = os.path.join(self.directory, 'index.json')
+
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+
+    def fetch(self, source, version, file_path, download):
+        """
+        Copies the cached file of a source to the file path when the appliance copy did not change since it was cached,
+        otherwise downloads and caches it.
+
+        Args:
+            source (str): Identifies the file on the appliance, see transfer_source.
+            version: ETag or modification time of the appliance copy. Nothing is served from the cache when it is None.
+            file_path (str): Destination path.
+            download: Function without arguments that downloads the file to the file path and returns its manifest,
+                like download_file.
+
+        Returns:
+            tuple: The manifest of the file, with its size and sha256, and whether it was downloaded.
+        """
+        digest = None
+        if version is not None:
+            with self.__locked() as index:
+                entry = index['sources'].get(source)
+                if entry and entry['version'] == version and entry['sha256'] in index['blobs']:
+                    digest = entry['sha256']
+                    index['blobs'][digest]['used'] = time.time()
+
+        if digest:
+            try:
+                _copy_file(self.get_path(digest), file_path)
+                return dict(size=os.path.getsize(file_path), sha256=digest), False
+            except (IOError, OSError) as error:
+                # another process may have evicted the file since the index was read
+                logger.debug("Could not copy the cached file '{0}': {1}".format(digest, error))
+
+        manifest = download()
+        self.add(file_path, manifest['sha256'], source=source, version=version)
+        return manifest, True
+
+    def add(self, file_path, digest=None, source=None, version=None):
+        """
+        Stores a copy of a file, unless a file with the same digest is already stored.
+
+        Args:
+            file_path (str): Path of the file.
+            digest (str): SHA-256 digest of the file, computed when not informed.
+            source (str): Identifies the file on the appliance it was downloaded from, if any.
+            version: ETag or modification time of the appliance copy.
+
+        Returns:
+            str: The digest.
+        """
+        digest = digest or file_digest(file_path)
+        blob_path = self.get_path(digest)
+        if not os.path.exists(blob_path):
+            _copy_file(file_path, blob_path)
+
+        with self.__locked() as index:
+            index['blobs'][digest] = dict(size=os.path.getsize(blob_path), used=time.time())
+            if source:
+                index['sources'][source] = dict(sha256=digest, version=version)
+            self.__evict(index, digest)
+        return digest
+
+    def get_path(self, digest):
+        """
+        Gets the path where the file with the digest is stored. The file may not exist.
+        """
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get_upload(self, target, digest):
+        """
+        Gets the URI of the resource created when a file with the digest was uploaded to the target appliance.
+
+        Returns:
+            str: The resource URI, or None when the digest was never uploaded to the target.
+        """
+        with self.__locked() as index:
+            return index['targets'].get(target, {}).get(digest)
+
+    def record_upload(self, target, digest, uri):
+        """
+        Records the resource created by uploading a file with the digest to the target appliance. A None URI forgets
+        the upload, e.g. when the resource was removed from the appliance.
+        """
+        with self.__locked() as index:
+            uploads = index['targets'].setdefault(target, {})
+            if uri:
+                uploads[digest] = uri
+            else:
+                uploads.pop(digest, None)
+
+    def __evict(self, index, keep):
+        size = sum(blob['size'] for blob in index['blobs'].values())
+
+        for digest, blob in sorted(index['blobs'].items(), key=lambda item: item[1]['used']):
+            if size <= self.max_size:
+                break
+            if digest == keep:
+                continue
+
+            if os.path.exists(self.get_path(digest)):
+                os.remove(self.get_path(digest))
+            del index['blobs'][digest]
+            size -= blob['size']
+
+        for source in [key for key, entry in index['sources'].items() if entry['sha256'] not in index['blobs']]:
+            del index['sources'][source]
+
+    @contextmanager
+    def __locked(self):
+        with self.__lock:
+            with open(self.__index_path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    index = load_json_file(self.__index_path, default={})
+                    for key in ['blobs', 'sources', 'targets']:
+                        index.setdefault(key, {})
+                    yield index
+                    save_json_file(self.__index_path, index)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _copy_file(source_path, file_path):
+    directory = os.path.dirname(os.path.abspath(file_path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path))
+    os.close(fd)
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.rename(temp_path, file_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+class _TaskStarter(object):
+    """
+    Stands in for the TaskMonitor of an SDK resource client, returning the tasks instead of waiting for them.
+    """
+
+    def __init__(self):
+        self.tasks = []
+
+    def wait_for_task(self, task, timeout=-1):
+        self.tasks.append(task)
+        return task
+
+    def get_completed_task(self, task, timeout=-1):
+        return self.wait_for_task(task, timeout)
+
+
+def start_task(resource, operation):
+    """
+    Calls an operation of an SDK resource client without waiting for the appliance task it starts.
+
+    The SDK waits for every task before returning, which holds the Ansible fork for as long as a firmware update or
+    a Server Profile creation takes. The request is still built by the SDK, only the task monitor of the resource
+    client is swapped during the call, so the resource client must not be shared with other threads meanwhile.
+
+    Args:
+        resource: The SDK resource client, e.g. oneview_client.logical_interconnects.
+        operation: Function without arguments calling the resource client. Use functools.partial to bind them.
+
+    Returns:
+        tuple: The task, or None when the appliance completed the operation without a task, and the result of the
+        operation.
+    """
+    client = resource._client
+    task_monitor = client._task_monitor
+    task_starter = _TaskStarter()
+    client._task_monitor = task_starter
+    try:
+        result = operation()
+    finally:
+        client._task_monitor = task_monitor
+
+    return (task_starter.tasks[0] if task_starter.tasks else None), result
+
+
+_ESTATE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    uri TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT,
+    serial TEXT,
+    enclosure TEXT,
+    state TEXT,
+    status TEXT,
+    modified TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_type_name ON resources (type, name);
+CREATE INDEX IF NOT EXISTS resources_serial ON resources (serial);
+CREATE INDEX IF NOT EXISTS resources_enclosure ON resources (enclosure);
+CREATE INDEX IF NOT EXISTS resources_state ON resources (state);
+CREATE INDEX IF NOT EXISTS resources_modified ON resources (modified);
+CREATE TABLE IF NOT EXISTS syncs (
+    type TEXT PRIMARY KEY,
+    watermark TEXT,
+    uris TEXT,
+    refreshed REAL,
+    full_refreshed REAL
+);
+"""
+
+
+class EstateIndex(object):
+    """
+    Local SQLite index of OneView resources, filled by the oneview_estate_snapshot module.
+
+    Each resource is kept whole as JSON, next to indexed columns extracted from it, so resources can be looked up by
+    type, name, serial number, enclosure or state without querying the appliance. The database is opened in WAL
+    mode, so the forks of a playbook can read it while it is refreshed. A new database file is readable only by its
+    owner, as are the journal files SQLite creates next to it.
+    """
+    COLUMNS = ('uri', 'type', 'name', 'serial', 'enclosure', 'state', 'status', 'modified')
+
+    def __init__(self, file_path, timeout=30):
+        self.file_path = file_path
+        os.close(os.open(file_path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self.connection = sqlite3.connect(file_path, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_ESTATE_INDEX_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_sync(self, resource_type):
+        """
+        Gets the state of the last refresh of a resource type.
+
+        Returns:
+            dict: The cursor of get_changed_since and the times of the last refresh and of the last full refresh, or
+            None when the type was never refreshed.
+        """
+        row = self.connection.execute('SELECT watermark, uris, refreshed, full_refreshed FROM syncs WHERE type = ?',
+                                      (resource_type,)).fetchone()
+        if not row:
+            return None
+        cursor = dict(watermark=row[0], uris=json.loads(row[1] or '[]')) if row[0] else None
+        return dict(type=resource_type, cursor=cursor, refreshed=row[2], full_refreshed=row[3])
+
+    def get_syncs(self):
+        """
+        Gets the state of the last refresh of every resource type, with the number of resources indexed.
+
+        Returns:
+            list: One dict per resource type, sorted by type.
+        """
+        counts = dict(self.connection.execute('SELECT type, COUNT(*) FROM resources GROUP BY type'))
+        types = [row[0] for row in self.connection.execute('SELECT type FROM syncs ORDER BY type')]
+        syncs = []
+        for resource_type in types:
+            sync = self.get_sync(resource_type)
+            sync['count'] = counts.get(resource_type, 0)
+            syncs.append(sync)
+        return syncs
+
+    def save(self, resource_type, resources, cursor, refreshed, full=False):
+        """
+        Stores the resources of a type and the cursor of the refresh in a single transaction.
+
+        Args:
+            resource_type: Name of the resource type, e.g. 'server_hardware'.
+            resources (list): The resources created or changed, or all the resources on a full refresh.
+            cursor (dict): The cursor returned by get_changed_since.
+            refreshed (float): Time of the refresh.
+            full (bool): Whether the resources are all the resources of the type. The ones indexed before and not
+                informed are removed.
+        """
+        cursor = cursor or {}
+        with self.connection:
+            sync = self.get_sync(resource_type)
+            full_refreshed = refreshed if full or not sync else sync['full_refreshed']
+
+            if full:
+                self.connection.execute('DELETE FROM resources WHERE type = ?', (resource_type,))
+            self.connection.executemany('INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        [self.__to_row(resource_type, resource) for resource in resources])
+            self.connection.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?, ?)',
+                                    (resource_type, cursor.get('watermark'), json.dumps(cursor.get('uris') or []),
+                                     refreshed, full_refreshed))
+
+    def find(self, **filters):
+        """
+        Gets the resources matching all the filters.
+
+        Args:
+            **filters: Values of the indexed columns, e.g. type='server_hardware', name='0000A66101, bay 3'. A list
+                matches any of its values.
+
+        Returns:
+            list: The resources, sorted by type and name.
+        """
+        conditions = []
+        values = []
+        for column, value in sorted(filters.items()):
+            if column not in self.COLUMNS:
+                raise ValueError("Unknown column '{0}'. Use one of: {1}.".format(column, ', '.join(self.COLUMNS)))
+            if isinstance(value, (list, tuple)):
+                conditions.append('{0} IN ({1})'.format(column, ', '.join('?' * len(value))))
+                values.extend(value)
+            else:
+                conditions.append('{0} = ?'.format(column))
+                values.append(value)
+
+        query = 'SELECT data FROM resources'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY type, name'
+
+        return [json.loads(row[0]) for row in self.connection.execute(query, values)]
+
+    def refresh(self, resource_types, get_resource_client, full=False, max_age=None,
+                max_workers=DEFAULT_MAX_WORKERS, errors=(Exception,)):
+        """
+        Fetches the resource types concurrently with get_changed_since and stores them.
+
+        A type is fetched in full when it was never refreshed, when requested, or when its last full refresh is older
+        than max_age, so the resources removed from the appliance are also removed from the index. The resources are
+        stored from the calling thread, as the SQLite connection must not be shared among threads.
+
+        Args:
+            resource_types (list): Names of the resource types, e.g. 'server_hardware'.
+            get_resource_client: Function that returns the resource client of a type.
+            full (bool): Whether all the types must be fetched in full.
+            max_age (int): Seconds after which the refresh of a type is a full refresh.
+            max_workers (int): Maximum number of types fetched at the same time.
+            errors (tuple): Exceptions recorded as the error of a type, instead of being raised.
+
+        Returns:
+            list: One dict per resource type, with whether the refresh was full, the number of resources created or
+            changed, the number of resources indexed, and the error message when the type could not be fetched.
+        """
+        now = time.time()
+
+        cursors = []
+        for resource_type in resource_types:
+            sync = self.get_sync(resource_type)
+            full_refresh = full or not sync or not sync['cursor'] or \
+                (max_age is not None and now - (sync['full_refreshed'] or 0) >= max_age)
+            cursors.append(None if full_refresh else sync['cursor'])
+
+        def fetch(resource_type, cursor):
+            try:
+                resources, new_cursor = get_changed_since(get_resource_client(resource_type), {}, cursor)
+                return resources, new_cursor, None
+            except errors as exception:
+                return None, None, '; '.join(str(e) for e in exception.args)
+
+        fetches = [partial(fetch, resource_type, cursor) for resource_type, cursor in zip(resource_types, cursors)]
+        fetched = run_concurrently(fetches, max_workers or DEFAULT_MAX_WORKERS)
+
+        results = []
+        for resource_type, cursor, (resources, new_cursor, error) in zip(resource_types, cursors, fetched):
+            result = dict(type=resource_type, full=cursor is None, changed=0, count=None, error=error)
+            if not error:
+                self.save(resource_type, resources, new_cursor, now, full=cursor is None)
+                result['changed'] = len(resources)
+            results.append(result)
+
+        counts = dict((sync['type'], sync['count']) for sync in self.get_syncs())
+        for result in results:
+            result['count'] = counts.get(result['type'], 0)
+
+        return results
+
+    def get_by_name(self, resource_type, name):
+        resources = self.find(type=resource_type, name=name)
+        return resources[0] if resources else None
+
+    @staticmethod
+    def __to_row(resource_type, resource):
+        enclosure = resource.get('enclosureUri')
+        location = resource.get('locationUri') or ''
+        if not enclosure and location.startswith('/rest/enclosures/'):
+            enclosure = location
+
+        return (resource['uri'], resource_type, resource.get('name'), resource.get('serialNumber'), enclosure,
+                resource.get('state'), resource.get('status'), resource.get('modified'),
+                json.dumps(resource, separators=(',', ':')))
+
+
+_GOVERNOR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    appliance TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    granted REAL,
+    expires REAL,
+    task_uri TEXT
+);
+CREATE INDEX IF NOT EXISTS tickets_queue ON tickets (appliance, kind, granted);
+CREATE TABLE IF NOT EXISTS rates (
+    appliance TEXT PRIMARY KEY,
+    next_start REAL NOT NULL
+);
+"""
+
+_TASK_FINAL_STATES = frozenset(['Completed', 'Warning', 'Error', 'Terminated', 'Killed'])
+
+
+def _is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+class ApiGovernor(object):
+    """
+    Limits the requests made to each appliance by all the processes that share the same SQLite file, e.g. the forks
+    of a playbook.
+
+    Callers take a ticket and are served in the order they arrive: a ticket is granted when there is room for it and
+    for all the tickets taken before it. Up to 'max_requests' requests are in flight at the same time and, when
+    'rate' is informed, each one starts no sooner than 1 / rate seconds after the previous one. Requests that may
+    start a long-running task also need a task ticket, which is held until the task is seen in a final state, so no
+    more than 'max_tasks' tasks run at the same time.
+
+    The tickets of processes that are gone are discarded, and every granted ticket expires after its lease, so a
+    crashed run never blocks the others for long. The ticket of a started task outlives its process, as the task is
+    still running on the appliance, e.g. when the module was called with 'wait: false'. While a caller waits for a
+    task ticket, it gets the tasks held through the installed connections, and releases the ones that are finished.
+
+    Args:
+        file_path: Path of the SQLite database file. It is created when it does not exist.
+        max_requests (int): Maximum number of requests in flight per appliance. No limit when zero or None.
+        rate (float): Maximum number of requests started per second per appliance. No limit when zero or None.
+        max_tasks (int): Maximum number of running tasks per appliance. No limit when zero or None.
+        lease (int): Seconds after which a request ticket expires.
+        task_lease (int): Seconds after which the ticket of a started task expires.
+    """
+    REQUEST = 'request'
+    TASK = 'task'
+    UNGOVERNED_PATHS = ('/rest/login-sessions',)
+
+    def __init__(self, file_path, max_requests=DEFAULT_GOVERNOR_MAX_REQUESTS, rate=None, max_tasks=None,
+                 lease=DEFAULT_GOVERNOR_LEASE, task_lease=DEFAULT_GOVERNOR_TASK_LEASE, timeout=30):
+        self.file_path = file_path
+        self.limits = {self.REQUEST: max_requests, self.TASK: max_tasks}
+        self.interval = 1.0 / rate if rate else 0
+        self.lease = lease
+        self.task_lease = task_lease
+        self.timeout = timeout
+        self.__local = threading.local()
+        self.__task_getters = {}
+        connection = sqlite3.connect(file_path, timeout=timeout)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_GOVERNOR_SCHEMA)
+        finally:
+            connection.close()
+
+    def enqueue(self, appliance, kind):
+        """
+        Takes a ticket, at the end of the queue of the appliance.
+
+        Returns:
+            int: The ticket.
+        """
+        with self.__transaction() as connection:
+            return self.__insert(connection, appliance, kind)
+
+    def poll(self, ticket):
+        """
+        Grants the ticket when it is its turn and there is room for it.
+
+        Returns:
+            float: Zero when the ticket is granted, or the seconds to wait before polling it again.
+        """
+        with self.__transaction() as connection:
+            row = connection.execute('SELECT appliance, kind, granted FROM tickets WHERE id = ?', (ticket,)).fetchone()
+            if not row:
+                raise ValueError("Unknown ticket '{0}'.".format(ticket))
+            appliance, kind, granted = row
+            if granted is not None:
+                return 0
+            return self.__grant(connection, ticket, appliance, kind)
+
+    def wait(self, ticket):
+        """
+        Blocks until the ticket is granted.
+        """
+        delay = self.poll(ticket)
+        while delay:
+            time.sleep(delay)
+            delay = self.poll(ticket)
+        return ticket
+
+    def acquire(self, appliance, kind):
+        """
+        Takes a ticket and blocks until it is granted. An uncontended ticket is taken and granted at once.
+
+        Returns:
+            int: The ticket.
+        """
+        with self.__transaction() as connection:
+            ticket = self.__insert(connection, appliance, kind)
+            delay = self.__grant(connection, ticket, appliance, kind)
+        checked = None
+        while delay:
+            if kind == self.TASK and appliance in self.__task_getters and \
+                    (checked is None or time.time() - checked >= GOVERNOR_TASK_CHECK_INTERVAL):
+                checked = time.time()
+                self.__finish_tasks(appliance)
+            time.sleep(delay)
+            delay = self.poll(ticket)
+        return ticket
+
+    def release(self, ticket):
+        with self.__transaction() as connection:
+            connection.execute('DELETE FROM tickets WHERE id = ?', (ticket,))
+
+    @contextmanager
+    def request(self, appliance):
+        """
+        Holds a request ticket while the block runs, when the requests are limited. Used by the transfers that do
+        not go through the governed connection, e.g. upload_file and download_file.
+        """
+        if self.limits[self.REQUEST] or self.interval:
+            with self.slot(appliance, self.REQUEST):
+                yield
+        else:
+            yield
+
+    @contextmanager
+    def slot(self, appliance, kind):
+        """
+        Holds a granted ticket while the block runs.
+        """
+        ticket = self.acquire(appliance, kind)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def start_task(self, ticket, task_uri):
+        """
+        Keeps a task ticket until the task is finished, or until the task lease expires.
+        """
+        with self.__transaction() as connection:
+            connection.execute('UPDATE tickets SET task_uri = ?, expires = ? WHERE id = ?',
+                               (task_uri, time.time() + self.task_lease, ticket))
+
+    def finish_task(self, appliance, task_uri):
+        with self.__transaction() as connection:
+            connection.execute('DELETE FROM tickets WHERE appliance = ? AND kind = ? AND task_uri = ?',
+                               (appliance, self.TASK, task_uri))
+
+    def get_status(self, appliance):
+        """
+        Gets the number of tickets granted and queued of each kind, and the URIs of the tasks running.
+        """
+        with self.__transaction() as connection:
+            status = dict(task_uris=[row[0] for row in connection.execute(
+                'SELECT task_uri FROM tickets WHERE appliance = ? AND task_uri IS NOT NULL ORDER BY id', (appliance,))])
+            for kind in (self.REQUEST, self.TASK):
+                status[kind + 's'] = self.__count_granted(connection, appliance, kind)
+                status['queued_' + kind + 's'] = connection.execute(
+                    'SELECT COUNT(*) FROM tickets WHERE appliance = ? AND kind = ? AND granted IS NULL',
+                    (appliance, kind)).fetchone()[0]
+            return status
+
+    def install(self, connection):
+        """
+        Governs all the requests made through an HPE OneView SDK connection, which is shared by all the resource
+        clients of a OneViewClient. The governor is also kept as the 'api_governor' of the connection, so the file
+        transfers made on its raw HTTP connections hold a request ticket too.
+        """
+        appliance = connection.get_host()
+        do_http = connection.do_http
+
+        def governed_do_http(method, path, body, custom_headers=None):
+            task_ticket = None
+            if self.limits[self.TASK] and method != 'GET' and not path.startswith(self.UNGOVERNED_PATHS):
+                task_ticket = self.acquire(appliance, self.TASK)
+            try:
+                with self.request(appliance):
+                    response, response_body = do_http(method, path, body, custom_headers)
+            except BaseException:
+                if task_ticket:
+                    self.release(task_ticket)
+                raise
+
+            if task_ticket:
+                task_uri = self.__get_started_task_uri(response, response_body)
+                if task_uri:
+                    self.start_task(task_ticket, task_uri)
+                else:
+                    self.release(task_ticket)
+            elif self.limits[self.TASK] and method == 'GET' and isinstance(response_body, dict) and \
+                    response_body.get('category') == 'tasks' and response_body.get('taskState') in _TASK_FINAL_STATES:
+                self.finish_task(appliance, response_body.get('uri'))
+
+            return response, response_body
+
+        connection.do_http = governed_do_http
+        connection.api_governor = self
+        self.__task_getters[appliance] = partial(governed_do_http, 'GET', body='')
+        return connection
+
+    def __finish_tasks(self, appliance):
+        with self.__transaction() as connection:
+            task_uris = [row[0] for row in connection.execute(
+                'SELECT task_uri FROM tickets WHERE appliance = ? AND kind = ? AND task_uri IS NOT NULL',
+                (appliance, self.TASK))]
+
+        # the tasks seen in a final state are released by the GET itself
+        for task_uri in task_uris:
+            try:
+                response, body = self.__task_getters[appliance](task_uri)
+            except IOError as error:
+                logger.debug("Could not get the task '{0}': {1}".format(task_uri, error))
+                continue
+            if response.status == 404:
+                self.finish_task(appliance, task_uri)
+
+    @staticmethod
+    def __get_started_task_uri(response, body):
+        if isinstance(body, dict) and body.get('category') == 'tasks' and body.get('taskState') not in \
+                _TASK_FINAL_STATES:
+            return body.get('uri')
+        location = response.getheader('Location') if response.status == 202 else None
+        if location and '/rest/tasks/' in location:
+            return location[location.index('/rest/tasks/'):]
+        return None
+
+    @staticmethod
+    def __insert(connection, appliance, kind):
+        return connection.execute('INSERT INTO tickets (appliance, kind, pid) VALUES (?, ?, ?)',
+                                  (appliance, kind, os.getpid())).lastrowid
+
+    def __grant(self, connection, ticket, appliance, kind):
+        delay = self.__get_delay(connection, ticket, appliance, kind)
+        if delay:
+            self.__remove_stale(connection)
+            delay = self.__get_delay(connection, ticket, appliance, kind)
+        if delay:
+            return delay
+
+        now = time.time()
+        connection.execute('UPDATE tickets SET granted = ?, expires = ? WHERE id = ?', (now, now + self.lease, ticket))
+        if kind == self.REQUEST and self.interval:
+            next_start = self.__get_next_start(connection, appliance)
+            connection.execute('INSERT OR REPLACE INTO rates VALUES (?, ?)',
+                               (appliance, max(now, next_start) + self.interval))
+        return 0
+
+    def __get_delay(self, connection, ticket, appliance, kind):
+        granted, ahead = connection.execute(
+            'SELECT COUNT(granted), COUNT(CASE WHEN granted IS NULL AND id < ? THEN 1 END) FROM tickets '
+            'WHERE appliance = ? AND kind = ?', (ticket, appliance, kind)).fetchone()
+        limit = self.limits[kind]
+        if limit and ahead >= limit - granted:
+            return GOVERNOR_POLL_INTERVAL
+        if kind == self.REQUEST and self.interval:
+            # the requests start one at a time, in the order they arrived
+            if ahead:
+                return GOVERNOR_POLL_INTERVAL
+            return max(self.__get_next_start(connection, appliance) - time.time(), 0)
+        return 0
+
+    @staticmethod
+    def __count_granted(connection, appliance, kind):
+        return connection.execute('SELECT COUNT(*) FROM tickets WHERE appliance = ? AND kind = ? AND granted IS NOT '
+                                  'NULL', (appliance, kind)).fetchone()[0]
+
+    @staticmethod
+    def __get_next_start(connection, appliance):
+        row = connection.execute('SELECT next_start FROM rates WHERE appliance = ?', (appliance,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def __remove_stale(connection):
+        connection.execute('DELETE FROM tickets WHERE expires <= ?', (time.time(),))
+        pids = [row[0] for row in connection.execute('SELECT DISTINCT pid FROM tickets WHERE task_uri IS NULL')]
+        for pid in pids:
+            if not _is_process_alive(pid):
+                connection.execute('DELETE FROM tickets WHERE pid = ? AND task_uri IS NULL', (pid,))
+
+    @contextmanager
+    def __transaction(self):
+        # each thread keeps its own connection, as SQLite connections cannot be shared between threads
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.file_path, timeout=self.timeout, isolation_level=None)
+            self.__local.connection = connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+
+def govern(oneview_client, environ=None):
+    """
+    Installs an ApiGovernor on the connection of a OneViewClient, or of an ImageStreamerClient, when the
+    ONEVIEW_GOVERNOR_FILE environment variable is set, so all the modules run by a playbook share the same limits.
+    The Image Streamer clients created by the OneViewClient are governed as well.
+
+    The limits are read from the ONEVIEW_GOVERNOR_MAX_REQUESTS, ONEVIEW_GOVERNOR_RATE and ONEVIEW_GOVERNOR_MAX_TASKS
+    environment variables.
+
+    Returns:
+        The client.
+    """
+    environ = os.environ if environ is None else environ
+    file_path = environ.get('ONEVIEW_GOVERNOR_FILE')
+    if file_path:
+        max_requests = int(environ.get('ONEVIEW_GOVERNOR_MAX_REQUESTS') or DEFAULT_GOVERNOR_MAX_REQUESTS)
+        governor = ApiGovernor(file_path, max_requests=max_requests,
+                               rate=float(environ.get('ONEVIEW_GOVERNOR_RATE') or 0),
+                               max_tasks=int(environ.get('ONEVIEW_GOVERNOR_MAX_TASKS') or 0))
+        governor.install(oneview_client.connection)
+
+        create_image_streamer_client = getattr(oneview_client, 'create_image_streamer_client', None)
+        if create_image_streamer_client:
+            def create_governed_image_streamer_client():
+                i3s_client = create_image_streamer_client()
+                governor.install(i3s_client.connection)
+                return i3s_client
+
+            oneview_client.create_image_streamer_client = create_governed_image_streamer_client
+    return oneview_client
@@ -17,6 +17,10 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (export_all_projected, get_all_projected, get_changed_since, get_path, govern,
+                                          load_json_file, project_resource, save_json_file, transform_fields)
+from datetime import datetime, timedelta
+import json
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.exceptions import HPOneViewException
@@ -46,6 +50,45 @@ options:
         - "List with parameters to help filter the alerts.
           Params allowed: count, fields, filter, query, sort, start, and view."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Alerts.
+          Nested attributes are addressed with dots, e.g. 'associatedResource.resourceName'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
+    dest:
+      description:
+        - Path of a file where the Alerts are written, one JSON document per line, instead of being
+          returned as facts. The collection is requested one page at a time, so the memory used does not depend
+          on its size. Only the path and the number of resources written are returned.
+      required: false
+    compress:
+      description:
+        - Whether the file informed in 'dest' must be gzip-compressed.
+      required: false
+      default: false
+    page_size:
+      description:
+        - Number of resources requested on each call when writing to 'dest'.
+      required: false
+      default: 500
+    cursor_file:
+      description:
+        - Path of a local JSON file where the cursor (the last 'modified' timestamp seen) and the aggregated alert
+          summaries are kept between runs. When informed, only the alerts created or changed since the previous run
+          are requested, using a server-side filter, and returned together with the summaries they updated.
+          The 'sort' param is replaced by 'modified' ascending.
+      required: false
+    dedupe_keys:
+      description:
+        - Alert attributes, in dotted notation, that identify a group of duplicated alerts in the summaries.
+      required: false
+      default: ['alertTypeID', 'resourceUri', 'correlationId']
+    retention_days:
+      description:
+        - Summaries of the 'cursor_file' not seen in the last given days are removed.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -79,6 +122,31 @@ EXAMPLES = '''
       filter: "urgency='High'"
 
 - debug: var=alerts
+
+- name: Collect the active alerts created or changed since the previous run
+  oneview_alert_facts:
+    config: "{{ config }}"
+    params:
+      filter: "alertState='Active'"
+    cursor_file: /var/tmp/oneview-alerts.json
+    retention_days: 30
+    fields:
+      - description
+      - severity
+      - alertState
+
+- debug: var=alerts
+- debug: var=alert_summaries
+
+- name: Write all the active alerts to a compressed JSON lines file
+  oneview_alert_facts:
+    config: "{{ config }}"
+    params:
+      filter: "alertState='Active'"
+    dest: /tmp/oneview-alerts.jsonl.gz
+    compress: true
+
+- debug: var=alerts_export
 '''
 
 RETURN = '''
@@ -86,14 +154,41 @@ alerts:
     description: The list of alerts.
     returned: Always, but can be null.
     type: list
+alerts_export:
+    description: Has the destination file path, whether it is compressed, and the number of resources written.
+    returned: When 'dest' is informed.
+    type: dict
+
+alert_summaries:
+    description:
+        Has one summary for each group of duplicated alerts changed in this run, with the values of the
+        'dedupe_keys', the number of distinct alerts in the group (count), when the group was first and last seen
+        (firstSeen, lastSeen), and the severity, state, description and uri of the last alert.
+    returned: When 'cursor_file' is informed.
+    type: list
+
+alerts_cursor:
+    description: Has the cursor file path, the current watermark and the number of summaries kept in the file.
+    returned: When 'cursor_file' is informed.
+    type: dict
 '''
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
+DEFAULT_DEDUPE_KEYS = ['alertTypeID', 'resourceUri', 'correlationId']
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+RECENT_ALERT_URIS = 100
 
 
 class AlertFactsModule(object):
     argument_spec = dict(
         config=dict(required=False, type='str'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list'),
+        dest=dict(required=False, type='str'),
+        compress=dict(required=False, type='bool', default=False),
+        page_size=dict(required=False, type='int', default=500),
+        cursor_file=dict(required=False, type='str'),
+        dedupe_keys=dict(required=False, type='list', default=DEFAULT_DEDUPE_KEYS),
+        retention_days=dict(required=False, type='int')
     )
 
     def __init__(self):
@@ -102,21 +197,89 @@ class AlertFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            oneview_client = OneViewClient.from_environment_variables()
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.resource_client = oneview_client.alerts
 
     def run(self):
         try:
             params = self.module.params.get('params') or dict()
-            facts = self.resource_client.get_all(**params)
-            self.module.exit_json(changed=False, ansible_facts=dict(alerts=facts))
+
+            if self.module.params.get('cursor_file'):
+                self.module.exit_json(changed=False, ansible_facts=self.__collect(params))
+            elif self.module.params.get('dest'):
+                export = export_all_projected(self.resource_client, params, self.module.params.get('fields'),
+                                              self.module.params['dest'], self.module.params.get('compress'),
+                                              self.module.params.get('page_size'))
+                self.module.exit_json(changed=False, ansible_facts=dict(alerts_export=export))
+            else:
+                facts = get_all_projected(self.resource_client, params, self.module.params.get('fields'))
+                self.module.exit_json(changed=False, ansible_facts=dict(alerts=facts))
 
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
 
+    def __collect(self, params):
+        cursor_file = self.module.params['cursor_file']
+        dedupe_keys = self.module.params.get('dedupe_keys') or DEFAULT_DEDUPE_KEYS
+        store = load_json_file(cursor_file, default={})
+        summaries = store.get('summaries', {})
+
+        alerts, cursor = get_changed_since(self.resource_client, params, store.get('cursor'))
+
+        changed_keys = []
+        for alert in alerts:
+            key_values = [get_path(alert, key) for key in dedupe_keys]
+            key = json.dumps(key_values)
+            summaries[key] = self.__summarize(summaries.get(key), alert, dict(zip(dedupe_keys, key_values)))
+            if key not in changed_keys:
+                changed_keys.append(key)
+
+        retention_days = self.module.params.get('retention_days')
+        if retention_days:
+            oldest = (datetime.utcnow() - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT)
+            summaries = dict((key, summary) for key, summary in summaries.items() if summary['lastSeen'] >= oldest)
+
+        save_json_file(cursor_file, dict(cursor=cursor, summaries=summaries))
+
+        alert_summaries = [self.__compact(summaries[key]) for key in changed_keys if key in summaries]
+        fields = transform_fields(self.module.params.get('fields'))
+
+        return dict(alerts=project_resource(alerts, fields),
+                    alert_summaries=alert_summaries,
+                    alerts_cursor=dict(cursor_file=cursor_file,
+                                       watermark=cursor.get('watermark'),
+                                       summaries=len(summaries)))
+
+    def __summarize(self, summary, alert, key_values):
+        seen = alert.get('modified') or alert.get('created') or ''
+        created = alert.get('created') or seen
+
+        if not summary:
+            summary = dict(key_values, recentUris=[], count=0, firstSeen=created, lastSeen=seen)
+        elif 'uris' in summary:
+            summary['recentUris'] = summary.pop('uris')[-RECENT_ALERT_URIS:]
+
+        # Only the last distinct alerts of a group are kept to detect the ones changed again, so that the cursor
+        # file does not grow with the number of alerts. An older alert changed again is counted twice.
+        if alert['uri'] not in summary['recentUris']:
+            summary['recentUris'] = (summary['recentUris'] + [alert['uri']])[-RECENT_ALERT_URIS:]
+            summary['count'] += 1
+
+        summary['firstSeen'] = min(summary['firstSeen'], created)
+        if seen >= summary['lastSeen']:
+            summary.update(lastSeen=seen,
+                           lastAlertUri=alert['uri'],
+                           severity=alert.get('severity'),
+                           alertState=alert.get('alertState'),
+                           description=alert.get('description'))
+        return summary
+
+    def __compact(self, summary):
+        return dict((key, value) for key, value in summary.items() if key != 'recentUris')
+
 
 def main():
     AlertFactsModule().run()
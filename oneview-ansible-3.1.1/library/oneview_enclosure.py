@@ -15,8 +15,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, start_task
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -82,6 +84,13 @@ options:
       description:
         - List with the Enclosure properties.
       required: true
+    wait:
+      description:
+        - Whether to wait for the refresh of the 'refreshed' state to complete. When false, the module returns as soon
+          as OneView accepts the request, with the URI of its task on the 'task_uri' fact, so the task can be waited
+          for later with the oneview_task_wait module.
+      required: false
+      default: true
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -262,6 +271,17 @@ EXAMPLES = '''
     data:
       name: 'Test-Enclosure'
       supportDataCollectionState: 'PendingCollection'
+
+- name: Start the refresh of an enclosure, without waiting for it to complete
+  oneview_enclosure:
+    config: "{{ config_file_path }}"
+    state: refreshed
+    wait: false
+    data:
+      name: 'Test-Enclosure'
+      refreshState: Refreshing
+
+- debug: var=task_uri
 '''
 
 RETURN = '''
@@ -269,6 +289,11 @@ enclosure:
     description: Has all the facts about the enclosure.
     returned: On states 'present', 'reconfigured', and 'refreshed'. Can be null.
     type: complex
+
+task_uri:
+    description: Has the URI of the task started by OneView.
+    returned: On state 'refreshed', when 'wait' is false.
+    type: string
 '''
 
 ENCLOSURE_ADDED = 'Enclosure added successfully.'
@@ -278,6 +303,7 @@ ENCLOSURE_ALREADY_EXIST = 'Enclosure already exists.'
 ENCLOSURE_ALREADY_ABSENT = 'Nothing to do.'
 ENCLOSURE_RECONFIGURED = 'Enclosure reconfigured successfully.'
 ENCLOSURE_REFRESHED = 'Enclosure refreshed successfully.'
+ENCLOSURE_REFRESH_STARTED = 'Enclosure refresh started.'
 ENCLOSURE_NOT_FOUND = 'Enclosure not found.'
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 APPLIANCE_BAY_ALREADY_POWERED_ON = 'The device in specified bay is already powered on.'
@@ -331,7 +357,8 @@ class EnclosureModule(object):
                 'support_data_collection_set',
             ]
         ),
-        data=dict(required=True, type='dict')
+        data=dict(required=True, type='dict'),
+        wait=dict(required=False, type='bool', default=True)
     )
 
     patch_params = dict(
@@ -381,9 +408,9 @@ class EnclosureModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -401,18 +428,21 @@ class EnclosureModule(object):
                 if not resource:
                     raise HPOneViewResourceNotFound(ENCLOSURE_NOT_FOUND)
 
+                facts = dict()
+
                 if state == 'reconfigured':
                     changed, msg, resource = self.__reconfigure(resource)
                 elif state == 'refreshed':
-                    changed, msg, resource = self.__refresh(resource, data)
+                    changed, msg, resource, facts = self.__refresh(resource, data)
                 elif state == 'support_data_collection_set':
                     changed, msg, resource = self.__support_data_collection_set(resource, data)
                 else:
                     changed, msg, resource = self.__patch(resource, data)
 
+                facts['enclosure'] = resource
                 self.module.exit_json(changed=changed,
                                       msg=msg,
-                                      ansible_facts=dict(enclosure=resource))
+                                      ansible_facts=facts)
 
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
@@ -465,10 +495,17 @@ class EnclosureModule(object):
         refresh_config = data.copy()
         refresh_config.pop('name', None)
 
-        self.oneview_client.enclosures.refresh_state(resource['uri'], refresh_config)
-        enclosure = self.oneview_client.enclosures.get(resource['uri'])
+        enclosures = self.oneview_client.enclosures
+        if self.module.params.get('wait', True):
+            enclosures.refresh_state(resource['uri'], refresh_config)
+            return True, ENCLOSURE_REFRESHED, enclosures.get(resource['uri']), dict()
+
+        task, _ = start_task(enclosures, partial(enclosures.refresh_state, resource['uri'], refresh_config))
+        enclosure = enclosures.get(resource['uri'])
 
-        return True, ENCLOSURE_REFRESHED, enclosure
+        if not task:
+            return True, ENCLOSURE_REFRESHED, enclosure, dict()
+        return True, ENCLOSURE_REFRESH_STARTED, enclosure, dict(task_uri=task['uri'])
 
     def __support_data_collection_set(self, resource, data):
         current_value = resource.get('supportDataCollectionState')
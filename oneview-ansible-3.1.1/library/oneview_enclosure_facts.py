@@ -16,7 +16,11 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (gather_option_facts, get_all_projected, govern, project_resource,
+                                          transform_fields)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.common import transform_list_to_dict
@@ -63,6 +67,13 @@ options:
           Options allowed: script, environmentalConfiguration, and utilization. For the option utilization, you can
           provide specific parameters."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Enclosures.
+          Nested attributes are addressed with dots, e.g. 'deviceBays.devicePresence'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -161,6 +172,7 @@ class EnclosureFactsModule(object):
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
         params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -170,9 +182,9 @@ class EnclosureFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
@@ -183,6 +195,8 @@ class EnclosureFactsModule(object):
 
                 if self.module.params.get('options') and enclosures:
                     ansible_facts = self.__gather_optional_facts(self.module.params['options'], enclosures[0])
+
+                enclosures = project_resource(enclosures, transform_fields(self.module.params.get('fields')))
             else:
                 enclosures = self.__get_all()
 
@@ -199,17 +213,18 @@ class EnclosureFactsModule(object):
         options = transform_list_to_dict(options)
 
         enclosure_client = self.oneview_client.enclosures
-        ansible_facts = {}
+        option_calls = []
 
         if options.get('script'):
-            ansible_facts['enclosure_script'] = enclosure_client.get_script(enclosure['uri'])
+            option_calls.append(('enclosure_script', partial(enclosure_client.get_script, enclosure['uri'])))
         if options.get('environmentalConfiguration'):
-            env_config = enclosure_client.get_environmental_configuration(enclosure['uri'])
-            ansible_facts['enclosure_environmental_configuration'] = env_config
+            option_calls.append(('enclosure_environmental_configuration',
+                                 partial(enclosure_client.get_environmental_configuration, enclosure['uri'])))
         if options.get('utilization'):
-            ansible_facts['enclosure_utilization'] = self.__get_utilization(enclosure, options['utilization'])
+            option_calls.append(('enclosure_utilization',
+                                 partial(self.__get_utilization, enclosure, options['utilization'])))
 
-        return ansible_facts
+        return gather_option_facts(option_calls)
 
     def __get_utilization(self, enclosure, params):
         fields = view = refresh = filter = ''
@@ -232,7 +247,7 @@ class EnclosureFactsModule(object):
     def __get_all(self):
         params = self.module.params.get('params') or {}
 
-        return self.oneview_client.enclosures.get_all(**params)
+        return get_all_projected(self.oneview_client.enclosures, params, self.module.params.get('fields'))
 
 
 def main():
@@ -0,0 +1,200 @@
+#!/usr/bin/python
+
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import DEFAULT_MAX_WORKERS, EstateIndex, govern
+
+try:
+    from hpOneView.oneview_client import OneViewClient
+    from hpOneView.exceptions import HPOneViewException
+    from hpOneView.exceptions import HPOneViewValueError
+
+    HAS_HPE_ONEVIEW = True
+except ImportError:
+    HAS_HPE_ONEVIEW = False
+
+DOCUMENTATION = '''
+---
+module: oneview_estate_snapshot
+short_description: Keep a local SQLite index of the OneView resources up to date.
+description:
+    - Fetches the main OneView resource types concurrently and stores them in a local SQLite database, where they
+      can be read by the oneview_estate_snapshot_facts module, or by any other module through the EstateIndex of
+      module_utils, without querying the appliance.
+    - After the first run, only the resources created or changed since the previous run are requested, using a
+      server-side filter on their 'modified' attribute. Removed resources are only noticed by a full refresh, done
+      once the last one is older than 'max_age'.
+requirements:
+    - "python >= 2.7.9"
+    - "hpOneView >= 3.1.0"
+author:
+    - "Camila Balestrin (@balestrinc)"
+    - "Mariana Kreisig (@marikrg)"
+options:
+  config:
+    description:
+      - Path to a .json configuration file containing the OneView client configuration.
+        The configuration file is optional. If the file path is not provided, the configuration will be loaded from
+        environment variables.
+    required: false
+  database:
+    description:
+      - Path of the SQLite database file. It is created when it does not exist. Use one file per appliance.
+    required: true
+  resource_types:
+    description:
+      - Resource types to refresh, among 'enclosures', 'enclosure_groups', 'server_hardware',
+        'server_hardware_types', 'server_profiles', 'server_profile_templates', 'ethernet_networks', 'fc_networks',
+        'fcoe_networks', 'network_sets', 'logical_interconnects', 'logical_interconnect_groups', 'uplink_sets',
+        'volumes', 'storage_pools', 'storage_systems' and 'deployment_plans'. The 'deployment_plans' are the Image
+        Streamer Deployment Plans and require the Image Streamer address on the configuration.
+    required: false
+    default: All the types, except 'deployment_plans'.
+  full:
+    description:
+      - Whether all the resources must be fetched again, instead of only the ones changed since the previous run.
+    required: false
+    default: false
+  max_age:
+    description:
+      - Seconds after which the next run of a resource type is a full refresh, so the resources removed from the
+        appliance are also removed from the index.
+    required: false
+    default: 86400
+  max_workers:
+    description:
+      - Maximum number of resource types fetched at the same time.
+    required: false
+    default: 8
+notes:
+    - "A sample configuration file for the config parameter can be found at:
+       https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
+    - "Check how to use environment variables for configuration at:
+       https://github.com/HewlettPackard/oneview-ansible#environment-variables"
+'''
+
+EXAMPLES = '''
+- name: Refresh the estate snapshot
+  oneview_estate_snapshot:
+    config: "{{ config }}"
+    database: /var/tmp/oneview-estate.db
+  delegate_to: localhost
+  run_once: true
+- debug: var=estate_snapshot
+
+- name: Fully refresh the Server Hardware and the Image Streamer Deployment Plans
+  oneview_estate_snapshot:
+    config: "{{ config }}"
+    database: /var/tmp/oneview-estate.db
+    resource_types:
+      - server_hardware
+      - deployment_plans
+    full: true
+'''
+
+RETURN = '''
+estate_snapshot:
+    description:
+        Has the database path and, for each resource type refreshed, whether the refresh was full, the number of
+        resources created or changed, the number of resources indexed, and the error message when it failed.
+    returned: Always, also on failure.
+    type: complex
+'''
+
+ESTATE_SNAPSHOT_REFRESHED = 'Estate snapshot refreshed: {0} resource(s) created or changed.'
+ESTATE_SNAPSHOT_FAILED = '{0} of {1} resource type(s) could not be refreshed.'
+RESOURCE_TYPE_INVALID = "Unknown resource type(s): {0}. Use any of: {1}."
+
+# Resource types, named after the resource clients of the SDK
+DEFAULT_RESOURCE_TYPES = ['enclosures', 'enclosure_groups', 'server_hardware', 'server_hardware_types',
+                          'server_profiles', 'server_profile_templates', 'ethernet_networks', 'fc_networks',
+                          'fcoe_networks', 'network_sets', 'logical_interconnects', 'logical_interconnect_groups',
+                          'uplink_sets', 'volumes', 'storage_pools', 'storage_systems']
+IMAGE_STREAMER_RESOURCE_TYPES = ['deployment_plans']
+RESOURCE_TYPES = DEFAULT_RESOURCE_TYPES + IMAGE_STREAMER_RESOURCE_TYPES
+
+HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
+
+
+class EstateSnapshotModule(object):
+    argument_spec = dict(
+        config=dict(required=False, type='str'),
+        database=dict(required=True, type='str'),
+        resource_types=dict(required=False, type='list'),
+        full=dict(required=False, type='bool', default=False),
+        max_age=dict(required=False, type='int', default=86400),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS)
+    )
+
+    def __init__(self):
+        self.module = AnsibleModule(argument_spec=self.argument_spec, supports_check_mode=False)
+        if not HAS_HPE_ONEVIEW:
+            self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
+
+        if not self.module.params['config']:
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
+        else:
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
+
+    def run(self):
+        try:
+            resource_types = self.__get_resource_types()
+            index = EstateIndex(self.module.params['database'])
+            try:
+                results = index.refresh(resource_types, self.__get_resource_client,
+                                        full=self.module.params.get('full'),
+                                        max_age=self.module.params.get('max_age'),
+                                        max_workers=self.module.params.get('max_workers'),
+                                        errors=HPOneViewException)
+            finally:
+                index.close()
+
+            snapshot = dict(database=self.module.params['database'], resource_types=results)
+            failed = [result for result in results if result['error']]
+            if failed:
+                self.module.fail_json(msg=ESTATE_SNAPSHOT_FAILED.format(len(failed), len(results)),
+                                      estate_snapshot=snapshot)
+            else:
+                changed_count = sum(result['changed'] for result in results)
+                self.module.exit_json(changed=bool(changed_count),
+                                      msg=ESTATE_SNAPSHOT_REFRESHED.format(changed_count),
+                                      ansible_facts=dict(estate_snapshot=snapshot))
+
+        except HPOneViewException as exception:
+            self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
+
+    def __get_resource_types(self):
+        resource_types = self.module.params.get('resource_types') or DEFAULT_RESOURCE_TYPES
+        unknown = [resource_type for resource_type in resource_types if resource_type not in RESOURCE_TYPES]
+        if unknown:
+            raise HPOneViewValueError(RESOURCE_TYPE_INVALID.format(', '.join(unknown), ', '.join(RESOURCE_TYPES)))
+        return list(resource_types)
+
+    def __get_resource_client(self, resource_type):
+        if resource_type in IMAGE_STREAMER_RESOURCE_TYPES:
+            client = self.oneview_client.create_image_streamer_client()
+        else:
+            client = self.oneview_client
+        return getattr(client, resource_type)
+
+
+def main():
+    EstateSnapshotModule().run()
+
+
+if __name__ == '__main__':
+    main()
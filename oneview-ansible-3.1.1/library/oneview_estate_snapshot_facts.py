@@ -0,0 +1,148 @@
+#!/usr/bin/python
+
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import os
+
+from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import EstateIndex, project_resource, transform_fields
+
+DOCUMENTATION = '''
+---
+module: oneview_estate_snapshot_facts
+short_description: Retrieve facts about the OneView resources from the local estate snapshot.
+description:
+    - Retrieve facts about the OneView resources indexed by the oneview_estate_snapshot module. The resources are
+      read from the local SQLite database, without querying the appliance, so they are as recent as the last
+      refresh of their type.
+requirements:
+    - "python >= 2.7.9"
+author:
+    - "Camila Balestrin (@balestrinc)"
+    - "Mariana Kreisig (@marikrg)"
+options:
+  database:
+    description:
+      - Path of the SQLite database file refreshed by the oneview_estate_snapshot module.
+    required: true
+  resource_type:
+    description:
+      - Resource type, e.g. 'server_hardware'. The resources of all the types are returned when not informed.
+    required: false
+  name:
+    description:
+      - Resource name.
+    required: false
+  filters:
+    description:
+      - Values of the other indexed attributes, among 'uri', 'serial', 'enclosure', 'state', 'status' and
+        'modified'. A list matches any of its values. The 'serial' is the serialNumber of the resource, and the
+        'enclosure' is its enclosureUri, or the locationUri of a Server Hardware in an enclosure.
+    required: false
+  fields:
+    description:
+      - List of attributes to keep in the returned resources. Nested attributes are addressed with dots, e.g.
+        'mpHostInfo.mpIpAddresses'. If not provided, the whole resources are returned.
+    required: false
+'''
+
+EXAMPLES = '''
+- name: Gather facts about a Server Hardware from the estate snapshot
+  oneview_estate_snapshot_facts:
+    database: /var/tmp/oneview-estate.db
+    resource_type: server_hardware
+    filters:
+      serial: 'VCGE9KB041'
+
+- debug: var=estate_resources
+
+- name: Gather the names of the Server Profiles of an enclosure in the 'Normal' state
+  oneview_estate_snapshot_facts:
+    database: /var/tmp/oneview-estate.db
+    resource_type: server_profiles
+    filters:
+      enclosure: '/rest/enclosures/09SGH100X6J1'
+      state: 'Normal'
+    fields:
+      - name
+      - serverHardwareUri
+
+- debug: var=estate_resources
+- debug: var=estate_snapshot
+'''
+
+RETURN = '''
+estate_resources:
+    description: The list of resources found.
+    returned: Always, but can be empty.
+    type: list
+
+estate_snapshot:
+    description:
+        Has, for each resource type indexed, the time of its last refresh and of its last full refresh, in seconds
+        since the epoch, and the number of resources indexed.
+    returned: Always.
+    type: list
+'''
+
+ESTATE_SNAPSHOT_NOT_FOUND = "Estate snapshot '{0}' not found. Refresh it with the oneview_estate_snapshot module."
+
+
+class EstateSnapshotFactsModule(object):
+    argument_spec = dict(
+        database=dict(required=True, type='str'),
+        resource_type=dict(required=False, type='str'),
+        name=dict(required=False, type='str'),
+        filters=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
+    )
+
+    def __init__(self):
+        self.module = AnsibleModule(argument_spec=self.argument_spec, supports_check_mode=False)
+
+    def run(self):
+        database = self.module.params['database']
+        if not os.path.exists(database):
+            self.module.fail_json(msg=ESTATE_SNAPSHOT_NOT_FOUND.format(database))
+            return
+
+        filters = dict(self.module.params.get('filters') or {})
+        if self.module.params.get('resource_type'):
+            filters['type'] = self.module.params['resource_type']
+        if self.module.params.get('name'):
+            filters['name'] = self.module.params['name']
+
+        index = EstateIndex(database)
+        try:
+            resources = index.find(**filters)
+            syncs = [dict(type=sync['type'], refreshed=sync['refreshed'], full_refreshed=sync['full_refreshed'],
+                          count=sync['count']) for sync in index.get_syncs()]
+        except ValueError as error:
+            self.module.fail_json(msg=str(error))
+            return
+        finally:
+            index.close()
+
+        resources = project_resource(resources, transform_fields(self.module.params.get('fields')))
+        self.module.exit_json(changed=False, ansible_facts=dict(estate_resources=resources, estate_snapshot=syncs))
+
+
+def main():
+    EstateSnapshotFactsModule().run()
+
+
+if __name__ == '__main__':
+    main()
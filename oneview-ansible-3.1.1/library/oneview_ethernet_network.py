@@ -15,10 +15,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (DEFAULT_MAX_WORKERS, govern, map_concurrently, merge_and_update,
+                                          resource_compare, run_concurrently)
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
 
@@ -48,6 +51,13 @@ options:
             - Indicates the desired state for the Ethernet Network resource.
               'present' will ensure data properties are compliant with OneView.
               'absent' will remove the resource from OneView, if it exists.
+              When 'vlanIdRange' and 'namePrefix' are informed in the data, 'present' creates only the missing
+              networks of the range and applies the 'bandwidth' to the existing ones, and 'absent' removes all the
+              networks of the range.
+              When 'namePattern' is informed in the data instead, 'present' applies the 'bandwidth' to all the
+              existing networks whose name matches the pattern, without creating any network.
+              'default_bandwidth_reset' also accepts 'vlanIdRange' and 'namePrefix', or 'namePattern', to reset many
+              networks at once.
               'default_bandwidth_reset' will reset the network connection template to the default.
         choices: ['present', 'absent', 'default_bandwidth_reset']
     data:
@@ -58,8 +68,16 @@ options:
         description:
             - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
               for the resource matches the ETag provided in the data.
+            - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and
+              the update is retried, unless the same attributes were changed to other values.
         default: true
         choices: ['true', 'false']
+    max_workers:
+        description:
+            - Maximum number of Ethernet Networks removed, or connection templates read or updated, at the same time
+              on bulk operations.
+        required: false
+        default: 8
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -117,6 +135,37 @@ EXAMPLES = '''
         maximumBandwidth: 10000
         typicalBandwidth: 2000
 
+- name: Ensure the bandwidth of all the Ethernet networks of a range
+  oneview_ethernet_network:
+    config: "{{ config_file_path }}"
+    state: present
+    data:
+      vlanIdRange: '1-10,15,17'
+      namePrefix: TestNetwork
+      bandwidth:
+        maximumBandwidth: 10000
+        typicalBandwidth: 2500
+
+- name: Ensure the bandwidth of all the Ethernet networks whose name starts with 'Prod_'
+  oneview_ethernet_network:
+    config: "{{ config_file_path }}"
+    state: present
+    max_workers: 16
+    data:
+      # '%' matches any sequence of characters
+      namePattern: 'Prod\\_%'
+      bandwidth:
+        maximumBandwidth: 20000
+        typicalBandwidth: 5000
+
+- name: Remove Ethernet networks in bulk
+  oneview_ethernet_network:
+    config: "{{ config_file_path }}"
+    state: absent
+    data:
+      vlanIdRange: '1-10,15,17'
+      namePrefix: TestNetwork
+
 - name: Reset to the default network connection template
   oneview_ethernet_network:
     config: "{{ config_file_path }}"
@@ -124,6 +173,15 @@ EXAMPLES = '''
     data:
       name: 'Test Ethernet Network'
   delegate_to: localhost
+
+- name: Reset all the Ethernet networks of a range to the default network connection template
+  oneview_ethernet_network:
+    config: "{{ config_file_path }}"
+    state: default_bandwidth_reset
+    data:
+      vlanIdRange: '1-10,15,17'
+      namePrefix: TestNetwork
+  delegate_to: localhost
 '''
 
 RETURN = '''
@@ -133,8 +191,14 @@ ethernet_network:
     type: complex
 
 ethernet_network_bulk:
-    description: Has the facts about the Ethernet Networks affected by the bulk insert.
-    returned: When 'vlanIdRange' attribute is in data argument. Can be null.
+    description: Has the facts about the Ethernet Networks affected by the bulk insert or bandwidth update.
+    returned: When 'vlanIdRange' or 'namePattern' attribute is in data argument. Can be null.
+    type: complex
+
+ethernet_network_connection_templates:
+    description: Has the facts about the Connection Templates updated by the bulk bandwidth update or reset.
+    returned: When 'namePattern' attribute is in data argument, or on state 'default_bandwidth_reset' with
+              'vlanIdRange' or 'namePattern'.
     type: complex
 
 ethernet_network_connection_template:
@@ -151,6 +215,10 @@ ETHERNET_NETWORK_ALREADY_ABSENT = 'Ethernet Network is already absent.'
 ETHERNET_NETWORKS_CREATED = 'Ethernet Networks created successfully.'
 MISSING_ETHERNET_NETWORKS_CREATED = 'Some missing Ethernet Networks were created successfully.'
 ETHERNET_NETWORKS_ALREADY_EXIST = 'The specified Ethernet Networks already exist.'
+ETHERNET_NETWORKS_UPDATED = 'Ethernet Networks updated successfully.'
+ETHERNET_NETWORKS_DELETED = 'Ethernet Networks deleted successfully.'
+ETHERNET_NETWORKS_ALREADY_ABSENT = 'The specified Ethernet Networks are already absent.'
+ETHERNET_NETWORKS_CONNECTION_TEMPLATES_RESET = 'Ethernet Networks connection templates were reset to the default.'
 ETHERNET_NETWORK_CONNECTION_TEMPLATE_RESET = 'Ethernet Network connection template was reset to the default.'
 ETHERNET_NETWORK_NOT_FOUND = 'Ethernet Network was not found.'
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
@@ -167,7 +235,8 @@ class EthernetNetworkModule(object):
         validate_etag=dict(
             required=False,
             type='bool',
-            default=True)
+            default=True),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS)
     )
 
     def __init__(self):
@@ -176,9 +245,9 @@ class EthernetNetworkModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -192,12 +261,20 @@ class EthernetNetworkModule(object):
             if state == 'present':
                 if data.get('vlanIdRange'):
                     changed, msg, ansible_facts = self.__bulk_present(data)
+                elif data.get('namePattern'):
+                    changed, msg, ansible_facts = self.__bulk_bandwidth(data)
                 else:
                     changed, msg, ansible_facts = self.__present(data)
             elif state == 'default_bandwidth_reset':
-                changed, msg, ansible_facts = self.__default_bandwidth_reset(data)
+                if data.get('vlanIdRange') or data.get('namePattern'):
+                    changed, msg, ansible_facts = self.__bulk_default_bandwidth_reset(data)
+                else:
+                    changed, msg, ansible_facts = self.__default_bandwidth_reset(data)
             elif state == 'absent':
-                changed, msg, ansible_facts = self.__absent(data)
+                if data.get('vlanIdRange'):
+                    changed, msg, ansible_facts = self.__bulk_absent(data)
+                else:
+                    changed, msg, ansible_facts = self.__absent(data)
 
             self.module.exit_json(changed=changed,
                                   msg=msg,
@@ -221,15 +298,8 @@ class EthernetNetworkModule(object):
             changed = True
             msg = ETHERNET_NETWORK_CREATED
         else:
-            merged_data = ethernet_network.copy()
-            merged_data.update(data)
-
-            if not resource_compare(ethernet_network, merged_data):
-                ethernet_network = self.oneview_client.ethernet_networks.update(merged_data)
-                changed = True
-                msg = ETHERNET_NETWORK_UPDATED
-            else:
-                msg = ETHERNET_NETWORK_ALREADY_EXIST
+            ethernet_network, changed = merge_and_update(self.oneview_client.ethernet_networks, ethernet_network, data)
+            msg = ETHERNET_NETWORK_UPDATED if changed else ETHERNET_NETWORK_ALREADY_EXIST
 
         if bandwidth:
             if self.__update_connection_template(ethernet_network, bandwidth)[0]:
@@ -259,26 +329,94 @@ class EthernetNetworkModule(object):
             msg = ETHERNET_NETWORKS_CREATED
 
         else:
-            vlan_ids = self.oneview_client.ethernet_networks.dissociate_values_or_ranges(vlan_id_range)
-            for net in ethernet_networks[:]:
-                vlan_ids.remove(net['vlanId'])
-
-            if len(vlan_ids) == 0:
-                msg = ETHERNET_NETWORKS_ALREADY_EXIST
-                changed = False
-            else:
-                if len(vlan_ids) == 1:
-                    data['vlanIdRange'] = '{0}-{1}'.format(vlan_ids[0], vlan_ids[0])
-                else:
-                    data['vlanIdRange'] = ','.join(map(str, vlan_ids))
+            vlan_ids = set(self.oneview_client.ethernet_networks.dissociate_values_or_ranges(vlan_id_range))
+            missing_vlan_ids = vlan_ids - set(int(net['vlanId']) for net in ethernet_networks)
+
+            changed = False
+            msg = ETHERNET_NETWORKS_ALREADY_EXIST
+
+            if data.get('bandwidth'):
+                if self.__update_connection_templates(ethernet_networks, data['bandwidth']):
+                    changed = True
+                    msg = ETHERNET_NETWORKS_UPDATED
+
+            if missing_vlan_ids:
+                data['vlanIdRange'] = compress_vlan_ids(missing_vlan_ids)
 
-                self.oneview_client.ethernet_networks.create_bulk(data)
-                ethernet_networks = self.oneview_client.ethernet_networks.get_range(data['namePrefix'], vlan_id_range)
+                # create_bulk posts the bulk request once and reads back, in a single listing of the prefix, only
+                # the networks of the missing range, which are merged with the existing ones
+                created_networks = self.oneview_client.ethernet_networks.create_bulk(data)
+                ethernet_networks = sorted(ethernet_networks + created_networks, key=lambda net: int(net['vlanId']))
                 changed = True
                 msg = MISSING_ETHERNET_NETWORKS_CREATED
 
         return changed, msg, dict(ethernet_network_bulk=ethernet_networks)
 
+    def __bulk_absent(self, data):
+        ethernet_networks = self.oneview_client.ethernet_networks.get_range(data['namePrefix'], data['vlanIdRange'])
+
+        if not ethernet_networks:
+            return False, ETHERNET_NETWORKS_ALREADY_ABSENT, {}
+
+        deletions = [partial(self.oneview_client.ethernet_networks.delete, net) for net in ethernet_networks]
+        run_concurrently(deletions, self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS)
+
+        return True, ETHERNET_NETWORKS_DELETED, {}
+
+    def __bulk_bandwidth(self, data):
+        ethernet_networks = self.__get_bulk_networks(data)
+
+        connection_templates = []
+        if data.get('bandwidth'):
+            connection_templates = self.__update_connection_templates(ethernet_networks, data['bandwidth'])
+
+        if connection_templates:
+            msg = ETHERNET_NETWORKS_UPDATED
+        else:
+            msg = ETHERNET_NETWORKS_ALREADY_EXIST
+
+        return bool(connection_templates), msg, dict(ethernet_network_bulk=ethernet_networks,
+                                                     ethernet_network_connection_templates=connection_templates)
+
+    def __bulk_default_bandwidth_reset(self, data):
+        ethernet_networks = self.__get_bulk_networks(data)
+
+        default_connection_template = self.oneview_client.connection_templates.get_default()
+        connection_templates = self.__update_connection_templates(ethernet_networks,
+                                                                  default_connection_template['bandwidth'])
+
+        return bool(connection_templates), ETHERNET_NETWORKS_CONNECTION_TEMPLATES_RESET, dict(
+            ethernet_network_connection_templates=connection_templates)
+
+    def __get_bulk_networks(self, data):
+        if data.get('vlanIdRange'):
+            return self.oneview_client.ethernet_networks.get_range(data['namePrefix'], data['vlanIdRange'])
+
+        name_filter = "\"'name' matches '{0}'\"".format(data['namePattern'])
+        return self.oneview_client.ethernet_networks.get_all(filter=name_filter, sort='vlanId:ascending')
+
+    def __update_connection_templates(self, ethernet_networks, bandwidth):
+        """
+        Reads the connection templates of the networks concurrently and updates, also concurrently, only the ones
+        whose bandwidth differs.
+
+        Returns:
+            list: The updated connection templates.
+        """
+        max_workers = self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS
+        template_uris = [net['connectionTemplateUri'] for net in ethernet_networks if net.get('connectionTemplateUri')]
+
+        updates = []
+        for connection_template in map_concurrently(self.oneview_client.connection_templates.get, template_uris,
+                                                    max_workers):
+            merged_data = connection_template.copy()
+            merged_data.update({'bandwidth': bandwidth})
+
+            if not resource_compare(connection_template, merged_data):
+                updates.append(partial(self.oneview_client.connection_templates.update, merged_data))
+
+        return run_concurrently(updates, max_workers)
+
     def __get_by_name(self, data):
         result = self.oneview_client.ethernet_networks.get_by('name', data['name'])
         return result[0] if result else None
@@ -314,6 +452,24 @@ class EthernetNetworkModule(object):
             ethernet_network_connection_template=connection_template)
 
 
+def compress_vlan_ids(vlan_ids):
+    """
+    Builds the shortest vlanIdRange with the given VLAN IDs, e.g. [1, 2, 3, 5] is compressed to '1-3,5'.
+    """
+    ranges = []
+    for vlan_id in sorted(vlan_ids):
+        if ranges and ranges[-1][1] == vlan_id - 1:
+            ranges[-1][1] = vlan_id
+        else:
+            ranges.append([vlan_id, vlan_id])
+
+    if len(ranges) == 1:
+        # a single value means the range from 1 to the value for OneView
+        return '{0}-{1}'.format(*ranges[0])
+
+    return ','.join(str(start) if start == end else '{0}-{1}'.format(start, end) for start, end in ranges)
+
+
 def main():
     EthernetNetworkModule().run()
 
@@ -17,6 +17,7 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import get_all_projected, govern, project_resource, transform_fields
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -64,6 +65,13 @@ options:
         - "List with options to gather additional facts about an Ethernet Network and related resources.
           Options allowed: associatedProfiles and associatedUplinkGroups."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Ethernet Networks.
+          Nested attributes are addressed with dots, e.g. 'bandwidth.maximumBandwidth'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -133,7 +141,8 @@ class EthernetNetworkFactsModule(object):
         config=dict(required=False, type='str'),
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -143,9 +152,9 @@ class EthernetNetworkFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
@@ -155,6 +164,9 @@ class EthernetNetworkFactsModule(object):
 
                 if self.module.params.get('options') and ethernet_networks:
                     ansible_facts = self.__gather_optional_facts(self.module.params['options'], ethernet_networks[0])
+
+                ethernet_networks = project_resource(ethernet_networks,
+                                                     transform_fields(self.module.params.get('fields')))
             else:
                 ethernet_networks = self.__get_all()
 
@@ -196,7 +208,7 @@ class EthernetNetworkFactsModule(object):
 
     def __get_all(self):
         params = self.module.params.get('params') or {}
-        return self.oneview_client.ethernet_networks.get_all(**params)
+        return get_all_projected(self.oneview_client.ethernet_networks, params, self.module.params.get('fields'))
 
 
 def main():
@@ -16,10 +16,10 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, merge_and_update
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
 
     HAS_HPE_ONEVIEW = True
@@ -57,6 +57,8 @@ options:
         description:
             - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
               for the resource matches the ETag provided in the data.
+            - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and
+              the update is retried, unless the same attributes were changed to other values.
         default: true
         choices: ['true', 'false']
 notes:
@@ -125,9 +127,9 @@ class FcNetworkModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -171,18 +173,17 @@ class FcNetworkModule(object):
                               ansible_facts=dict(fc_network=new_fc_network))
 
     def __update(self, data, resource):
-        merged_data = resource.copy()
-        merged_data.update(data)
+        fc_networks = self.oneview_client.fc_networks
+        updated_fc_network, changed = merge_and_update(fc_networks, resource, data,
+                                                       update=lambda current, merged: fc_networks.update(merged))
 
-        if resource_compare(resource, merged_data):
+        if not changed:
 
             self.module.exit_json(changed=False,
                                   msg=FC_NETWORK_ALREADY_EXIST,
                                   ansible_facts=dict(fc_network=resource))
 
         else:
-            updated_fc_network = self.oneview_client.fc_networks.update(merged_data)
-
             self.module.exit_json(changed=True,
                                   msg=FC_NETWORK_UPDATED,
                                   ansible_facts=dict(fc_network=updated_fc_network))
@@ -16,10 +16,10 @@
 # limitations under the License.
 ###
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, merge_and_update
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
 
     HAS_HPE_ONEVIEW = True
@@ -57,6 +57,8 @@ options:
         description:
             - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
               for the resource matches the ETag provided in the data.
+            - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and
+              the update is retried, unless the same attributes were changed to other values.
         default: true
         choices: ['true', 'false']
 notes:
@@ -118,9 +120,9 @@ class FcoeNetworkModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -158,15 +160,10 @@ class FcoeNetworkModule(object):
             msg = FCOE_NETWORK_CREATED
             changed = True
         else:
-            merged_data = resource.copy()
-            merged_data.update(data)
-
-            if resource_compare(resource, merged_data):
-                msg = FCOE_NETWORK_ALREADY_EXIST
-            else:
-                resource = self.oneview_client.fcoe_networks.update(merged_data)
-                changed = True
-                msg = FCOE_NETWORK_UPDATED
+            fcoe_networks = self.oneview_client.fcoe_networks
+            resource, changed = merge_and_update(fcoe_networks, resource, data,
+                                                 update=lambda current, merged: fcoe_networks.update(merged))
+            msg = FCOE_NETWORK_UPDATED if changed else FCOE_NETWORK_ALREADY_EXIST
 
         return changed, msg, dict(fcoe_network=resource)
 
@@ -16,10 +16,16 @@
 # limitations under the License.
 ###
 
+import os
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (DEFAULT_UPLOAD_CHUNK_SIZE, TRANSFER_ERRORS, file_digest, get_upload_task,
+                                          govern, progress_logger, upload_file)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.exceptions import HPOneViewException
+    from hpOneView.exceptions import HPOneViewValueError
+    from hpOneView.resources.task_monitor import TaskMonitor
 
     HAS_HPE_ONEVIEW = True
 except ImportError:
@@ -31,8 +37,8 @@ module: oneview_firmware_bundle
 short_description: Upload OneView Firmware Bundle resources.
 description:
     - Upload an SPP ISO image file or a hotfix file to the appliance.
-notes:
-   - "This module is non-idempotent"
+    - The upload is skipped when a firmware driver uploaded from a file with the same name, and with the informed
+      'name' and 'version', is already on the appliance.
 requirements:
     - "python >= 2.7.9"
     - "hpOneView >= 2.0.1"
@@ -53,11 +59,40 @@ options:
       description:
         - The full path of a local file to be loaded.
       required: true
+    name:
+      description:
+        - Name of the firmware driver expected from the file, e.g. 'Service Pack for ProLiant'. When informed, an
+          existing firmware driver only matches the file if it has the same name.
+      required: false
+    version:
+      description:
+        - Version of the firmware driver expected from the file, e.g. '2017.04.0'. When informed, an existing
+          firmware driver only matches the file if it has the same version.
+      required: false
+    checksum:
+      description:
+        - Expected SHA-256 digest of the local file, as published with the SPP. OneView does not expose the digest
+          of the uploaded bundles, so the local file is verified against it before any upload and the module fails
+          when they differ.
+      required: false
+    chunk_size:
+      description:
+        - Number of bytes read from the file and sent to the appliance at a time.
+      required: false
+      default: 1048576
+    upload_retries:
+      description:
+        - Number of times the upload is resumed when the connection fails. OneView does not accept partial uploads,
+          so before each retry the appliance is checked for the firmware driver, in case the failed attempt
+          completed, and the file is sent again only when it is not there.
+      required: false
+      default: 0
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
     - "Check how to use environment variables for configuration at:
        https://github.com/HewlettPackard/oneview-ansible#environment-variables"
+    - "The upload progress is logged by the 'module_utils.oneview' logger."
 '''
 
 EXAMPLES = '''
@@ -67,6 +102,16 @@ EXAMPLES = '''
     state: present
     file_path: "/home/user/Downloads/hp-firmware-hdd-a1b08f8a6b-HPGH-1.1.x86_64.rpm"
 
+- name: Ensure that the verified SPP is present, resuming the upload up to 3 times
+  oneview_firmware_bundle:
+    config: "{{ config_file_path }}"
+    state: present
+    file_path: "/home/user/Downloads/SPP2017040.2017_0410.14.iso"
+    name: "Service Pack for ProLiant"
+    version: "2017.04.0"
+    checksum: "9b6a2ae2a14a0a1a0e4b8ba3bc8b2ab2e9e6a8f4e0d1c2b3a4f5e6d7c8b9a0f1"
+    chunk_size: 8388608
+    upload_retries: 3
 '''
 
 RETURN = '''
@@ -74,17 +119,32 @@ firmware_bundle:
     description: Has the facts about the OneView Firmware Bundle.
     returned: Always. Can be null.
     type: complex
+
+firmware_bundle_upload:
+    description: Has the size, SHA-256 digest and number of attempts of the upload.
+    returned: When the file is uploaded.
+    type: complex
 '''
 
 FIRMWARE_BUNDLE_UPLOADED = 'Firmware Bundle uploaded sucessfully.'
+FIRMWARE_BUNDLE_ALREADY_PRESENT = 'Firmware Bundle already present.'
+FIRMWARE_BUNDLE_CHECKSUM_MISMATCH = "The SHA-256 digest of the file, '{0}', does not match the checksum '{1}'."
+FIRMWARE_BUNDLE_UPLOAD_FAILED = 'Firmware Bundle upload failed after {0} attempts: {1}'
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 
+FIRMWARE_BUNDLES_URI = '/rest/firmware-bundles'
+
 
 class FirmwareBundleModule(object):
     argument_spec = dict(
         config=dict(required=False, type='str'),
         state=dict(required=True, choices=['present']),
-        file_path=dict(required=True, type='str')
+        file_path=dict(required=True, type='str'),
+        name=dict(required=False, type='str'),
+        version=dict(required=False, type='str'),
+        checksum=dict(required=False, type='str'),
+        chunk_size=dict(required=False, type='int', default=DEFAULT_UPLOAD_CHUNK_SIZE),
+        upload_retries=dict(required=False, type='int', default=0)
     )
 
     def __init__(self):
@@ -93,22 +153,77 @@ class FirmwareBundleModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         file_path = self.module.params['file_path']
+        chunk_size = self.module.params.get('chunk_size') or DEFAULT_UPLOAD_CHUNK_SIZE
 
         try:
-            new_firmware = self.oneview_client.firmware_bundles.upload(file_path)
-            self.module.exit_json(changed=True,
-                                  msg=FIRMWARE_BUNDLE_UPLOADED,
-                                  ansible_facts=dict(firmware_bundle=new_firmware))
+            checksum = self.module.params.get('checksum')
+            if checksum:
+                digest = file_digest(file_path, chunk_size)
+                if digest != checksum.lower():
+                    raise HPOneViewValueError(FIRMWARE_BUNDLE_CHECKSUM_MISMATCH.format(digest, checksum))
+
+            firmware = self.__get_existing_firmware(file_path)
+            if firmware:
+                self.module.exit_json(changed=False,
+                                      msg=FIRMWARE_BUNDLE_ALREADY_PRESENT,
+                                      ansible_facts=dict(firmware_bundle=firmware))
+            else:
+                new_firmware, upload = self.__upload(file_path, chunk_size)
+                self.module.exit_json(changed=True,
+                                      msg=FIRMWARE_BUNDLE_UPLOADED,
+                                      ansible_facts=dict(firmware_bundle=new_firmware,
+                                                         firmware_bundle_upload=upload))
 
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
 
+    def __get_existing_firmware(self, file_path):
+        file_name = os.path.basename(file_path)
+        expected = dict((key, self.module.params.get(key)) for key in ['name', 'version']
+                        if self.module.params.get(key))
+
+        for firmware in self.oneview_client.firmware_drivers.get_all():
+            file_names = [firmware.get('isoFileName')]
+            file_names += [component.get('fileName') for component in firmware.get('fwComponents') or []]
+
+            if file_name in file_names and all(firmware.get(key) == value for key, value in expected.items()):
+                return firmware
+        return None
+
+    def __upload(self, file_path, chunk_size):
+        connection = self.oneview_client.connection
+        retries = self.module.params.get('upload_retries') or 0
+        progress = progress_logger(os.path.basename(file_path))
+        attempts = 0
+
+        while True:
+            attempts += 1
+            try:
+                response, body, digest = upload_file(connection, FIRMWARE_BUNDLES_URI, file_path, chunk_size, progress)
+                break
+            except TRANSFER_ERRORS as error:
+                if attempts > retries:
+                    raise HPOneViewException(FIRMWARE_BUNDLE_UPLOAD_FAILED.format(attempts, error))
+
+            # the connection may drop after the appliance received the whole file
+            firmware = self.__get_existing_firmware(file_path)
+            if firmware:
+                return firmware, dict(size=os.path.getsize(file_path), sha256=None, attempts=attempts)
+
+        if response.status >= 400:
+            raise HPOneViewException(body)
+
+        task = get_upload_task(connection, response, body)
+        new_firmware = TaskMonitor(connection).wait_for_task(task) if task else body
+
+        return new_firmware, dict(size=os.path.getsize(file_path), sha256=digest, attempts=attempts)
+
 
 def main():
     FirmwareBundleModule().run()
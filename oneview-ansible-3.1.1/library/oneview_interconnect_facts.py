@@ -16,7 +16,11 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (gather_option_facts, get_all_projected, govern, project_resource,
+                                          transform_fields)
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -71,6 +75,13 @@ options:
         - "To gather additional facts it is required inform the Interconnect name. Otherwise, these options will be
           ignored."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Interconnects.
+          Nested attributes are addressed with dots, e.g. 'ports.portName'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -212,6 +223,7 @@ class InterconnectFactsModule(object):
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
         params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -220,18 +232,19 @@ class InterconnectFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
             interconnect_name = self.module.params['name']
             facts = dict()
+            fields = transform_fields(self.module.params.get('fields'))
 
             if interconnect_name:
                 interconnects = self.oneview_client.interconnects.get_by('name', interconnect_name)
-                facts['interconnects'] = interconnects
+                facts['interconnects'] = project_resource(interconnects, fields)
 
                 if interconnects and self.module.params.get('options'):
                     self.__get_options(interconnects, facts)
@@ -239,7 +252,7 @@ class InterconnectFactsModule(object):
             else:
                 params = self.module.params.get('params') or {}
 
-                facts['interconnects'] = self.oneview_client.interconnects.get_all(**params)
+                facts['interconnects'] = get_all_projected(self.oneview_client.interconnects, params, fields)
 
             self.module.exit_json(
                 changed=False,
@@ -252,36 +265,41 @@ class InterconnectFactsModule(object):
 
         options = transform_list_to_dict(self.module.params['options'])
 
+        interconnects_client = self.oneview_client.interconnects
         interconnect_uri = interconnects[0]['uri']
+        option_calls = []
 
         if options.get('nameServers'):
-            name_servers = self.oneview_client.interconnects.get_name_servers(interconnect_uri)
-            facts['interconnect_name_servers'] = name_servers
+            option_calls.append(('interconnect_name_servers',
+                                 partial(interconnects_client.get_name_servers, interconnect_uri)))
 
         if options.get('statistics'):
-            facts['interconnect_statistics'] = self.oneview_client.interconnects.get_statistics(interconnect_uri)
+            option_calls.append(('interconnect_statistics',
+                                 partial(interconnects_client.get_statistics, interconnect_uri)))
 
         if options.get('portStatistics'):
             port_name = options['portStatistics']
-            port_statistics = self.oneview_client.interconnects.get_statistics(interconnect_uri, port_name)
-            facts['interconnect_port_statistics'] = port_statistics
+            option_calls.append(('interconnect_port_statistics',
+                                 partial(interconnects_client.get_statistics, interconnect_uri, port_name)))
 
         if options.get('subPortStatistics'):
             facts['interconnect_subport_statistics'] = None
             sub_options = options['subPortStatistics']
             if type(sub_options) is dict and sub_options.get('portName') and sub_options.get('subportNumber'):
-                facts['interconnect_subport_statistics'] = self.oneview_client.interconnects.get_subport_statistics(
-                    interconnect_uri, sub_options['portName'], sub_options['subportNumber'])
+                option_calls.append(('interconnect_subport_statistics',
+                                     partial(interconnects_client.get_subport_statistics, interconnect_uri,
+                                             sub_options['portName'], sub_options['subportNumber'])))
 
         if options.get('ports'):
-            ports = self.oneview_client.interconnects.get_ports(interconnect_uri)
-            facts['interconnect_ports'] = ports
+            option_calls.append(('interconnect_ports', partial(interconnects_client.get_ports, interconnect_uri)))
 
         if options.get('port'):
             port_name = options.get('port')
             port_id = "{}:{}".format(extract_id_from_uri(interconnect_uri), port_name)
-            port = self.oneview_client.interconnects.get_port(interconnect_uri, port_id)
-            facts['interconnect_port'] = port
+            option_calls.append(('interconnect_port',
+                                 partial(interconnects_client.get_port, interconnect_uri, port_id)))
+
+        facts.update(gather_option_facts(option_calls))
 
 
 def main():
@@ -15,10 +15,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, resource_compare, start_task
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
 
@@ -64,6 +66,13 @@ options:
         description:
             - List with Logical Enclosure properties and its associated states.
         required: true
+    wait:
+        description:
+            - Whether to wait for the firmware update of the 'firmware_updated' state to complete. When false, the
+              module returns as soon as OneView accepts the request, with the URI of its task on the 'task_uri' fact,
+              so the task can be waited for later with the oneview_task_wait module.
+        required: false
+        default: true
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -98,6 +107,20 @@ EXAMPLES = '''
             forceInstallFirmware: "false"
   delegate_to: localhost
 
+- name: Start the firmware update for the Logical Enclosure, without waiting for it to complete
+  oneview_logical_enclosure:
+    config: "{{ config_file_name }}"
+    state: firmware_updated
+    wait: false
+    data:
+        name: "Encl1"
+        firmware:
+            firmwareBaselineUri: "/rest/firmware-drivers/SPPGen9Snap3_2015_0221_71"
+            firmwareUpdateOn: "EnclosureOnly"
+            forceInstallFirmware: "false"
+  delegate_to: localhost
+- debug: var=task_uri
+
 # This play is compatible with Synergy Enclosures
 - name: Update the firmware for the Logical Enclosure with the logical-interconnect validation set as true
   oneview_logical_enclosure:
@@ -187,6 +210,11 @@ generated_dump_uri:
     description: Has the facts about the Logical Enclosure generated support dump URI.
     returned: On state 'dumped'. Can be null.
     type: complex
+
+task_uri:
+    description: Has the URI of the task started by OneView.
+    returned: On state 'firmware_updated', when 'wait' is false.
+    type: string
 '''
 
 LOGICAL_ENCLOSURE_UPDATED = 'Logical Enclosure updated successfully.'
@@ -194,6 +222,7 @@ LOGICAL_ENCLOSURE_ALREADY_UPDATED = 'Logical Enclosure already updated.'
 LOGICAL_ENCLOSURE_REQUIRED = "An existing Logical Enclosure is required."
 LOGICAL_ENCLOSURE_UPDATED_FROM_GROUP = 'Logical Enclosure updated from group successfully.'
 LOGICAL_ENCLOSURE_FIRMWARE_UPDATED = 'Logical Enclosure firmware updated.'
+LOGICAL_ENCLOSURE_FIRMWARE_UPDATE_STARTED = 'Logical Enclosure firmware update started.'
 LOGICAL_ENCLOSURE_CONFIGURATION_SCRIPT_UPDATED = 'Logical Enclosure configuration script updated.'
 LOGICAL_ENCLOSURE_DUMP_GENERATED = 'Logical Enclosure support dump generated.'
 LOGICAL_ENCLOSURE_RECONFIGURED = 'Logical Enclosure configuration reapplied.'
@@ -211,7 +240,8 @@ class LogicalEnclosureModule(object):
             choices=['present', 'firmware_updated', 'script_updated',
                      'dumped', 'reconfigured', 'updated_from_group', 'absent']
         ),
-        data=dict(required=True, type='dict')
+        data=dict(required=True, type='dict'),
+        wait=dict(required=False, type='bool', default=True)
     )
 
     def __init__(self):
@@ -220,9 +250,9 @@ class LogicalEnclosureModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
@@ -307,10 +337,16 @@ class LogicalEnclosureModule(object):
         return True, LOGICAL_ENCLOSURE_CONFIGURATION_SCRIPT_UPDATED, dict(configuration_script=script)
 
     def __update_firmware(self, data, logical_enclosure):
-        logical_enclosure = self.oneview_client.logical_enclosures.patch(logical_enclosure['uri'],
-                                                                         operation="replace",
-                                                                         path="/firmware",
-                                                                         value=data['firmware'])
+        logical_enclosures = self.oneview_client.logical_enclosures
+        patch = partial(logical_enclosures.patch, logical_enclosure['uri'], operation="replace", path="/firmware",
+                        value=data['firmware'])
+
+        if self.module.params.get('wait', True):
+            logical_enclosure = patch()
+        else:
+            task, logical_enclosure = start_task(logical_enclosures, patch)
+            if task:
+                return True, LOGICAL_ENCLOSURE_FIRMWARE_UPDATE_STARTED, dict(task_uri=task['uri'])
 
         return True, LOGICAL_ENCLOSURE_FIRMWARE_UPDATED, dict(logical_enclosure=logical_enclosure)
 
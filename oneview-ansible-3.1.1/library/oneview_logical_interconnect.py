@@ -15,12 +15,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, resource_compare, start_task
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
     from hpOneView.exceptions import HPOneViewValueError
@@ -81,6 +82,13 @@ options:
               for the resource matches the ETag provided in the data.
         default: true
         choices: ['true', 'false']
+    wait:
+        description:
+            - Whether to wait for the firmware installation of the 'firmware_installed' state to complete. When false,
+              the module returns as soon as OneView accepts the request, with the URI of its task on the 'task_uri'
+              fact, so the task can be waited for later with the oneview_task_wait module.
+        required: false
+        default: true
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -182,6 +190,19 @@ EXAMPLES = '''
       command: Stage
       spp: "filename"  # could also be sppUri: '/rest/firmware-drivers/<filename>'
 
+- name: Start the firmware update of the logical interconnect, without waiting for it to complete
+  oneview_logical_interconnect:
+  config: "{{ config_file_path }}"
+  state: firmware_installed
+  wait: false
+  data:
+    name: "Name of the Logical Interconnect"
+    firmware:
+      command: Update
+      spp: "filename"
+
+- debug: var=task_uri
+
 - name: Updates the telemetry configuration of a logical interconnect.
   oneview_logical_interconnect:
   config: "{{ config_file_path }}"
@@ -232,6 +253,11 @@ telemetry_configuration:
     description: Has the OneView facts about the Telemetry Configuration.
     returned: On 'telemetry_configuration_updated' state, but can be null.
     type: complex
+
+task_uri:
+    description: Has the URI of the task started by OneView.
+    returned: On 'firmware_installed' state, when 'wait' is false.
+    type: string
 '''
 
 LOGICAL_INTERCONNECT_CONSISTENT = 'logical interconnect returned to a consistent state.'
@@ -244,6 +270,7 @@ LOGICAL_INTERCONNECT_PORT_MONITOR_UPDATED = 'Port Monitor configuration updated
 LOGICAL_INTERCONNECT_CONFIGURATION_UPDATED = 'Configuration on the logical interconnect updated successfully.'
 LOGICAL_INTERCONNECT_TELEMETRY_CONFIGURATION_UPDATED = 'Telemetry configuration updated successfully.'
 LOGICAL_INTERCONNECT_FIRMWARE_INSTALLED = 'Firmware updated successfully.'
+LOGICAL_INTERCONNECT_FIRMWARE_INSTALL_STARTED = 'Firmware update started.'
 LOGICAL_INTERCONNECT_NOT_FOUND = 'Logical Interconnect not found.'
 LOGICAL_INTERCONNECT_ETH_NETWORK_NOT_FOUND = 'Ethernet network not found: '
 LOGICAL_INTERCONNECT_NO_CHANGES_PROVIDED = 'Nothing to do.'
@@ -265,7 +292,8 @@ class LogicalInterconnectModule(object):
         validate_etag=dict(
             required=False,
             type='bool',
-            default=True)
+            default=True),
+        wait=dict(required=False, type='bool', default=True)
     )
 
     def __init__(self):
@@ -274,9 +302,9 @@ class LogicalInterconnectModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -433,7 +461,14 @@ class LogicalInterconnectModule(object):
         if 'spp' in options:
             options['sppUri'] = self.__build_firmware_uri(options.pop('spp'))
 
-        firmware = self.oneview_client.logical_interconnects.install_firmware(options, uri)
+        logical_interconnects = self.oneview_client.logical_interconnects
+        if self.module.params.get('wait', True):
+            firmware = logical_interconnects.install_firmware(options, uri)
+        else:
+            task, firmware = start_task(logical_interconnects,
+                                        partial(logical_interconnects.install_firmware, options, uri))
+            if task:
+                return True, LOGICAL_INTERCONNECT_FIRMWARE_INSTALL_STARTED, dict(task_uri=task['uri'])
 
         return True, LOGICAL_INTERCONNECT_FIRMWARE_INSTALLED, dict(li_firmware=firmware)
 
@@ -15,7 +15,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import gather_option_facts, govern
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.exceptions import HPOneViewException
@@ -206,9 +209,10 @@ class LogicalInterconnectFactsModule(object):
         if not HAS_HPE_ONEVIEW:
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
         if not self.module.params['config']:
-            logical_interconnects = OneViewClient.from_environment_variables().logical_interconnects
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            logical_interconnects = OneViewClient.from_json_file(self.module.params['config']).logical_interconnects
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
+        logical_interconnects = oneview_client.logical_interconnects
 
         self.resource_client = logical_interconnects
         self.options = dict(
@@ -254,17 +258,18 @@ class LogicalInterconnectFactsModule(object):
         return facts
 
     def __get_options(self, logical_interconnect, options):
-        facts = dict()
+        option_calls = []
         uri = logical_interconnect["uri"]
 
         for option in options:
             if option == 'telemetry_configuration':
                 telemetry_configuration_uri = logical_interconnect["telemetryConfiguration"]["uri"]
-                facts[option] = self.options[option](telemetry_configuration_uri=telemetry_configuration_uri)
+                option_calls.append(
+                    (option, partial(self.options[option], telemetry_configuration_uri=telemetry_configuration_uri)))
             else:
-                facts[option] = self.options[option](id_or_uri=uri)
+                option_calls.append((option, partial(self.options[option], id_or_uri=uri)))
 
-        return facts
+        return gather_option_facts(option_calls)
 
 
 def main():
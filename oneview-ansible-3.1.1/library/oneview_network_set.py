@@ -17,9 +17,9 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, merge_and_update
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
     from hpOneView.exceptions import HPOneViewValueError
@@ -59,6 +59,8 @@ options:
       description:
         - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
           for the resource matches the ETag provided in the data.
+        - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and the
+          update is retried, unless the same attributes were changed to other values.
       default: true
       choices: ['true', 'false']
 notes:
@@ -134,9 +136,9 @@ class NetworkSetModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -187,18 +189,17 @@ class NetworkSetModule(object):
                 raise HPOneViewValueError(NETWORK_SET_NEW_NAME_INVALID)
             data['name'] = data.pop('newName')
 
-        merged_data = resource.copy()
-        merged_data.update(data)
+        network_sets = self.oneview_client.network_sets
+        updated_network_set, changed = merge_and_update(network_sets, resource, data,
+                                                        update=lambda current, merged: network_sets.update(merged))
 
-        if resource_compare(resource, merged_data):
+        if not changed:
 
             self.module.exit_json(changed=False,
                                   msg=NETWORK_SET_ALREADY_EXIST,
                                   ansible_facts=dict(network_set=resource))
 
         else:
-            updated_network_set = self.oneview_client.network_sets.update(merged_data)
-
             self.module.exit_json(changed=True,
                                   msg=NETWORK_SET_UPDATED,
                                   ansible_facts=dict(network_set=updated_network_set))
@@ -15,7 +15,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import gather_option_facts, govern
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -135,9 +138,9 @@ class SasLogicalInterconnectFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            oneview_client = OneViewClient.from_environment_variables()
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.resource_client = oneview_client.sas_logical_interconnects
 
@@ -173,14 +176,15 @@ class SasLogicalInterconnectFactsModule(object):
         return sas_logical_interconnects
 
     def __gather_option_facts(self, options, resource):
-        ansible_facts = {}
+        option_calls = []
 
         options = transform_list_to_dict(options)
 
         if options.get('firmware'):
-            ansible_facts['sas_logical_interconnect_firmware'] = self.resource_client.get_firmware(resource['uri'])
+            option_calls.append(('sas_logical_interconnect_firmware',
+                                 partial(self.resource_client.get_firmware, resource['uri'])))
 
-        return ansible_facts
+        return gather_option_facts(option_calls)
 
 
 def main():
@@ -15,9 +15,9 @@
 # limitations under the License.
 ###
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, merge_and_update
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
 
@@ -59,6 +59,8 @@ options:
         description:
             - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
               for the resource matches the ETag provided in the data.
+            - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and
+              the update is retried, unless the same attributes were changed to other values.
         default: true
         choices: ['true', 'false']
 notes:
@@ -158,9 +160,9 @@ class ScopeModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -209,16 +211,14 @@ class ScopeModule(object):
         if 'newName' in data:
             data['name'] = data.pop('newName')
 
-        merged_data = resource.copy()
-        merged_data.update(data)
+        scope_updated, changed = merge_and_update(self.oneview_client.scopes, resource, data)
 
-        if resource_compare(resource, merged_data):
+        if not changed:
             self.module.exit_json(changed=False,
                                   msg=SCOPE_ALREADY_EXIST,
                                   ansible_facts=dict(scope=resource))
 
         else:
-            scope_updated = self.oneview_client.scopes.update(merged_data)
             self.module.exit_json(changed=True,
                                   msg=SCOPE_UPDATED,
                                   ansible_facts=dict(scope=scope_updated))
@@ -16,7 +16,13 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (DEFAULT_MAX_WORKERS, DEFAULT_PAGE_SIZE, TRANSFER_ERRORS, RateLimiter,
+                                          export_all_projected, gather_option_facts, get_all_projected, govern,
+                                          iter_all_pages, map_concurrently, project_resource, transform_fields,
+                                          write_json_lines)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.common import transform_list_to_dict
@@ -52,7 +58,27 @@ options:
         - "List with options to gather additional facts about Server Hardware related resources.
           Options allowed: bios, javaRemoteConsoleUrl, environmentalConfig, iloSsoUrl, remoteConsoleUrl,
           utilization, firmware, and firmwares."
+        - "Except for 'firmwares', the options are gathered only when the name is informed, unless 'fleet' is
+          enabled."
+      required: false
+    fleet:
+      description:
+        - When true and no name is informed, the options are gathered for every Server Hardware returned according
+          to 'params', instead of a single named one. The servers are processed concurrently and an error on one
+          server is reported in its own entry without failing the task.
+        - When 'dest' is informed, the entries are written to the file instead of the Server Hardware list.
+      required: false
+      default: false
+    max_workers:
+      description:
+        - Maximum number of Server Hardwares processed at the same time on 'fleet' mode.
       required: false
+      default: 8
+    rate_limit:
+      description:
+        - Maximum number of requests per second issued on 'fleet' mode. No limit is applied when set to 0.
+      required: false
+      default: 0
     params:
       description:
         - List of params to delimit, filter and sort the list of resources.
@@ -62,6 +88,30 @@ options:
            'filter': A general filter/query string to narrow the list of items returned.
            'sort': The sort order of the returned data set."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Server Hardwares.
+          Nested attributes are addressed with dots, e.g. 'mpHostInfo.mpIpAddresses'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
+    dest:
+      description:
+        - Path of a file where the Server Hardwares are written, one JSON document per line, instead of being
+          returned as facts. The collection is requested one page at a time, so the memory used does not depend
+          on its size. Only the path and the number of resources written are returned.
+          Ignored when the name is informed.
+      required: false
+    compress:
+      description:
+        - Whether the file informed in 'dest' must be gzip-compressed.
+      required: false
+      default: false
+    page_size:
+      description:
+        - Number of resources requested on each call when writing to 'dest'.
+      required: false
+      default: 500
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -92,6 +142,28 @@ EXAMPLES = '''
 - debug: msg="{{server_hardwares | map(attribute='name') | list }}"
 
 
+- name: Gather facts about all Server Hardware keeping only the name, power state and iLO addresses
+  oneview_server_hardware_facts:
+    config: "{{ config }}"
+    fields:
+      - name
+      - powerState
+      - mpHostInfo.mpIpAddresses
+  delegate_to: localhost
+
+- debug: var=server_hardwares
+
+
+- name: Write the inventory of all Server Hardware to a JSON lines file
+  oneview_server_hardware_facts:
+    config: "{{ config }}"
+    dest: /tmp/server-hardware.jsonl
+    page_size: 200
+  delegate_to: localhost
+
+- debug: var=server_hardwares_export
+
+
 - name: Gather facts about a Server Hardware by name
   oneview_server_hardware_facts:
     config: "{{ config }}"
@@ -148,6 +220,23 @@ EXAMPLES = '''
   delegate_to: localhost
 
 - debug: var=server_hardware_firmware
+
+- name: Gather BIOS and firmware facts about all the Server Hardware of an enclosure
+  oneview_server_hardware_facts:
+   config: "{{ config }}"
+   params:
+     filter: "locationUri='/rest/enclosures/09SGH100X6J1'"
+   options:
+     - bios
+     - firmware
+   fleet: true
+   max_workers: 16
+   rate_limit: 20
+   dest: /tmp/bios-firmware-survey.jsonl.gz
+   compress: true
+  delegate_to: localhost
+
+- debug: var=server_hardware_fleet_export
 '''
 
 RETURN = '''
@@ -195,6 +284,26 @@ server_hardware_firmwares:
     description: Has all the facts about the firmwares inventory across all servers.
     returned: When requested, but can be null.
     type: complex
+
+server_hardwares_export:
+    description: Has the destination file path, whether it is compressed, and the number of resources written.
+    returned: When 'dest' is informed.
+    type: dict
+
+server_hardware_fleet_facts:
+    description:
+        Has one entry for each Server Hardware processed on 'fleet' mode, with its name, uri and the facts about the
+        requested options, named as for a single Server Hardware. When the options of a server could not be
+        gathered, the entry has the 'error' message instead.
+    returned: On 'fleet' mode, when 'dest' is not informed.
+    type: list
+
+server_hardware_fleet_export:
+    description:
+        Has the destination file path, whether it is compressed, the number of entries written and the number of
+        entries with errors.
+    returned: On 'fleet' mode, when 'dest' is informed.
+    type: dict
 '''
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 
@@ -204,7 +313,14 @@ class ServerHardwareFactsModule(object):
         config=dict(required=False, type='str'),
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list'),
+        dest=dict(required=False, type='str'),
+        compress=dict(required=False, type='bool', default=False),
+        page_size=dict(required=False, type='int', default=500),
+        fleet=dict(required=False, type='bool', default=False),
+        max_workers=dict(required=False, type='int', default=8),
+        rate_limit=dict(required=False, type='float', default=0)
     )
 
     def __init__(self):
@@ -213,13 +329,14 @@ class ServerHardwareFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
             ansible_facts, options = {}, None
+            fields = transform_fields(self.module.params.get('fields'))
 
             if self.module.params.get('options'):
                 options = transform_list_to_dict(self.module.params.get('options'))
@@ -230,44 +347,91 @@ class ServerHardwareFactsModule(object):
                 if self.module.params.get('options') and server_hardwares:
                     ansible_facts = self.gather_option_facts(options, server_hardwares[0])
 
+                ansible_facts["server_hardwares"] = project_resource(server_hardwares, fields)
+
             else:
                 params = self.module.params.get('params') or {}
-                server_hardwares = self.oneview_client.server_hardware.get_all(**params)
+
+                if self.module.params.get('fleet') and options:
+                    ansible_facts.update(self.gather_fleet_option_facts(options, params, fields))
+                elif self.module.params.get('dest'):
+                    ansible_facts['server_hardwares_export'] = export_all_projected(
+                        self.oneview_client.server_hardware, params, fields, self.module.params['dest'],
+                        self.module.params.get('compress'), self.module.params.get('page_size'))
+                else:
+                    ansible_facts['server_hardwares'] = get_all_projected(self.oneview_client.server_hardware,
+                                                                          params, fields)
 
                 if options and options.get('firmwares'):
                     ansible_facts['server_hardware_firmwares'] = self.get_all_firmwares(options)
 
-            ansible_facts["server_hardwares"] = server_hardwares
-
             self.module.exit_json(changed=False,
                                   ansible_facts=ansible_facts)
 
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
 
+    def gather_fleet_option_facts(self, options, params, fields):
+        rate_limiter = RateLimiter(self.module.params.get('rate_limit'))
+        max_workers = self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS
+        dest = self.module.params.get('dest')
+        compress = bool(self.module.params.get('compress'))
+        failed = []
+
+        def gather_server_facts(server_hardware):
+            entry = dict(name=server_hardware.get('name'), uri=server_hardware['uri'])
+            option_calls = [(name, rate_limiter.limit(function))
+                            for name, function in self.__get_option_calls(options, server_hardware)]
+            try:
+                entry.update(gather_option_facts(option_calls, max_workers=1))
+            except HPOneViewException as exception:
+                entry['error'] = '; '.join(str(e) for e in exception.args)
+                failed.append(entry['uri'])
+            except TRANSFER_ERRORS as error:
+                entry['error'] = str(error)
+                failed.append(entry['uri'])
+            return entry
+
+        if dest:
+            server_hardwares = iter_all_pages(rate_limiter.limit(self.oneview_client.server_hardware.get_all), params,
+                                              self.module.params.get('page_size') or DEFAULT_PAGE_SIZE)
+            entries = map_concurrently(gather_server_facts, server_hardwares, max_workers)
+            count = write_json_lines(dest, entries, compress)
+            return dict(server_hardware_fleet_export=dict(dest=dest, compressed=compress, count=count,
+                                                          failed=len(failed)))
+
+        server_hardwares = self.oneview_client.server_hardware.get_all(**params)
+        entries = list(map_concurrently(gather_server_facts, server_hardwares, max_workers))
+        return dict(server_hardwares=project_resource(server_hardwares, fields), server_hardware_fleet_facts=entries)
+
     def gather_option_facts(self, options, server_hardware):
+        return gather_option_facts(self.__get_option_calls(options, server_hardware))
+
+    def __get_option_calls(self, options, server_hardware):
         srv_hw_client = self.oneview_client.server_hardware
-        ansible_facts = {}
+        uri = server_hardware['uri']
+        option_calls = []
 
         if options.get('bios'):
-            ansible_facts['server_hardware_bios'] = srv_hw_client.get_bios(server_hardware['uri'])
+            option_calls.append(('server_hardware_bios', partial(srv_hw_client.get_bios, uri)))
         if options.get('environmentalConfig'):
-            ansible_facts['server_hardware_env_config'] = srv_hw_client.get_environmental_configuration(
-                server_hardware['uri'])
+            option_calls.append(('server_hardware_env_config',
+                                 partial(srv_hw_client.get_environmental_configuration, uri)))
         if options.get('javaRemoteConsoleUrl'):
-            ansible_facts['server_hardware_java_remote_console_url'] = srv_hw_client.get_java_remote_console_url(
-                server_hardware['uri'])
+            option_calls.append(('server_hardware_java_remote_console_url',
+                                 partial(srv_hw_client.get_java_remote_console_url, uri)))
         if options.get('iloSsoUrl'):
-            ansible_facts['server_hardware_ilo_sso_url'] = srv_hw_client.get_ilo_sso_url(server_hardware['uri'])
+            option_calls.append(('server_hardware_ilo_sso_url', partial(srv_hw_client.get_ilo_sso_url, uri)))
         if options.get('remoteConsoleUrl'):
-            ansible_facts['server_hardware_remote_console_url'] = srv_hw_client.get_remote_console_url(
-                server_hardware['uri'])
+            option_calls.append(('server_hardware_remote_console_url',
+                                 partial(srv_hw_client.get_remote_console_url, uri)))
         if options.get('utilization'):
-            ansible_facts['server_hardware_utilization'] = self.get_utilization(server_hardware, options['utilization'])
+            option_calls.append(('server_hardware_utilization',
+                                 partial(self.get_utilization, server_hardware, options['utilization'])))
         if options.get('firmware'):
-            ansible_facts['server_hardware_firmware'] = srv_hw_client.get_firmware(server_hardware["uri"])
+            option_calls.append(('server_hardware_firmware', partial(srv_hw_client.get_firmware, uri)))
 
-        return ansible_facts
+        return option_calls
 
     def get_all_firmwares(self, options):
         if isinstance(options['firmwares'], bool):
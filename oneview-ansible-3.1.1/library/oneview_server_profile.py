@@ -16,12 +16,15 @@
 # limitations under the License.
 ###
 import logging
+import tempfile
+from functools import partial
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (DEFAULT_MAX_WORKERS, DEFAULT_RESERVATION_LEASE, ResourceReservations, govern,
+                                          merge_and_update, run_concurrently, start_task)
 
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.extras.server_profile_utils import ServerProfileReplaceNamesByUris
     from hpOneView.extras.server_profile_utils import ServerProfileMerger
     from hpOneView.extras.server_profile_utils import Keys
@@ -43,16 +46,33 @@ HARDWARE_NOT_FOUND = "Informed Server Hardware '{}' not found"
 SERVER_PROFILE_CREATED = "Server Profile created."
 SERVER_ALREADY_UPDATED = 'Server Profile is already updated.'
 SERVER_PROFILE_UPDATED = 'Server profile updated'
+SERVER_PROFILE_CREATION_STARTED = 'Server Profile creation started.'
+SERVER_PROFILE_UPDATE_STARTED = 'Server Profile update started.'
 SERVER_PROFILE_DELETED = 'Deleted profile'
 SERVER_PROFILE_ALREADY_ABSENT = 'Nothing do.'
 REMEDIATED_COMPLIANCE = "Remediated compliance issues"
 ALREADY_COMPLIANT = "Server Profile is already compliant."
 SERVER_PROFILE_NOT_FOUND = "Server Profile is required for this operation."
 ERROR_ALLOCATE_SERVER_HARDWARE = 'Could not allocate server hardware'
+BULK_PROFILES_CREATED = "{} Server Profile(s) created."
+BULK_PROFILES_FAILED = "{} of {} Server Profile(s) could not be created."
+BULK_STATE_NOT_SUPPORTED = "Only the 'present' state is supported when 'profile_names' or 'profile_count' is informed."
+BULK_NAMES_REQUIRED = "Inform either 'profile_names' or 'profile_count' together with 'profile_name_pattern'."
+BULK_NOT_ENOUGH_HARDWARE = "Could not allocate server hardware: {} Server Profile(s) to create and only {} " \
+                           "available server hardware."
+UPDATE_REQUIRES_WAIT = "The update requires powering off the Server Hardware '{}', which is only powered on again " \
+                       "when 'wait' is true. Power it off first, or set 'wait' to true."
 MAKE_COMPLIANT_NOT_SUPPORTED = "Update from template is not supported for server profile '{}' because it is not " \
                                "associated with a server profile template."
 
 CONCURRENCY_FAILOVER_RETRIES = 25
+# Server Profile attributes that OneView updates without powering off the server hardware. The compliance preview
+# tells it only for the remediation to the template, so the updates from the data rely on this list.
+ONLINE_UPDATE_ATTRIBUTES = ['description']
+EXTRA_FACTS = ['server_hardware', 'compliance_preview']
+# Extra facts fetched even when the Server Profile did not change, as playbooks rely on the server hardware facts
+UNCHANGED_EXTRA_FACTS = ['server_hardware']
+DEFAULT_RESERVATION_FILE = os.path.join(tempfile.gettempdir(), 'oneview-server-hardware-reservations.json')
 
 DOCUMENTATION = '''
 ---
@@ -79,12 +99,13 @@ options:
     description:
       - Indicates the desired state for the Server Profile resource by the end of the playbook execution.
         'present' will ensure data properties are compliant with OneView. This operation will power off the Server
-        Hardware before configuring the Server Profile. After it completes, the Server Hardware is powered on.
+        Hardware before configuring the Server Profile, unless it is already off or only the description changes.
+        After it completes, the Server Hardware is powered on if it was on before.
         For the osDeploymentSettings, you can provide an osDeploymentPlanName instead of osDeploymentPlanUri.
         'absent' will remove the resource from OneView, if it exists.
         'compliant' will make the server profile compliant with its server profile template, when this option was
         specified. If there are Offline updates, the Server Hardware is turned off before remediate compliance issues
-        and turned on after that.
+        and turned on after that, unless it was already off.
     default: present
     choices: ['present', 'absent', 'compliant']
   data:
@@ -95,8 +116,61 @@ options:
     description:
       - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag for
         the resource matches the ETag provided in the data.
+      - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and the
+        update is retried, unless the same attributes were changed to other values.
     default: true
     choices: ['true', 'false']
+  profile_names:
+    description:
+      - List of Server Profile names to create in bulk with the 'data', usually from a Server Profile Template.
+        The template is resolved once, distinct server hardware is allocated up front for all the profiles, and the
+        creations are submitted concurrently. Profiles that already exist are left untouched. Only supported on
+        'present' state.
+    required: false
+  profile_count:
+    description:
+      - Number of Server Profiles to create in bulk, named with the 'profile_name_pattern'. Alternative to
+        'profile_names'.
+    required: false
+  profile_name_pattern:
+    description:
+      - Pattern used to name the profiles when 'profile_count' is informed. The index, starting at 1, is replaced
+        in the '{index}' placeholder, e.g. 'esxi-{index:02d}'.
+    required: false
+  max_workers:
+    description:
+      - Maximum number of Server Profile creations in flight at the same time on bulk mode.
+    required: false
+    default: 8
+  reservation_file:
+    description:
+      - Path of a local file where the server hardware chosen automatically is reserved while the profile is created.
+        The runs that share the same file, like the forks of a playbook, never pick the same server hardware.
+    required: false
+    default: oneview-server-hardware-reservations.json in the temporary directory
+  reservation_lease:
+    description:
+      - Seconds after which a reservation of the 'reservation_file' expires, even if the run that made it has not
+        released it.
+    required: false
+    default: 120
+  return_facts:
+    description:
+      - List of extra facts to fetch on states 'present' and 'compliant', among 'server_hardware' and
+        'compliance_preview'. The facts not fetched are returned as null. When not informed, the 'server_hardware'
+        is always fetched and the 'compliance_preview' only when the Server Profile changed, so runs with nothing to
+        do skip its request.
+    required: false
+  wait:
+    description:
+      - Whether to wait for the creation or update of the Server Profile on state 'present' to complete. When false,
+        the module returns as soon as OneView accepts the request, with the URI of its task on the 'task_uri' fact, so
+        the task can be waited for later with the oneview_task_wait module. An update that requires powering off
+        Server Hardware that is on fails instead, since nothing would power it on again after the task. The Server
+        Hardware chosen automatically for a creation stays reserved until the 'reservation_lease' expires. Ignored on
+        bulk mode.
+    required: false
+    default: true
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -161,6 +235,26 @@ EXAMPLES = '''
 - debug: var=compliance_preview
 - debug: var=created
 
+- name: Ensure the Server Profile without fetching the extra facts, even when it changes
+  oneview_server_profile:
+    config: "{{ config }}"
+    state: "present"
+    return_facts: []
+    data:
+        name: Web-Server-L2
+        server_template: Compute-node-template
+
+- name: Create 32 Server Profiles from a Server Profile Template, 8 at a time
+  oneview_server_profile:
+    config: "{{ config }}"
+    state: "present"
+    profile_count: 32
+    profile_name_pattern: "esxi-{index:02d}"
+    max_workers: 8
+    data:
+        server_template: Compute-node-template
+- debug: var=server_profiles_bulk
+
 - name : Remediate compliance issues
   oneview_server_profile:
      config: "{{ config }}"
@@ -174,6 +268,16 @@ EXAMPLES = '''
     state: "absent"
     data:
         name: Web-Server-L2
+
+- name: Start the creation of a Server Profile, without waiting for it to complete
+  oneview_server_profile:
+    config: "{{ config }}"
+    state: "present"
+    wait: false
+    data:
+        name: Web-Server-L3
+        server_template: Compute-node-template
+- debug: var=task_uri
 '''
 
 RETURN = '''
@@ -187,18 +291,34 @@ serial_number:
     type: complex
 server_hardware:
     description: Has the OneView facts about the Server Hardware.
-    returned: On states 'present' and 'compliant'.
+    returned: On states 'present' and 'compliant', unless 'return_facts' is informed without it.
     type: complex
 compliance_preview:
     description:
         Has the OneView facts about the manual and automatic updates required to make the server profile
         consistent with its template.
-    returned: On states 'present' and 'compliant'.
+    returned: On states 'present' and 'compliant', when selected by 'return_facts' or the Server Profile changed.
     type: complex
 created:
     description: Indicates if the Server Profile was created.
     returned: On states 'present' and 'compliant'.
     type: bool
+power_actions:
+    description:
+        Has the power transitions decided for the Server Hardware, with the server hardware uri, the power state
+        and whether it was changed or skipped because the Server Hardware was already in that state.
+    returned: Always, except on failure.
+    type: list
+server_profiles_bulk:
+    description:
+        Has one result for each Server Profile of the bulk mode, with the name, whether it was created, the uri of
+        the profile and of the server hardware, and the error message when the creation failed.
+    returned: When 'profile_names' or 'profile_count' is informed.
+    type: list
+task_uri:
+    description: Has the URI of the task started by OneView.
+    returned: On state 'present', when 'wait' is false and the Server Profile was created or updated.
+    type: string
 '''
 
 
@@ -238,6 +358,14 @@ class ServerProfileModule(object):
             required=False,
             type='bool',
             default=True),
+        profile_names=dict(required=False, type='list'),
+        profile_count=dict(required=False, type='int'),
+        profile_name_pattern=dict(required=False, type='str'),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS),
+        reservation_file=dict(required=False, type='str', default=DEFAULT_RESERVATION_FILE),
+        reservation_lease=dict(required=False, type='int', default=DEFAULT_RESERVATION_LEASE),
+        return_facts=dict(required=False, type='list'),
+        wait=dict(required=False, type='bool', default=True)
     )
 
     def __init__(self):
@@ -249,37 +377,54 @@ class ServerProfileModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         if not self.module.params.get('validate_etag'):
             self.oneview_client.connection.disable_etag_validation()
 
+        self.power_actions = []
+        self.power_states_before_update = {}
+        self.started_task = None
+
+        lease = self.module.params.get('reservation_lease') or DEFAULT_RESERVATION_LEASE
+        self.reservations = ResourceReservations(self.module.params.get('reservation_file'), lease)
+
     def run(self):
         data = deepcopy(self.module.params['data'])
         server_profile_name = data.get('name')
         state = self.module.params['state']
 
         try:
+            if self.module.params.get('profile_names') or self.module.params.get('profile_count'):
+                if state != 'present':
+                    raise HPOneViewValueError(BULK_STATE_NOT_SUPPORTED)
+                self.__present_bulk(data)
+                return
+
             server_profile = self.oneview_client.server_profiles.get_by_name(server_profile_name)
 
             if state == 'present':
                 created, changed, msg, server_profile = self.__present(data, server_profile)
-                facts = self.__gather_facts(server_profile)
-                facts['created'] = created
+                if self.started_task:
+                    msg = SERVER_PROFILE_CREATION_STARTED if created else SERVER_PROFILE_UPDATE_STARTED
+                    facts = dict(task_uri=self.started_task['uri'], created=created, power_actions=self.power_actions)
+                else:
+                    facts = self.__gather_facts(server_profile, changed)
+                    facts['created'] = created
                 self.module.exit_json(
                     changed=changed, msg=msg, ansible_facts=facts
                 )
             elif state == 'absent':
                 changed, msg = self.__delete_profile(server_profile)
                 self.module.exit_json(
-                    changed=changed, msg=msg
+                    changed=changed, msg=msg, ansible_facts=dict(power_actions=self.power_actions)
                 )
             elif state == "compliant":
                 changed, msg, server_profile = self.__make_compliant(server_profile)
                 self.module.exit_json(
-                    changed=changed, msg=msg, ansible_facts=self.__gather_facts(server_profile)
+                    changed=changed, msg=msg, ansible_facts=self.__gather_facts(server_profile, changed)
                 )
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
@@ -314,29 +459,136 @@ class ServerProfileModule(object):
             created = True
             msg = SERVER_PROFILE_CREATED
         else:
-            merged_data = ServerProfileMerger().merge_data(resource, data)
-
-            if not resource_compare(resource, merged_data):
-                resource = self.__update_server_profile(merged_data)
-                changed = True
-                msg = SERVER_PROFILE_UPDATED
-            else:
-                msg = SERVER_ALREADY_UPDATED
+            resource, changed = merge_and_update(
+                self.oneview_client.server_profiles, resource, data, merge=ServerProfileMerger().merge_data,
+                update=lambda current, merged: self.__update_server_profile(merged, current))
+            msg = SERVER_PROFILE_UPDATED if changed else SERVER_ALREADY_UPDATED
 
         return created, changed, msg, resource
 
-    def __update_server_profile(self, profile_with_updates):
+    def __present_bulk(self, data):
+        names = self.__get_bulk_profile_names()
+        server_template_name = data.pop('server_template', '')
+        data.pop('server_hardware', None)
+        server_template = None
+
+        ServerProfileReplaceNamesByUris().replace(self.oneview_client, data)
+
+        if server_template_name:
+            server_template = self.oneview_client.server_profile_templates.get_by_name(server_template_name)
+            if not server_template:
+                raise HPOneViewValueError(TEMPLATE_NOT_FOUND.format(server_template_name))
+            data['serverProfileTemplateUri'] = server_template['uri']
+        elif data.get('serverProfileTemplateUri'):
+            server_template = self.oneview_client.server_profile_templates.get(data['serverProfileTemplateUri'])
+
+        existing_profiles = dict((profile['name'], profile) for profile in self.oneview_client.server_profiles.get_all()
+                                 if profile.get('name') in names)
+        names_to_create = [name for name in names if name not in existing_profiles]
+
+        results = dict((name, dict(name=name, created=False, uri=profile.get('uri'),
+                                   serverHardwareUri=profile.get('serverHardwareUri')))
+                       for name, profile in existing_profiles.items())
+
+        if names_to_create:
+            self.__remove_inconsistent_data(data)
+
+            logger.debug(msg="Allocate server hardware for {} Server Profiles".format(len(names_to_create)))
+            server_hardware_uris = self.__get_available_server_hardware_uris(data, server_template)
+            allocated_uris = [self.reservations.reserve(server_hardware_uris, name) for name in names_to_create]
+            if None in allocated_uris:
+                for server_hardware_uri in allocated_uris:
+                    if server_hardware_uri:
+                        self.reservations.release(server_hardware_uri)
+                raise HPOneViewException(BULK_NOT_ENOUGH_HARDWARE.format(
+                    len(names_to_create), len([uri for uri in allocated_uris if uri])))
+
+            # The template is resolved once and each profile is built from a copy of it
+            base_profile = self.__build_new_profile_data(data, server_template, None)
+
+            creations = [partial(self.__create_bulk_profile, base_profile, name, server_hardware_uri,
+                                 server_hardware_uris)
+                         for name, server_hardware_uri in zip(names_to_create, allocated_uris)]
+            max_workers = self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS
+
+            for result in run_concurrently(creations, max_workers):
+                results[result['name']] = result
+
+        results = [results[name] for name in names]
+        failed = [result for result in results if result.get('error')]
+        created = [result for result in results if result['created']]
+
+        if failed:
+            self.module.fail_json(msg=BULK_PROFILES_FAILED.format(len(failed), len(names_to_create)),
+                                  server_profiles_bulk=results)
+        else:
+            self.module.exit_json(changed=bool(created),
+                                  msg=BULK_PROFILES_CREATED.format(len(created)),
+                                  ansible_facts=dict(server_profiles_bulk=results, power_actions=self.power_actions))
+
+    def __get_bulk_profile_names(self):
+        names = self.module.params.get('profile_names')
+        if names:
+            return list(names)
+
+        pattern = self.module.params.get('profile_name_pattern')
+        if not pattern:
+            raise HPOneViewValueError(BULK_NAMES_REQUIRED)
+        return [pattern.format(index=index) for index in range(1, self.module.params['profile_count'] + 1)]
+
+    def __create_bulk_profile(self, base_profile, name, server_hardware_uri, server_hardware_uris):
+        server_profile = deepcopy(base_profile)
+        server_profile['name'] = name
+
+        while True:
+            try:
+                logger.debug(msg="Power off the Server Hardware before create the Server Profile '{}'".format(name))
+                self.__power_off_server_hardware(server_hardware_uri)
+
+                server_profile['serverHardwareUri'] = server_hardware_uri
+                created_profile = self.oneview_client.server_profiles.create(server_profile)
+                self.reservations.release(server_hardware_uri)
+                return dict(name=name, created=True, uri=created_profile.get('uri'),
+                            serverHardwareUri=server_hardware_uri)
+
+            except HPOneViewException as exception:
+                error_code = getattr(exception, 'error_code', None)
+                if error_code in ASSIGN_HARDWARE_ERROR_CODES:
+                    # someone grabbed the hardware since the allocation, it stays reserved until the lease expires
+                    # and the profile moves to a spare one if there is any
+                    server_hardware_uri = self.reservations.reserve(server_hardware_uris, name)
+                    if server_hardware_uri:
+                        continue
+                else:
+                    self.reservations.release(server_hardware_uri)
+                return dict(name=name, created=False, uri=None, serverHardwareUri=None,
+                            error='; '.join(str(e) for e in exception.args))
+
+    def __update_server_profile(self, profile_with_updates, current_profile):
         logger.debug(msg="Updating Server Profile")
 
-        if profile_with_updates.get('serverHardwareUri'):
+        server_hardware_uri = profile_with_updates.get('serverHardwareUri')
+        changed_attributes = [key for key in set(profile_with_updates) | set(current_profile)
+                              if profile_with_updates.get(key) != current_profile.get(key)]
+        is_offline_update = not changed_attributes or not set(changed_attributes).issubset(ONLINE_UPDATE_ATTRIBUTES)
+
+        previous_power_state = None
+        if server_hardware_uri and is_offline_update:
+            if not self.module.params.get('wait', True):
+                self.__check_powered_off(server_hardware_uri)
+
             logger.debug("Power off the server hardware before update")
-            self.__set_server_hardware_power_state(profile_with_updates['serverHardwareUri'], 'Off')
+            previous_power_state = self.__power_off_server_hardware(server_hardware_uri)
+            # a retry after an ETag conflict finds the server hardware powered off by the previous attempt
+            previous_power_state = self.power_states_before_update.setdefault(server_hardware_uri,
+                                                                              previous_power_state)
 
-        resource = self.oneview_client.server_profiles.update(profile_with_updates, profile_with_updates['uri'])
+        resource = self.__request(self.oneview_client.server_profiles.update, profile_with_updates,
+                                  profile_with_updates['uri'])
 
-        if profile_with_updates.get('serverHardwareUri'):
+        if server_hardware_uri and is_offline_update and not self.started_task:
             logger.debug("Power on the server hardware after update")
-            self.__set_server_hardware_power_state(profile_with_updates['serverHardwareUri'], 'On')
+            self.__restore_server_hardware_power_state(server_hardware_uri, previous_power_state)
 
         return resource
 
@@ -349,34 +601,58 @@ class ServerProfileModule(object):
                 tries += 1
 
                 server_hardware_uri = data.get('serverHardwareUri')
+                reserved_uri = None
 
                 if not server_hardware_uri:
                     # find servers that have no profile, mathing Server hardware type and enclosure group
                     logger.debug(msg="Get an available Server Hardware for the Profile")
-                    server_hardware_uri = self.__get_available_server_hardware_uri(data, server_profile_template)
+                    server_hardware_uris = self.__get_available_server_hardware_uris(data, server_profile_template)
+                    server_hardware_uri = self.__reserve_server_hardware(server_hardware_uris, data)
+                    reserved_uri = server_hardware_uri
+
+                    if server_hardware_uris and not server_hardware_uri:
+                        # every candidate is reserved by a concurrent run, which releases it if its creation fails,
+                        # so wait and list them again instead of creating the profile without server hardware
+                        time.sleep(10)
+                        continue
 
                 if server_hardware_uri:
                     logger.debug(msg="Power off the Server Hardware before create the Server Profile")
-                    self.__set_server_hardware_power_state(server_hardware_uri, 'Off')
+                    self.__power_off_server_hardware(server_hardware_uri)
 
                 # Build the data to create a new server profile based on a template if informed
                 server_profile = self.__build_new_profile_data(data, server_profile_template, server_hardware_uri)
 
                 logger.debug(msg="Request Server Profile creation")
-                return self.oneview_client.server_profiles.create(server_profile)
+                created_profile = self.__request(self.oneview_client.server_profiles.create, server_profile)
+                if reserved_uri and not self.started_task:
+                    self.reservations.release(reserved_uri)
+                return created_profile
 
             except HPOneViewTaskError as task_error:
                 logger.exception("Error code: {} Message: {}".format(str(task_error.error_code), str(task_error.msg)))
                 if task_error.error_code in ASSIGN_HARDWARE_ERROR_CODES:
                     # if this is because the server is already assigned, someone grabbed it before we assigned,
                     # ignore and try again
-                    # This waiting time was chosen empirically and it could differ according to the hardware.
-                    time.sleep(10)
+                    if not reserved_uri:
+                        # This waiting time was chosen empirically and it could differ according to the hardware.
+                        time.sleep(10)
+                    # otherwise the grabbed server hardware stays reserved until the lease expires, so the next try
+                    # picks another one right away
                 else:
+                    if reserved_uri:
+                        self.reservations.release(reserved_uri)
                     raise task_error
 
         raise HPOneViewException(ERROR_ALLOCATE_SERVER_HARDWARE)
 
+    def __request(self, method, *args):
+        if self.module.params.get('wait', True):
+            return method(*args)
+
+        self.started_task, result = start_task(self.oneview_client.server_profiles, partial(method, *args))
+        return result
+
     def __build_new_profile_data(self, data, server_template, server_hardware_uri):
 
         server_profile_data = deepcopy(data)
@@ -431,7 +707,13 @@ class ServerProfileModule(object):
                     if volume.get(Keys.LUN_TYPE) == 'Auto':
                         volume.pop(Keys.LUN, None)
 
-    def __get_available_server_hardware_uri(self, server_profile, server_template):
+    def __reserve_server_hardware(self, server_hardware_uris, server_profile):
+        server_hardware_uri = self.reservations.reserve(server_hardware_uris, server_profile.get('name') or '')
+
+        logger.debug(msg="Found available server hardware: '{}'".format(server_hardware_uri))
+        return server_hardware_uri
+
+    def __get_available_server_hardware_uris(self, server_profile, server_template):
 
         if server_template:
             enclosure_group = server_template.get('enclosureGroupUri', '')
@@ -445,22 +727,20 @@ class ServerProfileModule(object):
             enclosureGroupUri=enclosure_group,
             serverHardwareTypeUri=server_hardware_type)
 
-        # targets will list empty bays. We need to pick one that has a server
-        index = 0
-        server_hardware_uri = None
-        while not server_hardware_uri and index < len(available_server_hardware['targets']):
-            server_hardware_uri = available_server_hardware['targets'][index]['serverHardwareUri']
-            index = index + 1
+        # targets will list empty bays. We need to pick the ones that have a server
+        server_hardware_uris = []
+        for target in available_server_hardware['targets']:
+            if target.get('serverHardwareUri') and target['serverHardwareUri'] not in server_hardware_uris:
+                server_hardware_uris.append(target['serverHardwareUri'])
 
-        logger.debug(msg="Found available server hardware: '{}'".format(server_hardware_uri))
-        return server_hardware_uri
+        return server_hardware_uris
 
     def __delete_profile(self, server_profile):
         if not server_profile:
             return False, SERVER_PROFILE_ALREADY_ABSENT
 
         if server_profile.get('serverHardwareUri'):
-            self.__set_server_hardware_power_state(server_profile['serverHardwareUri'], 'Off')
+            self.__power_off_server_hardware(server_profile['serverHardwareUri'])
 
         self.oneview_client.server_profiles.delete(server_profile)
         return True, SERVER_PROFILE_DELETED
@@ -484,9 +764,10 @@ class ServerProfileModule(object):
 
             is_offline_update = compliance_preview.get('isOnlineUpdate') is False
 
+            previous_power_state = None
             if is_offline_update:
                 logger.debug(msg="Power off the server hardware before update from template")
-                self.__set_server_hardware_power_state(server_profile['serverHardwareUri'], 'Off')
+                previous_power_state = self.__power_off_server_hardware(server_profile['serverHardwareUri'])
 
             logger.debug(msg="Updating from template")
 
@@ -495,21 +776,24 @@ class ServerProfileModule(object):
 
             if is_offline_update:
                 logger.debug(msg="Power on the server hardware after update from template")
-                self.__set_server_hardware_power_state(server_profile['serverHardwareUri'], 'On')
+                self.__restore_server_hardware_power_state(server_profile['serverHardwareUri'], previous_power_state)
 
             changed = True
             msg = REMEDIATED_COMPLIANCE
 
         return changed, msg, server_profile
 
-    def __gather_facts(self, server_profile):
+    def __gather_facts(self, server_profile, changed):
+        return_facts = self.module.params.get('return_facts')
+        if return_facts is None:
+            return_facts = EXTRA_FACTS if changed else UNCHANGED_EXTRA_FACTS
 
         server_hardware = None
-        if server_profile.get('serverHardwareUri'):
+        if 'server_hardware' in return_facts and server_profile.get('serverHardwareUri'):
             server_hardware = self.oneview_client.server_hardware.get(server_profile['serverHardwareUri'])
 
         compliance_preview = None
-        if server_profile.get('serverProfileTemplateUri'):
+        if 'compliance_preview' in return_facts and server_profile.get('serverProfileTemplateUri'):
             compliance_preview = self.oneview_client.server_profiles.get_compliance_preview(server_profile.get('uri'))
 
         facts = {
@@ -517,7 +801,8 @@ class ServerProfileModule(object):
             'server_profile': server_profile,
             'server_hardware': server_hardware,
             'compliance_preview': compliance_preview,
-            'created': False
+            'created': False,
+            'power_actions': self.power_actions
         }
 
         return facts
@@ -526,7 +811,39 @@ class ServerProfileModule(object):
         server_hardwares = self.oneview_client.server_hardware.get_by('name', server_hardware_name)
         return server_hardwares[0] if server_hardwares else None
 
+    def __power_off_server_hardware(self, hardware_uri):
+        """
+        Powers off the server hardware, unless it is already off.
+
+        Returns:
+            str: The power state before, to be restored after the operation.
+        """
+        power_state = (self.oneview_client.server_hardware.get(hardware_uri) or {}).get('powerState')
+
+        if power_state == 'Off':
+            logger.debug(msg="Server hardware '{}' is already off".format(hardware_uri))
+            self.power_actions.append(dict(serverHardwareUri=hardware_uri, powerState='Off', changed=False))
+        else:
+            self.__set_server_hardware_power_state(hardware_uri, 'Off')
+
+        return power_state
+
+    def __check_powered_off(self, hardware_uri):
+        # nothing powers the server hardware on again when the update is not waited for
+        power_state = (self.oneview_client.server_hardware.get(hardware_uri) or {}).get('powerState')
+        if power_state != 'Off':
+            raise HPOneViewValueError(UPDATE_REQUIRES_WAIT.format(hardware_uri))
+
+    def __restore_server_hardware_power_state(self, hardware_uri, previous_power_state):
+        if previous_power_state == 'Off':
+            logger.debug(msg="Server hardware '{}' was off, keep it off".format(hardware_uri))
+            self.power_actions.append(dict(serverHardwareUri=hardware_uri, powerState='Off', changed=False))
+        else:
+            self.__set_server_hardware_power_state(hardware_uri, 'On')
+
     def __set_server_hardware_power_state(self, hardware_uri, power_state='On'):
+        self.power_actions.append(dict(serverHardwareUri=hardware_uri, powerState=power_state, changed=True))
+
         if power_state == 'On':
             self.oneview_client.server_hardware.update_power_state(
                 dict(powerState='On', powerControl='MomentaryPress'), hardware_uri)
@@ -16,7 +16,11 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (gather_option_facts, get_all_projected, govern, project_resource,
+                                          transform_fields)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.common import transform_list_to_dict
@@ -64,6 +68,13 @@ options:
            'filter': A general filter/query string to narrow the list of items returned.
            'sort': The sort order of the returned data set."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Server Profiles.
+          Nested attributes are addressed with dots, e.g. 'connections.networkUri'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -231,7 +242,8 @@ class ServerProfileFactsModule(object):
         config=dict(required=False, type='str'),
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -240,23 +252,25 @@ class ServerProfileFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
 
             ansible_facts = {}
             server_profile_uri = None
+            fields = transform_fields(self.module.params.get('fields'))
 
             if self.module.params.get('name'):
                 server_profiles = self.oneview_client.server_profiles.get_by("name", self.module.params['name'])
                 if len(server_profiles) > 0:
                     server_profile_uri = server_profiles[0]['uri']
+                server_profiles = project_resource(server_profiles, fields)
             else:
                 params = self.module.params.get('params') or {}
-                server_profiles = self.oneview_client.server_profiles.get_all(**params)
+                server_profiles = get_all_projected(self.oneview_client.server_profiles, params, fields)
 
             if self.module.params.get('options'):
                 ansible_facts = self.__gather_option_facts(self.module.params['options'], server_profile_uri)
@@ -274,47 +288,54 @@ class ServerProfileFactsModule(object):
         options = transform_list_to_dict(options)
 
         client = self.oneview_client.server_profiles
-        facts = {}
+        option_calls = []
 
         if profile_uri:
             if options.get('messages'):
-                facts['server_profile_messages'] = client.get_messages(profile_uri)
+                option_calls.append(('server_profile_messages', partial(client.get_messages, profile_uri)))
 
             if options.get('transformation'):
                 transform_options = self.__get_sub_options(options['transformation'])
-                facts['server_profile_transformation'] = client.get_transformation(profile_uri, **transform_options)
+                option_calls.append(('server_profile_transformation',
+                                     partial(client.get_transformation, profile_uri, **transform_options)))
 
             if options.get('compliancePreview'):
-                facts['server_profile_compliance_preview'] = client.get_compliance_preview(profile_uri)
+                option_calls.append(('server_profile_compliance_preview',
+                                     partial(client.get_compliance_preview, profile_uri)))
 
         if options.get('schema'):
-            facts['server_profile_schema'] = client.get_schema()
+            option_calls.append(('server_profile_schema', client.get_schema))
 
         if options.get('profilePorts'):
             ports_options = self.__get_sub_options(options['profilePorts'])
-            facts['server_profile_profile_ports'] = client.get_profile_ports(**ports_options)
+            option_calls.append(('server_profile_profile_ports', partial(client.get_profile_ports, **ports_options)))
 
         if options.get('availableNetworks'):
             enets_options = self.__get_sub_options(options['availableNetworks'])
-            facts['server_profile_available_networks'] = client.get_available_networks(**enets_options)
+            option_calls.append(('server_profile_available_networks',
+                                 partial(client.get_available_networks, **enets_options)))
 
         if options.get('availableServers'):
             servers_options = self.__get_sub_options(options['availableServers'])
-            facts['server_profile_available_servers'] = client.get_available_servers(**servers_options)
+            option_calls.append(('server_profile_available_servers',
+                                 partial(client.get_available_servers, **servers_options)))
 
         if options.get('availableStorageSystem'):
             storage_options = self.__get_sub_options(options['availableStorageSystem'])
-            facts['server_profile_available_storage_system'] = client.get_available_storage_system(**storage_options)
+            option_calls.append(('server_profile_available_storage_system',
+                                 partial(client.get_available_storage_system, **storage_options)))
 
         if options.get('availableStorageSystems'):
             storage_options = self.__get_sub_options(options['availableStorageSystems'])
-            facts['server_profile_available_storage_systems'] = client.get_available_storage_systems(**storage_options)
+            option_calls.append(('server_profile_available_storage_systems',
+                                 partial(client.get_available_storage_systems, **storage_options)))
 
         if options.get('availableTargets'):
             target_options = self.__get_sub_options(options['availableTargets'])
-            facts['server_profile_available_targets'] = client.get_available_targets(**target_options)
+            option_calls.append(('server_profile_available_targets',
+                                 partial(client.get_available_targets, **target_options)))
 
-        return facts
+        return gather_option_facts(option_calls)
 
     def __get_sub_options(self, option):
         return option if type(option) is dict else {}
@@ -0,0 +1,366 @@
+#!/usr/bin/python
+
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import time
+from copy import deepcopy
+from functools import partial
+
+from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, resource_compare, run_concurrently
+
+try:
+    from hpOneView.oneview_client import OneViewClient
+    from hpOneView.extras.server_profile_utils import ServerProfileReplaceNamesByUris
+    from hpOneView.extras.server_profile_utils import ServerProfileMerger
+    from hpOneView.exceptions import HPOneViewException
+    from hpOneView.exceptions import HPOneViewValueError
+
+    HAS_HPE_ONEVIEW = True
+except ImportError:
+    HAS_HPE_ONEVIEW = False
+
+DOCUMENTATION = '''
+---
+module: oneview_server_profile_rolling_update
+short_description: Roll out a change to a set of OneView Server Profiles in batches.
+description:
+    - Applies the same change, usually a new OS Deployment Plan or Server Profile Template, to a set of Server
+      Profiles, batch by batch. The profiles of a batch are updated concurrently, and each one must pass a health
+      gate before the next batch starts. A profile that fails the update or the health gate is reverted to its
+      previous configuration, and the rolling update stops once more profiles than 'max_failures' have failed.
+    - Each update powers off the Server Hardware and powers it on afterwards, unless it was off before.
+requirements:
+    - "python >= 2.7.9"
+    - "hpOneView >= 3.1.0"
+author:
+    - "Chakravarthy Racharla"
+    - "Camila Balestrin (@balestrinc)"
+    - "Mariana Kreisig (@marikrg)"
+options:
+  config:
+    description:
+      - Path to a .json configuration file containing the OneView client configuration.
+        The configuration file is optional. If the file path is not provided, the configuration will be loaded from
+        environment variables.
+    required: false
+  profile_names:
+    description:
+      - Names of the Server Profiles to update, in the order they are rolled out.
+    required: true
+  data:
+    description:
+      - Server Profile properties applied to every profile, merged the same way as on the oneview_server_profile
+        module. Inform a server_template, a serverProfileTemplateUri, or the osDeploymentSettings with an
+        osDeploymentPlanName or osDeploymentPlanUri. Profiles that already match the data are left untouched.
+    required: true
+  batch_size:
+    description:
+      - Number of Server Profiles per batch, or a percentage of the profiles, such as '25%'.
+    required: false
+    default: 1
+  max_unavailable:
+    description:
+      - Maximum number of Server Profiles of a batch updated at the same time, that is, of servers powered off by
+        the rolling update at once. Defaults to the batch size.
+    required: false
+  max_failures:
+    description:
+      - Number of failed Server Profiles tolerated. The batches left are not started once it is exceeded.
+    required: false
+    default: 0
+  revert:
+    description:
+      - Whether a Server Profile that fails the update or the health gate is reverted to its previous configuration.
+    required: false
+    default: true
+  healthy_statuses:
+    description:
+      - Statuses of the Server Profile and of its Server Hardware accepted by the health gate. The profile must
+        also be in the 'Normal' state.
+    required: false
+    default: ['OK']
+  health_timeout:
+    description:
+      - Seconds a Server Profile has to pass the health gate after its update.
+    required: false
+    default: 1800
+  health_interval:
+    description:
+      - Seconds between two health checks of a Server Profile.
+    required: false
+    default: 30
+  pause:
+    description:
+      - Seconds to wait between two batches, after the health gate.
+    required: false
+    default: 0
+notes:
+    - "A sample configuration file for the config parameter can be found at:
+       https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
+    - "Check how to use environment variables for configuration at:
+       https://github.com/HewlettPackard/oneview-ansible#environment-variables"
+'''
+
+EXAMPLES = '''
+- name: Move the ESXi hosts to a new OS Deployment Plan, 25% at a time, reverting the hosts that fail
+  oneview_server_profile_rolling_update:
+    config: "{{ config }}"
+    profile_names: "{{ groups['esxi'] }}"
+    batch_size: '25%'
+    max_unavailable: 4
+    max_failures: 1
+    health_timeout: 3600
+    data:
+      osDeploymentSettings:
+        osDeploymentPlanName: 'ESXi 6.5 update 1'
+  delegate_to: localhost
+  run_once: true
+- debug: var=rolling_update
+
+- name: Move a set of Server Profiles to a new Server Profile Template, one at a time, without reverting
+  oneview_server_profile_rolling_update:
+    config: "{{ config }}"
+    profile_names:
+      - 'esxi-01'
+      - 'esxi-02'
+      - 'esxi-03'
+    revert: false
+    pause: 60
+    data:
+      server_template: 'ESXi template v2'
+  delegate_to: localhost
+'''
+
+RETURN = '''
+rolling_update:
+    description:
+        Has the batches of Server Profile names and, for each Server Profile, its batch, its status among 'updated',
+        'unchanged', 'failed', 'reverted' and 'skipped', the error when it failed, and a timeline of the events with
+        their UTC time.
+    returned: Always, also on failure.
+    type: complex
+'''
+
+ROLLING_UPDATE_DONE = 'Rolling update done: {0} Server Profile(s) updated, {1} already updated and {2} failed.'
+ROLLING_UPDATE_STOPPED = 'Rolling update stopped after {0} failed Server Profile(s): {1} updated, {2} reverted and ' \
+                         '{3} not attempted.'
+PROFILES_NOT_FOUND = 'Server Profile(s) not found: {0}.'
+TEMPLATE_NOT_FOUND = "Informed Server Profile Template '{0}' not found."
+INVALID_BATCH_SIZE = "Invalid batch size '{0}'. Inform a number of Server Profiles or a percentage, such as '25%'."
+PROFILE_FAILED = "Server Profile is in the '{0}' state."
+PROFILE_NOT_HEALTHY = "Server Profile not healthy after {0} seconds: state '{1}', status '{2}' and Server Hardware " \
+                      "status '{3}'."
+
+HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
+
+
+class ServerProfileRollingUpdateModule(object):
+    argument_spec = dict(
+        config=dict(required=False, type='str'),
+        profile_names=dict(required=True, type='list'),
+        data=dict(required=True, type='dict'),
+        batch_size=dict(required=False, type='str', default='1'),
+        max_unavailable=dict(required=False, type='int'),
+        max_failures=dict(required=False, type='int', default=0),
+        revert=dict(required=False, type='bool', default=True),
+        healthy_statuses=dict(required=False, type='list', default=['OK']),
+        health_timeout=dict(required=False, type='int', default=1800),
+        health_interval=dict(required=False, type='int', default=30),
+        pause=dict(required=False, type='int', default=0)
+    )
+
+    def __init__(self):
+        self.module = AnsibleModule(argument_spec=self.argument_spec, supports_check_mode=False)
+        if not HAS_HPE_ONEVIEW:
+            self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
+
+        if not self.module.params['config']:
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
+        else:
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
+
+    def run(self):
+        try:
+            names = list(self.module.params['profile_names'])
+            profiles = self.__get_profiles(names)
+            data = self.__resolve_data(deepcopy(self.module.params['data']))
+
+            batch_size = self.__get_batch_size(len(names))
+            batches = [names[index:index + batch_size] for index in range(0, len(names), batch_size)]
+            max_workers = self.module.params.get('max_unavailable') or batch_size
+            max_failures = self.module.params.get('max_failures') or 0
+
+            hosts = dict((name, dict(name=name, batch=None, status='skipped', timeline=[])) for name in names)
+            failures = 0
+            for index, batch in enumerate(batches):
+                if failures > max_failures:
+                    break
+                if index and self.module.params.get('pause'):
+                    time.sleep(self.module.params['pause'])
+
+                updates = [partial(self.__update_host, profiles[name], data, hosts[name], index) for name in batch]
+                results = run_concurrently(updates, max_workers)
+                failures += len([host for host in results if host['status'] in ['failed', 'reverted']])
+
+            self.__exit(batches, [hosts[name] for name in names], failures > max_failures)
+
+        except HPOneViewException as exception:
+            self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
+
+    def __exit(self, batches, hosts, stopped):
+        counts = dict((status, len([host for host in hosts if host['status'] == status]))
+                      for status in ['updated', 'unchanged', 'failed', 'reverted', 'skipped'])
+        rolling_update = dict(batches=batches, hosts=hosts)
+
+        if stopped:
+            msg = ROLLING_UPDATE_STOPPED.format(counts['failed'] + counts['reverted'], counts['updated'],
+                                                counts['reverted'], counts['skipped'])
+            self.module.fail_json(msg=msg, rolling_update=rolling_update)
+        else:
+            self.module.exit_json(changed=counts['unchanged'] < len(hosts),
+                                  msg=ROLLING_UPDATE_DONE.format(counts['updated'], counts['unchanged'],
+                                                                 counts['failed'] + counts['reverted']),
+                                  ansible_facts=dict(rolling_update=rolling_update))
+
+    def __get_profiles(self, names):
+        profiles = dict((profile['name'], profile) for profile in self.oneview_client.server_profiles.get_all()
+                        if profile.get('name') in names)
+        missing = [name for name in names if name not in profiles]
+        if missing:
+            raise HPOneViewValueError(PROFILES_NOT_FOUND.format(', '.join(missing)))
+        return profiles
+
+    def __resolve_data(self, data):
+        data.pop('name', None)
+        server_template_name = data.pop('server_template', '')
+
+        ServerProfileReplaceNamesByUris().replace(self.oneview_client, data)
+
+        if server_template_name:
+            server_template = self.oneview_client.server_profile_templates.get_by_name(server_template_name)
+            if not server_template:
+                raise HPOneViewValueError(TEMPLATE_NOT_FOUND.format(server_template_name))
+            data['serverProfileTemplateUri'] = server_template['uri']
+        return data
+
+    def __get_batch_size(self, total):
+        batch_size = str(self.module.params.get('batch_size') or '1').strip()
+        try:
+            if batch_size.endswith('%'):
+                size = total * int(batch_size[:-1]) // 100
+            else:
+                size = int(batch_size)
+        except ValueError:
+            raise HPOneViewValueError(INVALID_BATCH_SIZE.format(batch_size))
+        return max(1, min(size, total))
+
+    def __update_host(self, profile, data, host, batch):
+        host['batch'] = batch
+        desired = ServerProfileMerger().merge_data(profile, data)
+        if resource_compare(profile, desired):
+            host['status'] = 'unchanged'
+            return host
+
+        self.__record(host, 'started')
+        hardware_uri = profile.get('serverHardwareUri')
+        power_state = None
+        try:
+            if hardware_uri:
+                power_state = self.__power_off(hardware_uri)
+            self.__update_profile(desired)
+            self.__restore_power(hardware_uri, power_state)
+            self.__record(host, 'updated')
+
+            self.__wait_healthy(profile['uri'], hardware_uri)
+            self.__record(host, 'healthy')
+            host['status'] = 'updated'
+        except HPOneViewException as exception:
+            host['status'] = 'failed'
+            host['error'] = '; '.join(str(e) for e in exception.args)
+            self.__record(host, 'failed')
+            if self.module.params.get('revert'):
+                self.__revert(profile, hardware_uri, power_state, host)
+        return host
+
+    def __revert(self, profile, hardware_uri, power_state, host):
+        try:
+            current = self.oneview_client.server_profiles.get(profile['uri'])
+            if not resource_compare(current, profile):
+                if hardware_uri:
+                    self.__power_off(hardware_uri)
+                self.__update_profile(dict(profile, eTag=current.get('eTag')))
+            if power_state is not None:
+                # unknown when the power off failed, the server is left as it is
+                self.__restore_power(hardware_uri, power_state)
+            host['status'] = 'reverted'
+            self.__record(host, 'reverted')
+        except HPOneViewException as exception:
+            host['revert_error'] = '; '.join(str(e) for e in exception.args)
+            self.__record(host, 'revert_failed')
+
+    def __update_profile(self, profile):
+        updated = self.oneview_client.server_profiles.update(profile, profile['uri'])
+        if updated.get('serverProfileTemplateUri') and updated.get('templateCompliance') == 'NonCompliant':
+            updated = self.oneview_client.server_profiles.patch(updated['uri'], 'replace', '/templateCompliance',
+                                                                'Compliant')
+        return updated
+
+    def __wait_healthy(self, profile_uri, hardware_uri):
+        healthy_statuses = self.module.params.get('healthy_statuses') or ['OK']
+        timeout = self.module.params.get('health_timeout') or 0
+        deadline = time.time() + timeout
+
+        while True:
+            profile = self.oneview_client.server_profiles.get(profile_uri)
+            hardware = self.oneview_client.server_hardware.get(hardware_uri) if hardware_uri else {}
+
+            state = profile.get('state') or ''
+            if state.endswith('Failed'):
+                raise HPOneViewException(PROFILE_FAILED.format(state))
+
+            statuses = [profile.get('status')] + ([hardware.get('status')] if hardware_uri else [])
+            if state == 'Normal' and all(status in healthy_statuses for status in statuses):
+                return
+
+            if time.time() >= deadline:
+                raise HPOneViewException(PROFILE_NOT_HEALTHY.format(timeout, state, profile.get('status'),
+                                                                    hardware.get('status')))
+            time.sleep(self.module.params.get('health_interval') or 1)
+
+    def __power_off(self, hardware_uri):
+        power_state = (self.oneview_client.server_hardware.get(hardware_uri) or {}).get('powerState')
+        if power_state != 'Off':
+            self.oneview_client.server_hardware.update_power_state(
+                dict(powerState='Off', powerControl='PressAndHold'), hardware_uri)
+        return power_state
+
+    def __restore_power(self, hardware_uri, previous_power_state):
+        if hardware_uri and previous_power_state != 'Off':
+            self.oneview_client.server_hardware.update_power_state(
+                dict(powerState='On', powerControl='MomentaryPress'), hardware_uri)
+
+    @staticmethod
+    def __record(host, event):
+        host['timeline'].append(dict(event=event, time=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())))
+
+
+def main():
+    ServerProfileRollingUpdateModule().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import get_all_projected, govern, project_resource, transform_fields
 from hpOneView.common import transform_list_to_dict
 
 try:
@@ -62,6 +63,13 @@ options:
            'filter': A general filter/query string to narrow the list of items returned.
            'sort': The sort order of the returned data set."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Server Profile Templates.
+          Nested attributes are addressed with dots, e.g. 'connections.networkUri'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -121,7 +129,8 @@ class ServerProfileTemplateFactsModule(object):
         config=dict(required=False, type='str'),
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -130,9 +139,9 @@ class ServerProfileTemplateFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            oneview_client = OneViewClient.from_environment_variables()
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.resource_client = oneview_client.server_profile_templates
 
@@ -154,7 +163,8 @@ class ServerProfileTemplateFactsModule(object):
         if not template:
             return dict(server_profile_templates=[])
 
-        facts = dict(server_profile_templates=[template])
+        fields = transform_fields(self.module.params.get('fields'))
+        facts = dict(server_profile_templates=[project_resource(template, fields)])
 
         options = self.module.params.get("options")
 
@@ -175,7 +185,7 @@ class ServerProfileTemplateFactsModule(object):
 
     def __get_all(self):
         params = self.module.params.get('params') or {}
-        templates = self.resource_client.get_all(**params)
+        templates = get_all_projected(self.resource_client, params, self.module.params.get('fields'))
         return dict(server_profile_templates=templates)
 
 
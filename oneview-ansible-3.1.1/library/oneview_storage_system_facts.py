@@ -16,7 +16,10 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import gather_option_facts, govern
 
 try:
     from hpOneView.oneview_client import OneViewClient
@@ -162,9 +165,9 @@ class StorageSystemFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
@@ -193,14 +196,19 @@ class StorageSystemFactsModule(object):
 
         if self.module.params.get('options'):
             options = transform_list_to_dict(self.module.params['options'])
+            storage_systems_client = self.oneview_client.storage_systems
+            option_calls = []
 
             if options.get('hostTypes'):
-                facts['storage_system_host_types'] = self.oneview_client.storage_systems.get_host_types()
+                option_calls.append(('storage_system_host_types', storage_systems_client.get_host_types))
 
             if storage_system and is_specific_storage_system:
                 storage_uri = storage_system['uri']
                 if options.get('storagePools'):
-                    facts['storage_system_pools'] = self.oneview_client.storage_systems.get_storage_pools(storage_uri)
+                    option_calls.append(('storage_system_pools',
+                                         partial(storage_systems_client.get_storage_pools, storage_uri)))
+
+            facts.update(gather_option_facts(option_calls))
 
 
 def main():
@@ -16,6 +16,8 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (export_all_projected, get_all_projected, govern, project_resource,
+                                          transform_fields)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.common import transform_list_to_dict
@@ -78,6 +80,30 @@ options:
           'paths' retrieve all paths or a specific attachment path for the specified volume attachment. To retrieve a
            specific path a 'pathUri' or a 'pathId' must be informed"
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Storage Volume Attachments.
+          Nested attributes are addressed with dots, e.g. 'paths.initiatorName'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
+    dest:
+      description:
+        - Path of a file where the Storage Volume Attachments are written, one JSON document per line, instead of being
+          returned as facts. The collection is requested one page at a time, so the memory used does not depend
+          on its size. Only the path and the number of resources written are returned.
+          Ignored when a specific attachment is requested.
+      required: false
+    compress:
+      description:
+        - Whether the file informed in 'dest' must be gzip-compressed.
+      required: false
+      default: false
+    page_size:
+      description:
+        - Number of resources requested on each call when writing to 'dest'.
+      required: false
+      default: 500
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -172,6 +198,10 @@ storage_volume_attachment_paths:
     description: Has facts about all paths or a specific attachment path for the specified volume attachment.
     returned: When requested, but can be null.
     type: complex
+storage_volume_attachments_export:
+    description: Has the destination file path, whether it is compressed, and the number of resources written.
+    returned: When 'dest' is informed.
+    type: dict
 '''
 ATTACHMENT_KEY_REQUIRED = "Server Profile Name and Volume Name or Volume Uri are required."
 SPECIFIC_ATTACHMENT_OPTIONS = ['storageVolumeAttachmentUri', 'storageVolumeUri', 'storageVolumeName',
@@ -188,6 +218,10 @@ class StorageVolumeAttachmentFactsModule(object):
         storageVolumeName=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
         params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list'),
+        dest=dict(required=False, type='str'),
+        compress=dict(required=False, type='bool', default=False),
+        page_size=dict(required=False, type='int', default=500)
     )
 
     def __init__(self):
@@ -196,9 +230,9 @@ class StorageVolumeAttachmentFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         resource_uri = self.oneview_client.storage_volume_attachments.URI
         self.__search_attachment_uri = str(resource_uri) + "?filter=storageVolumeUri='{}'&filter=hostName='{}'"
@@ -209,6 +243,7 @@ class StorageVolumeAttachmentFactsModule(object):
             client = self.oneview_client.storage_volume_attachments
             params = self.module.params
             options = {}
+            fields = transform_fields(params.get('fields'))
 
             if params.get('options'):
                 options = transform_list_to_dict(params['options'])
@@ -218,11 +253,14 @@ class StorageVolumeAttachmentFactsModule(object):
             if param_specific_attachment:
                 attachments = self.__get_specific_attachment(params)
                 self.__get_paths(attachments, options, facts)
+                facts['storage_volume_attachments'] = project_resource(attachments, fields)
+            elif params.get('dest'):
+                facts['storage_volume_attachments_export'] = export_all_projected(
+                    client, params.get('params'), fields, params['dest'], params.get('compress'),
+                    params.get('page_size'))
             else:
                 params = self.module.params.get('params') or {}
-                attachments = client.get_all(**params)
-
-            facts['storage_volume_attachments'] = attachments
+                facts['storage_volume_attachments'] = get_all_projected(client, params, fields)
 
             if options.get('extraUnmanagedStorageVolumes'):
                 volumes_options = self.__get_sub_options(options['extraUnmanagedStorageVolumes'])
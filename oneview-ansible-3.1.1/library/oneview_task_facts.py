@@ -17,6 +17,9 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (export_all_projected, get_all_projected, get_changed_since, govern,
+                                          load_json_file, save_json_file)
+from datetime import datetime, timedelta
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.exceptions import HPOneViewException
@@ -46,6 +49,45 @@ options:
         - "List with parameters to help filter the tasks.
           Params allowed: count, fields, filter, query, sort, start, and view."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Tasks.
+          Nested attributes are addressed with dots, e.g. 'associatedResource.resourceName'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
+    dest:
+      description:
+        - Path of a file where the Tasks are written, one JSON document per line, instead of being
+          returned as facts. The collection is requested one page at a time, so the memory used does not depend
+          on its size. Only the path and the number of resources written are returned.
+      required: false
+    compress:
+      description:
+        - Whether the file informed in 'dest' must be gzip-compressed.
+      required: false
+      default: false
+    page_size:
+      description:
+        - Number of resources requested on each call when writing to 'dest'.
+      required: false
+      default: 500
+    watermark_file:
+      description:
+        - Path of a local JSON file where the watermark (the last 'modified' timestamp seen) and a rolling store of
+          the tasks are kept between runs. When informed, only the tasks created or changed since the previous run
+          are requested, using a server-side filter, and returned. The 'sort' param is replaced by 'modified'
+          ascending, so a 'count' param limits how many changes are consumed on each run.
+      required: false
+    retention_count:
+      description:
+        - Maximum number of tasks kept in the store of the 'watermark_file'. The most recently modified are kept.
+      required: false
+      default: 1000
+    retention_days:
+      description:
+        - Tasks not modified in the last given days are removed from the store of the 'watermark_file'.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -70,6 +112,28 @@ EXAMPLES = '''
       filter: "associatedResource.resourceCategory='server-profile-templates'"
 
 - debug: var=tasks
+
+- name: Gather compact facts about the last 100 tasks
+  oneview_task_facts:
+    config: "{{ config }}"
+    params:
+      count: 100
+    fields:
+      - name
+      - taskState
+      - associatedResource.resourceName
+
+- debug: var=tasks
+
+- name: Poll the tasks changed since the previous run
+  oneview_task_facts:
+    config: "{{ config }}"
+    watermark_file: /var/tmp/oneview-tasks.json
+    retention_count: 5000
+    retention_days: 7
+
+- debug: var=tasks
+- debug: var=tasks_watermark
 '''
 
 RETURN = '''
@@ -77,14 +141,31 @@ tasks:
     description: The list of tasks.
     returned: Always, but can be null.
     type: list
+tasks_export:
+    description: Has the destination file path, whether it is compressed, and the number of resources written.
+    returned: When 'dest' is informed.
+    type: dict
+
+tasks_watermark:
+    description: Has the watermark file path, the current watermark and the number of tasks kept in the store.
+    returned: When 'watermark_file' is informed.
+    type: dict
 '''
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
 
 
 class TaskFactsModule(object):
     argument_spec = dict(
         config=dict(required=False, type='str'),
-        params=dict(required=False, type='dict')
+        params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list'),
+        dest=dict(required=False, type='str'),
+        compress=dict(required=False, type='bool', default=False),
+        page_size=dict(required=False, type='int', default=500),
+        watermark_file=dict(required=False, type='str'),
+        retention_count=dict(required=False, type='int', default=1000),
+        retention_days=dict(required=False, type='int')
     )
 
     def __init__(self):
@@ -93,21 +174,62 @@ class TaskFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            oneview_client = OneViewClient.from_environment_variables()
+            oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
         self.resource_client = oneview_client.tasks
 
     def run(self):
         try:
             params = self.module.params.get('params') or {}
-            facts = self.resource_client.get_all(**params)
-            self.module.exit_json(changed=False, ansible_facts=dict(tasks=facts))
+
+            if self.module.params.get('watermark_file'):
+                self.module.exit_json(changed=False, ansible_facts=self.__get_incremental(params))
+            elif self.module.params.get('dest'):
+                export = export_all_projected(self.resource_client, params, self.module.params.get('fields'),
+                                              self.module.params['dest'], self.module.params.get('compress'),
+                                              self.module.params.get('page_size'))
+                self.module.exit_json(changed=False, ansible_facts=dict(tasks_export=export))
+            else:
+                facts = get_all_projected(self.resource_client, params, self.module.params.get('fields'))
+                self.module.exit_json(changed=False, ansible_facts=dict(tasks=facts))
 
         except HPOneViewException as exception:
             self.module.fail_json(msg='; '.join(str(e) for e in exception.args))
 
+    def __get_incremental(self, params):
+        watermark_file = self.module.params['watermark_file']
+        store = load_json_file(watermark_file, default={})
+
+        tasks, cursor = get_changed_since(self.resource_client, params, store.get('cursor'),
+                                          self.module.params.get('fields'))
+
+        stored_tasks = dict((task['uri'], task) for task in store.get('tasks', []))
+        stored_tasks.update((task['uri'], task) for task in tasks)
+        stored_tasks = self.__apply_retention(list(stored_tasks.values()))
+
+        save_json_file(watermark_file, dict(cursor=cursor, tasks=stored_tasks))
+
+        return dict(tasks=tasks,
+                    tasks_watermark=dict(watermark_file=watermark_file,
+                                         watermark=cursor.get('watermark'),
+                                         stored=len(stored_tasks)))
+
+    def __apply_retention(self, tasks):
+        tasks = sorted(tasks, key=lambda task: task.get('modified') or '', reverse=True)
+
+        retention_days = self.module.params.get('retention_days')
+        if retention_days:
+            oldest = (datetime.utcnow() - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT)
+            tasks = [task for task in tasks if (task.get('modified') or '') >= oldest]
+
+        retention_count = self.module.params.get('retention_count')
+        if retention_count:
+            tasks = tasks[:retention_count]
+
+        return tasks
+
 
 def main():
     TaskFactsModule().run()
@@ -0,0 +1,252 @@
+#!/usr/bin/python
+
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import time
+
+from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import DEFAULT_MAX_WORKERS, TRANSFER_ERRORS, govern, map_concurrently
+
+try:
+    from hpOneView.oneview_client import OneViewClient
+    from hpOneView.exceptions import HPOneViewException
+
+    HAS_HPE_ONEVIEW = True
+except ImportError:
+    HAS_HPE_ONEVIEW = False
+
+DOCUMENTATION = '''
+---
+module: oneview_task_wait
+short_description: Wait for many OneView tasks at once.
+description:
+    - Waits for the OneView tasks started by the modules run with 'wait' set to false, so work can be started across
+      the whole estate and waited for once. The tasks are polled concurrently, and each task is polled less often
+      while its progress does not change.
+requirements:
+    - "python >= 2.7.9"
+    - "hpOneView >= 3.1.0"
+author:
+    - "Camila Balestrin (@balestrinc)"
+    - "Mariana Kreisig (@marikrg)"
+options:
+  config:
+    description:
+      - Path to a .json configuration file containing the OneView client configuration.
+        The configuration file is optional. If the file path is not provided, the configuration will be loaded from
+        environment variables.
+    required: false
+  task_uris:
+    description:
+      - URIs of the tasks to wait for. Tasks, as returned by OneView, are also accepted, and empty items are
+        ignored, so the 'task_uri' facts of skipped hosts can be passed as they are.
+    required: true
+  timeout:
+    description:
+      - Seconds to wait for all the tasks. The tasks still running after it are reported as timed out; they are not
+        cancelled on OneView.
+    required: false
+    default: 3600
+  poll_interval:
+    description:
+      - Seconds between two polls of a task whose progress changed.
+    required: false
+    default: 2
+  max_poll_interval:
+    description:
+      - Maximum seconds between two polls of a task. The interval of a task doubles, up to this value, each time its
+        progress is the same as on the previous poll.
+    required: false
+    default: 60
+  max_workers:
+    description:
+      - Maximum number of tasks polled at the same time.
+    required: false
+    default: 8
+  fail_on_error:
+    description:
+      - Whether the module fails when a task fails or times out.
+    required: false
+    default: true
+notes:
+    - "A sample configuration file for the config parameter can be found at:
+       https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
+    - "Check how to use environment variables for configuration at:
+       https://github.com/HewlettPackard/oneview-ansible#environment-variables"
+    - "A task in the 'Warning' state is considered completed."
+'''
+
+EXAMPLES = '''
+- name: Start the firmware update of every logical interconnect
+  oneview_logical_interconnect:
+    config: "{{ config }}"
+    state: firmware_installed
+    wait: false
+    data:
+      name: "{{ item }}"
+      firmware:
+        command: Update
+        spp: "{{ spp_file_name }}"
+  with_items: "{{ logical_interconnects }}"
+  register: firmware_updates
+
+- name: Wait for all the firmware updates
+  oneview_task_wait:
+    config: "{{ config }}"
+    task_uris: "{{ firmware_updates.results | map(attribute='ansible_facts.task_uri') | list }}"
+    timeout: 7200
+- debug: var=oneview_tasks
+'''
+
+RETURN = '''
+oneview_tasks:
+    description:
+        Has one result for each task, in the order informed, with the task uri, its name, its state, its percent
+        complete, the uri of the resource associated with it, and the error message when it failed or timed out.
+    returned: Always, also on failure.
+    type: list
+'''
+
+TASKS_COMPLETED = '{0} task(s) completed, {1} failed and {2} timed out.'
+TASKS_FAILED = '{0} of {1} task(s) failed or timed out.'
+TASK_FAILED = "Task finished in the '{0}' state."
+TASK_TIMED_OUT = 'Task still running after {0} seconds.'
+
+COMPLETED_STATES = ['Error', 'Warning', 'Completed', 'Terminated', 'Killed']
+FAILED_STATES = ['Error', 'Terminated', 'Killed']
+
+HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
+
+
+class TaskWaitModule(object):
+    argument_spec = dict(
+        config=dict(required=False, type='str'),
+        task_uris=dict(required=True, type='list'),
+        timeout=dict(required=False, type='int', default=3600),
+        poll_interval=dict(required=False, type='int', default=2),
+        max_poll_interval=dict(required=False, type='int', default=60),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS),
+        fail_on_error=dict(required=False, type='bool', default=True)
+    )
+
+    def __init__(self):
+        self.module = AnsibleModule(argument_spec=self.argument_spec, supports_check_mode=False)
+        if not HAS_HPE_ONEVIEW:
+            self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
+
+        if not self.module.params['config']:
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
+        else:
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
+
+    def run(self):
+        uris = self.__get_task_uris()
+        results = dict((uri, dict(uri=uri, name=None, state=None, percent=None, resource_uri=None, error=None))
+                       for uri in uris)
+
+        timed_out = self.__wait(uris, results)
+
+        tasks = [results[uri] for uri in uris]
+        failed = [task for task in tasks if task['error']]
+
+        if failed and self.module.params.get('fail_on_error', True):
+            self.module.fail_json(msg=TASKS_FAILED.format(len(failed), len(tasks)), oneview_tasks=tasks)
+        else:
+            self.module.exit_json(changed=False,
+                                  msg=TASKS_COMPLETED.format(len(tasks) - len(failed), len(failed) - len(timed_out),
+                                                             len(timed_out)),
+                                  ansible_facts=dict(oneview_tasks=tasks))
+
+    def __get_task_uris(self):
+        uris = []
+        for item in self.module.params['task_uris'] or []:
+            uri = item.get('uri') if isinstance(item, dict) else item
+            if uri and uri not in uris:
+                uris.append(uri)
+        return uris
+
+    def __wait(self, uris, results):
+        timeout = self.module.params.get('timeout') or 0
+        poll_interval = max(self.module.params.get('poll_interval') or 1, 1)
+        max_poll_interval = max(self.module.params.get('max_poll_interval') or poll_interval, poll_interval)
+        max_workers = self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS
+
+        deadline = time.time() + timeout
+        pending = dict((uri, dict(due=0, interval=poll_interval, percent=None)) for uri in uris)
+
+        while pending:
+            now = time.time()
+            last_poll = now >= deadline
+            due = [uri for uri in uris if uri in pending and (last_poll or pending[uri]['due'] <= now)]
+
+            for uri, task, error in map_concurrently(self.__poll, due, max_workers):
+                schedule = pending[uri]
+                if error:
+                    results[uri]['error'] = error
+                    del pending[uri]
+                    continue
+
+                if task:
+                    self.__update_result(results[uri], task)
+                    if results[uri]['state'] in COMPLETED_STATES:
+                        del pending[uri]
+                        continue
+
+                # Back off while the task does not progress, or while the appliance cannot be reached
+                if task and results[uri]['percent'] != schedule['percent']:
+                    schedule['interval'] = poll_interval
+                else:
+                    schedule['interval'] = min(schedule['interval'] * 2, max_poll_interval)
+                schedule['percent'] = results[uri]['percent']
+                schedule['due'] = time.time() + schedule['interval']
+
+            if last_poll:
+                for uri in pending:
+                    results[uri]['error'] = TASK_TIMED_OUT.format(timeout)
+                return list(pending)
+
+            if pending:
+                next_due = min(min(schedule['due'] for schedule in pending.values()), deadline)
+                time.sleep(max(next_due - time.time(), 0))
+
+        return []
+
+    def __poll(self, uri):
+        try:
+            return uri, self.oneview_client.tasks.get(uri), None
+        except HPOneViewException as exception:
+            return uri, None, '; '.join(str(e) for e in exception.args)
+        except TRANSFER_ERRORS:
+            return uri, None, None
+
+    @staticmethod
+    def __update_result(result, task):
+        result['name'] = task.get('name')
+        result['state'] = task.get('taskState')
+        result['percent'] = task.get('computedPercentComplete', task.get('percentComplete'))
+        result['resource_uri'] = (task.get('associatedResource') or {}).get('resourceUri')
+
+        if result['state'] in FAILED_STATES:
+            errors = [error.get('message') for error in task.get('taskErrors') or [] if error.get('message')]
+            result['error'] = '; '.join(errors) or task.get('taskStatus') or TASK_FAILED.format(result['state'])
+
+
+def main():
+    TaskWaitModule().run()
+
+
+if __name__ == '__main__':
+    main()
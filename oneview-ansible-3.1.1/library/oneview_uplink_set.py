@@ -16,9 +16,9 @@
 # limitations under the License.
 ###
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import govern, merge_and_update
 try:
     from hpOneView.oneview_client import OneViewClient
-    from hpOneView.extras.comparators import resource_compare
     from hpOneView.exceptions import HPOneViewException
     from hpOneView.exceptions import HPOneViewResourceNotFound
     from hpOneView.exceptions import HPOneViewValueError
@@ -61,6 +61,8 @@ options:
       description:
         - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
           for the resource matches the ETag provided in the data.
+        - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and the
+          update is retried, unless the same attributes were changed to other values.
       default: true
       choices: ['true', 'false']
 notes:
@@ -148,9 +150,9 @@ class UplinkSetModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
@@ -198,13 +200,11 @@ class UplinkSetModule(object):
         if 'newName' in data:
             data['name'] = data.pop('newName')
 
-        resource_to_update = existent_resource.copy()
-        resource_to_update.update(data)
+        updated_uplink, changed = merge_and_update(self.oneview_client.uplink_sets, existent_resource, data)
 
-        if resource_compare(existent_resource, resource_to_update):
+        if not changed:
             return False, UPLINK_SET_ALREADY_EXIST, existent_resource
         else:
-            updated_uplink = self.oneview_client.uplink_sets.update(resource_to_update)
             return True, UPLINK_SET_UPDATED, updated_uplink
 
     def __validate_key(self, data):
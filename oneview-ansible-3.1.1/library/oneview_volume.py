@@ -16,7 +16,11 @@
 # limitations under the License.
 ###
 
+from functools import partial
+
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import (DEFAULT_MAX_WORKERS, SERVER_MANAGED_FIELDS, govern, merge_and_update,
+                                          run_concurrently, start_task)
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.exceptions import HPOneViewException
@@ -49,9 +53,9 @@ options:
         description:
             - Indicates the desired state for the Volume resource.
               'present' creates/adds the resource when it does not exist, otherwise it updates the resource. When the
-              resource already exists, the update operation is non-idempotent, since it is always called even though
-              the given options are compliant with the existent data. To change the name of the volume, a 'newName' in
-              the data must be provided.
+              resource already exists, it is only updated when the given options differ from the existent data; the
+              creation-only options 'provisioningParameters' and 'type' are not compared. To change the name of the
+              volume, a 'newName' in the data must be provided.
               'absent' by default deletes a volume from OneView and the storage system. When export_only is True, the
               volume is removed only from OneView.
               'repaired' removes extra presentations from a specified volume on the storage system. This operation is
@@ -61,8 +65,19 @@ options:
         choices: ['present', 'absent', 'repaired', 'snapshot_created', 'snapshot_deleted']
     data:
       description:
-        - Volume or snapshot data.
-      required: true
+        - Volume or snapshot data. When 'volumes' is informed, it has the data common to all the volumes.
+      required: false
+    volumes:
+      description:
+        - List with the data of many volumes to create, update or delete in bulk. Each item is merged over the
+          'data', so a key of the item replaces the same key of the 'data' entirely. The existing volumes are
+          fetched once and the tasks are submitted concurrently. Only supported on 'present' and 'absent' states.
+      required: false
+    max_workers:
+      description:
+        - Maximum number of volume tasks in flight at the same time on bulk mode.
+      required: false
+      default: 8
     export_only:
       description:
         - If set to True, when the status is 'absent' and the resource exists, it will be removed only from OneView.
@@ -71,8 +86,17 @@ options:
       description:
           - When the ETag Validation is enabled, the request will be conditionally processed only if the current ETag
             for the resource matches the ETag provided in the data.
+          - If the resource was changed by someone else since it was read, the data is merged over the fresh copy and
+            the update is retried, unless the same attributes were changed to other values.
       default: true
       choices: ['true', 'false']
+    wait:
+      description:
+        - Whether to wait for the snapshot of the 'snapshot_created' state to be created. When false, the module
+          returns as soon as OneView accepts the request, with the URI of its task on the 'task_uri' fact, so the task
+          can be waited for later with the oneview_task_wait module.
+      required: false
+      default: true
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -135,6 +159,24 @@ EXAMPLES = '''
       shareable: False
     delegate_to: localhost
 
+- name: Ensure many volumes sharing the same Storage Pool
+  oneview_volume:
+    config: '{{ config_path }}'
+    state: present
+    max_workers: 4
+    data:
+      provisioningParameters:
+          provisionType: 'Thin'
+          shareable: True
+          requestedCapacity: 1073741824
+          storagePoolUri: '/rest/storage-pools/3B1CF17F-7657-4C89-B580-D236507A9182'
+    volumes:
+      - name: 'datastore-01'
+      - name: 'datastore-02'
+      - name: 'datastore-03'
+        description: 'Datastore for the management cluster'
+  delegate_to: localhost
+
 - name: Remove extra presentations from the specified volume on the storage system
   oneview_volume:
     config: '{{ config_path }}'
@@ -183,6 +225,28 @@ EXAMPLES = '''
     data:
       name: 'Volume added with a specific WWN'
     export_only: True
+
+- name: Delete many volumes
+  oneview_volume:
+    config: '{{ config_path }}'
+    state: absent
+    volumes:
+      - name: 'datastore-01'
+      - name: 'datastore-02'
+      - name: 'datastore-03'
+
+- name: Start the creation of a snapshot, without waiting for it to complete
+  oneview_volume:
+    config: '{{ config_path }}'
+    state: snapshot_created
+    wait: false
+    data:
+      name: 'Volume with Snapshot Pool'
+      snapshotParameters:
+        name: 'nightly_snapshot'
+        type: 'Snapshot'
+
+- debug: var=task_uri
 '''
 
 RETURN = '''
@@ -190,21 +254,41 @@ storage_volume:
     description: Has the facts about the Storage Volume.
     returned: On state 'present', but can be null.
     type: complex
+
+storage_volumes_bulk:
+    description: Has the name, uri, changed flag and message of each volume of the bulk mode.
+    returned: When 'volumes' is informed.
+    type: list
+
+task_uri:
+    description: Has the URI of the task started by OneView.
+    returned: On state 'snapshot_created', when 'wait' is false.
+    type: string
 '''
 
 VOLUME_CREATED = 'Volume added/created successfully.'
 VOLUME_UPDATED = 'Volume updated successfully.'
+VOLUME_ALREADY_UPDATED = 'Volume is already present.'
 VOLUME_DELETED = 'Volume removed/deleted successfully.'
 VOLUME_REPAIRED = 'Volume repaired successfully.'
 VOLUME_SNAPSHOT_CREATED = 'Volume snapshot created successfully.'
+VOLUME_SNAPSHOT_CREATION_STARTED = 'Volume snapshot creation started.'
 VOLUME_SNAPSHOT_DELETED = 'Volume snapshot deleted successfully.'
 VOLUME_NOT_FOUND = 'Volume not found.'
 VOLUME_SNAPSHOT_NOT_FOUND = 'Snapshot not found.'
 VOLUME_ALREADY_ABSENT = 'Nothing to do.'
 VOLUME_NO_OPTIONS_PROVIDED = 'No options provided.'
 VOLUME_NEW_NAME_INVALID = 'Rename failed: the new name provided is being used by another Volume.'
+VOLUME_DATA_REQUIRED = "Inform either 'data' or 'volumes'."
+BULK_VOLUMES_DONE = 'Volumes processed: {0} created, {1} updated and {2} deleted.'
+BULK_VOLUMES_FAILED = '{0} of {1} Volumes failed.'
+BULK_STATE_NOT_SUPPORTED = "Only the 'present' and 'absent' states are supported when 'volumes' is informed."
 HPE_ONEVIEW_SDK_REQUIRED = 'HPE OneView Python SDK is required for this module.'
 
+# Only used to create the volume, they are not part of the volume resource
+VOLUME_CREATION_ATTRIBUTES = ['provisioningParameters', 'type']
+VOLUME_COMPARE_IGNORE = SERVER_MANAGED_FIELDS | frozenset(VOLUME_CREATION_ATTRIBUTES)
+
 
 class VolumeModule(object):
     argument_spec = dict(
@@ -213,12 +297,15 @@ class VolumeModule(object):
             required=True,
             choices=['present', 'absent', 'repaired', 'snapshot_created', 'snapshot_deleted']
         ),
-        data=dict(required=True, type='dict'),
+        data=dict(required=False, type='dict'),
         export_only=dict(required=False, type='bool'),
         validate_etag=dict(
             required=False,
             type='bool',
-            default=True)
+            default=True),
+        volumes=dict(required=False, type='list'),
+        max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS),
+        wait=dict(required=False, type='bool', default=True)
     )
 
     def __init__(self):
@@ -227,19 +314,23 @@ class VolumeModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         state = self.module.params['state']
-        data = self.module.params['data'].copy()
+        data = (self.module.params.get('data') or {}).copy()
 
         try:
             if not self.module.params.get('validate_etag'):
                 self.oneview_client.connection.disable_etag_validation()
 
-            if state == 'present':
+            if self.module.params.get('volumes'):
+                self.__bulk(state, data)
+            elif not data:
+                raise HPOneViewValueError(VOLUME_DATA_REQUIRED)
+            elif state == 'present':
                 self.__present(data)
             elif state == 'absent':
                 export_only = self.module.params.get('export_only', False)
@@ -256,11 +347,18 @@ class VolumeModule(object):
 
     def __present(self, data):
         resource = self.__get_by_name(data['name'])
+        if not resource and data.get('newName'):
+            # renamed by a previous run
+            resource = self.__get_by_name(data['newName'])
 
         if not resource:
-            self.__create(data)
+            changed, msg, volume = self.__create(data)
         else:
-            self.__update(data, resource)
+            changed, msg, volume = self.__update(data, resource, self.__get_by_name)
+
+        self.module.exit_json(changed=changed,
+                              msg=msg,
+                              ansible_facts=dict(storage_volume=volume))
 
     def __absent(self, data, export_only):
         resource = self.__get_by_name(data['name'])
@@ -274,25 +372,78 @@ class VolumeModule(object):
 
     def __create(self, data):
         created_volume = self.oneview_client.volumes.create(data)
+        return True, VOLUME_CREATED, created_volume
 
-        self.module.exit_json(changed=True,
-                              msg=VOLUME_CREATED,
-                              ansible_facts=dict(storage_volume=created_volume))
-
-    def __update(self, data, resource):
+    def __update(self, data, resource, get_by_name):
         if 'newName' in data:
-            if self.__get_by_name(data['newName']):
+            new_name = data.pop('newName')
+            if new_name != resource['name'] and get_by_name(new_name):
                 raise HPOneViewValueError(VOLUME_NEW_NAME_INVALID)
-            data['name'] = data.pop('newName')
+            data['name'] = new_name
+
+        volumes = self.oneview_client.volumes
+        updated_volume, changed = merge_and_update(volumes, resource, data, ignore=VOLUME_COMPARE_IGNORE,
+                                                   update=lambda current, merged: volumes.update(merged))
+        if not changed:
+            return False, VOLUME_ALREADY_UPDATED, resource
+
+        return True, VOLUME_UPDATED, updated_volume
+
+    def __bulk(self, state, data):
+        if state not in ['present', 'absent']:
+            raise HPOneViewValueError(BULK_STATE_NOT_SUPPORTED)
+
+        volumes = [dict(data, **volume) for volume in self.module.params['volumes']]
+        existing_volumes = dict((volume['name'], volume) for volume in self.oneview_client.volumes.get_all())
+        export_only = self.module.params.get('export_only', False)
+
+        if state == 'present':
+            tasks = [partial(self.__bulk_present, volume, existing_volumes) for volume in volumes]
+        else:
+            tasks = [partial(self.__bulk_absent, volume, existing_volumes, export_only) for volume in volumes]
+
+        results = run_concurrently(tasks, self.module.params.get('max_workers') or DEFAULT_MAX_WORKERS)
+
+        failed = [result for result in results if result.get('error')]
+        if failed:
+            self.module.fail_json(msg=BULK_VOLUMES_FAILED.format(len(failed), len(results)),
+                                  storage_volumes_bulk=results)
+        else:
+            counts = [len([result for result in results if result['msg'] == msg])
+                      for msg in [VOLUME_CREATED, VOLUME_UPDATED, VOLUME_DELETED]]
+            self.module.exit_json(changed=any(result['changed'] for result in results),
+                                  msg=BULK_VOLUMES_DONE.format(*counts),
+                                  ansible_facts=dict(storage_volumes_bulk=results))
+
+    def __bulk_present(self, data, existing_volumes):
+        resource = existing_volumes.get(data['name']) or existing_volumes.get(data.get('newName'))
+        name = data.get('newName') or data['name']
+
+        def run():
+            if not resource:
+                return self.__create(data)
+            return self.__update(data, resource, existing_volumes.get)
+
+        return self.__bulk_result(name, run)
 
-        merged_data = resource.copy()
-        merged_data.update(data)
+    def __bulk_absent(self, data, existing_volumes, export_only):
+        resource = existing_volumes.get(data['name'])
 
-        updated_volume = self.oneview_client.volumes.update(merged_data)
+        def run():
+            if not resource:
+                return False, VOLUME_ALREADY_ABSENT, None
+            self.oneview_client.volumes.delete(resource, export_only=export_only)
+            return True, VOLUME_DELETED, resource
+
+        return self.__bulk_result(data['name'], run)
 
-        self.module.exit_json(changed=True,
-                              msg=VOLUME_UPDATED,
-                              ansible_facts=dict(storage_volume=updated_volume))
+    def __bulk_result(self, name, run):
+        try:
+            changed, msg, volume = run()
+            return dict(name=name, changed=changed, msg=msg, uri=(volume or {}).get('uri'))
+        except HPOneViewException as exception:
+            return dict(name=name, changed=False, msg=None, uri=None,
+                        error='; '.join(str(e) for e in exception.args))
 
     def __repair(self, data):
         resource = self.__get_by_name(data['name'])
@@ -310,12 +461,22 @@ class VolumeModule(object):
 
         resource = self.__get_by_name(data['name'])
 
-        if resource:
+        if not resource:
+            self.module.fail_json(msg=VOLUME_NOT_FOUND)
+        elif self.module.params.get('wait', True):
             self.oneview_client.volumes.create_snapshot(resource['uri'], data['snapshotParameters'])
             self.module.exit_json(changed=True,
                                   msg=VOLUME_SNAPSHOT_CREATED)
         else:
-            self.module.fail_json(msg=VOLUME_NOT_FOUND)
+            volumes = self.oneview_client.volumes
+            task, _ = start_task(volumes, partial(volumes.create_snapshot, resource['uri'], data['snapshotParameters']))
+            if task:
+                self.module.exit_json(changed=True,
+                                      msg=VOLUME_SNAPSHOT_CREATION_STARTED,
+                                      ansible_facts=dict(task_uri=task['uri']))
+            else:
+                self.module.exit_json(changed=True,
+                                      msg=VOLUME_SNAPSHOT_CREATED)
 
     def __delete_snapshot(self, data):
         if 'snapshotParameters' not in data:
@@ -17,6 +17,7 @@
 ###
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.oneview import get_all_projected, govern, project_resource, transform_fields
 try:
     from hpOneView.oneview_client import OneViewClient
     from hpOneView.common import transform_list_to_dict
@@ -62,6 +63,13 @@ options:
           Options allowed: attachableVolumes, extraManagedVolumePaths, and snapshots. For the option snapshots, you may
           provide a name."
       required: false
+    fields:
+      description:
+        - List of attributes to keep in the returned Volumes.
+          Nested attributes are addressed with dots, e.g. 'storagePoolUri'.
+          When the API supports the 'fields' query parameter, the projection is also requested from the appliance.
+          If not provided, the whole resources are returned.
+      required: false
 notes:
     - "A sample configuration file for the config parameter can be found at:
        https://github.com/HewlettPackard/oneview-ansible/blob/master/examples/oneview_config-rename.json"
@@ -148,6 +156,7 @@ class VolumeFactsModule(object):
         name=dict(required=False, type='str'),
         options=dict(required=False, type='list'),
         params=dict(required=False, type='dict'),
+        fields=dict(required=False, type='list')
     )
 
     def __init__(self):
@@ -156,9 +165,9 @@ class VolumeFactsModule(object):
             self.module.fail_json(msg=HPE_ONEVIEW_SDK_REQUIRED)
 
         if not self.module.params['config']:
-            self.oneview_client = OneViewClient.from_environment_variables()
+            self.oneview_client = govern(OneViewClient.from_environment_variables())
         else:
-            self.oneview_client = OneViewClient.from_json_file(self.module.params['config'])
+            self.oneview_client = govern(OneViewClient.from_json_file(self.module.params['config']))
 
     def run(self):
         try:
@@ -194,7 +203,8 @@ class VolumeFactsModule(object):
     def __gather_facts_about_all_volumes(self):
         facts = {}
         params = self.module.params.get('params') or {}
-        facts['storage_volumes'] = self.oneview_client.volumes.get_all(**params)
+        facts['storage_volumes'] = get_all_projected(self.oneview_client.volumes, params,
+                                                     self.module.params.get('fields'))
         return facts
 
     def __gather_facts_about_one_volume(self, options):
@@ -210,7 +220,7 @@ class VolumeFactsModule(object):
             else:
                 facts['snapshots'] = self.oneview_client.volumes.get_snapshots(volume_uri)
 
-        facts['storage_volumes'] = volumes
+        facts['storage_volumes'] = project_resource(volumes, transform_fields(self.module.params.get('fields')))
 
         return facts
 
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+###
+# Copyright (2017) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+
+# Ansible resolves 'ansible.module_utils.oneview' from the ANSIBLE_MODULE_UTILS path when it packs a module.
+# When running the tests, the modules are imported straight from the library path, so the shared utilities are
+# registered under the same name here.
+import sys
+import ansible.module_utils
+from module_utils import oneview
+
+sys.modules['ansible.module_utils.oneview'] = oneview
+ansible.module_utils.oneview = oneview
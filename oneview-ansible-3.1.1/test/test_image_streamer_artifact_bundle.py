@@ -13,7 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import hashlib
 import mock
+import os
+import shutil
+import tempfile
 import unittest
 import yaml
 
@@ -21,8 +25,12 @@ from copy import deepcopy
 from image_streamer_artifact_bundle import ArtifactBundleModule, EXAMPLES, ARTIFACT_BUNDLE_CREATED, \
     ARTIFACT_BUNDLE_UPDATED, ARTIFACT_BUNDLE_DELETED, ARTIFACT_BUNDLE_ABSENT, ARTIFACT_BUNDLE_ALREADY_EXIST, \
     ARTIFACT_BUNDLE_DOWNLOADED, ARTIFACT_BUNDLE_UPLOADED, BACKUP_UPLOADED, ARCHIVE_DOWNLOADED, BACKUP_CREATED, \
-    ARTIFACT_BUNDLE_EXTRACTED, BACKUP_EXTRACTED
+    ARTIFACT_BUNDLE_EXTRACTED, BACKUP_EXTRACTED, ARTIFACT_BUNDLE_DOWNLOADED_FROM_CACHE, ARCHIVE_DOWNLOADED_FROM_CACHE, \
+    ARTIFACT_BUNDLE_NOT_FOUND, ARTIFACT_BUNDLE_REPLICATED, ARTIFACT_BUNDLE_REPLICATION_FAILED, \
+    REPLICATION_TARGETS_REQUIRED, ARTIFACT_BUNDLE_TRANSFER_FAILED
 
+from hpOneView.exceptions import HPOneViewException
+from module_utils.oneview import ArtifactCache
 from test.utils import ModuleContructorTestCase
 from test.utils import ErrorHandlingTestCase
 
@@ -58,6 +66,8 @@ class ArtifactBundleSpec(unittest.TestCase,
         self.TASK_BACKUP_EXTRACT = self.ARTIFACT_BUNDLE_EXAMPLES[7]['image_streamer_artifact_bundle']
         self.TASK_UPDATE = self.ARTIFACT_BUNDLE_EXAMPLES[8]['image_streamer_artifact_bundle']
         self.TASK_REMOVE = self.ARTIFACT_BUNDLE_EXAMPLES[9]['image_streamer_artifact_bundle']
+        self.TASK_CACHED_DOWNLOAD = self.ARTIFACT_BUNDLE_EXAMPLES[10]['image_streamer_artifact_bundle']
+        self.TASK_CACHED_UPLOAD = self.ARTIFACT_BUNDLE_EXAMPLES[11]['image_streamer_artifact_bundle']
 
         self.BUILD_PLANS = dict(
             resourceUri="/rest/build-plans/ab65bb06-4387-48a0-9a5d-0b0da2888508",
@@ -326,5 +336,275 @@ class ArtifactBundleSpec(unittest.TestCase,
         )
 
 
+class ArtifactBundleCacheSpec(unittest.TestCase, ModuleContructorTestCase):
+    CONTENT = b'artifact bundle content'
+
+    def setUp(self):
+        self.configure_mocks(self, ArtifactBundleModule)
+        self.i3s = self.mock_ov_client.create_image_streamer_client()
+        self.i3s.connection.get_host.return_value = '10.0.0.1'
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, 'artifact.zip')
+        self.digest = hashlib.sha256(self.CONTENT).hexdigest()
+
+        self.artifact_bundle = dict(name='Artifact Bundle', uri='/rest/artifact-bundles/1', eTag='1')
+        self.i3s.artifact_bundles.get_by.return_value = [self.artifact_bundle]
+
+        patcher = mock.patch('image_streamer_artifact_bundle.download_file', side_effect=self.__download)
+        self.download_file = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def __download(self, connection, uri, file_path, version=None):
+        with open(file_path, 'wb') as stream:
+            stream.write(self.CONTENT)
+        return dict(source=uri, size=len(self.CONTENT), sha256=self.digest)
+
+    def __params(self, state, **data):
+        return dict(config='config.json', state=state, cache_dir=os.path.join(self.directory, 'cache'),
+                    cache_max_size=1024, data=data)
+
+    def test_should_download_and_then_copy_from_the_cache(self):
+        self.mock_ansible_module.params = self.__params('downloaded', name='Artifact Bundle',
+                                                        destinationFilePath=self.file_path)
+        ArtifactBundleModule().run()
+        os.remove(self.file_path)
+        ArtifactBundleModule().run()
+
+        self.download_file.assert_called_once_with(self.i3s.connection, '/rest/artifact-bundles/download/1',
+                                                   self.file_path, version='1')
+        self.i3s.artifact_bundles.download_artifact_bundle.assert_not_called()
+        with open(self.file_path, 'rb') as stream:
+            self.assertEqual(stream.read(), self.CONTENT)
+
+        transfer = dict(source='/rest/artifact-bundles/download/1', size=len(self.CONTENT), sha256=self.digest,
+                        version='1')
+        self.assertEqual(self.mock_ansible_module.exit_json.call_args_list, [
+            mock.call(changed=False, msg=ARTIFACT_BUNDLE_DOWNLOADED,
+                      ansible_facts=dict(artifact_bundle_transfer=dict(transfer, cached=False))),
+            mock.call(changed=False, msg=ARTIFACT_BUNDLE_DOWNLOADED_FROM_CACHE,
+                      ansible_facts=dict(artifact_bundle_transfer=dict(transfer, cached=True)))])
+
+    def test_should_fail_when_the_download_fails(self):
+        self.download_file.side_effect = IOError('Connection reset by peer')
+        self.mock_ansible_module.params = self.__params('archive_downloaded', name='Artifact Bundle',
+                                                        destinationFilePath=self.file_path)
+
+        ArtifactBundleModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=ARTIFACT_BUNDLE_TRANSFER_FAILED.format('Connection reset by peer'))
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_should_download_the_archive_again_when_the_appliance_copy_changed(self):
+        self.mock_ansible_module.params = self.__params('archive_downloaded', name='Artifact Bundle',
+                                                        destinationFilePath=self.file_path)
+        ArtifactBundleModule().run()
+        ArtifactBundleModule().run()
+        self.artifact_bundle['eTag'] = '2'
+        ArtifactBundleModule().run()
+
+        self.assertEqual(self.download_file.call_count, 2)
+        self.assertEqual([call[1]['msg'] for call in self.mock_ansible_module.exit_json.call_args_list],
+                         [ARCHIVE_DOWNLOADED, ARCHIVE_DOWNLOADED_FROM_CACHE, ARCHIVE_DOWNLOADED])
+
+    def test_should_not_upload_a_file_already_uploaded_to_the_appliance(self):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.CONTENT)
+        self.i3s.artifact_bundles.get_by.return_value = []
+        self.i3s.artifact_bundles.upload_bundle_from_file.return_value = self.artifact_bundle
+        self.i3s.artifact_bundles.get.return_value = dict(self.artifact_bundle, name='Renamed Artifact Bundle')
+
+        self.mock_ansible_module.params = self.__params('present', localArtifactBundleFilePath=self.file_path)
+        ArtifactBundleModule().run()
+        ArtifactBundleModule().run()
+
+        self.i3s.artifact_bundles.upload_bundle_from_file.assert_called_once_with(self.file_path)
+        self.i3s.artifact_bundles.get.assert_called_once_with('/rest/artifact-bundles/1')
+        cache = ArtifactCache(os.path.join(self.directory, 'cache'))
+        self.assertFalse(os.path.exists(cache.get_path(hashlib.sha256(self.CONTENT).hexdigest())))
+        self.assertEqual(self.mock_ansible_module.exit_json.call_args_list, [
+            mock.call(changed=True, msg=ARTIFACT_BUNDLE_UPLOADED,
+                      ansible_facts=dict(artifact_bundle=self.artifact_bundle)),
+            mock.call(changed=False, msg=ARTIFACT_BUNDLE_ALREADY_EXIST,
+                      ansible_facts=dict(artifact_bundle=dict(self.artifact_bundle, name='Renamed Artifact Bundle')))])
+
+    def test_should_upload_again_when_the_uploaded_bundle_was_removed(self):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.CONTENT)
+        self.i3s.artifact_bundles.get_by.return_value = []
+        self.i3s.artifact_bundles.upload_bundle_from_file.return_value = self.artifact_bundle
+        self.i3s.artifact_bundles.get.side_effect = HPOneViewException('Resource not found')
+
+        self.mock_ansible_module.params = self.__params('present', localArtifactBundleFilePath=self.file_path)
+        ArtifactBundleModule().run()
+        ArtifactBundleModule().run()
+
+        self.assertEqual(self.i3s.artifact_bundles.upload_bundle_from_file.call_count, 2)
+        self.mock_ansible_module.fail_json.assert_not_called()
+
+    def test_should_upload_to_another_appliance(self):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.CONTENT)
+        self.i3s.artifact_bundles.get_by.return_value = []
+        self.i3s.artifact_bundles.upload_bundle_from_file.return_value = self.artifact_bundle
+
+        self.mock_ansible_module.params = self.__params('present', localArtifactBundleFilePath=self.file_path)
+        ArtifactBundleModule().run()
+        self.i3s.connection.get_host.return_value = '10.0.0.2'
+        ArtifactBundleModule().run()
+
+        self.assertEqual(self.i3s.artifact_bundles.upload_bundle_from_file.call_count, 2)
+        self.i3s.artifact_bundles.get.assert_not_called()
+
+
+class ArtifactBundleReplicationSpec(unittest.TestCase, ModuleContructorTestCase):
+    def setUp(self):
+        self.configure_mocks(self, ArtifactBundleModule)
+        self.source = self.mock_ov_client.create_image_streamer_client()
+        self.source.connection.get_host.return_value = '172.18.15.1'
+        self.source.artifact_bundles.get_by.return_value = [dict(name='Artifact Bundle',
+                                                                 uri='/rest/artifact-bundles/1')]
+
+        self.targets = dict()
+        patchers = dict(download_file=mock.patch('image_streamer_artifact_bundle.download_file'),
+                        upload_file=mock.patch('image_streamer_artifact_bundle.upload_file'),
+                        task_monitor=mock.patch('image_streamer_artifact_bundle.TaskMonitor'),
+                        client=mock.patch('image_streamer_artifact_bundle.ImageStreamerClient',
+                                          side_effect=self.__create_target))
+        self.mocks = dict((name, patcher.start()) for name, patcher in patchers.items())
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+        self.mocks['upload_file'].return_value = mock.Mock(status=200), dict(uri='/rest/artifact-bundles/2'), 'digest'
+
+        self.mock_ansible_module.params = yaml.load(EXAMPLES)[12]['image_streamer_artifact_bundle']
+
+    def __create_target(self, ip, session_id, api_version):
+        target = self.targets.setdefault(ip, mock.Mock())
+        target.connection.get_host.return_value = ip
+        target.artifact_bundles.get_by.return_value = []
+        target.artifact_bundles.extract_bundle.side_effect = lambda resource: resource
+        return target
+
+    @mock.patch('image_streamer_artifact_bundle.govern', side_effect=lambda client: client)
+    def test_should_govern_the_target_clients(self, mock_govern):
+        self.mock_ov_client_from_json_file.side_effect = [self.mock_ov_client, mock.Mock()]
+
+        ArtifactBundleModule().run()
+
+        self.assertEqual(len(self.targets), 2)
+        for target in self.targets.values():
+            mock_govern.assert_any_call(target)
+
+    def __upload_hosts(self):
+        return sorted(call[0][0].get_host() for call in self.mocks['upload_file'].call_args_list)
+
+    def test_should_download_once_and_upload_to_each_target(self):
+        remote_client = mock.Mock()
+        self.mock_ov_client_from_json_file.side_effect = [self.mock_ov_client, remote_client]
+
+        ArtifactBundleModule().run()
+
+        self.mocks['download_file'].assert_called_once_with(self.source.connection,
+                                                            '/rest/artifact-bundles/download/1', mock.ANY,
+                                                            version=mock.ANY)
+        file_path = self.mocks['download_file'].call_args[0][2]
+        self.assertEqual(os.path.basename(file_path), 'Artifact Bundle.zip')
+        self.assertFalse(os.path.exists(os.path.dirname(file_path)))
+
+        self.mocks['client'].assert_any_call('172.18.15.2', self.mock_ov_client.connection.get_session_id(),
+                                             self.mock_ov_client.connection._apiVersion)
+        self.mocks['client'].assert_any_call('172.20.15.1', remote_client.connection.get_session_id(),
+                                             remote_client.connection._apiVersion)
+        self.assertEqual(self.__upload_hosts(), ['172.18.15.2', '172.20.15.1'])
+
+        rates = dict((call[0][0].get_host(), call[0][5]) for call in self.mocks['upload_file'].call_args_list)
+        self.assertEqual(rates, {'172.18.15.2': 52428800, '172.20.15.1': 10485760})
+
+        for target in self.targets.values():
+            target.artifact_bundles.extract_bundle.assert_called_once_with(dict(uri='/rest/artifact-bundles/2'))
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=ARTIFACT_BUNDLE_REPLICATED.format(2, 2),
+            ansible_facts=dict(artifact_bundle_replication=[
+                dict(target='172.18.15.2', changed=True, msg=ARTIFACT_BUNDLE_EXTRACTED,
+                     uri='/rest/artifact-bundles/2'),
+                dict(target='172.20.15.1', changed=True, msg=ARTIFACT_BUNDLE_EXTRACTED,
+                     uri='/rest/artifact-bundles/2')]))
+
+    def test_should_skip_the_targets_that_already_have_the_artifact_bundle(self):
+        self.mock_ansible_module.params['targets'] = ['172.18.15.2', '172.18.15.3']
+        self.__create_target('172.18.15.3', None, None)
+        self.targets['172.18.15.3'].artifact_bundles.get_by.return_value = [dict(uri='/rest/artifact-bundles/5')]
+        self.mocks['client'].side_effect = lambda ip, session_id, api_version: (
+            self.targets.get(ip) or self.__create_target(ip, session_id, api_version))
+
+        ArtifactBundleModule().run()
+
+        self.assertEqual(self.__upload_hosts(), ['172.18.15.2'])
+        self.targets['172.18.15.3'].artifact_bundles.extract_bundle.assert_not_called()
+        facts = self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['artifact_bundle_replication']
+        self.assertEqual(facts[1], dict(target='172.18.15.3', changed=False, msg=ARTIFACT_BUNDLE_ALREADY_EXIST,
+                                        uri='/rest/artifact-bundles/5'))
+        self.assertEqual(self.mock_ansible_module.exit_json.call_args[1]['msg'],
+                         ARTIFACT_BUNDLE_REPLICATED.format(1, 2))
+
+    def test_should_report_each_failed_target(self):
+        self.mock_ansible_module.params['targets'] = ['172.18.15.2', '172.18.15.3', '172.18.15.4']
+        self.mocks['upload_file'].side_effect = lambda connection, *args: (
+            self.__fail_upload(connection.get_host()))
+
+        ArtifactBundleModule().run()
+
+        self.mock_ansible_module.exit_json.assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=ARTIFACT_BUNDLE_REPLICATION_FAILED.format(2, 3),
+            artifact_bundle_replication=[
+                dict(target='172.18.15.2', changed=False, msg=None, uri=None, error='Connection reset by peer'),
+                dict(target='172.18.15.3', changed=False, msg=None, uri=None,
+                     error="Not enough space; {'message': 'Not enough space'}"),
+                dict(target='172.18.15.4', changed=True, msg=ARTIFACT_BUNDLE_EXTRACTED,
+                     uri='/rest/artifact-bundles/2')])
+
+    def test_should_fail_when_the_source_download_fails(self):
+        self.mock_ansible_module.params['targets'] = ['172.18.15.2', '172.18.15.3']
+        self.mocks['download_file'].side_effect = IOError('Connection reset by peer')
+
+        ArtifactBundleModule().run()
+
+        self.mocks['upload_file'].assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=ARTIFACT_BUNDLE_TRANSFER_FAILED.format('Connection reset by peer'),
+            artifact_bundle_replication=[
+                dict(target='172.18.15.2', changed=False, msg=None, uri=None, error='Connection reset by peer'),
+                dict(target='172.18.15.3', changed=False, msg=None, uri=None, error='Connection reset by peer')])
+
+    def __fail_upload(self, host):
+        if host == '172.18.15.2':
+            raise IOError('Connection reset by peer')
+        if host == '172.18.15.3':
+            return mock.Mock(status=507), dict(message='Not enough space'), 'digest'
+        return mock.Mock(status=200), dict(uri='/rest/artifact-bundles/2'), 'digest'
+
+    def test_should_fail_when_the_artifact_bundle_is_not_found(self):
+        self.source.artifact_bundles.get_by.return_value = []
+
+        ArtifactBundleModule().run()
+
+        self.mocks['download_file'].assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=ARTIFACT_BUNDLE_NOT_FOUND)
+
+    def test_should_fail_when_the_targets_are_not_informed(self):
+        self.mock_ansible_module.params['targets'] = None
+
+        ArtifactBundleModule().run()
+
+        self.mocks['download_file'].assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=REPLICATION_TARGETS_REQUIRED)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -13,13 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import os
 import unittest
+import mock
 import yaml
 
 from image_streamer_golden_image import GoldenImageModule, GOLDEN_IMAGE_ALREADY_UPDATED, GOLDEN_IMAGE_UPLOADED, \
     GOLDEN_IMAGE_ALREADY_ABSENT, GOLDEN_IMAGE_CREATED, GOLDEN_IMAGE_DELETED, EXAMPLES, I3S_BUILD_PLAN_WAS_NOT_FOUND, \
     GOLDEN_IMAGE_UPDATED, I3S_CANT_CREATE_AND_UPLOAD, I3S_MISSING_MANDATORY_ATTRIBUTES, I3S_OS_VOLUME_WAS_NOT_FOUND, \
-    GOLDEN_IMAGE_DOWNLOADED, GOLDEN_IMAGE_ARCHIVE_DOWNLOADED, GOLDEN_IMAGE_WAS_NOT_FOUND
+    GOLDEN_IMAGE_DOWNLOADED, GOLDEN_IMAGE_ARCHIVE_DOWNLOADED, GOLDEN_IMAGE_WAS_NOT_FOUND, \
+    GOLDEN_IMAGE_ALREADY_DOWNLOADED, GOLDEN_IMAGE_TRANSFER_FAILED
 from test.utils import ModuleContructorTestCase
 from test.utils import ErrorHandlingTestCase
 
@@ -50,6 +53,24 @@ class GoldenImageSpec(unittest.TestCase,
         self.GOLDEN_IMAGE_DOWNLOAD = self.GOLDEN_IMAGE_EXAMPLES[3]['image_streamer_golden_image']
         self.GOLDEN_IMAGE_ARCHIVE_DOWNLOAD = self.GOLDEN_IMAGE_EXAMPLES[4]['image_streamer_golden_image']
         self.GOLDEN_IMAGE_DELETE = self.GOLDEN_IMAGE_EXAMPLES[5]['image_streamer_golden_image']
+        self.GOLDEN_IMAGE_PARALLEL_DOWNLOAD = self.GOLDEN_IMAGE_EXAMPLES[6]['image_streamer_golden_image']
+
+        patchers = dict(upload_file=mock.patch('image_streamer_golden_image.upload_file'),
+                        download_file=mock.patch('image_streamer_golden_image.download_file'),
+                        load_manifest=mock.patch('image_streamer_golden_image.load_manifest'),
+                        save_manifest=mock.patch('image_streamer_golden_image.save_manifest'),
+                        task_monitor=mock.patch('image_streamer_golden_image.TaskMonitor'),
+                        getsize=mock.patch('os.path.getsize'))
+        self.mocks = dict((name, patcher.start()) for name, patcher in patchers.items())
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+        self.mocks['load_manifest'].return_value = None
+        self.mocks['getsize'].return_value = 1024
+        self.upload_response = mock.Mock(status=202)
+        self.upload_response.getheader.return_value = '/rest/tasks/1'
+        self.mocks['upload_file'].return_value = self.upload_response, {}, 'digest'
+        self.mocks['task_monitor'].return_value.wait_for_task.return_value = {"name": "name"}
 
     def test_create_new_golden_image(self):
         self.i3s.golden_images.get_by.return_value = []
@@ -76,7 +97,6 @@ class GoldenImageSpec(unittest.TestCase,
 
     def test_upload_a_golden_image(self):
         self.i3s.golden_images.get_by.return_value = []
-        self.i3s.golden_images.upload.return_value = {"name": "name"}
 
         self.mock_ansible_module.params = self.GOLDEN_IMAGE_UPLOAD
 
@@ -84,16 +104,30 @@ class GoldenImageSpec(unittest.TestCase,
 
         GoldenImageModule().run()
 
-        self.i3s.golden_images.upload.assert_called_once_with(
-            file_path,
-            self.GOLDEN_IMAGE_UPLOAD['data'])
+        self.mocks['upload_file'].assert_called_once_with(
+            self.i3s.connection, '/rest/golden-images?name=Demo%20Golden%20Image%20upload&description=Test',
+            file_path, 1048576, mock.ANY)
+        self.i3s.connection.get.assert_called_once_with('/rest/tasks/1')
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
             msg=GOLDEN_IMAGE_UPLOADED,
-            ansible_facts=dict(golden_image={"name": "name"})
+            ansible_facts=dict(golden_image={"name": "name"},
+                               golden_image_transfer=dict(source=file_path, size=1024, sha256='digest', attempts=1))
         )
 
+    def test_should_not_upload_again_when_the_failed_attempt_completed(self):
+        self.i3s.golden_images.get_by.side_effect = [[], [{"name": "name"}]]
+        self.mocks['upload_file'].side_effect = IOError('Connection reset by peer')
+
+        self.mock_ansible_module.params = dict(self.GOLDEN_IMAGE_UPLOAD, transfer_retries=2)
+
+        GoldenImageModule().run()
+
+        self.mocks['upload_file'].assert_called_once()
+        self.assertEqual(self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['golden_image'],
+                         {"name": "name"})
+
     def test_update_golden_image(self):
         self.i3s.golden_images.get_by.return_value = [self.GOLDEN_IMAGE_CREATE['data']]
         self.i3s.golden_images.update.return_value = {"name": "name"}
@@ -111,19 +145,112 @@ class GoldenImageSpec(unittest.TestCase,
     def test_golden_image_download(self):
         golden_image = self.GOLDEN_IMAGE_CREATE['data']
         golden_image['uri'] = '/rest/golden-images/1'
+        golden_image['eTag'] = '2'
+        manifest = dict(source='/rest/golden-images/download/1', size=1024, sha256='digest')
+        self.mocks['download_file'].return_value = manifest.copy()
 
         self.i3s.golden_images.get_by.return_value = [golden_image]
         self.mock_ansible_module.params = self.GOLDEN_IMAGE_DOWNLOAD
 
         GoldenImageModule().run()
 
-        download_file = self.GOLDEN_IMAGE_DOWNLOAD['data']['destination_file_path']
-        self.i3s.golden_images.download.assert_called_once_with('/rest/golden-images/1', download_file)
+        download_file = os.path.expanduser(self.GOLDEN_IMAGE_DOWNLOAD['data']['destination_file_path'])
+        self.mocks['download_file'].assert_called_once_with(self.i3s.connection, '/rest/golden-images/download/1',
+                                                            download_file, 1048576, 1, mock.ANY, '2')
+        self.mocks['save_manifest'].assert_called_once_with(download_file, dict(manifest, version='2'))
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
             msg=GOLDEN_IMAGE_DOWNLOADED,
-            ansible_facts={})
+            ansible_facts=dict(golden_image_transfer=dict(manifest, version='2', attempts=1)))
+
+    def test_should_not_download_when_the_destination_matches_the_manifest(self):
+        golden_image = dict(self.GOLDEN_IMAGE_CREATE['data'], uri='/rest/golden-images/1', eTag='2')
+        manifest = dict(source='/rest/golden-images/download/1', size=1024, sha256='digest', version='2')
+        self.mocks['load_manifest'].return_value = manifest
+
+        self.i3s.golden_images.get_by.return_value = [golden_image]
+        self.mock_ansible_module.params = self.GOLDEN_IMAGE_DOWNLOAD
+
+        GoldenImageModule().run()
+
+        self.mocks['download_file'].assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=GOLDEN_IMAGE_ALREADY_DOWNLOADED,
+            ansible_facts=dict(golden_image_transfer=manifest))
+
+    def test_should_download_again_when_the_golden_image_changed(self):
+        golden_image = dict(self.GOLDEN_IMAGE_CREATE['data'], uri='/rest/golden-images/1', eTag='3')
+        self.mocks['load_manifest'].return_value = dict(source='/rest/golden-images/download/1', size=1024,
+                                                        sha256='digest', version='2')
+        self.mocks['download_file'].return_value = dict(source='/rest/golden-images/download/1', size=2048,
+                                                        sha256='other')
+
+        self.i3s.golden_images.get_by.return_value = [golden_image]
+        self.mock_ansible_module.params = self.GOLDEN_IMAGE_DOWNLOAD
+
+        GoldenImageModule().run()
+
+        self.mocks['download_file'].assert_called_once()
+        self.assertTrue(self.mock_ansible_module.exit_json.call_args[1]['changed'])
+
+    @mock.patch('image_streamer_golden_image.ArtifactCache')
+    def test_should_copy_the_download_from_the_cache(self, mock_cache):
+        golden_image = dict(self.GOLDEN_IMAGE_CREATE['data'], uri='/rest/golden-images/1', eTag='2')
+        manifest = dict(source='https://10.0.0.1/rest/golden-images/download/1', size=1024, sha256='digest')
+        mock_cache.return_value.fetch.return_value = manifest, False
+        self.i3s.connection.get_host.return_value = '10.0.0.1'
+
+        self.i3s.golden_images.get_by.return_value = [golden_image]
+        self.mock_ansible_module.params = dict(self.GOLDEN_IMAGE_DOWNLOAD, cache_dir='/tmp/cache',
+                                               cache_max_size=1024)
+
+        GoldenImageModule().run()
+
+        download_file = os.path.expanduser(self.GOLDEN_IMAGE_DOWNLOAD['data']['destination_file_path'])
+        mock_cache.assert_called_once_with('/tmp/cache', 1024)
+        mock_cache.return_value.fetch.assert_called_once_with('10.0.0.1/rest/golden-images/download/1', '2',
+                                                              download_file, mock.ANY)
+        self.mocks['download_file'].assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=GOLDEN_IMAGE_DOWNLOADED,
+            ansible_facts=dict(golden_image_transfer=dict(manifest, source='/rest/golden-images/download/1',
+                                                          version='2', attempts=0)))
+
+    def test_should_resume_the_parallel_download_when_the_connection_fails(self):
+        golden_image = dict(self.GOLDEN_IMAGE_CREATE['data'], uri='/rest/golden-images/1', eTag='2')
+        manifest = dict(source='/rest/golden-images/download/1', size=1024, sha256='digest')
+        self.mocks['download_file'].side_effect = [IOError('Connection reset by peer'), IOError('Timed out'),
+                                                   manifest.copy()]
+
+        self.i3s.golden_images.get_by.return_value = [golden_image]
+        self.mock_ansible_module.params = self.GOLDEN_IMAGE_PARALLEL_DOWNLOAD
+
+        GoldenImageModule().run()
+
+        download_file = os.path.expanduser(self.GOLDEN_IMAGE_PARALLEL_DOWNLOAD['data']['destination_file_path'])
+        self.mocks['download_file'].assert_called_with(self.i3s.connection, '/rest/golden-images/download/1',
+                                                       download_file, 1048576, 4, mock.ANY, mock.ANY)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=GOLDEN_IMAGE_DOWNLOADED,
+            ansible_facts=dict(golden_image_transfer=dict(manifest, version='2', attempts=3)))
+
+    def test_should_fail_when_the_download_retries_are_exhausted(self):
+        golden_image = dict(self.GOLDEN_IMAGE_CREATE['data'], uri='/rest/golden-images/1')
+        self.mocks['download_file'].side_effect = IOError('Connection reset by peer')
+
+        self.i3s.golden_images.get_by.return_value = [golden_image]
+        self.mock_ansible_module.params = dict(self.GOLDEN_IMAGE_DOWNLOAD, transfer_retries=1)
+
+        GoldenImageModule().run()
+
+        self.assertEqual(self.mocks['download_file'].call_count, 2)
+        self.mocks['save_manifest'].assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=GOLDEN_IMAGE_TRANSFER_FAILED.format(2, 'Connection reset by peer'))
 
     def test_golden_image_download_nonexistent(self):
         self.i3s.golden_images.get_by.return_value = []
@@ -138,19 +265,22 @@ class GoldenImageSpec(unittest.TestCase,
     def test_golden_image_archive_download(self):
         golden_image = self.GOLDEN_IMAGE_CREATE['data']
         golden_image['uri'] = '/rest/golden-images/1'
+        manifest = dict(source='/rest/golden-images/archive/1', size=1024, sha256='digest')
+        self.mocks['download_file'].return_value = manifest.copy()
 
         self.i3s.golden_images.get_by.return_value = [golden_image]
         self.mock_ansible_module.params = self.GOLDEN_IMAGE_ARCHIVE_DOWNLOAD
 
         GoldenImageModule().run()
 
-        download_file = self.GOLDEN_IMAGE_ARCHIVE_DOWNLOAD['data']['destination_file_path']
-        self.i3s.golden_images.download_archive.assert_called_once_with('/rest/golden-images/1', download_file)
+        download_file = os.path.expanduser(self.GOLDEN_IMAGE_ARCHIVE_DOWNLOAD['data']['destination_file_path'])
+        self.mocks['download_file'].assert_called_once_with(self.i3s.connection, '/rest/golden-images/archive/1',
+                                                            download_file, 1048576, 1, mock.ANY, None)
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
             msg=GOLDEN_IMAGE_ARCHIVE_DOWNLOADED,
-            ansible_facts={})
+            ansible_facts=dict(golden_image_transfer=dict(manifest, version=None, attempts=1)))
 
     def test_golden_image_archive_download_nonexistent(self):
         self.i3s.golden_images.get_by.return_value = []
@@ -0,0 +1,1369 @@
+###
+# Copyright (2017) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from copy import deepcopy
+from functools import partial
+
+from mock import Mock, call, create_autospec, patch
+
+from module_utils.oneview import (RESOURCE_CONFLICT, RESOURCE_REMOVED, UPLOAD_BOUNDARY, ApiGovernor, ArtifactCache,
+                                  EstateIndex, RateLimiter, ResourceReservations, TransferError, canonical_hash,
+                                  download_file, export_all_projected, file_digest, gather_option_facts,
+                                  get_all_projected, get_changed_since, get_patch_operations, get_path,
+                                  get_upload_task, govern, is_etag_conflict, iter_all_pages, load_json_file,
+                                  load_manifest, map_concurrently, merge_and_update, progress_logger, project_resource,
+                                  rank_candidates, resource_compare, run_concurrently, save_json_file, save_manifest,
+                                  start_task, supports_argument, transfer_source, transform_fields, upload_file,
+                                  write_json_lines)
+from hpOneView.exceptions import HPOneViewException
+from hpOneView.resources.resource import ResourceClient
+
+SERVER_HARDWARE = dict(
+    name='Encl1, bay 1',
+    uri='/rest/server-hardware/31393736-3831-4753-567h-30335837524E',
+    powerState='On',
+    mpHostInfo=dict(
+        mpHostName='ILO-1',
+        mpIpAddresses=[dict(address='10.0.0.1', type='DHCP'), dict(address='fe80::1', type='LinkLocal')]
+    ),
+    portMap=dict(deviceSlots=[dict(slotNumber=1, physicalPorts=[])])
+)
+
+
+class ResourceClientWithFields(object):
+    def get_all(self, start=0, count=-1, fields='', filter='', query='', sort='', view=''):
+        pass
+
+
+class ResourceClientWithoutFields(object):
+    def get_all(self, start=0, count=-1, filter='', sort=''):
+        pass
+
+
+class TransformFieldsSpec(unittest.TestCase):
+    def test_should_return_empty_list_when_not_informed(self):
+        self.assertEqual(transform_fields(None), [])
+        self.assertEqual(transform_fields([]), [])
+
+    def test_should_split_comma_separated_string(self):
+        self.assertEqual(transform_fields('name, uri,,mpHostInfo.mpHostName'),
+                         ['name', 'uri', 'mpHostInfo.mpHostName'])
+
+    def test_should_keep_list(self):
+        self.assertEqual(transform_fields(['name', '', 'uri']), ['name', 'uri'])
+
+
+class ProjectResourceSpec(unittest.TestCase):
+    def test_should_return_resource_when_no_fields(self):
+        self.assertIs(project_resource(SERVER_HARDWARE, []), SERVER_HARDWARE)
+
+    def test_should_keep_top_level_fields(self):
+        self.assertEqual(project_resource(SERVER_HARDWARE, ['name', 'powerState', 'unknown']),
+                         dict(name='Encl1, bay 1', powerState='On'))
+
+    def test_should_keep_nested_fields(self):
+        self.assertEqual(project_resource(SERVER_HARDWARE, ['name', 'mpHostInfo.mpHostName']),
+                         dict(name='Encl1, bay 1', mpHostInfo=dict(mpHostName='ILO-1')))
+
+    def test_should_apply_path_to_each_list_item(self):
+        self.assertEqual(project_resource(SERVER_HARDWARE, ['mpHostInfo.mpIpAddresses.address']),
+                         dict(mpHostInfo=dict(mpIpAddresses=[dict(address='10.0.0.1'), dict(address='fe80::1')])))
+
+    def test_should_project_each_resource_of_a_list(self):
+        self.assertEqual(project_resource([SERVER_HARDWARE, SERVER_HARDWARE], ['name']),
+                         [dict(name='Encl1, bay 1'), dict(name='Encl1, bay 1')])
+
+    def test_should_not_change_the_original_resource(self):
+        project_resource(SERVER_HARDWARE, ['mpHostInfo.mpHostName'])
+
+        self.assertEqual(len(SERVER_HARDWARE['mpHostInfo']), 2)
+
+
+class GetPathSpec(unittest.TestCase):
+    def test_should_get_nested_attribute(self):
+        self.assertEqual(get_path(SERVER_HARDWARE, 'mpHostInfo.mpHostName'), 'ILO-1')
+
+    def test_should_return_default_when_attribute_is_missing(self):
+        self.assertEqual(get_path(SERVER_HARDWARE, 'name.missing', 'none'), 'none')
+
+
+class GetAllProjectedSpec(unittest.TestCase):
+    def test_should_check_declared_arguments(self):
+        self.assertTrue(supports_argument(ResourceClientWithFields().get_all, 'fields'))
+        self.assertFalse(supports_argument(ResourceClientWithoutFields().get_all, 'fields'))
+
+    def test_should_request_top_level_fields_from_server_when_supported(self):
+        resource_client = create_autospec(ResourceClientWithFields, instance=True)
+        resource_client.get_all.return_value = [SERVER_HARDWARE]
+
+        result = get_all_projected(resource_client, dict(count=10), ['name', 'mpHostInfo.mpHostName', 'mpHostInfo'])
+
+        resource_client.get_all.assert_called_once_with(count=10, fields='name,mpHostInfo')
+        self.assertEqual(result, [dict(name='Encl1, bay 1', mpHostInfo=SERVER_HARDWARE['mpHostInfo'])])
+
+    def test_should_project_locally_when_server_does_not_support_fields(self):
+        resource_client = Mock()
+        resource_client.get_all.return_value = [SERVER_HARDWARE]
+
+        result = get_all_projected(resource_client, dict(count=10), 'name')
+
+        resource_client.get_all.assert_called_once_with(count=10)
+        self.assertEqual(result, [dict(name='Encl1, bay 1')])
+
+    def test_should_not_override_fields_informed_in_params(self):
+        resource_client = Mock()
+        resource_client.get_all.return_value = [SERVER_HARDWARE]
+
+        get_all_projected(resource_client, dict(fields='name,uri'), None)
+
+        resource_client.get_all.assert_called_once_with(fields='name,uri')
+
+
+class IterAllPagesSpec(unittest.TestCase):
+    def setUp(self):
+        self.items = [dict(name=str(index)) for index in range(7)]
+        self.get_all = Mock(side_effect=lambda start, count, **kwargs: self.items[start:start + count])
+
+    def test_should_request_one_page_at_a_time(self):
+        result = list(iter_all_pages(self.get_all, dict(filter='a'), page_size=3))
+
+        self.assertEqual(result, self.items)
+        self.assertEqual(self.get_all.call_args_list, [call(start=0, count=3, filter='a'),
+                                                       call(start=3, count=3, filter='a'),
+                                                       call(start=6, count=3, filter='a')])
+
+    def test_should_respect_start_and_count(self):
+        result = list(iter_all_pages(self.get_all, dict(start=1, count=4), page_size=3))
+
+        self.assertEqual(result, self.items[1:5])
+        self.assertEqual(self.get_all.call_args_list, [call(start=1, count=3), call(start=4, count=1)])
+
+    def test_should_stop_when_collection_is_empty(self):
+        self.items = []
+
+        self.assertEqual(list(iter_all_pages(self.get_all, None, page_size=3)), [])
+        self.get_all.assert_called_once_with(start=0, count=3)
+
+
+class WriteJsonLinesSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'resources.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_should_write_one_resource_per_line(self):
+        count = write_json_lines(self.file_path, iter([dict(name='a'), dict(name='b')]))
+
+        self.assertEqual(count, 2)
+        with open(self.file_path) as stream:
+            self.assertEqual([json.loads(line) for line in stream], [dict(name='a'), dict(name='b')])
+
+    def test_should_write_compressed_file(self):
+        write_json_lines(self.file_path, [dict(name='a')], compress=True)
+
+        with gzip.open(self.file_path, 'rb') as stream:
+            self.assertEqual(json.loads(stream.read().decode('utf-8')), dict(name='a'))
+
+    def test_should_not_leave_partial_file_when_fails(self):
+        def resources():
+            yield dict(name='a')
+            raise ValueError('Fake error')
+
+        self.assertRaises(ValueError, write_json_lines, self.file_path, resources())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_should_export_projected_resources(self):
+        resource_client = Mock()
+        resource_client.get_all.return_value = [SERVER_HARDWARE]
+
+        result = export_all_projected(resource_client, dict(filter='a'), ['name'], self.file_path, page_size=10)
+
+        self.assertEqual(result, dict(dest=self.file_path, compressed=False, count=1))
+        resource_client.get_all.assert_called_once_with(start=0, count=10, filter='a')
+        with open(self.file_path) as stream:
+            self.assertEqual(json.loads(stream.readline()), dict(name='Encl1, bay 1'))
+
+
+class RunConcurrentlySpec(unittest.TestCase):
+    def test_should_return_results_in_order(self):
+        def delayed(value, delay):
+            time.sleep(delay)
+            return value
+
+        result = run_concurrently([partial(delayed, 1, 0.05), partial(delayed, 2, 0), partial(delayed, 3, 0.02)])
+
+        self.assertEqual(result, [1, 2, 3])
+
+    def test_should_run_functions_at_the_same_time(self):
+        barrier = threading.Event()
+        arrived = []
+
+        def wait_for_all():
+            arrived.append(1)
+            if len(arrived) == 3:
+                barrier.set()
+            return barrier.wait(5)
+
+        self.assertEqual(run_concurrently([wait_for_all] * 3), [True, True, True])
+
+    def test_should_limit_the_functions_running_at_the_same_time(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def tracked():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        run_concurrently([tracked] * 10, max_workers=3)
+
+        self.assertEqual(max(peak), 3)
+
+    def test_should_raise_the_first_error_in_order(self):
+        def fail(message, delay):
+            time.sleep(delay)
+            raise ValueError(message)
+
+        try:
+            run_concurrently([lambda: 1, partial(fail, 'first', 0.05), partial(fail, 'second', 0)])
+        except ValueError as error:
+            self.assertEqual(error.args[0], 'first')
+        else:
+            self.fail('Expected ValueError was not raised')
+
+    def test_should_gather_facts_by_name(self):
+        facts = gather_option_facts([('bios', lambda: 'bios'), ('firmware', lambda: 'firmware')])
+
+        self.assertEqual(facts, dict(bios='bios', firmware='firmware'))
+
+    def test_should_return_empty_facts_without_options(self):
+        self.assertEqual(gather_option_facts([]), {})
+
+
+class MapConcurrentlySpec(unittest.TestCase):
+    def test_should_yield_results_in_order(self):
+        def delayed(value):
+            time.sleep(0.01 * (5 - value))
+            return value * 2
+
+        self.assertEqual(list(map_concurrently(delayed, iter(range(5)), max_workers=3)), [0, 2, 4, 6, 8])
+
+    def test_should_run_sequentially_with_one_worker(self):
+        self.assertEqual(list(map_concurrently(str, [1, 2], max_workers=1)), ['1', '2'])
+
+    def test_should_raise_error(self):
+        def fail(value):
+            raise ValueError(value)
+
+        self.assertRaises(ValueError, list, map_concurrently(fail, [1, 2]))
+
+    def test_should_not_consume_the_items_ahead_of_the_results(self):
+        consumed = []
+
+        def items():
+            for value in range(100):
+                consumed.append(value)
+                yield value
+
+        results = map_concurrently(str, items(), max_workers=2)
+
+        self.assertEqual(next(results), '0')
+        self.assertLessEqual(len(consumed), 4)
+        self.assertEqual(list(results), [str(value) for value in range(1, 100)])
+
+
+class RateLimiterSpec(unittest.TestCase):
+    def test_should_not_wait_without_rate(self):
+        limiter = RateLimiter()
+        started = time.time()
+
+        for _ in range(100):
+            limiter.wait()
+
+        self.assertLess(time.time() - started, 0.1)
+
+    def test_should_space_out_calls(self):
+        limiter = RateLimiter(50)
+        limited = limiter.limit(time.time)
+
+        calls = run_concurrently([limited] * 5, max_workers=5)
+
+        self.assertGreaterEqual(max(calls) - min(calls), 0.07)
+
+
+class JsonFileSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_should_return_default_when_file_does_not_exist(self):
+        self.assertEqual(load_json_file(self.file_path, default={}), {})
+
+    def test_should_save_and_load(self):
+        save_json_file(self.file_path, dict(watermark='2017-01-01T00:00:00.000Z'))
+
+        self.assertEqual(load_json_file(self.file_path), dict(watermark='2017-01-01T00:00:00.000Z'))
+        self.assertEqual(os.listdir(self.directory), ['state.json'])
+
+
+class GetChangedSinceSpec(unittest.TestCase):
+    def setUp(self):
+        self.resource_client = Mock()
+
+    def test_should_get_all_sorted_on_first_call(self):
+        self.resource_client.get_all.return_value = [dict(uri='/rest/tasks/1', modified='2017-01-01T00:00:01.000Z'),
+                                                     dict(uri='/rest/tasks/2', modified='2017-01-01T00:00:02.000Z')]
+
+        changed, cursor = get_changed_since(self.resource_client, dict(count=100), None)
+
+        self.resource_client.get_all.assert_called_once_with(count=100, sort='modified:ascending')
+        self.assertEqual(len(changed), 2)
+        self.assertEqual(cursor, dict(watermark='2017-01-01T00:00:02.000Z', uris=['/rest/tasks/2']))
+
+    def test_should_filter_by_watermark_and_skip_resources_already_seen(self):
+        self.resource_client.get_all.return_value = [dict(uri='/rest/tasks/2', modified='2017-01-01T00:00:02.000Z'),
+                                                     dict(uri='/rest/tasks/3', modified='2017-01-01T00:00:02.000Z')]
+        cursor = dict(watermark='2017-01-01T00:00:02.000Z', uris=['/rest/tasks/2'])
+
+        changed, cursor = get_changed_since(self.resource_client, dict(filter="taskState='Error'"), cursor)
+
+        self.resource_client.get_all.assert_called_once_with(
+            filter=["taskState='Error'", "modified >= '2017-01-01T00:00:02.000Z'"], sort='modified:ascending')
+        self.assertEqual(changed, [dict(uri='/rest/tasks/3', modified='2017-01-01T00:00:02.000Z')])
+        self.assertEqual(cursor, dict(watermark='2017-01-01T00:00:02.000Z', uris=['/rest/tasks/2', '/rest/tasks/3']))
+
+    def test_should_keep_cursor_when_nothing_changed(self):
+        self.resource_client.get_all.return_value = [dict(uri='/rest/tasks/2', modified='2017-01-01T00:00:02.000Z')]
+        cursor = dict(watermark='2017-01-01T00:00:02.000Z', uris=['/rest/tasks/2'])
+
+        changed, new_cursor = get_changed_since(self.resource_client, None, cursor)
+
+        self.assertEqual(changed, [])
+        self.assertEqual(new_cursor, cursor)
+
+    def test_should_keep_uri_and_timestamp_when_projecting(self):
+        self.resource_client.get_all.return_value = [dict(uri='/rest/tasks/1', modified='2017-01-01T00:00:01.000Z',
+                                                          name='Update', taskState='Completed')]
+
+        changed, _ = get_changed_since(self.resource_client, None, None, fields=['taskState'])
+
+        self.assertEqual(changed, [dict(uri='/rest/tasks/1', modified='2017-01-01T00:00:01.000Z',
+                                        taskState='Completed')])
+
+
+class RankCandidatesSpec(unittest.TestCase):
+    def test_should_keep_a_stable_order_for_each_owner(self):
+        candidates = ['/rest/server-hardware/{0}'.format(index) for index in range(10)]
+
+        ranked = rank_candidates(candidates, 'esxi-01')
+
+        self.assertEqual(sorted(ranked), sorted(candidates))
+        self.assertEqual(rank_candidates(list(reversed(candidates)), 'esxi-01'), ranked)
+        self.assertNotEqual(rank_candidates(candidates, 'esxi-02'), ranked)
+
+
+class ResourceReservationsSpec(unittest.TestCase):
+    CANDIDATES = ['/rest/server-hardware/1', '/rest/server-hardware/2']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, 'reservations.json')
+
+    def test_should_reserve_distinct_candidates(self):
+        reservations = ResourceReservations()
+
+        reserved = [reservations.reserve(self.CANDIDATES, owner) for owner in ('a', 'b', 'c')]
+
+        self.assertEqual(sorted(reserved[:2]), self.CANDIDATES)
+        self.assertIsNone(reserved[2])
+
+    def test_should_share_the_reservations_through_the_file(self):
+        first = ResourceReservations(self.file_path).reserve(self.CANDIDATES, 'a')
+        second = ResourceReservations(self.file_path).reserve(self.CANDIDATES, 'a')
+
+        self.assertEqual(sorted([first, second]), self.CANDIDATES)
+
+    def test_should_reserve_again_after_release(self):
+        reservations = ResourceReservations(self.file_path)
+        reserved = reservations.reserve(self.CANDIDATES[:1], 'a')
+
+        reservations.release(reserved)
+
+        self.assertEqual(ResourceReservations(self.file_path).reserve(self.CANDIDATES[:1], 'b'), reserved)
+
+    def test_should_reserve_again_after_the_lease_expires(self):
+        ResourceReservations(self.file_path, lease=-1).reserve(self.CANDIDATES[:1], 'a')
+
+        self.assertEqual(ResourceReservations(self.file_path).reserve(self.CANDIDATES[:1], 'b'), self.CANDIDATES[0])
+
+
+class GetPatchOperationsSpec(unittest.TestCase):
+    def test_should_emit_only_the_changed_paths(self):
+        current = dict(name='net', vlanId=1, bandwidth=dict(typicalBandwidth=2000, maximumBandwidth=10000),
+                       networkUris=['/rest/ethernet-networks/1'])
+        desired = dict(current, bandwidth=dict(typicalBandwidth=2500, maximumBandwidth=10000),
+                       networkUris=['/rest/ethernet-networks/1', '/rest/ethernet-networks/2'], purpose='Management')
+
+        self.assertEqual(get_patch_operations(current, desired), [
+            dict(op='replace', path='/bandwidth/typicalBandwidth', value=2500),
+            dict(op='replace', path='/networkUris', value=['/rest/ethernet-networks/1', '/rest/ethernet-networks/2']),
+            dict(op='add', path='/purpose', value='Management')])
+
+    def test_should_escape_the_json_pointer(self):
+        self.assertEqual(get_patch_operations({'a/b': 1}, {'a/b': 2}), [dict(op='replace', path='/a~1b', value=2)])
+
+    def test_should_return_no_operations_when_equal(self):
+        self.assertEqual(get_patch_operations(dict(SERVER_HARDWARE), dict(SERVER_HARDWARE)), [])
+
+
+class MergeAndUpdateSpec(unittest.TestCase):
+    CURRENT = dict(uri='/rest/ethernet-networks/1', name='Net1', vlanId=10, smartLink=False, purpose='General',
+                   eTag='1')
+    ETAG_MISMATCH = dict(errorCode='PRECONDITION_FAILED', message='The resource was modified by another request.')
+
+    def setUp(self):
+        patcher = patch('module_utils.oneview.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.resource_client = Mock()
+        self.update = Mock(side_effect=lambda current, merged: merged)
+
+    def test_should_update_the_merged_resource(self):
+        result = merge_and_update(self.resource_client, self.CURRENT, dict(smartLink=True), update=self.update)
+
+        self.assertEqual(result, (dict(self.CURRENT, smartLink=True), True))
+        self.update.assert_called_once_with(self.CURRENT, dict(self.CURRENT, smartLink=True))
+
+    def test_should_use_update_resource_by_default(self):
+        merge_and_update(self.resource_client, self.CURRENT, dict(smartLink=True))
+
+        self.resource_client.update.assert_called_once_with(dict(self.CURRENT, smartLink=True))
+
+    def test_should_not_update_when_nothing_changed(self):
+        result = merge_and_update(self.resource_client, self.CURRENT, dict(name='Net1'), update=self.update)
+
+        self.assertEqual(result, (self.CURRENT, False))
+        self.update.assert_not_called()
+
+    def test_should_merge_over_the_fresh_resource_after_a_conflict(self):
+        fresh = dict(self.CURRENT, purpose='Management', eTag='2')
+        self.resource_client.get.return_value = fresh
+        self.update.side_effect = [HPOneViewException(self.ETAG_MISMATCH), dict(fresh, smartLink=True)]
+
+        result = merge_and_update(self.resource_client, self.CURRENT, dict(smartLink=True), update=self.update)
+
+        self.assertEqual(result, (dict(fresh, smartLink=True), True))
+        self.resource_client.get.assert_called_once_with('/rest/ethernet-networks/1')
+        self.assertEqual(self.update.call_args, call(fresh, dict(fresh, smartLink=True)))
+        self.mock_time.sleep.assert_called_once_with(0.5)
+
+    def test_should_not_update_when_someone_else_made_the_same_change(self):
+        fresh = dict(self.CURRENT, smartLink=True, eTag='2')
+        self.resource_client.get.return_value = fresh
+        self.update.side_effect = HPOneViewException(self.ETAG_MISMATCH)
+
+        result = merge_and_update(self.resource_client, self.CURRENT, dict(smartLink=True), update=self.update)
+
+        self.assertEqual(result, (fresh, False))
+        self.assertEqual(self.update.call_count, 1)
+
+    def test_should_fail_when_someone_else_changed_the_same_attribute(self):
+        self.resource_client.get.return_value = dict(self.CURRENT, vlanId=30, eTag='2')
+        self.update.side_effect = HPOneViewException(self.ETAG_MISMATCH)
+
+        with self.assertRaises(HPOneViewException) as context:
+            merge_and_update(self.resource_client, self.CURRENT, dict(vlanId=20, smartLink=True), update=self.update)
+
+        self.assertEqual(context.exception.msg, RESOURCE_CONFLICT.format('/vlanId'))
+        self.assertEqual(self.update.call_count, 1)
+
+    def test_should_fail_when_the_resource_was_removed(self):
+        self.resource_client.get.return_value = None
+        self.update.side_effect = HPOneViewException(self.ETAG_MISMATCH)
+
+        with self.assertRaises(HPOneViewException) as context:
+            merge_and_update(self.resource_client, self.CURRENT, dict(smartLink=True), update=self.update)
+
+        self.assertEqual(context.exception.msg, RESOURCE_REMOVED)
+
+    def test_should_back_off_and_give_up_after_the_retries(self):
+        self.resource_client.get.side_effect = lambda uri: dict(self.CURRENT, eTag=str(self.update.call_count + 1))
+        self.update.side_effect = HPOneViewException(self.ETAG_MISMATCH)
+
+        self.assertRaises(HPOneViewException, merge_and_update, self.resource_client, self.CURRENT,
+                          dict(smartLink=True), update=self.update, retries=5)
+
+        self.assertEqual(self.update.call_count, 6)
+        self.assertEqual([args[0][0] for args in self.mock_time.sleep.call_args_list], [0.5, 1, 2, 4, 8])
+
+    def test_should_not_retry_other_errors(self):
+        self.update.side_effect = HPOneViewException(dict(errorCode='INVALID_VLAN_ID', message='Invalid VLAN ID.'))
+
+        self.assertRaises(HPOneViewException, merge_and_update, self.resource_client, self.CURRENT,
+                          dict(vlanId=5000), update=self.update)
+
+        self.resource_client.get.assert_not_called()
+
+    def test_should_recognize_the_etag_conflicts(self):
+        self.assertTrue(is_etag_conflict(HPOneViewException(self.ETAG_MISMATCH)))
+        self.assertTrue(is_etag_conflict(HPOneViewException(dict(errorCode='UNKNOWN', httpStatus=412,
+                                                                 message='The eTag does not match.'))))
+        self.assertTrue(is_etag_conflict(HPOneViewException('412 Precondition Failed')))
+        self.assertFalse(is_etag_conflict(HPOneViewException(dict(errorCode='RESOURCE_NOT_FOUND',
+                                                                  message='Resource not found.'))))
+
+    def test_should_not_take_other_errors_that_mention_the_etag_as_conflicts(self):
+        self.assertFalse(is_etag_conflict(HPOneViewException(dict(errorCode='INVALID_ETAG_FORMAT', httpStatus=400,
+                                                                  message='The eTag is malformed.'))))
+        self.assertFalse(is_etag_conflict(HPOneViewException(dict(errorCode='UNKNOWN',
+                                                                  message='The eTag does not match.'))))
+        self.assertFalse(is_etag_conflict(HPOneViewException(dict(errorCode='INVALID_NAME',
+                                                                  message="Name 'metagroup' is invalid."))))
+
+
+class ResourceCompareSpec(unittest.TestCase):
+    PROFILE = dict(name='Profile101', eTag='1', modified='2017-01-01T00:00:00.000Z', status='OK',
+                   connections=[dict(id=1, networkUri='/rest/ethernet-networks/1', requestedMbps=2500),
+                                dict(id=2, networkUri='/rest/ethernet-networks/2', requestedMbps=2500)],
+                   bios=dict(manageBios=True, overriddenSettings=[]))
+
+    def test_should_ignore_server_managed_fields(self):
+        other = dict(self.PROFILE, eTag='2', modified='2017-02-01T00:00:00.000Z', status='Critical')
+
+        self.assertTrue(resource_compare(self.PROFILE, other))
+
+    def test_should_ignore_list_order_and_value_types(self):
+        connections = [dict(id='2', networkUri='/rest/ethernet-networks/2', requestedMbps=2500.0),
+                       dict(id=1, networkUri='/rest/ethernet-networks/1', requestedMbps=2500)]
+        other = dict(self.PROFILE, connections=connections)
+
+        self.assertTrue(resource_compare(self.PROFILE, other))
+
+    def test_should_consider_missing_and_empty_values_equivalent(self):
+        other = dict(self.PROFILE, bios=dict(manageBios=True), description=None)
+
+        self.assertTrue(resource_compare(self.PROFILE, other))
+
+    def test_should_find_nested_differences(self):
+        other = deepcopy(self.PROFILE)
+        other['connections'][1]['requestedMbps'] = 5000
+
+        self.assertFalse(resource_compare(self.PROFILE, other))
+
+    def test_should_find_missing_attributes(self):
+        other = dict(self.PROFILE)
+        del other['name']
+
+        self.assertFalse(resource_compare(self.PROFILE, other))
+        self.assertFalse(resource_compare(other, self.PROFILE))
+
+    def test_should_hash_equivalent_resources_equally(self):
+        other = dict(self.PROFILE, eTag='2', connections=list(reversed(self.PROFILE['connections'])))
+
+        self.assertEqual(canonical_hash(self.PROFILE), canonical_hash(other))
+        self.assertNotEqual(canonical_hash(self.PROFILE), canonical_hash(dict(self.PROFILE, name='Profile102')))
+
+
+class UploadFileSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'spp.iso')
+        self.content = b'0123456789' * 10
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.content)
+
+        self.http_connection = Mock()
+        self.http_connection.getresponse.return_value.read.return_value = b'{"category": "tasks"}'
+        self.connection = Mock(_headers=dict(auth='token'), _apiVersion=300)
+        self.connection.get_connection.return_value = self.http_connection
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_should_compute_the_digest_in_chunks(self):
+        self.assertEqual(file_digest(self.file_path, chunk_size=7), hashlib.sha256(self.content).hexdigest())
+
+    def test_should_stream_the_file_in_chunks(self):
+        progress = Mock()
+
+        response, body, digest = upload_file(self.connection, '/rest/firmware-bundles', self.file_path,
+                                             chunk_size=30, progress=progress)
+
+        sent = b''.join(send_call[0][0] for send_call in self.http_connection.send.call_args_list)
+        self.assertEqual(self.http_connection.send.call_count, 6)
+        self.assertIn(b'filename="spp.iso"', sent)
+        self.assertIn(self.content, sent)
+        self.assertTrue(sent.endswith(('--' + UPLOAD_BOUNDARY + '--\r\n\r\n').encode('utf-8')))
+        self.http_connection.putheader.assert_any_call('Content-Length', str(len(sent)))
+        self.http_connection.putheader.assert_any_call('auth', 'token')
+        self.http_connection.putrequest.assert_called_once_with('POST', '/rest/firmware-bundles')
+        self.http_connection.close.assert_called_once_with()
+        self.assertEqual(progress.call_args_list, [call(30, 100), call(60, 100), call(90, 100), call(100, 100)])
+        self.assertEqual(body, dict(category='tasks'))
+        self.assertEqual(digest, hashlib.sha256(self.content).hexdigest())
+
+    def test_should_hold_a_request_ticket_of_the_governor_while_uploading(self):
+        governor = ApiGovernor(os.path.join(self.directory, 'governor.db'), max_requests=1)
+        self.connection.get_host.return_value = '10.0.0.10'
+        governor.install(self.connection)
+        statuses = []
+        self.http_connection.send.side_effect = lambda data: statuses.append(governor.get_status('10.0.0.10'))
+
+        upload_file(self.connection, '/rest/firmware-bundles', self.file_path)
+
+        self.assertTrue(all(status['requests'] == 1 for status in statuses))
+        self.assertEqual(governor.get_status('10.0.0.10')['requests'], 0)
+
+    @patch('module_utils.oneview.time')
+    def test_should_limit_the_bandwidth(self, mock_time):
+        mock_time.time.side_effect = [100.0, 100.25, 100.5, 102.5, 103.0]
+
+        upload_file(self.connection, '/rest/firmware-bundles', self.file_path, chunk_size=25, max_rate=50)
+
+        # at 50 bytes/s each 25 bytes chunk is due half a second after the previous one
+        self.assertEqual(mock_time.sleep.call_args_list, [call(0.25), call(0.5)])
+
+    def test_should_close_the_connection_when_the_transfer_fails(self):
+        self.http_connection.send.side_effect = [None, IOError('Connection reset by peer')]
+
+        self.assertRaises(IOError, upload_file, self.connection, '/rest/firmware-bundles', self.file_path)
+        self.http_connection.close.assert_called_once_with()
+
+    def test_should_log_the_progress_by_steps(self):
+        log_progress = progress_logger('spp.iso', step=50)
+
+        with patch('module_utils.oneview.logger') as logger:
+            for sent in [10, 40, 60, 90, 100]:
+                log_progress(sent, 100)
+
+        self.assertEqual(logger.info.call_args_list, [call('spp.iso: 10 of 100 bytes sent (10%)'),
+                                                      call('spp.iso: 60 of 100 bytes sent (60%)'),
+                                                      call('spp.iso: 100 of 100 bytes sent (100%)')])
+
+    def test_should_get_the_task_from_the_location(self):
+        response = Mock(status=202)
+        response.getheader.return_value = '/rest/tasks/1'
+        self.connection.get.return_value = dict(uri='/rest/tasks/1')
+
+        self.assertEqual(get_upload_task(self.connection, response, {}), dict(uri='/rest/tasks/1'))
+        self.connection.get.assert_called_once_with('/rest/tasks/1')
+
+    def test_should_return_the_task_from_the_body(self):
+        task = dict(category='tasks', uri='/rest/tasks/1')
+
+        self.assertEqual(get_upload_task(self.connection, Mock(status=200), task), task)
+
+    def test_should_return_none_when_the_body_is_the_result(self):
+        self.assertIsNone(get_upload_task(self.connection, Mock(status=200), dict(category='firmware-drivers')))
+
+
+class FakeDownloadResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self.stream = io.BytesIO(content)
+
+    def getheader(self, name):
+        return self.headers.get(name)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+class FakeDownloadConnection(object):
+    """
+    Serves a content honoring the 'Range' header like the appliance, optionally dropping the connection after
+    'drop_after' bytes of each response.
+    """
+
+    def __init__(self, content, accept_ranges=True, drop_after=None, etag=None):
+        self.content = content
+        self.accept_ranges = accept_ranges
+        self.drop_after = drop_after
+        self.etag = etag
+        self.ranges = []
+        self.if_ranges = []
+        self._headers = dict(auth='token')
+        self.__lock = threading.Lock()
+
+    def get_connection(self):
+        connection = Mock()
+        connection.request.side_effect = partial(self.__request, connection)
+        return connection
+
+    def __request(self, connection, method, uri, body, headers):
+        content_range = headers.get('Range')
+        if headers.get('If-Range'):
+            self.if_ranges.append(headers['If-Range'])
+        if not content_range or not self.accept_ranges or headers.get('If-Range', self.etag) != self.etag:
+            response = FakeDownloadResponse(200, self.__drop(self.content), {'ETag': self.etag})
+        else:
+            start, end = [int(value) for value in content_range[len('bytes='):].split('-')]
+            with self.__lock:
+                self.ranges.append((start, end))
+            response = FakeDownloadResponse(206, self.__drop(self.content[start:end + 1]), {
+                'Content-Range': 'bytes {0}-{1}/{2}'.format(start, end, len(self.content)), 'ETag': self.etag})
+        connection.getresponse.return_value = response
+
+    def __drop(self, content):
+        return content[:self.drop_after] if self.drop_after else content
+
+
+class DownloadFileSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'image.zip')
+        self.content = os.urandom(1000)
+        self.digest = hashlib.sha256(self.content).hexdigest()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __read_file(self):
+        with open(self.file_path, 'rb') as stream:
+            return stream.read()
+
+    def test_should_download_hashing_while_streaming(self):
+        connection = FakeDownloadConnection(self.content)
+        progress = Mock()
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=300,
+                                 progress=progress)
+
+        self.assertEqual(manifest, dict(source='/rest/golden-images/download/1', size=1000, sha256=self.digest))
+        self.assertEqual(self.__read_file(), self.content)
+        self.assertEqual(connection.ranges, [(0, 0), (0, 999)])
+        self.assertEqual(progress.call_args_list[-1], call(1000, 1000))
+        self.assertEqual(os.listdir(self.directory), ['image.zip'])
+
+    def test_should_download_the_ranges_in_parallel(self):
+        connection = FakeDownloadConnection(self.content)
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=100,
+                                 max_workers=3)
+
+        self.assertEqual(manifest['sha256'], self.digest)
+        self.assertEqual(self.__read_file(), self.content)
+        self.assertEqual(sorted(connection.ranges[1:]), [(0, 333), (334, 667), (668, 999)])
+        self.assertEqual(os.listdir(self.directory), ['image.zip'])
+
+    def test_should_hold_a_request_ticket_of_the_governor_for_each_range(self):
+        governor_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, governor_directory)
+        governor = ApiGovernor(os.path.join(governor_directory, 'governor.db'), max_requests=1)
+        connection = FakeDownloadConnection(self.content)
+        connection.get_host = lambda: '10.0.0.10'
+        connection.do_http = Mock()
+        governor.install(connection)
+        get_connection = connection.get_connection
+        in_flight = []
+        connection.get_connection = lambda: in_flight.append(governor.get_status('10.0.0.10')['requests']) or \
+            get_connection()
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=100,
+                                 max_workers=3)
+
+        self.assertEqual(manifest['sha256'], self.digest)
+        self.assertEqual(in_flight, [1, 1, 1, 1])
+        self.assertEqual(governor.get_status('10.0.0.10')['requests'], 0)
+
+    def test_should_resume_from_the_bytes_already_received(self):
+        connection = FakeDownloadConnection(self.content, drop_after=600, etag='"1"')
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=2000, version='1')
+        connection.drop_after = None
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=2000,
+                                 version='1')
+
+        self.assertEqual(connection.ranges[2:], [(0, 0), (600, 999)])
+        self.assertEqual(connection.if_ranges, ['"1"'])
+        self.assertEqual(manifest['sha256'], self.digest)
+        self.assertEqual(self.__read_file(), self.content)
+        self.assertEqual(os.listdir(self.directory), ['image.zip'])
+
+    def test_should_discard_the_parts_of_another_version(self):
+        connection = FakeDownloadConnection(self.content, drop_after=600)
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=2000, version='1')
+        new_content = os.urandom(1000)
+        connection = FakeDownloadConnection(new_content)
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=2000,
+                                 version='2')
+
+        self.assertEqual(connection.ranges, [(0, 0), (0, 999)])
+        self.assertEqual(manifest['sha256'], hashlib.sha256(new_content).hexdigest())
+        self.assertEqual(self.__read_file(), new_content)
+
+    def test_should_discard_the_parts_when_the_file_shrank(self):
+        connection = FakeDownloadConnection(self.content, drop_after=90)
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=2000)
+        connection = FakeDownloadConnection(self.content[:50])
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=2000)
+
+        self.assertEqual(manifest['size'], 50)
+        self.assertEqual(self.__read_file(), self.content[:50])
+
+    def test_should_discard_a_part_larger_than_its_range(self):
+        connection = FakeDownloadConnection(self.content, drop_after=150)
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=100, max_workers=2)
+        with open(self.file_path + '.part0of2', 'ab') as stream:
+            stream.write(os.urandom(400))
+        connection.drop_after = None
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=100,
+                                 max_workers=2)
+
+        self.assertEqual(sorted(connection.ranges[4:]), [(0, 499), (650, 999)])
+        self.assertEqual(manifest['sha256'], self.digest)
+
+    def test_should_discard_the_part_when_the_file_changed_during_the_download(self):
+        connection = FakeDownloadConnection(self.content, drop_after=600, etag='"1"')
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=2000)
+        connection.drop_after = None
+        probe = connection.get_connection
+
+        def change_after_the_probe():
+            connection.get_connection = probe
+            http_connection = probe()
+            http_connection.close.side_effect = lambda: setattr(connection, 'etag', '"2"')
+            return http_connection
+
+        connection.get_connection = change_after_the_probe
+
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path,
+                          chunk_size=2000)
+        self.assertEqual(connection.if_ranges, ['"1"'])
+        self.assertFalse(os.path.exists(self.file_path + '.part0of1'))
+
+    def test_should_keep_the_received_ranges_when_the_connection_drops(self):
+        connection = FakeDownloadConnection(self.content, drop_after=150)
+
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1',
+                          self.file_path, chunk_size=100, max_workers=2)
+        self.assertFalse(os.path.exists(self.file_path))
+
+        connection.drop_after = None
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, chunk_size=100,
+                                 max_workers=2)
+
+        self.assertEqual(sorted(connection.ranges[4:]), [(150, 499), (650, 999)])
+        self.assertEqual(manifest['sha256'], self.digest)
+        self.assertEqual(self.__read_file(), self.content)
+
+    def test_should_download_from_the_start_when_ranges_are_not_accepted(self):
+        with open(self.file_path + '.part0of1', 'wb') as stream:
+            stream.write(b'stale')
+        connection = FakeDownloadConnection(self.content, accept_ranges=False)
+
+        manifest = download_file(connection, '/rest/golden-images/download/1', self.file_path, max_workers=4)
+
+        self.assertEqual(manifest, dict(source='/rest/golden-images/download/1', size=1000, sha256=self.digest))
+        self.assertEqual(self.__read_file(), self.content)
+
+    def test_should_fail_when_the_endpoint_answers_an_error(self):
+        connection = Mock(_headers={})
+        connection.get_connection.return_value.getresponse.return_value = FakeDownloadResponse(404, b'Not found')
+
+        self.assertRaises(TransferError, download_file, connection, '/rest/golden-images/download/1', self.file_path)
+
+    def test_should_load_the_manifest_of_the_downloaded_file(self):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.content)
+        save_manifest(self.file_path, dict(source='/rest/golden-images/download/1', size=1000, sha256=self.digest))
+
+        self.assertEqual(load_manifest(self.file_path)['sha256'], self.digest)
+
+    def test_should_not_load_the_manifest_when_the_file_size_differs(self):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(self.content[:10])
+        save_manifest(self.file_path, dict(source='/rest/golden-images/download/1', size=1000, sha256=self.digest))
+
+        self.assertIsNone(load_manifest(self.file_path))
+        os.remove(self.file_path)
+        self.assertIsNone(load_manifest(self.file_path))
+
+
+class ArtifactCacheSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ArtifactCache(os.path.join(self.directory, 'cache'), max_size=250)
+        self.file_path = os.path.join(self.directory, 'bundle.zip')
+        self.downloads = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __download(self, content):
+        def download():
+            self.downloads.append(content)
+            with open(self.file_path, 'wb') as stream:
+                stream.write(content)
+            return dict(size=len(content), sha256=hashlib.sha256(content).hexdigest())
+        return download
+
+    def __read_file(self):
+        with open(self.file_path, 'rb') as stream:
+            return stream.read()
+
+    def test_should_identify_the_source_by_appliance(self):
+        connection = Mock()
+        connection.get_host.return_value = '10.0.0.1'
+
+        self.assertEqual(transfer_source(connection, '/rest/artifact-bundles/download/1'),
+                         '10.0.0.1/rest/artifact-bundles/download/1')
+
+    def test_should_download_when_the_source_is_not_cached(self):
+        manifest, downloaded = self.cache.fetch('host/uri', 'etag-1', self.file_path, self.__download(b'a' * 100))
+
+        self.assertTrue(downloaded)
+        self.assertEqual(manifest['size'], 100)
+        self.assertTrue(os.path.exists(self.cache.get_path(manifest['sha256'])))
+
+    def test_should_copy_the_cached_file_while_the_version_is_unchanged(self):
+        self.cache.fetch('host/uri', 'etag-1', self.file_path, self.__download(b'a' * 100))
+        os.remove(self.file_path)
+
+        manifest, downloaded = self.cache.fetch('host/uri', 'etag-1', self.file_path, self.__download(b'b' * 100))
+
+        self.assertFalse(downloaded)
+        self.assertEqual(self.downloads, [b'a' * 100])
+        self.assertEqual(self.__read_file(), b'a' * 100)
+        self.assertEqual(manifest, dict(size=100, sha256=hashlib.sha256(b'a' * 100).hexdigest()))
+
+    def test_should_download_when_the_cached_file_is_evicted_while_copied(self):
+        self.cache.fetch('host/uri', 'etag-1', self.file_path, self.__download(b'a' * 100))
+
+        with patch('module_utils.oneview.shutil.copyfile', side_effect=IOError(2, 'No such file or directory')):
+            manifest, downloaded = self.cache.fetch('host/uri', 'etag-1', self.file_path,
+                                                    self.__download(b'a' * 100))
+
+        self.assertTrue(downloaded)
+        self.assertEqual(self.downloads, [b'a' * 100, b'a' * 100])
+        self.assertEqual(manifest['sha256'], hashlib.sha256(b'a' * 100).hexdigest())
+
+    def test_should_download_again_when_the_version_changed(self):
+        self.cache.fetch('host/uri', 'etag-1', self.file_path, self.__download(b'a' * 100))
+
+        manifest, downloaded = self.cache.fetch('host/uri', 'etag-2', self.file_path, self.__download(b'b' * 100))
+
+        self.assertTrue(downloaded)
+        self.assertEqual(self.__read_file(), b'b' * 100)
+
+    def test_should_never_serve_a_source_without_version(self):
+        self.cache.fetch('host/uri', None, self.file_path, self.__download(b'a' * 100))
+
+        self.assertTrue(self.cache.fetch('host/uri', None, self.file_path, self.__download(b'a' * 100))[1])
+
+    def test_should_store_the_same_content_once(self):
+        self.cache.fetch('host-1/uri', 'etag-1', self.file_path, self.__download(b'a' * 100))
+        self.cache.fetch('host-2/uri', 'etag-9', self.file_path, self.__download(b'a' * 100))
+
+        digest = hashlib.sha256(b'a' * 100).hexdigest()
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'cache', digest[:2])), [digest])
+
+    def test_should_evict_the_least_recently_used_files(self):
+        self.cache.fetch('host/a', 'v', self.file_path, self.__download(b'a' * 100))
+        time.sleep(0.01)
+        self.cache.fetch('host/b', 'v', self.file_path, self.__download(b'b' * 100))
+        time.sleep(0.01)
+        self.cache.fetch('host/a', 'v', self.file_path, self.__download(b'x'))
+        time.sleep(0.01)
+        self.cache.fetch('host/c', 'v', self.file_path, self.__download(b'c' * 100))
+
+        self.assertFalse(os.path.exists(self.cache.get_path(hashlib.sha256(b'b' * 100).hexdigest())))
+        self.assertTrue(self.cache.fetch('host/b', 'v', self.file_path, self.__download(b'b' * 100))[1])
+        self.assertFalse(self.cache.fetch('host/c', 'v', self.file_path, self.__download(b'x'))[1])
+
+    def test_should_keep_a_file_bigger_than_the_maximum_size(self):
+        digest = self.cache.add(self.__write(b'a' * 300))
+
+        self.assertTrue(os.path.exists(self.cache.get_path(digest)))
+
+    def test_should_record_the_uploads_by_target(self):
+        self.cache.record_upload('10.0.0.1', 'digest', '/rest/artifact-bundles/1')
+
+        self.assertEqual(self.cache.get_upload('10.0.0.1', 'digest'), '/rest/artifact-bundles/1')
+        self.assertIsNone(self.cache.get_upload('10.0.0.2', 'digest'))
+
+        self.cache.record_upload('10.0.0.1', 'digest', None)
+        self.assertIsNone(self.cache.get_upload('10.0.0.1', 'digest'))
+
+    def test_should_share_the_index_between_instances(self):
+        self.cache.record_upload('10.0.0.1', 'digest', '/rest/artifact-bundles/1')
+
+        other_cache = ArtifactCache(os.path.join(self.directory, 'cache'))
+
+        self.assertEqual(other_cache.get_upload('10.0.0.1', 'digest'), '/rest/artifact-bundles/1')
+
+    def __write(self, content):
+        with open(self.file_path, 'wb') as stream:
+            stream.write(content)
+        return self.file_path
+
+
+class ResourceClientWrapper(object):
+    def __init__(self, client):
+        self._client = client
+
+
+class StartTaskSpec(unittest.TestCase):
+    TASK = dict(uri='/rest/tasks/1', taskState='Running')
+
+    def setUp(self):
+        self.connection = Mock()
+        self.client = ResourceClient(self.connection, '/rest/resources')
+        self.task_monitor = Mock()
+        self.client._task_monitor = self.task_monitor
+        self.resource = ResourceClientWrapper(self.client)
+
+    def test_should_return_the_task_without_waiting_for_it(self):
+        self.connection.post.return_value = self.TASK, None
+
+        task, result = start_task(self.resource, partial(self.client.create, dict(name='Resource')))
+
+        self.assertEqual(task, self.TASK)
+        self.assertEqual(result, self.TASK)
+        self.task_monitor.wait_for_task.assert_not_called()
+        self.connection.post.assert_called_once_with('/rest/resources', dict(name='Resource'), custom_headers=None)
+
+    def test_should_return_none_when_no_task_was_started(self):
+        self.connection.post.return_value = None, dict(name='Resource')
+
+        task, result = start_task(self.resource, partial(self.client.create, dict(name='Resource')))
+
+        self.assertIsNone(task)
+        self.assertEqual(result, dict(name='Resource'))
+
+    def test_should_restore_the_task_monitor(self):
+        self.connection.post.return_value = self.TASK, None
+        start_task(self.resource, partial(self.client.create, dict(name='Resource')))
+
+        self.assertIs(self.client._task_monitor, self.task_monitor)
+
+    def test_should_restore_the_task_monitor_on_failure(self):
+        self.connection.post.side_effect = IOError('Connection reset')
+
+        self.assertRaises(IOError, start_task, self.resource, partial(self.client.create, dict(name='Resource')))
+        self.assertIs(self.client._task_monitor, self.task_monitor)
+
+
+class EstateIndexSpec(unittest.TestCase):
+    BLADE = dict(uri='/rest/server-hardware/1', name='Encl1, bay 1', serialNumber='VCGE9KB041', state='ProfileApplied',
+                 status='OK', locationUri='/rest/enclosures/1', modified='2017-06-01T10:00:00.000Z')
+    RACK_SERVER = dict(uri='/rest/server-hardware/2', name='rack-01', serialNumber='VCGE9KB042',
+                       state='NoProfileApplied', status='Warning', locationUri=None,
+                       modified='2017-06-01T11:00:00.000Z')
+    PROFILE = dict(uri='/rest/server-profiles/1', name='esxi-01', enclosureUri='/rest/enclosures/1', state='Normal',
+                   status='OK', modified='2017-06-01T10:00:00.000Z')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index = EstateIndex(os.path.join(self.directory, 'estate.db'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def test_should_find_the_resources_by_the_indexed_columns(self):
+        self.index.save('server_hardware', [self.BLADE, self.RACK_SERVER], None, 100.0, full=True)
+        self.index.save('server_profiles', [self.PROFILE], None, 100.0, full=True)
+
+        self.assertEqual(self.index.find(type='server_hardware'), [self.BLADE, self.RACK_SERVER])
+        self.assertEqual(self.index.find(serial='VCGE9KB042'), [self.RACK_SERVER])
+        self.assertEqual(self.index.find(enclosure='/rest/enclosures/1'), [self.BLADE, self.PROFILE])
+        self.assertEqual(self.index.find(type='server_hardware', status=['OK', 'Critical']), [self.BLADE])
+        self.assertEqual(self.index.get_by_name('server_profiles', 'esxi-01'), self.PROFILE)
+        self.assertIsNone(self.index.get_by_name('server_profiles', 'esxi-02'))
+
+    def test_should_raise_on_unknown_columns(self):
+        self.assertRaises(ValueError, self.index.find, serialNumber='VCGE9KB041')
+
+    def test_should_replace_the_changed_resources_on_incremental_saves(self):
+        self.index.save('server_hardware', [self.BLADE, self.RACK_SERVER], None, 100.0, full=True)
+        changed = dict(self.BLADE, status='Critical', modified='2017-06-01T12:00:00.000Z')
+
+        self.index.save('server_hardware', [changed], dict(watermark=changed['modified'], uris=[changed['uri']]),
+                        200.0)
+
+        self.assertEqual(self.index.find(type='server_hardware'), [changed, self.RACK_SERVER])
+        self.assertEqual(self.index.get_sync('server_hardware'), dict(
+            type='server_hardware', cursor=dict(watermark=changed['modified'], uris=[changed['uri']]),
+            refreshed=200.0, full_refreshed=100.0))
+
+    def test_should_remove_the_resources_missing_on_full_saves(self):
+        self.index.save('server_hardware', [self.BLADE, self.RACK_SERVER], None, 100.0, full=True)
+        self.index.save('server_profiles', [self.PROFILE], None, 100.0, full=True)
+
+        self.index.save('server_hardware', [self.RACK_SERVER], None, 200.0, full=True)
+
+        self.assertEqual(self.index.find(type='server_hardware'), [self.RACK_SERVER])
+        self.assertEqual([(sync['type'], sync['count'], sync['full_refreshed']) for sync in self.index.get_syncs()],
+                         [('server_hardware', 1, 200.0), ('server_profiles', 1, 100.0)])
+
+    def test_should_return_none_for_types_never_saved(self):
+        self.assertIsNone(self.index.get_sync('server_hardware'))
+
+    def test_should_share_the_database_between_instances(self):
+        self.index.save('server_profiles', [self.PROFILE], None, 100.0, full=True)
+
+        other_index = EstateIndex(self.index.file_path)
+        try:
+            self.assertEqual(other_index.find(name='esxi-01'), [self.PROFILE])
+        finally:
+            other_index.close()
+
+
+class ApiGovernorSpec(unittest.TestCase):
+    APPLIANCE = '10.0.0.10'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, 'governor.db')
+
+        patcher = patch('module_utils.oneview.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_time.time.return_value = 1000.0
+
+        self.connection = Mock()
+        self.connection.get_host.return_value = self.APPLIANCE
+        self.do_http = self.connection.do_http
+
+    def __response(self, status=200, location=None):
+        response = Mock(status=status)
+        response.getheader.return_value = location
+        return response
+
+    def test_should_grant_up_to_the_max_requests_in_arrival_order(self):
+        governor = ApiGovernor(self.file_path, max_requests=1)
+        other_governor = ApiGovernor(self.file_path, max_requests=1)
+        first = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+        second = other_governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+        third = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.assertEqual(governor.poll(first), 0)
+        self.assertTrue(other_governor.poll(second))
+        governor.release(first)
+        self.assertTrue(governor.poll(third))
+        self.assertEqual(other_governor.poll(second), 0)
+
+    def test_should_grant_the_tickets_that_have_room_without_waiting_for_the_ones_ahead(self):
+        governor = ApiGovernor(self.file_path, max_requests=2)
+        first = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+        second = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+        third = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.assertEqual(governor.poll(second), 0)
+        self.assertTrue(governor.poll(third))
+        self.assertEqual(governor.poll(first), 0)
+
+    def test_should_keep_separate_queues_per_appliance(self):
+        governor = ApiGovernor(self.file_path, max_requests=1)
+        governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.assertEqual(governor.poll(governor.enqueue('10.0.0.11', ApiGovernor.REQUEST)), 0)
+
+    def test_should_space_out_the_requests_by_the_rate(self):
+        governor = ApiGovernor(self.file_path, max_requests=None, rate=4)
+        governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+        ticket = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.assertEqual(governor.poll(ticket), 0.25)
+        self.mock_time.time.return_value = 1000.25
+        self.assertEqual(governor.poll(ticket), 0)
+
+    def test_should_wait_until_a_slot_is_released(self):
+        governor = ApiGovernor(self.file_path, max_requests=1)
+        first = governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+        self.mock_time.sleep.side_effect = lambda seconds: governor.release(first)
+
+        governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.mock_time.sleep.assert_called_once_with(0.05)
+
+    def test_should_discard_the_tickets_of_processes_that_are_gone(self):
+        def kill(pid, signal):
+            if pid == 4321:
+                raise OSError(3, 'No such process')
+
+        governor = ApiGovernor(self.file_path, max_requests=1)
+        with patch('module_utils.oneview.os.getpid', return_value=4321):
+            governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+        ticket = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        with patch('module_utils.oneview.os.kill', side_effect=kill):
+            self.assertEqual(governor.poll(ticket), 0)
+
+    def test_should_expire_the_granted_tickets_after_the_lease(self):
+        governor = ApiGovernor(self.file_path, max_requests=1, lease=60)
+        governor.acquire(self.APPLIANCE, ApiGovernor.REQUEST)
+        ticket = governor.enqueue(self.APPLIANCE, ApiGovernor.REQUEST)
+
+        self.assertTrue(governor.poll(ticket))
+        self.mock_time.time.return_value = 1060.0
+        self.assertEqual(governor.poll(ticket), 0)
+
+    def test_should_govern_the_requests_of_a_connection(self):
+        governor = ApiGovernor(self.file_path, max_requests=1)
+        self.do_http.side_effect = lambda *args: (self.__response(), governor.get_status(self.APPLIANCE))
+
+        governor.install(self.connection)
+        response, status = self.connection.do_http('GET', '/rest/enclosures', '')
+
+        self.do_http.assert_called_once_with('GET', '/rest/enclosures', '', None)
+        self.assertEqual(status['requests'], 1)
+        self.assertEqual(governor.get_status(self.APPLIANCE)['requests'], 0)
+
+    def test_should_not_take_request_tickets_when_the_requests_are_not_limited(self):
+        governor = ApiGovernor(self.file_path, max_requests=None)
+        self.do_http.side_effect = lambda *args: (self.__response(), governor.get_status(self.APPLIANCE))
+
+        governor.install(self.connection)
+        response, status = self.connection.do_http('GET', '/rest/enclosures', '')
+
+        self.assertEqual(status['requests'], 0)
+
+    def test_should_hold_a_task_slot_until_the_task_is_finished(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.install(self.connection)
+
+        self.do_http.return_value = (self.__response(202, 'https://10.0.0.10/rest/tasks/1'), {})
+        self.connection.do_http('POST', '/rest/server-profiles', '{}')
+        self.assertEqual(governor.get_status(self.APPLIANCE)['task_uris'], ['/rest/tasks/1'])
+        self.assertTrue(governor.poll(governor.enqueue(self.APPLIANCE, ApiGovernor.TASK)))
+
+        task = dict(category='tasks', uri='/rest/tasks/1', taskState='Running')
+        self.do_http.return_value = (self.__response(), task)
+        self.connection.do_http('GET', '/rest/tasks/1', '')
+        self.assertEqual(governor.get_status(self.APPLIANCE)['tasks'], 1)
+
+        task = dict(category='tasks', uri='/rest/tasks/1', taskState='Completed')
+        self.do_http.return_value = (self.__response(), task)
+        self.connection.do_http('GET', '/rest/tasks/1', '')
+        self.assertEqual(governor.get_status(self.APPLIANCE)['task_uris'], [])
+
+    def test_should_get_the_held_tasks_when_waiting_for_a_task_slot(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.install(self.connection)
+        self.do_http.return_value = (self.__response(202, 'https://10.0.0.10/rest/tasks/1'), {})
+        self.connection.do_http('POST', '/rest/server-profiles', '{}')
+
+        task = dict(category='tasks', uri='/rest/tasks/1', taskState='Completed')
+        self.do_http.return_value = (self.__response(), task)
+        governor.acquire(self.APPLIANCE, ApiGovernor.TASK)
+
+        self.do_http.assert_called_with('GET', '/rest/tasks/1', '', None)
+        self.assertEqual(governor.get_status(self.APPLIANCE)['task_uris'], [])
+
+    def test_should_release_the_task_slot_of_a_task_that_is_gone(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.install(self.connection)
+        self.do_http.return_value = (self.__response(202, 'https://10.0.0.10/rest/tasks/1'), {})
+        self.connection.do_http('POST', '/rest/server-profiles', '{}')
+
+        self.do_http.return_value = (self.__response(404), dict(errorCode='RESOURCE_NOT_FOUND'))
+        governor.acquire(self.APPLIANCE, ApiGovernor.TASK)
+
+        self.assertEqual(governor.get_status(self.APPLIANCE)['tasks'], 1)
+        self.assertEqual(governor.get_status(self.APPLIANCE)['task_uris'], [])
+
+    def test_should_release_the_task_slot_when_no_task_is_started(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.install(self.connection)
+        self.do_http.return_value = (self.__response(200), dict(name='Label'))
+
+        self.connection.do_http('PUT', '/rest/labels/1', '{}')
+
+        self.assertEqual(governor.get_status(self.APPLIANCE)['tasks'], 0)
+
+    def test_should_release_the_slots_when_the_request_fails(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.install(self.connection)
+        self.do_http.side_effect = IOError('Connection reset')
+
+        self.assertRaises(IOError, self.connection.do_http, 'POST', '/rest/server-profiles', '{}')
+        status = governor.get_status(self.APPLIANCE)
+        self.assertEqual((status['requests'], status['tasks']), (0, 0))
+
+    def test_should_not_take_a_task_slot_to_log_in(self):
+        governor = ApiGovernor(self.file_path, max_tasks=1)
+        governor.acquire(self.APPLIANCE, ApiGovernor.TASK)
+        governor.install(self.connection)
+        self.do_http.return_value = (self.__response(), dict(sessionID='123'))
+
+        self.connection.do_http('POST', '/rest/login-sessions', '{}')
+
+        self.mock_time.sleep.assert_not_called()
+
+    def test_should_install_the_governor_from_the_environment(self):
+        oneview_client = Mock(connection=self.connection)
+
+        self.assertIs(govern(oneview_client, dict(ONEVIEW_GOVERNOR_FILE=self.file_path)), oneview_client)
+
+        self.assertIsNot(self.connection.do_http, self.do_http)
+        self.assertTrue(os.path.exists(self.file_path))
+
+    def test_should_install_the_governor_on_the_image_streamer_clients(self):
+        i3s_connection = Mock(do_http=Mock())
+        i3s_connection.get_host.return_value = '10.0.0.20'
+        i3s_do_http = i3s_connection.do_http
+        oneview_client = Mock(connection=self.connection)
+        oneview_client.create_image_streamer_client.return_value = Mock(connection=i3s_connection)
+
+        govern(oneview_client, dict(ONEVIEW_GOVERNOR_FILE=self.file_path))
+        i3s_client = oneview_client.create_image_streamer_client()
+
+        self.assertIs(i3s_client.connection, i3s_connection)
+        self.assertIsNot(i3s_connection.do_http, i3s_do_http)
+
+    def test_should_not_install_the_governor_when_not_configured(self):
+        oneview_client = Mock(connection=self.connection)
+
+        govern(oneview_client, {})
+
+        self.assertIs(self.connection.do_http, self.do_http)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,8 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import json
+import os
+import shutil
+import tempfile
 import unittest
-from oneview_alert_facts import AlertFactsModule
+from oneview_alert_facts import AlertFactsModule, RECENT_ALERT_URIS
 from utils import ModuleContructorTestCase
 from utils import ErrorHandlingTestCase
 import copy
@@ -36,6 +40,9 @@ ALL_ALERTS = [{
     "uri": "/rest/alerts/98"
 }]
 
+ALERT = dict(ALL_ALERTS[0], alertTypeID='Trap.cpqHe3FltTolPowerSupplyDegraded', resourceUri='/rest/server-hardware/1',
+             correlationId='1')
+
 
 class TaskFactsSpec(unittest.TestCase,
                     ModuleContructorTestCase,
@@ -86,6 +93,79 @@ class TaskFactsSpec(unittest.TestCase,
             ansible_facts=dict(alerts=ALL_ALERTS)
         )
 
+    def test_should_aggregate_alerts_changed_since_the_cursor(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cursor_file = os.path.join(directory, 'alerts.json')
+        first_alert = dict(ALERT, uri='/rest/alerts/1', created='2016-09-06T15:16:24.249Z',
+                           modified='2016-09-06T15:16:24.249Z')
+        second_alert = dict(ALERT, uri='/rest/alerts/2', severity='Critical', created='2016-09-06T15:20:00.000Z',
+                            modified='2016-09-06T15:20:00.000Z')
+        other_alert = dict(ALERT, uri='/rest/alerts/3', resourceUri='/rest/server-hardware/2',
+                           created='2016-09-06T15:20:00.000Z', modified='2016-09-06T15:20:00.000Z')
+        self.mock_ansible_module.params = dict(config='config.json', params=None, cursor_file=cursor_file,
+                                               dedupe_keys=['alertTypeID', 'resourceUri', 'correlationId'],
+                                               retention_days=None)
+
+        self.resource.get_all.return_value = [first_alert]
+        AlertFactsModule().run()
+
+        self.resource.get_all.return_value = [first_alert, second_alert, other_alert]
+        AlertFactsModule().run()
+
+        self.resource.get_all.assert_called_with(filter=["modified >= '2016-09-06T15:16:24.249Z'"],
+                                                 sort='modified:ascending')
+        self.mock_ansible_module.exit_json.assert_called_with(
+            changed=False,
+            ansible_facts=dict(
+                alerts=[second_alert, other_alert],
+                alert_summaries=[
+                    dict(alertTypeID=ALERT['alertTypeID'], resourceUri='/rest/server-hardware/1', correlationId='1',
+                         count=2, firstSeen='2016-09-06T15:16:24.249Z', lastSeen='2016-09-06T15:20:00.000Z',
+                         lastAlertUri='/rest/alerts/2', severity='Critical', alertState='Active',
+                         description=ALERT['description']),
+                    dict(alertTypeID=ALERT['alertTypeID'], resourceUri='/rest/server-hardware/2', correlationId='1',
+                         count=1, firstSeen='2016-09-06T15:20:00.000Z', lastSeen='2016-09-06T15:20:00.000Z',
+                         lastAlertUri='/rest/alerts/3', severity='Warning', alertState='Active',
+                         description=ALERT['description'])],
+                alerts_cursor=dict(cursor_file=cursor_file, watermark='2016-09-06T15:20:00.000Z', summaries=2))
+        )
+
+    def test_should_remove_summaries_out_of_retention(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cursor_file = os.path.join(directory, 'alerts.json')
+        self.resource.get_all.return_value = [
+            dict(ALERT, uri='/rest/alerts/1', correlationId='1', modified='2016-09-06T15:16:24.249Z'),
+            dict(ALERT, uri='/rest/alerts/2', correlationId='2', modified='2099-01-01T00:00:00.000Z')]
+        self.mock_ansible_module.params = dict(config='config.json', params=None, cursor_file=cursor_file,
+                                               dedupe_keys=None, retention_days=30)
+
+        AlertFactsModule().run()
+
+        with open(cursor_file) as stream:
+            store = json.load(stream)
+        self.assertEqual([summary['lastAlertUri'] for summary in store['summaries'].values()], ['/rest/alerts/2'])
+
+    def test_should_keep_only_the_last_alert_uris_of_a_summary(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cursor_file = os.path.join(directory, 'alerts.json')
+        self.resource.get_all.return_value = [
+            dict(ALERT, uri='/rest/alerts/%d' % index, modified='2016-09-06T15:16:24.249Z') for index in range(150)]
+        self.mock_ansible_module.params = dict(config='config.json', params=None, cursor_file=cursor_file,
+                                               dedupe_keys=None, retention_days=None)
+
+        AlertFactsModule().run()
+        self.resource.get_all.return_value = [dict(ALERT, uri='/rest/alerts/149', modified='2016-09-06T15:20:00.000Z')]
+        AlertFactsModule().run()
+
+        with open(cursor_file) as stream:
+            summary = list(json.load(stream)['summaries'].values())[0]
+        self.assertEqual(summary['count'], 150)
+        self.assertEqual(len(summary['recentUris']), RECENT_ALERT_URIS)
+        self.assertEqual(summary['recentUris'][-1], '/rest/alerts/149')
+
 
 if __name__ == '__main__':
     unittest.main()
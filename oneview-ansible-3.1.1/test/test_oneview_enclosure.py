@@ -21,7 +21,8 @@ import yaml
 from oneview_enclosure import EnclosureModule
 from oneview_enclosure import ENCLOSURE_ADDED, ENCLOSURE_ALREADY_EXIST, ENCLOSURE_UPDATED, \
     ENCLOSURE_REMOVED, ENCLOSURE_ALREADY_ABSENT, ENCLOSURE_RECONFIGURED, ENCLOSURE_REFRESHED, \
-    ENCLOSURE_NOT_FOUND, APPLIANCE_BAY_POWERED_ON, APPLIANCE_BAY_ALREADY_POWERED_ON, UID_ALREADY_POWERED_ON, \
+    ENCLOSURE_REFRESH_STARTED, ENCLOSURE_NOT_FOUND, APPLIANCE_BAY_POWERED_ON, APPLIANCE_BAY_ALREADY_POWERED_ON, \
+    UID_ALREADY_POWERED_ON, \
     UID_POWERED_ON, UID_POWERED_OFF, UID_ALREADY_POWERED_OFF, MANAGER_BAY_UID_ALREADY_ON, \
     MANAGER_BAY_UID_ON, BAY_NOT_FOUND, MANAGER_BAY_UID_OFF, MANAGER_BAY_UID_ALREADY_OFF, \
     MANAGER_BAY_POWER_STATE_E_FUSED, MANAGER_BAY_POWER_STATE_RESET, APPLIANCE_BAY_POWER_STATE_E_FUSED, \
@@ -380,6 +381,23 @@ class EnclosureRefreshedStateSpec(unittest.TestCase, PreloadedMocksBaseTestCase)
             msg=ENCLOSURE_REFRESHED
         )
 
+    def test_should_return_the_task_uri_when_not_waiting_for_the_refresh(self):
+        self.enclosures.get_by.return_value = [ENCLOSURE_FROM_ONEVIEW]
+        self.enclosures.get.return_value = ENCLOSURE_FROM_ONEVIEW
+        self.enclosures.refresh_state.side_effect = lambda *args: \
+            self.enclosures._client._task_monitor.wait_for_task(dict(uri='/rest/tasks/1'))
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_REFRESH, wait=False)
+
+        EnclosureModule().run()
+
+        self.enclosures.refresh_state.assert_called_once_with('/a/path', dict(refreshState='Refreshing'))
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            ansible_facts=dict(enclosure=ENCLOSURE_FROM_ONEVIEW, task_uri='/rest/tasks/1'),
+            msg=ENCLOSURE_REFRESH_STARTED
+        )
+
     def test_should_fail_when_enclosure_not_exist(self):
         self.enclosures.get_by.return_value = []
 
@@ -0,0 +1,194 @@
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from hpOneView.exceptions import HPOneViewException
+from oneview_estate_snapshot import EstateSnapshotModule, ESTATE_SNAPSHOT_REFRESHED, ESTATE_SNAPSHOT_FAILED, \
+    RESOURCE_TYPE_INVALID, RESOURCE_TYPES, DEFAULT_RESOURCE_TYPES
+from module_utils.oneview import EstateIndex
+from test.utils import ModuleContructorTestCase
+
+PARAMS = dict(
+    config='config.json',
+    database=None,
+    resource_types=['server_hardware', 'server_profiles'],
+    full=False,
+    max_age=86400,
+    max_workers=8
+)
+
+
+class FakeResourceClient(object):
+    """
+    Applies the 'modified' filter and sort of get_changed_since, and records the filters requested.
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.filters = []
+        self.error = None
+
+    def get_all(self, filter=None, sort=None):
+        self.filters.append(filter)
+        if self.error:
+            raise self.error
+        watermark = filter[-1].split("'")[1] if filter else ''
+        return sorted([resource for resource in self.resources if resource['modified'] >= watermark],
+                      key=lambda resource: resource['modified'])
+
+
+def resource(uri, name, modified='2017-06-01T10:00:00.000Z', **kwargs):
+    return dict(kwargs, uri=uri, name=name, modified=modified)
+
+
+class EstateSnapshotSpec(unittest.TestCase, ModuleContructorTestCase):
+    """
+    ModuleContructorTestCase has common tests for class constructor and main function,
+    also provides the mocks used in this test case
+    """
+
+    def setUp(self):
+        self.configure_mocks(self, EstateSnapshotModule)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.database = os.path.join(self.directory, 'estate.db')
+
+        self.server_hardware = FakeResourceClient([
+            resource('/rest/server-hardware/1', 'Encl1, bay 1', serialNumber='VCGE9KB041'),
+            resource('/rest/server-hardware/2', 'Encl1, bay 2', serialNumber='VCGE9KB042')])
+        self.server_profiles = FakeResourceClient([resource('/rest/server-profiles/1', 'esxi-01')])
+        self.mock_ov_client.server_hardware = self.server_hardware
+        self.mock_ov_client.server_profiles = self.server_profiles
+
+        patcher = mock.patch('module_utils.oneview.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_time.time.return_value = 1000.0
+
+        self.mock_ansible_module.params = dict(PARAMS, database=self.database)
+
+    def __get_snapshot(self):
+        if self.mock_ansible_module.exit_json.called:
+            return self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['estate_snapshot']
+        return self.mock_ansible_module.fail_json.call_args[1]['estate_snapshot']
+
+    def __find(self, **filters):
+        index = EstateIndex(self.database)
+        try:
+            return index.find(**filters)
+        finally:
+            index.close()
+
+    def __run_again(self, now):
+        self.mock_time.time.return_value = now
+        self.mock_ansible_module.exit_json.reset_mock()
+        EstateSnapshotModule().run()
+
+    def test_should_index_all_the_resources_on_the_first_run(self):
+        EstateSnapshotModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=ESTATE_SNAPSHOT_REFRESHED.format(3),
+            ansible_facts=dict(estate_snapshot=dict(database=self.database, resource_types=[
+                dict(type='server_hardware', full=True, changed=2, count=2, error=None),
+                dict(type='server_profiles', full=True, changed=1, count=1, error=None)])))
+        self.assertEqual(self.__find(serial='VCGE9KB042'), [self.server_hardware.resources[1]])
+        self.assertEqual(self.server_hardware.filters, [None])
+
+    def test_should_request_only_the_resources_changed_since_the_previous_run(self):
+        EstateSnapshotModule().run()
+        changed = resource('/rest/server-hardware/2', 'Encl1, bay 2', '2017-06-01T11:00:00.000Z', status='Critical')
+        self.server_hardware.resources[1] = changed
+
+        self.__run_again(2000.0)
+
+        self.assertEqual(self.server_hardware.filters[-1], ["modified >= '2017-06-01T10:00:00.000Z'"])
+        self.assertEqual([(result['full'], result['changed']) for result in self.__get_snapshot()['resource_types']],
+                         [(False, 1), (False, 0)])
+        self.assertEqual(self.__find(status='Critical'), [changed])
+
+    def test_should_not_change_when_nothing_changed(self):
+        EstateSnapshotModule().run()
+
+        self.__run_again(2000.0)
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False, msg=ESTATE_SNAPSHOT_REFRESHED.format(0), ansible_facts=mock.ANY)
+
+    def test_should_remove_the_deleted_resources_on_a_full_refresh_after_max_age(self):
+        EstateSnapshotModule().run()
+        del self.server_hardware.resources[0]
+
+        self.__run_again(1000.0 + 86400)
+
+        self.assertEqual(self.server_hardware.filters[-1], None)
+        self.assertEqual([result['name'] for result in self.__find(type='server_hardware')], ['Encl1, bay 2'])
+
+    def test_should_refresh_fully_when_requested(self):
+        EstateSnapshotModule().run()
+        self.mock_ansible_module.params['full'] = True
+
+        self.__run_again(2000.0)
+
+        self.assertEqual(self.server_hardware.filters, [None, None])
+
+    def test_should_keep_the_other_types_when_one_fails(self):
+        self.server_profiles.error = HPOneViewException('Service unavailable')
+
+        EstateSnapshotModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=ESTATE_SNAPSHOT_FAILED.format(1, 2),
+                                                                   estate_snapshot=mock.ANY)
+        self.assertEqual([(result['type'], result['error']) for result in self.__get_snapshot()['resource_types']],
+                         [('server_hardware', None), ('server_profiles', 'Service unavailable')])
+        self.assertEqual(len(self.__find(type='server_hardware')), 2)
+
+    def test_should_refresh_the_image_streamer_deployment_plans(self):
+        deployment_plans = FakeResourceClient([resource('/rest/deployment-plans/1', 'ESXi 6.5')])
+        self.mock_ov_client.create_image_streamer_client.return_value.deployment_plans = deployment_plans
+        self.mock_ansible_module.params['resource_types'] = ['deployment_plans']
+
+        EstateSnapshotModule().run()
+
+        self.assertEqual(self.__find(type='deployment_plans', name='ESXi 6.5'), deployment_plans.resources)
+
+    def test_should_refresh_the_default_types_when_not_informed(self):
+        self.mock_ansible_module.params['resource_types'] = None
+
+        with mock.patch('module_utils.oneview.get_changed_since', return_value=([], {})) as get_changed_since:
+            EstateSnapshotModule().run()
+
+        self.assertEqual(get_changed_since.call_count, len(DEFAULT_RESOURCE_TYPES))
+        self.assertEqual([result['type'] for result in self.__get_snapshot()['resource_types']],
+                         DEFAULT_RESOURCE_TYPES)
+
+    def test_should_fail_when_a_resource_type_is_unknown(self):
+        self.mock_ansible_module.params['resource_types'] = ['server_hardware', 'racks']
+
+        EstateSnapshotModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=RESOURCE_TYPE_INVALID.format('racks', ', '.join(RESOURCE_TYPES)))
+        self.assertFalse(os.path.exists(self.database))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import os
+import shutil
+import tempfile
+import unittest
+
+from oneview_estate_snapshot_facts import EstateSnapshotFactsModule, ESTATE_SNAPSHOT_NOT_FOUND
+from module_utils.oneview import EstateIndex
+from test.utils import PreloadedMocksBaseTestCase
+
+BLADE = dict(uri='/rest/server-hardware/1', name='Encl1, bay 1', serialNumber='VCGE9KB041', state='ProfileApplied',
+             locationUri='/rest/enclosures/1', mpHostInfo=dict(mpHostName='ilo-1', mpIpAddresses=['10.0.0.1']))
+RACK_SERVER = dict(uri='/rest/server-hardware/2', name='rack-01', serialNumber='VCGE9KB042',
+                   state='NoProfileApplied')
+PROFILE = dict(uri='/rest/server-profiles/1', name='esxi-01', enclosureUri='/rest/enclosures/1', state='Normal')
+
+
+class EstateSnapshotFactsSpec(unittest.TestCase, PreloadedMocksBaseTestCase):
+    def setUp(self):
+        self.configure_mocks(self, EstateSnapshotFactsModule)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.database = os.path.join(self.directory, 'estate.db')
+
+        index = EstateIndex(self.database)
+        index.save('server_hardware', [BLADE, RACK_SERVER], None, 100.0, full=True)
+        index.save('server_profiles', [PROFILE], None, 200.0, full=True)
+        index.close()
+
+        self.mock_ansible_module.params = dict(database=self.database, resource_type=None, name=None, filters=None,
+                                               fields=None)
+
+    def __get_resources(self):
+        return self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['estate_resources']
+
+    def test_should_get_the_resources_of_a_type(self):
+        self.mock_ansible_module.params['resource_type'] = 'server_hardware'
+
+        EstateSnapshotFactsModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(estate_resources=[BLADE, RACK_SERVER], estate_snapshot=[
+                dict(type='server_hardware', refreshed=100.0, full_refreshed=100.0, count=2),
+                dict(type='server_profiles', refreshed=200.0, full_refreshed=200.0, count=1)]))
+
+    def test_should_get_a_resource_by_name(self):
+        self.mock_ansible_module.params['resource_type'] = 'server_profiles'
+        self.mock_ansible_module.params['name'] = 'esxi-01'
+
+        EstateSnapshotFactsModule().run()
+
+        self.assertEqual(self.__get_resources(), [PROFILE])
+
+    def test_should_get_the_resources_matching_the_filters(self):
+        self.mock_ansible_module.params['filters'] = dict(enclosure='/rest/enclosures/1',
+                                                          state=['ProfileApplied', 'Normal'])
+
+        EstateSnapshotFactsModule().run()
+
+        self.assertEqual(self.__get_resources(), [BLADE, PROFILE])
+
+    def test_should_keep_only_the_fields_requested(self):
+        self.mock_ansible_module.params['filters'] = dict(serial='VCGE9KB041')
+        self.mock_ansible_module.params['fields'] = ['name', 'mpHostInfo.mpIpAddresses']
+
+        EstateSnapshotFactsModule().run()
+
+        self.assertEqual(self.__get_resources(),
+                         [dict(name='Encl1, bay 1', mpHostInfo=dict(mpIpAddresses=['10.0.0.1']))])
+
+    def test_should_not_query_the_appliance(self):
+        EstateSnapshotFactsModule().run()
+
+        self.mock_ov_client_from_json_file.assert_not_called()
+        self.mock_ov_client_from_env_vars.assert_not_called()
+
+    def test_should_fail_when_a_filter_is_unknown(self):
+        self.mock_ansible_module.params['filters'] = dict(serialNumber='VCGE9KB041')
+
+        EstateSnapshotFactsModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once()
+        self.mock_ansible_module.exit_json.assert_not_called()
+
+    def test_should_fail_when_the_database_does_not_exist(self):
+        self.mock_ansible_module.params['database'] = os.path.join(self.directory, 'missing.db')
+
+        EstateSnapshotFactsModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=ESTATE_SNAPSHOT_NOT_FOUND.format(self.mock_ansible_module.params['database']))
+        self.assertFalse(os.path.exists(self.mock_ansible_module.params['database']))
+
+
+if __name__ == '__main__':
+    unittest.main()
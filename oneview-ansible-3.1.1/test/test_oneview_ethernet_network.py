@@ -13,13 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import mock
 import unittest
 import yaml
 
 from oneview_ethernet_network import EthernetNetworkModule, ETHERNET_NETWORK_CREATED, ETHERNET_NETWORK_ALREADY_EXIST, \
     ETHERNET_NETWORK_UPDATED, ETHERNET_NETWORK_DELETED, ETHERNET_NETWORK_ALREADY_ABSENT, \
     ETHERNET_NETWORKS_CREATED, MISSING_ETHERNET_NETWORKS_CREATED, ETHERNET_NETWORKS_ALREADY_EXIST, \
-    ETHERNET_NETWORK_CONNECTION_TEMPLATE_RESET, ETHERNET_NETWORK_NOT_FOUND
+    ETHERNET_NETWORK_CONNECTION_TEMPLATE_RESET, ETHERNET_NETWORK_NOT_FOUND, ETHERNET_NETWORKS_UPDATED, \
+    ETHERNET_NETWORKS_DELETED, ETHERNET_NETWORKS_ALREADY_ABSENT, ETHERNET_NETWORKS_CONNECTION_TEMPLATES_RESET, \
+    compress_vlan_ids
+from hpOneView.exceptions import HPOneViewException
 from test.utils import ModuleContructorTestCase
 from test.utils import ValidateEtagTestCase
 from test.utils import ErrorHandlingTestCase
@@ -156,6 +160,29 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
             ansible_facts=dict(ethernet_network=data_merged)
         )
 
+    @mock.patch('module_utils.oneview.time')
+    def test_update_the_fresh_network_when_it_was_changed_by_someone_else(self, mock_time):
+        current = dict(DEFAULT_ENET_TEMPLATE, uri='/rest/ethernet-networks/1', eTag='1')
+        fresh = dict(current, smartLink=True, eTag='2')
+        data_merged = dict(fresh, purpose='Management')
+
+        self.resource.get_by.return_value = [current]
+        self.resource.get.return_value = fresh
+        self.resource.update.side_effect = [HPOneViewException(dict(errorCode='PRECONDITION_FAILED')), data_merged]
+        self.mock_ov_client.connection_templates.get.return_value = {"uri": "uri"}
+
+        self.mock_ansible_module.params = yaml.load(YAML_PARAMS_WITH_CHANGES)
+
+        EthernetNetworkModule().run()
+
+        self.resource.get.assert_called_once_with('/rest/ethernet-networks/1')
+        self.assertEqual(self.resource.update.call_args, mock.call(data_merged))
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=ETHERNET_NETWORK_UPDATED,
+            ansible_facts=dict(ethernet_network=data_merged)
+        )
+
     def test_update_when_only_bandwidth_has_modified_attributes(self):
         self.resource.get_by.return_value = [DICT_PARAMS_WITH_CHANGES]
         self.mock_ov_client.connection_templates.get.return_value = {"uri": "uri"}
@@ -281,7 +308,8 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
             {'name': 'TestNetwork_2', 'vlanId': 2},
         ]
 
-        self.resource.get_range.side_effect = [enet_get_range_return, DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_range.return_value = enet_get_range_return
+        self.resource.create_bulk.return_value = DEFAULT_BULK_ENET_TEMPLATE[2:]
         self.resource.dissociate_values_or_ranges.return_value = [1, 2, 5, 9, 10]
 
         self.mock_ansible_module.params = PARAMS_FOR_BULK_CREATED
@@ -289,7 +317,9 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
         EthernetNetworkModule().run()
 
         self.resource.create_bulk.assert_called_once_with(
-            dict(namePrefix="TestNetwork", vlanIdRange="5,9,10"))
+            dict(namePrefix="TestNetwork", vlanIdRange="5,9-10"))
+        self.resource.get_range.assert_called_once_with("TestNetwork", "1-2,5,9-10")
+        self.resource.get_by.assert_not_called()
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True, msg=MISSING_ETHERNET_NETWORKS_CREATED,
             ansible_facts=dict(ethernet_network_bulk=DEFAULT_BULK_ENET_TEMPLATE))
@@ -300,7 +330,8 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
             {'name': 'TestNetwork_2', 'vlanId': 2},
         ]
 
-        self.resource.get_range.side_effect = [enet_get_range_return, DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_range.return_value = enet_get_range_return
+        self.resource.create_bulk.return_value = [{'name': 'TestNetwork_5', 'vlanId': 5}]
         self.resource.dissociate_values_or_ranges.return_value = [1, 2, 5]
 
         self.mock_ansible_module.params = PARAMS_FOR_BULK_CREATED
@@ -312,7 +343,104 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
             msg=MISSING_ETHERNET_NETWORKS_CREATED,
-            ansible_facts=dict(ethernet_network_bulk=DEFAULT_BULK_ENET_TEMPLATE))
+            ansible_facts=dict(ethernet_network_bulk=DEFAULT_BULK_ENET_TEMPLATE[:3]))
+
+    def test_should_ignore_unexpected_vlans_when_creating_missing_networks(self):
+        self.resource.get_range.return_value = [{'name': 'TestNetwork_1', 'vlanId': '1'},
+                                                {'name': 'TestNetwork_3', 'vlanId': 3}]
+        self.resource.create_bulk.return_value = [{'name': 'TestNetwork_2', 'vlanId': 2}]
+        self.resource.dissociate_values_or_ranges.return_value = [1, 2]
+
+        self.mock_ansible_module.params = dict(config='config.json', state='present',
+                                               data=dict(namePrefix="TestNetwork", vlanIdRange="1-2"))
+
+        EthernetNetworkModule().run()
+
+        self.resource.create_bulk.assert_called_once_with({'vlanIdRange': '2-2', 'namePrefix': 'TestNetwork'})
+
+    def test_should_update_the_bandwidth_of_existing_networks_in_bulk(self):
+        networks = [dict(net, connectionTemplateUri='/rest/connection-templates/' + str(net['vlanId']))
+                    for net in DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_range.return_value = networks
+        self.resource.dissociate_values_or_ranges.return_value = [1, 2, 5, 9, 10]
+        bandwidth = dict(maximumBandwidth=10000, typicalBandwidth=2500)
+        self.mock_ov_client.connection_templates.get.side_effect = lambda uri: dict(
+            uri=uri, bandwidth=bandwidth if uri.endswith('/1') else dict(maximumBandwidth=10000, typicalBandwidth=2000))
+
+        self.mock_ansible_module.params = dict(config='config.json', state='present',
+                                               data=dict(PARAMS_FOR_BULK_CREATED['data'], bandwidth=bandwidth))
+
+        EthernetNetworkModule().run()
+
+        self.resource.create_bulk.assert_not_called()
+        self.assertEqual(self.mock_ov_client.connection_templates.update.call_count, 4)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True, msg=ETHERNET_NETWORKS_UPDATED,
+            ansible_facts=dict(ethernet_network_bulk=networks))
+
+    def test_should_update_the_bandwidth_of_networks_matching_the_name_pattern(self):
+        networks = [dict(net, connectionTemplateUri='/rest/connection-templates/' + str(net['vlanId']))
+                    for net in DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_all.return_value = networks
+        bandwidth = dict(maximumBandwidth=10000, typicalBandwidth=2500)
+        self.mock_ov_client.connection_templates.get.side_effect = lambda uri: dict(
+            uri=uri, bandwidth=bandwidth if uri.endswith('/1') else dict(maximumBandwidth=10000, typicalBandwidth=2000))
+        self.mock_ov_client.connection_templates.update.side_effect = lambda data: data
+
+        self.mock_ansible_module.params = dict(config='config.json', state='present', max_workers=2,
+                                               data=dict(namePattern='TestNetwork\\_%', bandwidth=bandwidth))
+
+        EthernetNetworkModule().run()
+
+        self.resource.get_all.assert_called_once_with(filter="\"'name' matches 'TestNetwork\\_%'\"",
+                                                      sort='vlanId:ascending')
+        self.resource.create_bulk.assert_not_called()
+        expected_templates = [dict(uri='/rest/connection-templates/' + str(vlan_id), bandwidth=bandwidth)
+                              for vlan_id in [2, 5, 9, 10]]
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True, msg=ETHERNET_NETWORKS_UPDATED,
+            ansible_facts=dict(ethernet_network_bulk=networks,
+                               ethernet_network_connection_templates=expected_templates))
+
+    def test_should_not_update_the_bandwidth_of_networks_matching_the_name_pattern_when_equal(self):
+        networks = [dict(net, connectionTemplateUri='/rest/connection-templates/' + str(net['vlanId']))
+                    for net in DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_all.return_value = networks
+        bandwidth = dict(maximumBandwidth=10000, typicalBandwidth=2500)
+        self.mock_ov_client.connection_templates.get.side_effect = lambda uri: dict(uri=uri, bandwidth=bandwidth)
+
+        self.mock_ansible_module.params = dict(config='config.json', state='present',
+                                               data=dict(namePattern='TestNetwork\\_%', bandwidth=bandwidth))
+
+        EthernetNetworkModule().run()
+
+        self.mock_ov_client.connection_templates.update.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False, msg=ETHERNET_NETWORKS_ALREADY_EXIST,
+            ansible_facts=dict(ethernet_network_bulk=networks, ethernet_network_connection_templates=[]))
+
+    def test_should_remove_ethernet_networks_in_bulk(self):
+        self.resource.get_range.return_value = DEFAULT_BULK_ENET_TEMPLATE
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK_CREATED, state='absent', max_workers=2)
+
+        EthernetNetworkModule().run()
+
+        self.assertEqual(sorted(call[0][0]['vlanId'] for call in self.resource.delete.call_args_list),
+                         [1, 2, 5, 9, 10])
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True, msg=ETHERNET_NETWORKS_DELETED, ansible_facts={})
+
+    def test_should_do_nothing_when_ethernet_networks_already_absent(self):
+        self.resource.get_range.return_value = []
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK_CREATED, state='absent', max_workers=2)
+
+        EthernetNetworkModule().run()
+
+        self.resource.delete.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False, msg=ETHERNET_NETWORKS_ALREADY_ABSENT, ansible_facts={})
 
     def test_should_do_nothing_when_ethernet_networks_already_exist(self):
         self.resource.get_range.return_value = DEFAULT_BULK_ENET_TEMPLATE
@@ -344,6 +472,27 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
             changed=True, msg=ETHERNET_NETWORK_CONNECTION_TEMPLATE_RESET,
             ansible_facts=dict(ethernet_network_connection_template={'result': 'success'}))
 
+    def test_should_reset_the_bandwidth_of_a_range_of_networks_fetching_the_default_once(self):
+        networks = [dict(net, connectionTemplateUri='/rest/connection-templates/' + str(net['vlanId']))
+                    for net in DEFAULT_BULK_ENET_TEMPLATE]
+        self.resource.get_range.return_value = networks
+        default_bandwidth = dict(maximumBandwidth=20000, typicalBandwidth=2500)
+        self.mock_ov_client.connection_templates.get_default.return_value = dict(bandwidth=default_bandwidth)
+        self.mock_ov_client.connection_templates.get.side_effect = lambda uri: dict(
+            uri=uri, bandwidth=default_bandwidth if uri.endswith('/9') else dict(maximumBandwidth=1))
+        self.mock_ov_client.connection_templates.update.side_effect = lambda data: data
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK_CREATED, state='default_bandwidth_reset')
+
+        EthernetNetworkModule().run()
+
+        self.mock_ov_client.connection_templates.get_default.assert_called_once_with()
+        expected_templates = [dict(uri='/rest/connection-templates/' + str(vlan_id), bandwidth=default_bandwidth)
+                              for vlan_id in [1, 2, 5, 10]]
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True, msg=ETHERNET_NETWORKS_CONNECTION_TEMPLATES_RESET,
+            ansible_facts=dict(ethernet_network_connection_templates=expected_templates))
+
     def test_should_fail_when_reset_not_existing_ethernet_network(self):
         self.resource.get_by.return_value = [None]
 
@@ -356,5 +505,14 @@ class EthernetNetworkModuleSpec(unittest.TestCase,
         )
 
 
+class CompressVlanIdsSpec(unittest.TestCase):
+    def test_should_compress_consecutive_ids_into_ranges(self):
+        self.assertEqual(compress_vlan_ids({10, 1, 2, 3, 5, 9}), '1-3,5,9-10')
+
+    def test_should_keep_a_single_id_as_a_range(self):
+        self.assertEqual(compress_vlan_ids([7]), '7-7')
+        self.assertEqual(compress_vlan_ids([7, 8, 9]), '7-9')
+
+
 if __name__ == '__main__':
     unittest.main()
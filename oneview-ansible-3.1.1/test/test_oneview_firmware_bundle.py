@@ -15,14 +15,19 @@
 ###
 import unittest
 
+import mock
+
 from oneview_firmware_bundle import FirmwareBundleModule
-from oneview_firmware_bundle import FIRMWARE_BUNDLE_UPLOADED
+from oneview_firmware_bundle import FIRMWARE_BUNDLE_UPLOADED, FIRMWARE_BUNDLE_ALREADY_PRESENT, \
+    FIRMWARE_BUNDLE_CHECKSUM_MISMATCH, FIRMWARE_BUNDLE_UPLOAD_FAILED
 
 from test.utils import ModuleContructorTestCase
 from test.utils import ErrorHandlingTestCase
 
 FAKE_MSG_ERROR = 'Fake message error'
-DEFAULT_FIRMWARE_FILE_PATH = '/path/to/file.rpm'
+DEFAULT_FIRMWARE_FILE_PATH = '/path/to/hp-firmware-hdd-a1b08f8a6b-HPGH-1.1.x86_64.rpm'
+FILE_DIGEST = '9b6a2ae2a14a0a1a0e4b8ba3bc8b2ab2e9e6a8f4e0d1c2b3a4f5e6d7c8b9a0f1'
+FILE_SIZE = 4837926
 
 DEFAULT_FIRMWARE_TEMPLATE = dict(
     bundleSize='4837926',
@@ -35,12 +40,28 @@ DEFAULT_FIRMWARE_TEMPLATE = dict(
                        swKeyNameList=['hp-firmware-hdd-a1b08f8a6b'])]
 )
 
+SPP_FIRMWARE = dict(
+    name='Service Pack for ProLiant',
+    version='2017.04.0',
+    isoFileName='SPP2017040.iso',
+    category='firmware-drivers'
+)
+
 PARAMS_FOR_PRESENT = dict(
     config='config.json',
     state='present',
     file_path=DEFAULT_FIRMWARE_FILE_PATH
 )
 
+PARAMS_FOR_SPP = dict(
+    config='config.json',
+    state='present',
+    file_path='/path/to/SPP2017040.iso',
+    name='Service Pack for ProLiant',
+    version='2017.04.0',
+    chunk_size=8388608
+)
+
 
 class FirmwareBundleModuleSpec(unittest.TestCase,
                                ModuleContructorTestCase,
@@ -49,22 +70,153 @@ class FirmwareBundleModuleSpec(unittest.TestCase,
     def setUp(self):
         self.configure_mocks(self, FirmwareBundleModule)
         ErrorHandlingTestCase.configure(self, ansible_params=PARAMS_FOR_PRESENT,
-                                        method_to_fire=self.mock_ov_client.firmware_bundles.upload)
+                                        method_to_fire=self.mock_ov_client.firmware_drivers.get_all)
 
-    def test_should_upload(self):
-        self.mock_ov_client.firmware_drivers.get_by_file_name.return_value = None
-        self.mock_ov_client.firmware_bundles.upload.side_effect = [DEFAULT_FIRMWARE_TEMPLATE]
+        self.mock_ov_client.firmware_drivers.get_all.return_value = []
+        self.response = mock.Mock(status=202)
+
+        patchers = dict(upload_file=mock.patch('oneview_firmware_bundle.upload_file'),
+                        get_upload_task=mock.patch('oneview_firmware_bundle.get_upload_task'),
+                        task_monitor=mock.patch('oneview_firmware_bundle.TaskMonitor'),
+                        file_digest=mock.patch('oneview_firmware_bundle.file_digest'),
+                        getsize=mock.patch('os.path.getsize'))
+        self.mocks = dict((name, patcher.start()) for name, patcher in patchers.items())
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
 
+        self.mocks['upload_file'].return_value = self.response, {}, FILE_DIGEST
+        self.mocks['get_upload_task'].return_value = dict(category='tasks')
+        self.mocks['task_monitor'].return_value.wait_for_task.return_value = DEFAULT_FIRMWARE_TEMPLATE
+        self.mocks['file_digest'].return_value = FILE_DIGEST
+        self.mocks['getsize'].return_value = FILE_SIZE
+
+    def test_should_upload(self):
         self.mock_ansible_module.params = PARAMS_FOR_PRESENT
 
         FirmwareBundleModule().run()
 
+        self.mocks['upload_file'].assert_called_once_with(self.mock_ov_client.connection, '/rest/firmware-bundles',
+                                                          DEFAULT_FIRMWARE_FILE_PATH, 1048576, mock.ANY)
+        self.mocks['task_monitor'].return_value.wait_for_task.assert_called_once_with(dict(category='tasks'))
+        self.mocks['file_digest'].assert_not_called()
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
             msg=FIRMWARE_BUNDLE_UPLOADED,
+            ansible_facts=dict(firmware_bundle=DEFAULT_FIRMWARE_TEMPLATE,
+                               firmware_bundle_upload=dict(size=FILE_SIZE, sha256=FILE_DIGEST, attempts=1))
+        )
+
+    def test_should_not_upload_when_the_hotfix_is_present(self):
+        self.mock_ov_client.firmware_drivers.get_all.return_value = [SPP_FIRMWARE, DEFAULT_FIRMWARE_TEMPLATE]
+
+        self.mock_ansible_module.params = PARAMS_FOR_PRESENT
+
+        FirmwareBundleModule().run()
+
+        self.mocks['upload_file'].assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=FIRMWARE_BUNDLE_ALREADY_PRESENT,
             ansible_facts=dict(firmware_bundle=DEFAULT_FIRMWARE_TEMPLATE)
         )
 
+    def test_should_not_upload_when_the_spp_is_present_with_the_same_version(self):
+        self.mock_ov_client.firmware_drivers.get_all.return_value = [DEFAULT_FIRMWARE_TEMPLATE, SPP_FIRMWARE]
+
+        self.mock_ansible_module.params = PARAMS_FOR_SPP
+
+        FirmwareBundleModule().run()
+
+        self.mocks['upload_file'].assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=FIRMWARE_BUNDLE_ALREADY_PRESENT,
+            ansible_facts=dict(firmware_bundle=SPP_FIRMWARE)
+        )
+
+    def test_should_upload_when_the_spp_is_present_with_another_version(self):
+        self.mock_ov_client.firmware_drivers.get_all.return_value = [dict(SPP_FIRMWARE, version='2016.10.0')]
+
+        self.mock_ansible_module.params = PARAMS_FOR_SPP
+
+        FirmwareBundleModule().run()
+
+        self.mocks['upload_file'].assert_called_once_with(self.mock_ov_client.connection, '/rest/firmware-bundles',
+                                                          '/path/to/SPP2017040.iso', 8388608, mock.ANY)
+        self.assertTrue(self.mock_ansible_module.exit_json.call_args[1]['changed'])
+
+    def test_should_fail_when_the_checksum_does_not_match(self):
+        self.mock_ansible_module.params = dict(PARAMS_FOR_SPP, checksum='ABC')
+
+        FirmwareBundleModule().run()
+
+        self.mocks['file_digest'].assert_called_once_with('/path/to/SPP2017040.iso', 8388608)
+        self.mocks['upload_file'].assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=FIRMWARE_BUNDLE_CHECKSUM_MISMATCH.format(FILE_DIGEST, 'ABC'))
+
+    def test_should_upload_when_the_checksum_matches(self):
+        self.mock_ansible_module.params = dict(PARAMS_FOR_SPP, checksum=FILE_DIGEST.upper())
+
+        FirmwareBundleModule().run()
+
+        self.mocks['upload_file'].assert_called_once_with(self.mock_ov_client.connection, '/rest/firmware-bundles',
+                                                          '/path/to/SPP2017040.iso', 8388608, mock.ANY)
+
+    def test_should_resume_the_upload_when_the_connection_fails(self):
+        self.mocks['upload_file'].side_effect = [IOError('Connection reset by peer'),
+                                                 (self.response, {}, FILE_DIGEST)]
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_PRESENT, upload_retries=1)
+
+        FirmwareBundleModule().run()
+
+        self.assertEqual(self.mocks['upload_file'].call_count, 2)
+        self.assertEqual(self.mock_ov_client.firmware_drivers.get_all.call_count, 2)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=FIRMWARE_BUNDLE_UPLOADED,
+            ansible_facts=dict(firmware_bundle=DEFAULT_FIRMWARE_TEMPLATE,
+                               firmware_bundle_upload=dict(size=FILE_SIZE, sha256=FILE_DIGEST, attempts=2))
+        )
+
+    def test_should_not_upload_again_when_the_failed_attempt_completed(self):
+        self.mocks['upload_file'].side_effect = IOError('Connection reset by peer')
+        self.mock_ov_client.firmware_drivers.get_all.side_effect = [[], [DEFAULT_FIRMWARE_TEMPLATE]]
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_PRESENT, upload_retries=3)
+
+        FirmwareBundleModule().run()
+
+        self.mocks['upload_file'].assert_called_once()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=FIRMWARE_BUNDLE_UPLOADED,
+            ansible_facts=dict(firmware_bundle=DEFAULT_FIRMWARE_TEMPLATE,
+                               firmware_bundle_upload=dict(size=FILE_SIZE, sha256=None, attempts=1))
+        )
+
+    def test_should_fail_when_the_retries_are_exhausted(self):
+        self.mocks['upload_file'].side_effect = IOError('Connection reset by peer')
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_PRESENT, upload_retries=1)
+
+        FirmwareBundleModule().run()
+
+        self.assertEqual(self.mocks['upload_file'].call_count, 2)
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=FIRMWARE_BUNDLE_UPLOAD_FAILED.format(2, 'Connection reset by peer'))
+
+    def test_should_fail_when_the_appliance_rejects_the_upload(self):
+        self.mocks['upload_file'].return_value = mock.Mock(status=400), dict(message=FAKE_MSG_ERROR), FILE_DIGEST
+
+        self.mock_ansible_module.params = PARAMS_FOR_PRESENT
+
+        FirmwareBundleModule().run()
+
+        self.mocks['task_monitor'].assert_not_called()
+        self.assertTrue(self.mock_ansible_module.fail_json.call_args[1]['msg'].startswith(FAKE_MSG_ERROR))
+
 
 if __name__ == '__main__':
     unittest.main()
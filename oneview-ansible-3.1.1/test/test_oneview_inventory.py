@@ -0,0 +1,194 @@
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from hpOneView.exceptions import HPOneViewException
+from test.test_oneview_estate_snapshot import FakeResourceClient, resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'contrib'))
+
+from oneview_inventory import OneViewInventory, to_group_name  # noqa: E402
+
+SERVER_HARDWARE = resource('/rest/server-hardware/1', 'Encl1, bay 1', serialNumber='VCGE9KB041', model='BL460c Gen9',
+                           powerState='On', locationUri='/rest/enclosures/1', mpHostInfo=dict(mpIpAddresses=[
+                               dict(address='fe80::1', type='LinkLocal'), dict(address='10.0.0.1', type='DHCP')]))
+PROFILE = resource('/rest/server-profiles/1', 'esxi-01', serverHardwareUri='/rest/server-hardware/1',
+                   serverHardwareTypeUri='/rest/server-hardware-types/1', enclosureGroupUri='/rest/enclosure-groups/1',
+                   serverProfileTemplateUri='/rest/server-profile-templates/1', enclosureUri='/rest/enclosures/1',
+                   enclosureBay=1, state='Normal', status='OK')
+UNASSIGNED_PROFILE = resource('/rest/server-profiles/2', 'esxi-02',
+                              serverHardwareTypeUri='/rest/server-hardware-types/1', state='Normal', status='OK')
+
+
+class OneViewInventorySpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.environ = dict(ONEVIEW_CONFIG='config.json',
+                            ONEVIEW_INVENTORY_DATABASE=os.path.join(self.directory, 'inventory.db'))
+
+        self.oneview_client = mock.Mock()
+        self.oneview_client.server_profiles = FakeResourceClient([PROFILE, UNASSIGNED_PROFILE])
+        self.oneview_client.server_hardware = FakeResourceClient([SERVER_HARDWARE])
+        self.oneview_client.enclosures = FakeResourceClient([resource('/rest/enclosures/1', 'Encl1')])
+        self.oneview_client.enclosure_groups = FakeResourceClient([resource('/rest/enclosure-groups/1', 'EG #1')])
+        self.oneview_client.server_hardware_types = FakeResourceClient([
+            resource('/rest/server-hardware-types/1', 'SY 480 Gen9 1')])
+        self.oneview_client.server_profile_templates = FakeResourceClient([
+            resource('/rest/server-profile-templates/1', 'ESXi hosts')])
+
+        patcher = mock.patch('oneview_inventory.OneViewClient')
+        self.mock_oneview_client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_oneview_client_class.from_json_file.return_value = self.oneview_client
+        self.mock_oneview_client_class.from_environment_variables.return_value = self.oneview_client
+
+        self.mock_times = []
+        for target in ['oneview_inventory.time', 'module_utils.oneview.time']:
+            patcher = mock.patch(target)
+            self.mock_times.append(patcher.start())
+            self.addCleanup(patcher.stop)
+        self.__set_time(1000.0)
+
+    def __set_time(self, now):
+        for mock_time in self.mock_times:
+            mock_time.time.return_value = now
+
+    def test_should_group_the_profiles_and_expose_their_attributes(self):
+        inventory = OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(inventory['oneview'], dict(hosts=['esxi-01', 'esxi-02']))
+        self.assertEqual(inventory['enclosure_Encl1'], dict(hosts=['esxi-01']))
+        self.assertEqual(inventory['enclosure_group_EG_1'], dict(hosts=['esxi-01']))
+        self.assertEqual(inventory['server_hardware_type_SY_480_Gen9_1'], dict(hosts=['esxi-01', 'esxi-02']))
+        self.assertEqual(inventory['profile_template_ESXi_hosts'], dict(hosts=['esxi-01']))
+        self.assertEqual(inventory['power_On'], dict(hosts=['esxi-01']))
+        self.assertEqual(inventory['_meta']['hostvars']['esxi-01'], dict(
+            oneview_uri='/rest/server-profiles/1',
+            oneview_profile_state='Normal',
+            oneview_status='OK',
+            oneview_profile_template='ESXi hosts',
+            oneview_server_hardware='Encl1, bay 1',
+            oneview_server_hardware_uri='/rest/server-hardware/1',
+            oneview_server_hardware_type='SY 480 Gen9 1',
+            oneview_enclosure='Encl1',
+            oneview_enclosure_group='EG #1',
+            oneview_enclosure_bay=1,
+            oneview_serial_number='VCGE9KB041',
+            oneview_model='BL460c Gen9',
+            oneview_power_state='On',
+            oneview_management_address='10.0.0.1'))
+        self.mock_oneview_client_class.from_json_file.assert_called_once_with('config.json')
+
+    def test_should_use_the_environment_variables_when_there_is_no_config(self):
+        del self.environ['ONEVIEW_CONFIG']
+
+        OneViewInventory(self.environ).get_inventory()
+
+        self.mock_oneview_client_class.from_environment_variables.assert_called_once_with()
+
+    def test_should_read_the_cache_within_its_ttl(self):
+        OneViewInventory(self.environ).get_inventory()
+        self.__set_time(1000.0 + 299)
+
+        inventory = OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(self.oneview_client.server_profiles.filters, [None])
+        self.assertEqual(self.mock_oneview_client_class.from_json_file.call_count, 1)
+        self.assertEqual(inventory['oneview'], dict(hosts=['esxi-01', 'esxi-02']))
+
+    def test_should_refresh_incrementally_after_the_ttl(self):
+        OneViewInventory(self.environ).get_inventory()
+        self.oneview_client.server_hardware.resources = [dict(SERVER_HARDWARE, powerState='Off',
+                                                              modified='2017-06-01T11:00:00.000Z')]
+        self.__set_time(1000.0 + 300)
+
+        inventory = OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(self.oneview_client.server_hardware.filters[-1], ["modified >= '2017-06-01T10:00:00.000Z'"])
+        self.assertEqual(inventory['power_Off'], dict(hosts=['esxi-01']))
+        self.assertNotIn('power_On', inventory)
+
+    def test_should_refresh_within_the_ttl_when_requested(self):
+        OneViewInventory(self.environ).get_inventory()
+
+        OneViewInventory(self.environ).get_inventory(refresh=True)
+
+        self.assertEqual(len(self.oneview_client.server_profiles.filters), 2)
+
+    def test_should_drop_the_deleted_profiles_after_the_max_age(self):
+        OneViewInventory(self.environ).get_inventory()
+        self.oneview_client.server_profiles.resources = [PROFILE]
+        self.__set_time(1000.0 + 3600)
+
+        inventory = OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(self.oneview_client.server_profiles.filters[-1], None)
+        self.assertEqual(inventory['oneview'], dict(hosts=['esxi-01']))
+
+    def test_should_keep_the_cached_resources_when_a_refresh_fails(self):
+        OneViewInventory(self.environ).get_inventory()
+        self.oneview_client.enclosures.error = HPOneViewException('Service unavailable')
+        self.__set_time(2000.0)
+
+        with mock.patch('oneview_inventory.sys.stderr') as stderr:
+            inventory = OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(inventory['enclosure_Encl1'], dict(hosts=['esxi-01']))
+        stderr.write.assert_called_once_with(
+            'Using the cached enclosures, as they could not be refreshed: Service unavailable\n')
+
+    def test_should_fail_when_a_type_was_never_fetched(self):
+        self.oneview_client.enclosures.error = HPOneViewException('Service unavailable')
+
+        self.assertRaises(RuntimeError, OneViewInventory(self.environ).get_inventory)
+
+    def test_should_get_the_variables_of_a_host(self):
+        inventory = OneViewInventory(self.environ)
+
+        self.assertEqual(inventory.get_host('esxi-02')['oneview_server_hardware_type'], 'SY 480 Gen9 1')
+        self.assertEqual(inventory.get_host('unknown'), {})
+
+    @mock.patch('oneview_inventory.tempfile')
+    def test_should_cache_each_appliance_in_its_own_database_by_default(self, mock_tempfile):
+        mock_tempfile.gettempdir.return_value = self.directory
+        config = os.path.join(self.directory, 'config.json')
+        with open(config, 'w') as config_file:
+            config_file.write('{"ip": "172.16.102.59"}')
+
+        inventory = OneViewInventory(dict(ONEVIEW_CONFIG=config))
+        from_environment = OneViewInventory(dict(ONEVIEWSDK_IP='oneview.example.com'))
+
+        self.assertEqual(inventory.database, os.path.join(self.directory, 'oneview-inventory-172.16.102.59.db'))
+        self.assertEqual(from_environment.database,
+                         os.path.join(self.directory, 'oneview-inventory-oneview.example.com.db'))
+
+    def test_should_create_the_database_readable_only_by_its_owner(self):
+        OneViewInventory(self.environ).get_inventory()
+
+        self.assertEqual(os.stat(self.environ['ONEVIEW_INVENTORY_DATABASE']).st_mode & 0o777, 0o600)
+
+    def test_should_build_valid_group_names(self):
+        self.assertEqual(to_group_name('enclosure_group', 'EG #1 (prod)'), 'enclosure_group_EG_1_prod')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,12 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ###
+import mock
 import unittest
 import yaml
 
 from test.utils import PreloadedMocksBaseTestCase, ModuleContructorTestCase, ErrorHandlingTestCase
 from oneview_logical_enclosure import LogicalEnclosureModule, LOGICAL_ENCLOSURE_UPDATED, \
-    LOGICAL_ENCLOSURE_ALREADY_UPDATED, LOGICAL_ENCLOSURE_FIRMWARE_UPDATED, \
+    LOGICAL_ENCLOSURE_ALREADY_UPDATED, LOGICAL_ENCLOSURE_FIRMWARE_UPDATED, LOGICAL_ENCLOSURE_FIRMWARE_UPDATE_STARTED, \
     LOGICAL_ENCLOSURE_CONFIGURATION_SCRIPT_UPDATED, \
     LOGICAL_ENCLOSURE_DUMP_GENERATED, LOGICAL_ENCLOSURE_RECONFIGURED, LOGICAL_ENCLOSURE_UPDATED_FROM_GROUP, \
     LOGICAL_ENCLOSURE_REQUIRED, LOGICAL_ENCLOSURE_CREATED, LOGICAL_ENCLOSURE_DELETED, LOGICAL_ENCLOSURE_ALREADY_ABSENT
@@ -184,6 +185,24 @@ class LogicalEnclosureSpec(unittest.TestCase, PreloadedMocksBaseTestCase):
             ansible_facts=dict(logical_enclosure={'PATCH', 'EXECUTED'})
         )
 
+    def test_should_return_the_task_uri_when_not_waiting_for_the_firmware_update(self):
+        logical_enclosures = self.mock_ov_client.logical_enclosures
+        logical_enclosures.get_by_name.return_value = DICT_DEFAULT_LOGICAL_ENCLOSURE
+        logical_enclosures.patch.side_effect = lambda *args, **kwargs: \
+            logical_enclosures._client._task_monitor.wait_for_task(dict(uri='/rest/tasks/1'))
+        self.mock_ansible_module.params = yaml.load(YAML_LOGICAL_ENCLOSURE_FIRMWARE_UPDATE)
+        self.mock_ansible_module.params['wait'] = False
+
+        LogicalEnclosureModule().run()
+
+        logical_enclosures.patch.assert_called_once_with(DICT_DEFAULT_LOGICAL_ENCLOSURE['uri'], operation='replace',
+                                                         path='/firmware', value=mock.ANY)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=LOGICAL_ENCLOSURE_FIRMWARE_UPDATE_STARTED,
+            ansible_facts=dict(task_uri='/rest/tasks/1')
+        )
+
     def test_should_not_update_firmware_when_resource_not_found(self):
         self.mock_ov_client.logical_enclosures.get_by_name.return_value = None
         self.mock_ansible_module.params = yaml.load(YAML_LOGICAL_ENCLOSURE_FIRMWARE_UPDATE)
@@ -22,6 +22,7 @@ from oneview_logical_interconnect import (LogicalInterconnectModule,
                                           LOGICAL_INTERCONNECT_CONSISTENT,
                                           LOGICAL_INTERCONNECT_NOT_FOUND,
                                           LOGICAL_INTERCONNECT_FIRMWARE_INSTALLED,
+                                          LOGICAL_INTERCONNECT_FIRMWARE_INSTALL_STARTED,
                                           LOGICAL_INTERCONNECT_ETH_SETTINGS_UPDATED,
                                           LOGICAL_INTERCONNECT_NO_CHANGES_PROVIDED,
                                           LOGICAL_INTERCONNECT_INTERNAL_NETWORKS_UPDATED,
@@ -763,6 +764,23 @@ class LogicalInterconnectFirmwareUpdatedStateSpec(unittest.TestCase, PreloadedMo
             msg=LOGICAL_INTERCONNECT_NOT_FOUND
         )
 
+    def test_should_return_the_task_uri_when_not_waiting(self):
+        task = dict(uri='/rest/tasks/1', taskState='Running')
+        self.resource.get_by_name.return_value = LOGICAL_INTERCONNECT
+        self.resource.install_firmware.side_effect = lambda *args: \
+            self.resource._client._task_monitor.wait_for_task(task)
+
+        self.mock_ansible_module.params = dict(self.PARAMS_FIRMWARE_WITH_SPP_URI, wait=False)
+
+        LogicalInterconnectModule().run()
+
+        self.resource.install_firmware.assert_called_once_with(self.expected_data, mock.ANY)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=LOGICAL_INTERCONNECT_FIRMWARE_INSTALL_STARTED,
+            ansible_facts=dict(task_uri='/rest/tasks/1')
+        )
+
 
 class LogicalInterconnectTelemetryConfigurationUpdatedStateSpec(unittest.TestCase, PreloadedMocksBaseTestCase):
     """
@@ -14,8 +14,14 @@
 # limitations under the License.
 ###
 
+import json
+import os
+import shutil
+import socket
+import tempfile
 import unittest
 
+from hpOneView.exceptions import HPOneViewException
 from oneview_server_hardware_facts import ServerHardwareFactsModule
 from test.utils import ModuleContructorTestCase, FactsParamsTestCase, ErrorHandlingTestCase
 
@@ -41,6 +47,19 @@ PARAMS_WITH_OPTIONS = dict(
                          "view": 'day'}}]
 )
 
+PARAMS_GET_ALL_WITH_FIELDS = dict(
+    config='config.json',
+    name=None,
+    fields=['name', 'mpHostInfo.mpIpAddresses']
+)
+
+PARAMS_GET_BY_NAME_WITH_FIELDS = dict(
+    config='config.json',
+    name="Test Server Hardware",
+    options=['bios'],
+    fields=['name']
+)
+
 PARAMS_WITH_ALL_FIRMWARES_WITHOUT_FILTER = dict(
     config='config.json',
     options=['firmwares']
@@ -121,6 +140,132 @@ class ServerHardwareFactsSpec(unittest.TestCase,
                            'server_hardware_firmware': {'subresource': 'firmware'}}
         )
 
+    def test_should_get_all_server_hardware_with_fields(self):
+        self.server_hardware.get_all.return_value = [
+            {"name": "Server Hardware Name", "uri": "resuri", "mpHostInfo": {"mpHostName": "ILO",
+                                                                             "mpIpAddresses": ["10.0.0.1"]}}
+        ]
+        self.mock_ansible_module.params = PARAMS_GET_ALL_WITH_FIELDS
+
+        ServerHardwareFactsModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(server_hardwares=[{"name": "Server Hardware Name",
+                                                  "mpHostInfo": {"mpIpAddresses": ["10.0.0.1"]}}])
+        )
+
+    def test_should_write_all_server_hardware_to_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_path = os.path.join(directory, 'server-hardware.jsonl')
+        self.server_hardware.get_all.return_value = [{"name": "Server Hardware Name", "uri": "resuri"}]
+        self.mock_ansible_module.params = dict(config='config.json', name=None, fields=['name'], dest=file_path,
+                                               compress=False, page_size=50)
+
+        ServerHardwareFactsModule().run()
+
+        self.server_hardware.get_all.assert_called_once_with(start=0, count=50)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(server_hardwares_export=dict(dest=file_path, compressed=False, count=1))
+        )
+        with open(file_path) as stream:
+            self.assertEqual(json.loads(stream.read()), {"name": "Server Hardware Name"})
+
+    def test_should_gather_options_before_applying_fields(self):
+        self.server_hardware.get_by.return_value = [{"name": "Server Hardware Name", "uri": "resuri"}]
+        self.server_hardware.get_bios.return_value = {'subresource': 'value'}
+        self.mock_ansible_module.params = PARAMS_GET_BY_NAME_WITH_FIELDS
+
+        ServerHardwareFactsModule().run()
+
+        self.server_hardware.get_bios.assert_called_once_with('resuri')
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts={'server_hardwares': [{'name': 'Server Hardware Name'}],
+                           'server_hardware_bios': {'subresource': 'value'}}
+        )
+
+    def test_should_gather_options_for_every_server_on_fleet_mode(self):
+        self.server_hardware.get_all.return_value = [{"name": "bay 1", "uri": "uri1"}, {"name": "bay 2", "uri": "uri2"}]
+        self.server_hardware.get_bios.side_effect = lambda uri: {'bios': uri}
+        self.server_hardware.get_firmware.side_effect = lambda uri: {'firmware': uri}
+        self.mock_ansible_module.params = dict(config='config.json', name=None, params={'filter': "model='SY 480'"},
+                                               options=['bios', 'firmware'], fleet=True, max_workers=2, rate_limit=0)
+
+        ServerHardwareFactsModule().run()
+
+        self.server_hardware.get_all.assert_called_once_with(filter="model='SY 480'")
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(
+                server_hardwares=[{"name": "bay 1", "uri": "uri1"}, {"name": "bay 2", "uri": "uri2"}],
+                server_hardware_fleet_facts=[
+                    dict(name='bay 1', uri='uri1', server_hardware_bios={'bios': 'uri1'},
+                         server_hardware_firmware={'firmware': 'uri1'}),
+                    dict(name='bay 2', uri='uri2', server_hardware_bios={'bios': 'uri2'},
+                         server_hardware_firmware={'firmware': 'uri2'})
+                ])
+        )
+
+    def test_should_isolate_server_errors_on_fleet_mode(self):
+        def get_bios(uri):
+            if uri == 'uri1':
+                raise HPOneViewException('iLO not responding')
+            return {'bios': uri}
+
+        self.server_hardware.get_all.return_value = [{"name": "bay 1", "uri": "uri1"}, {"name": "bay 2", "uri": "uri2"}]
+        self.server_hardware.get_bios.side_effect = get_bios
+        self.mock_ansible_module.params = dict(config='config.json', name=None, options=['bios'], fleet=True)
+
+        ServerHardwareFactsModule().run()
+
+        self.mock_ansible_module.fail_json.assert_not_called()
+        facts = self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']
+        self.assertEqual(facts['server_hardware_fleet_facts'], [
+            dict(name='bay 1', uri='uri1', error='iLO not responding'),
+            dict(name='bay 2', uri='uri2', server_hardware_bios={'bios': 'uri2'})
+        ])
+
+    def test_should_isolate_dropped_connections_on_fleet_mode(self):
+        def get_bios(uri):
+            if uri == 'uri1':
+                raise socket.error(104, 'Connection reset by peer')
+            return {'bios': uri}
+
+        self.server_hardware.get_all.return_value = [{"name": "bay 1", "uri": "uri1"}, {"name": "bay 2", "uri": "uri2"}]
+        self.server_hardware.get_bios.side_effect = get_bios
+        self.mock_ansible_module.params = dict(config='config.json', name=None, options=['bios'], fleet=True)
+
+        ServerHardwareFactsModule().run()
+
+        self.mock_ansible_module.fail_json.assert_not_called()
+        facts = self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']
+        self.assertEqual(facts['server_hardware_fleet_facts'], [
+            dict(name='bay 1', uri='uri1', error='[Errno 104] Connection reset by peer'),
+            dict(name='bay 2', uri='uri2', server_hardware_bios={'bios': 'uri2'})
+        ])
+
+    def test_should_write_fleet_facts_to_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_path = os.path.join(directory, 'survey.jsonl')
+        self.server_hardware.get_all.return_value = [{"name": "bay 1", "uri": "uri1"}]
+        self.server_hardware.get_bios.side_effect = HPOneViewException('iLO not responding')
+        self.mock_ansible_module.params = dict(config='config.json', name=None, options=['bios'], fleet=True,
+                                               dest=file_path, compress=False, page_size=10)
+
+        ServerHardwareFactsModule().run()
+
+        self.server_hardware.get_all.assert_called_once_with(start=0, count=10)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(server_hardware_fleet_export=dict(dest=file_path, compressed=False, count=1, failed=1))
+        )
+        with open(file_path) as stream:
+            self.assertEqual(json.loads(stream.read()), dict(name='bay 1', uri='uri1', error='iLO not responding'))
+
     def test_should_get_all_firmwares_across_the_servers(self):
         self.server_hardware.get_all.return_value = []
         self.server_hardware.get_all_firmwares.return_value = [{'subresource': 'firmware'}]
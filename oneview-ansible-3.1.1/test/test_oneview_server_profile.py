@@ -14,6 +14,10 @@
 # limitations under the License.
 ###
 import logging
+import os
+import shutil
+import tempfile
+import time
 import unittest
 import mock
 
@@ -28,9 +32,12 @@ from oneview_server_profile import ServerProfileMerger
 from hpOneView.extras.server_profile_utils import Keys
 from oneview_server_profile import MAKE_COMPLIANT_NOT_SUPPORTED, SERVER_PROFILE_CREATED, REMEDIATED_COMPLIANCE, \
     ALREADY_COMPLIANT, SERVER_PROFILE_DELETED, SERVER_PROFILE_UPDATED, SERVER_ALREADY_UPDATED, \
-    ERROR_ALLOCATE_SERVER_HARDWARE, SERVER_PROFILE_ALREADY_ABSENT
+    ERROR_ALLOCATE_SERVER_HARDWARE, SERVER_PROFILE_ALREADY_ABSENT, BULK_PROFILES_CREATED, BULK_PROFILES_FAILED, \
+    BULK_NOT_ENOUGH_HARDWARE, BULK_STATE_NOT_SUPPORTED, SERVER_PROFILE_CREATION_STARTED, \
+    SERVER_PROFILE_UPDATE_STARTED, UPDATE_REQUIRES_WAIT
 
 from oneview_server_profile import ServerProfileReplaceNamesByUris
+from module_utils.oneview import ResourceReservations, rank_candidates
 
 SERVER_PROFILE_NAME = "Profile101"
 SERVER_PROFILE_URI = "/rest/server-profiles/94B55683-173F-4B36-8FA6-EC250BA2328B"
@@ -157,7 +164,11 @@ INDEX_EMBED = 0
 INDEX_MEZZ = 1
 
 
-def gather_facts(mock_ov_client, created=False, online_update=True):
+def power_action(server_hardware_uri, power_state, changed=True):
+    return dict(serverHardwareUri=server_hardware_uri, powerState=power_state, changed=changed)
+
+
+def gather_facts(mock_ov_client, created=False, online_update=True, power_actions=None, extra_facts=True):
     compliance_preview = {
         'automaticUpdates': ['fake change.'],
         'isOnlineUpdate': online_update,
@@ -171,8 +182,9 @@ def gather_facts(mock_ov_client, created=False, online_update=True):
         'serial_number': CREATED_BASIC_PROFILE.get('serialNumber'),
         'server_profile': CREATED_BASIC_PROFILE,
         'server_hardware': {},
-        'compliance_preview': compliance_preview,
-        'created': created
+        'compliance_preview': compliance_preview if extra_facts else None,
+        'created': created,
+        'power_actions': power_actions or []
     }
 
     return facts
@@ -244,7 +256,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
     def test_should_not_update_when_already_compliant(self):
         fake_server = deepcopy(CREATED_BASIC_PROFILE)
-        mock_facts = gather_facts(self.mock_ov_client)
+        mock_facts = gather_facts(self.mock_ov_client, extra_facts=False)
 
         self.mock_ansible_module.params = deepcopy(PARAMS_FOR_COMPLIANT)
         self.mock_ov_client.server_profiles.get_by_name.return_value = fake_server
@@ -282,7 +294,9 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ansible_module.params = deepcopy(PARAMS_FOR_COMPLIANT)
 
         # shoud power off server to update
-        mock_facts = gather_facts(self.mock_ov_client, online_update=False)
+        hardware_uri = fake_server['serverHardwareUri']
+        mock_facts = gather_facts(self.mock_ov_client, online_update=False,
+                                  power_actions=[power_action(hardware_uri, 'Off'), power_action(hardware_uri, 'On')])
 
         ServerProfileModule().run()
 
@@ -307,7 +321,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
         self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
 
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
 
         ServerProfileModule().run()
 
@@ -333,7 +348,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_profile_templates.get_new_profile.return_value = profile_from_template
         self.mock_ov_client.server_profiles.server_hardware.update_power_state.return_value = {}
         self.mock_ansible_module.params = param_for_present
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
 
         ServerProfileModule().run()
 
@@ -366,7 +382,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_profile_templates.get_new_profile.return_value = profile_from_template
         self.mock_ov_client.server_hardware.update_power_state.return_value = {}
         self.mock_ansible_module.params = param_for_present
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
 
         ServerProfileModule().run()
 
@@ -393,7 +410,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_profiles.create.return_value = CREATED_BASIC_PROFILE
         self.mock_ov_client.server_hardware.get_by.return_value = [FAKE_SERVER_HARDWARE]
         self.mock_ansible_module.params = param_for_present
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
 
         ServerProfileModule().run()
 
@@ -420,7 +438,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_profile_templates.get_by_name.return_value = template
         self.mock_ov_client.server_profile_templates.get_new_profile.return_value = profile_from_template
         self.mock_ansible_module.params = param_for_present
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
 
         ServerProfileModule().run()
 
@@ -471,7 +490,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_hardware.get_by.return_value = [FAKE_SERVER_HARDWARE]
         self.mock_ansible_module.params = params_for_present
 
-        mock_facts = gather_facts(self.mock_ov_client, created=True)
+        mock_facts = gather_facts(self.mock_ov_client, created=True,
+                                  power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')] * 2)
 
         ServerProfileModule().run()
 
@@ -499,13 +519,189 @@ class ServerProfileModuleSpec(unittest.TestCase,
         times_get_targets_called = self.mock_ov_client.server_profiles.get_available_targets.call_count
         self.assertEqual(25, times_get_targets_called)
 
+        # each server hardware taken by someone else stays reserved, so it is tried only once
         times_create_called = self.mock_ov_client.server_profiles.create.call_count
-        self.assertEqual(25, times_create_called)
+        self.assertEqual(len(AVAILABLE_TARGETS['targets']) - 1, times_create_called)
 
         self.mock_ansible_module.fail_json.assert_called_once_with(
             msg=ERROR_ALLOCATE_SERVER_HARDWARE
         )
 
+    def test_should_create_profiles_in_bulk_from_template(self):
+        self.mock_ov_client.server_profiles.get_all.return_value = [
+            dict(name='esxi-01', uri='/rest/server-profiles/1', serverHardwareUri='/rest/server-hardware/1')]
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ov_client.server_profile_templates.get_by_name.return_value = deepcopy(BASIC_TEMPLATE)
+        self.mock_ov_client.server_profile_templates.get_new_profile.return_value = dict(
+            serverHardwareTypeUri=SHT_URI, enclosureGroupUri=ENCLOSURE_GROUP_URI)
+        self.mock_ov_client.server_profiles.create.side_effect = lambda profile: dict(
+            profile, uri='/rest/server-profiles/' + profile['name'])
+        self.mock_ov_client.server_hardware.get.return_value = dict(powerState='Off')
+        self.mock_ansible_module.params = dict(config='config.json', state='present', profile_count=3,
+                                               profile_name_pattern='esxi-{index:02d}', max_workers=2,
+                                               data=dict(server_template='Server-Template-7000'))
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_profile_templates.get_new_profile.assert_called_once_with(TEMPLATE_URI)
+        self.mock_ov_client.server_profiles.get_available_targets.assert_called_once_with(
+            enclosureGroupUri=ENCLOSURE_GROUP_URI, serverHardwareTypeUri=SHT_URI)
+        self.assertEqual(self.mock_ov_client.server_profiles.create.call_count, 2)
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+
+        result = self.mock_ansible_module.exit_json.call_args[1]
+        self.assertEqual(result['changed'], True)
+        self.assertEqual(result['msg'], BULK_PROFILES_CREATED.format(2))
+        self.assertEqual(result['ansible_facts']['server_profiles_bulk'], [
+            dict(name='esxi-01', created=False, uri='/rest/server-profiles/1',
+                 serverHardwareUri='/rest/server-hardware/1'),
+            dict(name='esxi-02', created=True, uri='/rest/server-profiles/esxi-02',
+                 serverHardwareUri=AVAILABLE_TARGETS['targets'][1]['serverHardwareUri']),
+            dict(name='esxi-03', created=True, uri='/rest/server-profiles/esxi-03',
+                 serverHardwareUri=AVAILABLE_TARGETS['targets'][2]['serverHardwareUri'])])
+        self.assertEqual(sorted(action['serverHardwareUri'] for action in result['ansible_facts']['power_actions']),
+                         [target['serverHardwareUri'] for target in AVAILABLE_TARGETS['targets'][1:3]])
+
+    def test_should_move_to_a_spare_hardware_when_the_allocated_one_was_taken_on_bulk_mode(self):
+        hardware_uris = [target['serverHardwareUri'] for target in AVAILABLE_TARGETS['targets'][1:]]
+        taken_uri, spare_uri = rank_candidates(hardware_uris, 'esxi-01')[:2]
+
+        def create(profile):
+            if profile['serverHardwareUri'] == taken_uri:
+                raise TASK_ERROR
+            return dict(profile, uri='/rest/server-profiles/' + profile['name'])
+
+        self.mock_ov_client.server_profiles.get_all.return_value = []
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ov_client.server_profiles.create.side_effect = create
+        self.mock_ansible_module.params = dict(config='config.json', state='present', profile_names=['esxi-01'],
+                                               max_workers=8, data=dict(BASIC_PROFILE))
+
+        ServerProfileModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=BULK_PROFILES_CREATED.format(1),
+            ansible_facts=dict(server_profiles_bulk=[
+                dict(name='esxi-01', created=True, uri='/rest/server-profiles/esxi-01', serverHardwareUri=spare_uri)],
+                power_actions=[power_action(taken_uri, 'Off'), power_action(spare_uri, 'Off')])
+        )
+
+    def test_should_report_each_failed_profile_on_bulk_mode(self):
+        self.mock_ov_client.server_profiles.get_all.return_value = []
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ov_client.server_profiles.create.side_effect = HPOneViewException(FAKE_MSG_ERROR)
+        self.mock_ansible_module.params = dict(config='config.json', state='present', profile_names=['esxi-01'],
+                                               max_workers=8, data=dict(BASIC_PROFILE))
+
+        ServerProfileModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=BULK_PROFILES_FAILED.format(1, 1),
+            server_profiles_bulk=[dict(name='esxi-01', created=False, uri=None, serverHardwareUri=None,
+                                       error=FAKE_MSG_ERROR)]
+        )
+
+    def test_should_fail_when_there_is_not_enough_hardware_on_bulk_mode(self):
+        self.mock_ov_client.server_profiles.get_all.return_value = []
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ansible_module.params = dict(config='config.json', state='present', profile_count=4,
+                                               profile_name_pattern='esxi-{index}', max_workers=8,
+                                               data=dict(BASIC_PROFILE))
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_profiles.create.assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=BULK_NOT_ENOUGH_HARDWARE.format(4, 3))
+
+    def test_should_fail_when_bulk_mode_is_used_with_absent_state(self):
+        self.mock_ansible_module.params = dict(config='config.json', state='absent', profile_names=['esxi-01'],
+                                               max_workers=8, data=dict(BASIC_PROFILE))
+
+        ServerProfileModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=BULK_STATE_NOT_SUPPORTED)
+
+    def test_should_not_select_hardware_reserved_by_another_run(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        reservation_file = os.path.join(directory, 'reservations.json')
+        hardware_uris = [target['serverHardwareUri'] for target in AVAILABLE_TARGETS['targets'][1:]]
+        reserved_by_others = [ResourceReservations(reservation_file).reserve(hardware_uris, 'other') for _ in
+                              range(2)]
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = None
+        self.mock_ov_client.server_profiles.create.return_value = CREATED_BASIC_PROFILE
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        params = deepcopy(PARAMS_FOR_PRESENT)
+        params.update(reservation_file=reservation_file, reservation_lease=120)
+        self.mock_ansible_module.params = params
+
+        ServerProfileModule().run()
+
+        free_uri = [uri for uri in hardware_uris if uri not in reserved_by_others][0]
+        self.assertEqual(self.mock_ov_client.server_profiles.create.call_args[0][0]['serverHardwareUri'], free_uri)
+        self.assertEqual(ResourceReservations(reservation_file).reserve([free_uri], 'other'), free_uri)
+
+    def test_should_retry_when_all_the_available_hardware_is_reserved_by_other_runs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        reservation_file = os.path.join(directory, 'reservations.json')
+        hardware_uris = [target['serverHardwareUri'] for target in AVAILABLE_TARGETS['targets'][1:]]
+        reservations = ResourceReservations(reservation_file)
+        reserved_by_others = [reservations.reserve(hardware_uris, 'other') for _ in hardware_uris]
+
+        def get_available_targets(**kwargs):
+            if time.sleep.called:
+                # the other run failed and released its server hardware in the meantime
+                reservations.release(reserved_by_others[0])
+            return AVAILABLE_TARGETS
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = None
+        self.mock_ov_client.server_profiles.create.return_value = CREATED_BASIC_PROFILE
+        self.mock_ov_client.server_profiles.get_available_targets.side_effect = get_available_targets
+        params = deepcopy(PARAMS_FOR_PRESENT)
+        params.update(reservation_file=reservation_file, reservation_lease=120)
+        self.mock_ansible_module.params = params
+
+        ServerProfileModule().run()
+
+        time.sleep.assert_called_once_with(10)
+        self.mock_ov_client.server_profiles.create.assert_called_once()
+        self.assertEqual(self.mock_ov_client.server_profiles.create.call_args[0][0]['serverHardwareUri'],
+                         reserved_by_others[0])
+
+    def test_should_fail_when_all_the_available_hardware_stays_reserved_by_other_runs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        reservation_file = os.path.join(directory, 'reservations.json')
+        hardware_uris = [target['serverHardwareUri'] for target in AVAILABLE_TARGETS['targets'][1:]]
+        for _ in hardware_uris:
+            ResourceReservations(reservation_file).reserve(hardware_uris, 'other')
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = None
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        params = deepcopy(PARAMS_FOR_PRESENT)
+        params.update(reservation_file=reservation_file, reservation_lease=120)
+        self.mock_ansible_module.params = params
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_profiles.create.assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=ERROR_ALLOCATE_SERVER_HARDWARE)
+
+    def test_should_not_wait_to_retry_when_automatically_selected_hardware_was_taken(self):
+        self.mock_ov_client.server_profiles.get_by_name.return_value = None
+        self.mock_ov_client.server_profiles.create.side_effect = [TASK_ERROR, CREATED_BASIC_PROFILE]
+        self.mock_ov_client.server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+
+        ServerProfileModule().run()
+
+        first_try, second_try = self.mock_ov_client.server_profiles.create.call_args_list
+        self.assertNotEqual(first_try[0][0]['serverHardwareUri'], second_try[0][0]['serverHardwareUri'])
+        time.sleep.assert_not_called()
+
     def test_should_fail_when_exception_is_not_related_with_server_hardware(self):
         self.mock_ov_client.server_profiles.get_by_name.return_value = None
         self.mock_ov_client.server_profiles.create.side_effect = HPOneViewException(FAKE_MSG_ERROR)
@@ -1360,7 +1556,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         self.mock_ov_client.server_profiles.create.assert_called_once()
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_update_when_data_changed(self, mock_resource_compare):
         profile_data = deepcopy(BASIC_PROFILE)
         mock_resource_compare.return_value = False
@@ -1382,7 +1578,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
             ansible_facts=mock_facts
         )
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_power_off_before_update_when_data_changed(self, mock_resource_compare):
         fake_profile_data = deepcopy(BASIC_PROFILE)
         fake_profile_data['serverHardwareUri'] = SHT_URI
@@ -1394,7 +1590,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ov_client.server_hardware.update_power_state.return_value = {}
         self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
 
-        mock_facts = gather_facts(self.mock_ov_client)
+        mock_facts = gather_facts(self.mock_ov_client,
+                                  power_actions=[power_action(SHT_URI, 'Off'), power_action(SHT_URI, 'On')])
 
         ServerProfileModule().run()
 
@@ -1411,24 +1608,180 @@ class ServerProfileModuleSpec(unittest.TestCase,
             ansible_facts=mock_facts
         )
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.time')
+    @mock.patch('module_utils.oneview.resource_compare')
+    def test_should_restore_the_power_state_after_retrying_an_etag_conflict(self, mock_resource_compare, mock_time):
+        fake_profile_data = deepcopy(BASIC_PROFILE)
+        fake_profile_data['serverHardwareUri'] = SHT_URI
+
+        mock_resource_compare.return_value = False
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = fake_profile_data
+        self.mock_ov_client.server_profiles.get.return_value = dict(fake_profile_data, eTag='2')
+        self.mock_ov_client.server_profiles.update.side_effect = [
+            HPOneViewException(dict(errorCode='PRECONDITION_FAILED', message='ETag mismatch.')), CREATED_BASIC_PROFILE]
+        # the server hardware is powered off by the first attempt
+        power_states = ['On']
+        self.mock_ov_client.server_hardware.get.side_effect = lambda uri: dict(powerState=power_states.pop(0)
+                                                                               if power_states else 'Off')
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+
+        ServerProfileModule().run()
+
+        self.assertEqual(self.mock_ov_client.server_profiles.update.call_args,
+                         mock.call(dict(fake_profile_data, eTag='2'), SERVER_PROFILE_URI))
+        self.assertEqual(self.mock_ov_client.server_hardware.update_power_state.call_args_list, [
+            mock.call(dict(powerState='Off', powerControl='PressAndHold'), SHT_URI),
+            mock.call(dict(powerState='On', powerControl='MomentaryPress'), SHT_URI)])
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True, msg=SERVER_PROFILE_UPDATED, ansible_facts=mock.ANY)
+
+    @mock.patch('module_utils.oneview.resource_compare')
+    def test_should_return_the_task_uri_when_not_waiting_for_the_update_of_powered_off_hardware(
+            self, mock_resource_compare):
+        fake_profile_data = deepcopy(BASIC_PROFILE)
+        fake_profile_data['serverHardwareUri'] = SHT_URI
+        server_profiles = self.mock_ov_client.server_profiles
+
+        mock_resource_compare.return_value = False
+
+        server_profiles.get_by_name.return_value = fake_profile_data
+        server_profiles.update.side_effect = lambda *args: \
+            server_profiles._client._task_monitor.wait_for_task(dict(uri='/rest/tasks/1'))
+        self.mock_ov_client.server_hardware.get.return_value = dict(uri=SHT_URI, powerState='Off')
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+        self.mock_ansible_module.params['wait'] = False
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+        server_profiles.update.assert_called_once_with(fake_profile_data, SERVER_PROFILE_URI)
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=SERVER_PROFILE_UPDATE_STARTED,
+            ansible_facts=dict(task_uri='/rest/tasks/1', created=False,
+                               power_actions=[power_action(SHT_URI, 'Off', changed=False)])
+        )
+
+    @mock.patch('module_utils.oneview.resource_compare')
+    def test_should_refuse_not_waiting_for_an_update_that_powers_off_the_hardware(self, mock_resource_compare):
+        fake_profile_data = deepcopy(BASIC_PROFILE)
+        fake_profile_data['serverHardwareUri'] = SHT_URI
+
+        mock_resource_compare.return_value = False
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = fake_profile_data
+        self.mock_ov_client.server_hardware.get.return_value = dict(uri=SHT_URI, powerState='On')
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+        self.mock_ansible_module.params['wait'] = False
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+        self.mock_ov_client.server_profiles.update.assert_not_called()
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=UPDATE_REQUIRES_WAIT.format(SHT_URI))
+
+    def test_should_return_the_task_uri_when_not_waiting_for_the_creation(self):
+        server_profiles = self.mock_ov_client.server_profiles
+        server_profiles.get_by_name.return_value = None
+        server_profiles.create.side_effect = lambda *args: \
+            server_profiles._client._task_monitor.wait_for_task(dict(uri='/rest/tasks/1'))
+        server_profiles.get_available_targets.return_value = AVAILABLE_TARGETS
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+        self.mock_ansible_module.params['wait'] = False
+
+        ServerProfileModule().run()
+
+        server_profiles.create.assert_called_once()
+        self.mock_ov_client.server_hardware.get.assert_called_once_with(FAKE_SERVER_HARDWARE['uri'])
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=SERVER_PROFILE_CREATION_STARTED,
+            ansible_facts=dict(task_uri='/rest/tasks/1', created=True,
+                               power_actions=[power_action(FAKE_SERVER_HARDWARE['uri'], 'Off')])
+        )
+
+    @mock.patch('module_utils.oneview.resource_compare')
+    def test_should_not_power_cycle_hardware_already_off_before_update(self, mock_resource_compare):
+        fake_profile_data = deepcopy(BASIC_PROFILE)
+        fake_profile_data['serverHardwareUri'] = SHT_URI
+
+        mock_resource_compare.return_value = False
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = fake_profile_data
+        self.mock_ov_client.server_profiles.update.return_value = CREATED_BASIC_PROFILE
+        self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
+
+        mock_facts = gather_facts(self.mock_ov_client, power_actions=[power_action(SHT_URI, 'Off', changed=False),
+                                                                      power_action(SHT_URI, 'Off', changed=False)])
+        self.mock_ov_client.server_hardware.get.return_value = dict(powerState='Off')
+        mock_facts['server_hardware'] = dict(powerState='Off')
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=SERVER_PROFILE_UPDATED,
+            ansible_facts=mock_facts
+        )
+
+    def test_should_not_power_off_when_only_the_description_changes(self):
+        current_profile = deepcopy(BASIC_PROFILE)
+        current_profile.update(uri=SERVER_PROFILE_URI, serverHardwareUri=SHT_URI, description='ESXi host')
+        params = deepcopy(PARAMS_FOR_PRESENT)
+        params['data'] = dict(name=SERVER_PROFILE_NAME, description='ESXi host of the web farm')
+
+        self.mock_ov_client.server_profiles.get_by_name.return_value = current_profile
+        self.mock_ov_client.server_profiles.update.return_value = CREATED_BASIC_PROFILE
+        self.mock_ansible_module.params = params
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+        self.mock_ov_client.server_profiles.update.assert_called_once_with(
+            dict(current_profile, description='ESXi host of the web farm'), SERVER_PROFILE_URI)
+
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_update_when_data_is_equals(self, mock_resource_compare):
         profile_data = deepcopy(CREATED_BASIC_PROFILE)
 
         mock_resource_compare.return_value = True
-        mock_facts = gather_facts(self.mock_ov_client)
+        mock_facts = gather_facts(self.mock_ov_client, extra_facts=False)
         self.mock_ov_client.server_profiles.get_by_name.return_value = profile_data
         self.mock_ansible_module.params = deepcopy(PARAMS_FOR_PRESENT)
 
         ServerProfileModule().run()
 
+        self.mock_ov_client.server_hardware.get.assert_called_once_with(profile_data['serverHardwareUri'])
+        self.mock_ov_client.server_profiles.get_compliance_preview.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=SERVER_ALREADY_UPDATED,
+            ansible_facts=mock_facts
+        )
+
+    @mock.patch('module_utils.oneview.resource_compare')
+    def test_should_fetch_only_the_selected_facts(self, mock_resource_compare):
+        mock_resource_compare.return_value = True
+        mock_facts = gather_facts(self.mock_ov_client)
+        mock_facts['server_hardware'] = None
+        self.mock_ov_client.server_profiles.get_by_name.return_value = deepcopy(CREATED_BASIC_PROFILE)
+        params = deepcopy(PARAMS_FOR_PRESENT)
+        params['return_facts'] = ['compliance_preview']
+        self.mock_ansible_module.params = params
+
+        ServerProfileModule().run()
+
+        self.mock_ov_client.server_hardware.get.assert_not_called()
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=False,
             msg=SERVER_ALREADY_UPDATED,
             ansible_facts=mock_facts
         )
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_change_power_state_when_data_is_equals(self, mock_resource_compare):
         profile_data = deepcopy(CREATED_BASIC_PROFILE)
 
@@ -1441,7 +1794,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         self.mock_ov_client.server_hardware.update_power_state.not_been_called()
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_fail_when_informed_template_not_exist_for_update(self, mock_resource_compare):
         profile_data = deepcopy(CREATED_BASIC_PROFILE)
 
@@ -1462,7 +1815,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ansible_module.fail_json.assert_called_once_with(
             msg="Informed Server Profile Template 'TemplateA200' not found")
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_fail_when_informed_hardware_not_exist_for_update(self, mock_resource_compare):
         profile_data = deepcopy(CREATED_BASIC_PROFILE)
 
@@ -1483,7 +1836,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.mock_ansible_module.fail_json.assert_called_once_with(
             msg="Informed Server Hardware 'ServerHardwareName' not found")
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     @mock.patch.object(ServerProfileMerger, 'merge_data')
     def test_should_call_deep_merge_when_resource_found(self, mock_deep_merge, mock_resource_compare):
         server_profile = deepcopy(BASIC_PROFILE)
@@ -1496,7 +1849,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         mock_deep_merge.assert_called_once_with(server_profile, PARAMS_FOR_PRESENT['data'])
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     @mock.patch.object(ServerProfileMerger, 'merge_data')
     def test_should_compare_original_and_merged_resource(self, mock_deep_merge, mock_resource_compare):
         server_profile = deepcopy(BASIC_PROFILE)
@@ -1510,9 +1863,9 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         ServerProfileModule().run()
 
-        mock_resource_compare.assert_called_once_with(server_profile, merged_data)
+        mock_resource_compare.assert_called_once_with(server_profile, merged_data, ignore=mock.ANY)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_replace_os_deployment_name_by_uri_on_update(self, mock_resource_compare):
         uri = '/rest/os-deployment-plans/81decf85-0dff-4a5e-8a95-52994eeb6493'
         mock_resource_compare.return_value = False
@@ -1609,7 +1962,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         expected_error = ServerProfileReplaceNamesByUris.SERVER_PROFILE_NETWORK_NOT_FOUND + "FC Network"
         self.mock_ansible_module.fail_json.assert_called_once_with(msg=expected_error)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_mac_from_connections_before_update_when_mac_is_virtual(self, mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
         params['data'][Keys.CONNECTIONS] = [CONNECTION_1, CONNECTION_2]
@@ -1625,7 +1978,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         args, _ = self.mock_ov_client.server_profiles.update.call_args
         self.assertEqual(args[0][Keys.CONNECTIONS], expected_connections)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_mac_from_connections_before_update_when_mac_is_physical(self, mock_resource_compare):
         mock_resource_compare.return_value = False
 
@@ -1643,7 +1996,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         args, _ = self.mock_ov_client.server_profiles.update.call_args
         self.assertEqual(args[0][Keys.CONNECTIONS], expected_connections)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_serial_number_before_update_when_serial_number_type_is_virtual(self,
                                                                                               mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
@@ -1661,7 +2014,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.assertEqual(args[0][Keys.UUID], 'eb0e2fac-bbe5-4ad1-84d3-3e38481c9806')
         self.assertEqual(args[0][Keys.SERIAL_NUMBER], 'VCGNC3V000')
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_serial_number_before_update_when_serial_number_type_is_physical(self,
                                                                                                mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
@@ -1679,7 +2032,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         self.assertEqual(args[0][Keys.UUID], 'eb0e2fac-bbe5-4ad1-84d3-3e38481c9806')
         self.assertEqual(args[0][Keys.SERIAL_NUMBER], 'VCGNC3V000')
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_wwpn_from_conns_before_update_when_wwpn_is_virtual(self, mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
         params['data'][Keys.CONNECTIONS] = [CONNECTION_1_WITH_WWPN]
@@ -1694,7 +2047,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         args, _ = self.mock_ov_client.server_profiles.update.call_args
         self.assertEqual(args[0][Keys.CONNECTIONS], expected_connections)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_wwpn_from_conns_before_update_when_wwpn_is_physical(self, mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
         params['data'][Keys.CONNECTIONS] = [CONNECTION_2_WITH_WWPN]
@@ -1709,7 +2062,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         args, _ = self.mock_ov_client.server_profiles.update.call_args
         self.assertEqual(args[0][Keys.CONNECTIONS], expected_connections)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_drive_number_from_controller_drives_before_update(self, mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
         params['data'][Keys.LOCAL_STORAGE] = dict(controllers=[CONTROLLER_EMBEDDED.copy()])
@@ -1724,7 +2077,7 @@ class ServerProfileModuleSpec(unittest.TestCase,
         args, _ = self.mock_ov_client.server_profiles.update.call_args
         self.assertEqual(args[0][Keys.LOCAL_STORAGE][Keys.CONTROLLERS][0][Keys.LOGICAL_DRIVES], expected_drives)
 
-    @mock.patch('oneview_server_profile.resource_compare')
+    @mock.patch('module_utils.oneview.resource_compare')
     def test_should_not_remove_lun_from_san_volumes_before_update_when_luntype_is_auto(self,
                                                                                        mock_resource_compare):
         params = deepcopy(PARAMS_FOR_PRESENT)
@@ -1752,7 +2105,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=False,
-            msg=SERVER_PROFILE_ALREADY_ABSENT
+            msg=SERVER_PROFILE_ALREADY_ABSENT,
+            ansible_facts=dict(power_actions=[])
         )
 
     def test_should_turn_off_hardware_before_delete(self):
@@ -1774,7 +2128,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
-            msg=SERVER_PROFILE_DELETED
+            msg=SERVER_PROFILE_DELETED,
+            ansible_facts=dict(power_actions=[power_action(sh_uri, 'Off')])
         )
 
     def test_should_not_turn_off_hardware_if_not_associated_before_delete(self):
@@ -1793,7 +2148,8 @@ class ServerProfileModuleSpec(unittest.TestCase,
 
         self.mock_ansible_module.exit_json.assert_called_once_with(
             changed=True,
-            msg=SERVER_PROFILE_DELETED
+            msg=SERVER_PROFILE_DELETED,
+            ansible_facts=dict(power_actions=[])
         )
 
 
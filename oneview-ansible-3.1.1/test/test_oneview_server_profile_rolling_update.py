@@ -0,0 +1,268 @@
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import itertools
+import mock
+import unittest
+import yaml
+
+from hpOneView.exceptions import HPOneViewException
+from oneview_server_profile_rolling_update import ServerProfileRollingUpdateModule, EXAMPLES, \
+    ROLLING_UPDATE_DONE, ROLLING_UPDATE_STOPPED, PROFILES_NOT_FOUND, TEMPLATE_NOT_FOUND, INVALID_BATCH_SIZE, \
+    PROFILE_NOT_HEALTHY
+from test.utils import ModuleContructorTestCase
+from test.utils import ErrorHandlingTestCase
+
+OLD_PLAN_URI = '/rest/os-deployment-plans/1'
+NEW_PLAN_URI = '/rest/os-deployment-plans/2'
+TEMPLATE_URI = '/rest/server-profile-templates/1'
+
+PARAMS = dict(
+    config='config.json',
+    profile_names=['esxi-01', 'esxi-02', 'esxi-03', 'esxi-04'],
+    batch_size='1',
+    max_unavailable=None,
+    max_failures=0,
+    revert=True,
+    healthy_statuses=['OK'],
+    health_timeout=60,
+    health_interval=30,
+    pause=0,
+    data=dict(osDeploymentSettings=dict(osDeploymentPlanUri=NEW_PLAN_URI))
+)
+
+
+class FakeServerProfiles(object):
+    """
+    Keeps the Server Profiles updated by the module, reporting them healthy unless they are listed as unhealthy.
+    """
+
+    def __init__(self, names):
+        self.profiles = dict(('/rest/server-profiles/' + name, dict(
+            name=name, uri='/rest/server-profiles/' + name, serverHardwareUri='/rest/server-hardware/' + name,
+            osDeploymentSettings=dict(osDeploymentPlanUri=OLD_PLAN_URI), state='Normal', status='OK', eTag='1'))
+            for name in names)
+        self.failing = set()
+        self.unhealthy = set()
+        self.updates = []
+
+    def get_all(self):
+        return [dict(profile) for profile in self.profiles.values()]
+
+    def get(self, uri):
+        profile = dict(self.profiles[uri])
+        if profile['name'] in self.unhealthy:
+            profile['status'] = 'Critical'
+        return profile
+
+    def update(self, profile, uri):
+        self.updates.append((profile['name'], profile['osDeploymentSettings']['osDeploymentPlanUri']))
+        if profile['name'] in self.failing:
+            raise HPOneViewException('Update failed')
+        self.profiles[uri] = dict(profile)
+        return dict(profile)
+
+
+class ServerProfileRollingUpdateSpec(unittest.TestCase,
+                                     ModuleContructorTestCase,
+                                     ErrorHandlingTestCase):
+    """
+    ModuleContructorTestCase has common tests for class constructor and main function,
+    also provides the mocks used in this test case
+
+    ErrorHandlingTestCase has common tests for the module error handling.
+    """
+
+    def setUp(self):
+        self.configure_mocks(self, ServerProfileRollingUpdateModule)
+        self.server_profiles = FakeServerProfiles(PARAMS['profile_names'])
+        self.mock_ov_client.server_profiles = self.server_profiles
+        self.mock_ov_client.server_hardware.get.return_value = dict(powerState='On', status='OK')
+
+        ErrorHandlingTestCase.configure(self, method_to_fire=self.mock_ov_client.server_profile_templates.get_by_name,
+                                        ansible_params=dict(PARAMS, data=dict(server_template='ESXi template')))
+
+        patcher = mock.patch('oneview_server_profile_rolling_update.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_time.time.side_effect = itertools.count(0, 30)
+        self.mock_time.strftime.return_value = '2017-06-01T10:00:00Z'
+
+        self.mock_ansible_module.params = dict(PARAMS)
+
+    def __get_rolling_update(self):
+        if self.mock_ansible_module.exit_json.called:
+            return self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['rolling_update']
+        return self.mock_ansible_module.fail_json.call_args[1]['rolling_update']
+
+    def __get_statuses(self):
+        return [host['status'] for host in self.__get_rolling_update()['hosts']]
+
+    def __get_plan(self, name):
+        return self.server_profiles.profiles['/rest/server-profiles/' + name]['osDeploymentSettings'][
+            'osDeploymentPlanUri']
+
+    def test_should_update_the_profiles_in_batches_of_a_percentage(self):
+        self.mock_ansible_module.params['batch_size'] = '50%'
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual([self.__get_plan(name) for name in PARAMS['profile_names']], [NEW_PLAN_URI] * 4)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=ROLLING_UPDATE_DONE.format(4, 0, 0),
+            ansible_facts=mock.ANY)
+
+        rolling_update = self.__get_rolling_update()
+        self.assertEqual(rolling_update['batches'], [['esxi-01', 'esxi-02'], ['esxi-03', 'esxi-04']])
+        self.assertEqual([host['batch'] for host in rolling_update['hosts']], [0, 0, 1, 1])
+        self.assertEqual([event['event'] for event in rolling_update['hosts'][0]['timeline']],
+                         ['started', 'updated', 'healthy'])
+        self.assertEqual(rolling_update['hosts'][0]['timeline'][0]['time'], '2017-06-01T10:00:00Z')
+
+    def test_should_power_off_during_the_update_and_restore_the_power_state(self):
+        self.mock_ansible_module.params['profile_names'] = ['esxi-01']
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.mock_ov_client.server_hardware.update_power_state.call_args_list, [
+            mock.call(dict(powerState='Off', powerControl='PressAndHold'), '/rest/server-hardware/esxi-01'),
+            mock.call(dict(powerState='On', powerControl='MomentaryPress'), '/rest/server-hardware/esxi-01')])
+
+    def test_should_keep_off_the_servers_that_were_off(self):
+        self.mock_ansible_module.params['profile_names'] = ['esxi-01']
+        self.mock_ov_client.server_hardware.get.return_value = dict(powerState='Off', status='OK')
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.mock_ov_client.server_hardware.update_power_state.assert_not_called()
+        self.assertEqual(self.__get_statuses(), ['updated'])
+
+    def test_should_update_concurrently_up_to_max_unavailable(self):
+        self.mock_ansible_module.params.update(batch_size='4', max_unavailable=2)
+
+        with mock.patch('oneview_server_profile_rolling_update.run_concurrently',
+                        side_effect=lambda functions, max_workers: [function() for function in functions]) as run:
+            ServerProfileRollingUpdateModule().run()
+
+        run.assert_called_once_with(mock.ANY, 2)
+        self.assertEqual(self.__get_statuses(), ['updated'] * 4)
+
+    def test_should_not_update_the_profiles_already_updated(self):
+        self.server_profiles.profiles['/rest/server-profiles/esxi-02']['osDeploymentSettings'] = dict(
+            osDeploymentPlanUri=NEW_PLAN_URI)
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertNotIn('esxi-02', [name for name, plan in self.server_profiles.updates])
+        self.assertEqual(self.__get_statuses(), ['updated', 'unchanged', 'updated', 'updated'])
+        self.assertEqual(self.mock_ansible_module.exit_json.call_args[1]['msg'], ROLLING_UPDATE_DONE.format(3, 1, 0))
+
+    def test_should_not_change_anything_when_all_profiles_are_updated(self):
+        for profile in self.server_profiles.profiles.values():
+            profile['osDeploymentSettings'] = dict(osDeploymentPlanUri=NEW_PLAN_URI)
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.server_profiles.updates, [])
+        self.assertFalse(self.mock_ansible_module.exit_json.call_args[1]['changed'])
+
+    def test_should_revert_the_unhealthy_profile_and_stop(self):
+        self.server_profiles.unhealthy.add('esxi-02')
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.server_profiles.updates, [('esxi-01', NEW_PLAN_URI), ('esxi-02', NEW_PLAN_URI),
+                                                        ('esxi-02', OLD_PLAN_URI)])
+        self.assertEqual(self.__get_plan('esxi-02'), OLD_PLAN_URI)
+        self.assertEqual(self.__get_statuses(), ['updated', 'reverted', 'skipped', 'skipped'])
+
+        host = self.__get_rolling_update()['hosts'][1]
+        self.assertEqual(host['error'], PROFILE_NOT_HEALTHY.format(60, 'Normal', 'Critical', 'OK'))
+        self.assertEqual([event['event'] for event in host['timeline']], ['started', 'updated', 'failed', 'reverted'])
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=ROLLING_UPDATE_STOPPED.format(1, 1, 1, 2),
+                                                                   rolling_update=mock.ANY)
+
+    def test_should_continue_while_the_failures_are_tolerated(self):
+        self.mock_ansible_module.params.update(max_failures=1, revert=False)
+        self.server_profiles.failing.add('esxi-02')
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.__get_statuses(), ['updated', 'failed', 'updated', 'updated'])
+        self.assertEqual(self.__get_rolling_update()['hosts'][1]['error'], 'Update failed')
+        self.assertEqual(self.__get_plan('esxi-02'), OLD_PLAN_URI)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=ROLLING_UPDATE_DONE.format(3, 0, 1),
+            ansible_facts=mock.ANY)
+
+    def test_should_power_on_the_server_when_a_failed_update_is_reverted(self):
+        self.mock_ansible_module.params['profile_names'] = ['esxi-01']
+        self.server_profiles.failing.add('esxi-01')
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.__get_statuses(), ['reverted'])
+        self.mock_ov_client.server_hardware.update_power_state.assert_called_with(
+            dict(powerState='On', powerControl='MomentaryPress'), '/rest/server-hardware/esxi-01')
+
+    def test_should_make_the_profiles_compliant_with_a_new_template(self):
+        self.mock_ansible_module.params.update(profile_names=['esxi-01'], data=dict(server_template='ESXi template'))
+        self.mock_ov_client.server_profile_templates.get_by_name.return_value = dict(uri=TEMPLATE_URI)
+        self.server_profiles.update = mock.Mock(return_value=dict(uri='/rest/server-profiles/esxi-01',
+                                                                  serverProfileTemplateUri=TEMPLATE_URI,
+                                                                  templateCompliance='NonCompliant'))
+        self.server_profiles.patch = mock.Mock()
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.server_profiles.update.call_args[0][0]['serverProfileTemplateUri'], TEMPLATE_URI)
+        self.server_profiles.patch.assert_called_once_with('/rest/server-profiles/esxi-01', 'replace',
+                                                           '/templateCompliance', 'Compliant')
+        self.assertEqual(self.__get_statuses(), ['updated'])
+
+    def test_should_fail_when_the_template_is_not_found(self):
+        self.mock_ansible_module.params['data'] = dict(server_template='ESXi template')
+        self.mock_ov_client.server_profile_templates.get_by_name.return_value = None
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=TEMPLATE_NOT_FOUND.format('ESXi template'))
+
+    def test_should_fail_before_updating_when_a_profile_is_not_found(self):
+        self.mock_ansible_module.params['profile_names'] = ['esxi-01', 'esxi-05', 'esxi-06']
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.server_profiles.updates, [])
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=PROFILES_NOT_FOUND.format('esxi-05, esxi-06'))
+
+    def test_should_fail_when_the_batch_size_is_invalid(self):
+        self.mock_ansible_module.params['batch_size'] = 'half'
+
+        ServerProfileRollingUpdateModule().run()
+
+        self.assertEqual(self.server_profiles.updates, [])
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=INVALID_BATCH_SIZE.format('half'))
+
+    def test_should_load_the_examples(self):
+        examples = yaml.load(EXAMPLES)
+
+        self.assertEqual(examples[0]['oneview_server_profile_rolling_update']['batch_size'], '25%')
+
+
+if __name__ == '__main__':
+    unittest.main()
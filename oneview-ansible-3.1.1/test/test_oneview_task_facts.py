@@ -14,8 +14,14 @@
 # limitations under the License.
 ###
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
 
+from mock import create_autospec, patch
+from hpOneView.resources.activity.tasks import Tasks
 from oneview_task_facts import TaskFactsModule
 
 from test.utils import ModuleContructorTestCase
@@ -66,6 +72,12 @@ TASK = {
 
 ALL_TASKS = [TASK]
 
+PARAMS_GET_ALL_WITH_FIELDS = dict(
+    config='config.json',
+    params=dict(count=COUNT),
+    fields=['taskState', 'associatedResource.resourceName']
+)
+
 
 class TaskFactsSpec(unittest.TestCase,
                     ModuleContructorTestCase,
@@ -119,6 +131,82 @@ class TaskFactsSpec(unittest.TestCase,
             ansible_facts=dict(tasks=ALL_TASKS)
         )
 
+    def test_should_write_tasks_to_file(self):
+        self.mock_ov_client.tasks.get_all.return_value = ALL_TASKS
+        self.mock_ansible_module.params = dict(config='config.json', params=None, dest='/tmp/tasks.jsonl',
+                                               compress=True, page_size=100)
+
+        with patch('oneview_task_facts.export_all_projected') as mock_export:
+            mock_export.return_value = dict(dest='/tmp/tasks.jsonl', compressed=True, count=1)
+            TaskFactsModule().run()
+
+        mock_export.assert_called_once_with(self.mock_ov_client.tasks, {}, None, '/tmp/tasks.jsonl', True, 100)
+        self.mock_ov_client.tasks.get_all.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(tasks_export=dict(dest='/tmp/tasks.jsonl', compressed=True, count=1))
+        )
+
+    def test_should_get_only_tasks_changed_since_the_watermark(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        watermark_file = os.path.join(directory, 'tasks.json')
+        first_task = dict(TASK, uri='/rest/tasks/1', modified='2016-09-06T15:16:24.249Z')
+        second_task = dict(TASK, uri='/rest/tasks/2', modified='2016-09-06T15:20:00.000Z')
+        self.mock_ansible_module.params = dict(config='config.json', params=None, watermark_file=watermark_file,
+                                               retention_count=1000, retention_days=None)
+
+        self.mock_ov_client.tasks.get_all.return_value = [first_task]
+        TaskFactsModule().run()
+
+        self.mock_ov_client.tasks.get_all.return_value = [first_task, second_task]
+        TaskFactsModule().run()
+
+        self.mock_ov_client.tasks.get_all.assert_called_with(filter=["modified >= '2016-09-06T15:16:24.249Z'"],
+                                                             sort='modified:ascending')
+        self.mock_ansible_module.exit_json.assert_called_with(
+            changed=False,
+            ansible_facts=dict(tasks=[second_task],
+                               tasks_watermark=dict(watermark_file=watermark_file,
+                                                    watermark='2016-09-06T15:20:00.000Z',
+                                                    stored=2))
+        )
+
+    def test_should_apply_retention_to_the_stored_tasks(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        watermark_file = os.path.join(directory, 'tasks.json')
+        tasks = [dict(TASK, uri='/rest/tasks/1', modified='2016-09-06T15:16:24.249Z'),
+                 dict(TASK, uri='/rest/tasks/2', modified='2099-01-01T00:00:00.000Z'),
+                 dict(TASK, uri='/rest/tasks/3', modified='2099-01-02T00:00:00.000Z')]
+        self.mock_ov_client.tasks.get_all.return_value = tasks
+        self.mock_ansible_module.params = dict(config='config.json', params=None, watermark_file=watermark_file,
+                                               retention_count=1, retention_days=30)
+
+        TaskFactsModule().run()
+
+        with open(watermark_file) as stream:
+            store = json.load(stream)
+        self.assertEqual([task['uri'] for task in store['tasks']], ['/rest/tasks/3'])
+
+    def test_get_all_with_fields(self):
+        self.mock_ov_client.tasks = create_autospec(Tasks, instance=True)
+        self.mock_ov_client.tasks.get_all.return_value = ALL_TASKS
+        self.mock_ansible_module.params = PARAMS_GET_ALL_WITH_FIELDS
+
+        TaskFactsModule().run()
+
+        self.mock_ov_client.tasks.get_all.assert_called_once_with(
+            count=COUNT,
+            fields='taskState,associatedResource'
+        )
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            ansible_facts=dict(tasks=[dict(taskState='Completed',
+                                           associatedResource=dict(resourceName='ProfileTemplate101'))])
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
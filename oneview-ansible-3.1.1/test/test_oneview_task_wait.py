@@ -0,0 +1,217 @@
+###
+# Copyright (2016) Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###
+import mock
+import unittest
+
+from hpOneView.exceptions import HPOneViewException
+from oneview_task_wait import TaskWaitModule, TASKS_COMPLETED, TASKS_FAILED, TASK_FAILED, TASK_TIMED_OUT
+from test.utils import ModuleContructorTestCase
+
+PARAMS = dict(
+    config='config.json',
+    task_uris=['/rest/tasks/1', '/rest/tasks/2'],
+    timeout=3600,
+    poll_interval=2,
+    max_poll_interval=60,
+    max_workers=8,
+    fail_on_error=True
+)
+
+
+def task(uri, state='Running', percent=0, **kwargs):
+    return dict(kwargs, uri=uri, name='Update firmware', taskState=state, computedPercentComplete=percent,
+                associatedResource=dict(resourceUri='/rest/logical-interconnects/1'))
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeTasks(object):
+    """
+    Returns the next step of the script of each task on each poll, repeating the last one, and records the polls.
+    """
+
+    def __init__(self, clock, scripts):
+        self.clock = clock
+        self.scripts = scripts
+        self.polls = dict((uri, []) for uri in scripts)
+
+    def get(self, uri):
+        self.polls[uri].append(self.clock.now)
+        script = self.scripts[uri]
+        step = script.pop(0) if len(script) > 1 else script[0]
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+class TaskWaitSpec(unittest.TestCase, ModuleContructorTestCase):
+    """
+    ModuleContructorTestCase has common tests for class constructor and main function,
+    also provides the mocks used in this test case
+    """
+
+    def setUp(self):
+        self.configure_mocks(self, TaskWaitModule)
+
+        self.clock = FakeClock()
+        patcher = mock.patch('oneview_task_wait.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mock_ansible_module.params = dict(PARAMS)
+
+    def __set_scripts(self, scripts):
+        self.tasks = FakeTasks(self.clock, scripts)
+        self.mock_ov_client.tasks = self.tasks
+
+    def __get_tasks(self):
+        if self.mock_ansible_module.exit_json.called:
+            return self.mock_ansible_module.exit_json.call_args[1]['ansible_facts']['oneview_tasks']
+        return self.mock_ansible_module.fail_json.call_args[1]['oneview_tasks']
+
+    def test_should_wait_for_all_the_tasks(self):
+        self.__set_scripts({
+            '/rest/tasks/1': [task('/rest/tasks/1', percent=50), task('/rest/tasks/1', 'Completed', 100)],
+            '/rest/tasks/2': [task('/rest/tasks/2', 'Warning', 100)]
+        })
+
+        TaskWaitModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=TASKS_COMPLETED.format(2, 0, 0),
+            ansible_facts=dict(oneview_tasks=[
+                dict(uri='/rest/tasks/1', name='Update firmware', state='Completed', percent=100,
+                     resource_uri='/rest/logical-interconnects/1', error=None),
+                dict(uri='/rest/tasks/2', name='Update firmware', state='Warning', percent=100,
+                     resource_uri='/rest/logical-interconnects/1', error=None)
+            ]))
+        self.assertEqual(self.tasks.polls, {'/rest/tasks/1': [0, 2], '/rest/tasks/2': [0]})
+
+    def test_should_ignore_empty_and_repeated_items_and_accept_tasks(self):
+        self.mock_ansible_module.params['task_uris'] = [None, dict(uri='/rest/tasks/1'), '/rest/tasks/1', '']
+        self.__set_scripts({'/rest/tasks/1': [task('/rest/tasks/1', 'Completed', 100)]})
+
+        TaskWaitModule().run()
+
+        self.assertEqual([result['uri'] for result in self.__get_tasks()], ['/rest/tasks/1'])
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0])
+
+    def test_should_back_off_while_the_progress_does_not_change(self):
+        self.mock_ansible_module.params['task_uris'] = ['/rest/tasks/1']
+        self.__set_scripts({'/rest/tasks/1': [task('/rest/tasks/1', percent=0), task('/rest/tasks/1', percent=0),
+                                              task('/rest/tasks/1', percent=0), task('/rest/tasks/1', percent=50),
+                                              task('/rest/tasks/1', percent=50),
+                                              task('/rest/tasks/1', 'Completed', 100)]})
+
+        TaskWaitModule().run()
+
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0, 2, 6, 14, 16, 20])
+
+    def test_should_not_poll_less_often_than_the_max_poll_interval(self):
+        self.mock_ansible_module.params['task_uris'] = ['/rest/tasks/1']
+        self.mock_ansible_module.params['max_poll_interval'] = 5
+        self.__set_scripts({'/rest/tasks/1': [task('/rest/tasks/1')] * 5 + [task('/rest/tasks/1', 'Completed', 100)]})
+
+        TaskWaitModule().run()
+
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0, 2, 6, 11, 16, 21])
+
+    def test_should_fail_when_a_task_fails(self):
+        self.__set_scripts({
+            '/rest/tasks/1': [task('/rest/tasks/1', 'Error', 30, taskErrors=[dict(message='Interconnect offline')])],
+            '/rest/tasks/2': [task('/rest/tasks/2', 'Completed', 100)]
+        })
+
+        TaskWaitModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=TASKS_FAILED.format(1, 2),
+                                                                   oneview_tasks=mock.ANY)
+        self.assertEqual([result['error'] for result in self.__get_tasks()], ['Interconnect offline', None])
+
+    def test_should_describe_a_failed_task_without_errors_by_its_state(self):
+        self.mock_ansible_module.params['task_uris'] = ['/rest/tasks/1']
+        self.__set_scripts({'/rest/tasks/1': [task('/rest/tasks/1', 'Terminated')]})
+
+        TaskWaitModule().run()
+
+        self.assertEqual(self.__get_tasks()[0]['error'], TASK_FAILED.format('Terminated'))
+
+    def test_should_report_the_failed_tasks_when_not_failing_on_error(self):
+        self.mock_ansible_module.params['fail_on_error'] = False
+        self.mock_ansible_module.params['timeout'] = 10
+        self.__set_scripts({
+            '/rest/tasks/1': [task('/rest/tasks/1', 'Killed')],
+            '/rest/tasks/2': [task('/rest/tasks/2')]
+        })
+
+        TaskWaitModule().run()
+
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=TASKS_COMPLETED.format(0, 1, 1),
+            ansible_facts=mock.ANY)
+
+    def test_should_time_out_the_tasks_still_running(self):
+        self.mock_ansible_module.params['timeout'] = 10
+        self.__set_scripts({
+            '/rest/tasks/1': [task('/rest/tasks/1', percent=10)],
+            '/rest/tasks/2': [task('/rest/tasks/2', 'Completed', 100)]
+        })
+
+        TaskWaitModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=TASKS_FAILED.format(1, 2),
+                                                                   oneview_tasks=mock.ANY)
+        result = self.__get_tasks()[0]
+        self.assertEqual(result['state'], 'Running')
+        self.assertEqual(result['error'], TASK_TIMED_OUT.format(10))
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0, 2, 6, 10])
+
+    def test_should_retry_a_task_when_the_connection_fails(self):
+        self.mock_ansible_module.params['task_uris'] = ['/rest/tasks/1']
+        self.__set_scripts({'/rest/tasks/1': [IOError('Connection reset'), task('/rest/tasks/1', 'Completed', 100)]})
+
+        TaskWaitModule().run()
+
+        self.assertEqual(self.__get_tasks()[0]['state'], 'Completed')
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0, 4])
+
+    def test_should_record_the_error_of_a_task_that_cannot_be_fetched(self):
+        self.__set_scripts({
+            '/rest/tasks/1': [HPOneViewException('Resource not found')],
+            '/rest/tasks/2': [task('/rest/tasks/2', 'Completed', 100)]
+        })
+
+        TaskWaitModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=TASKS_FAILED.format(1, 2),
+                                                                   oneview_tasks=mock.ANY)
+        self.assertEqual(self.__get_tasks()[0]['error'], 'Resource not found')
+        self.assertEqual(self.tasks.polls['/rest/tasks/1'], [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,8 +17,11 @@ import unittest
 
 from oneview_volume import VolumeModule
 from oneview_volume import VOLUME_CREATED, VOLUME_UPDATED, VOLUME_DELETED, VOLUME_ALREADY_ABSENT, VOLUME_REPAIRED, \
-    VOLUME_NOT_FOUND, VOLUME_SNAPSHOT_CREATED, VOLUME_SNAPSHOT_DELETED, VOLUME_SNAPSHOT_NOT_FOUND, \
-    VOLUME_NEW_NAME_INVALID
+    VOLUME_NOT_FOUND, VOLUME_SNAPSHOT_CREATED, VOLUME_SNAPSHOT_CREATION_STARTED, VOLUME_SNAPSHOT_DELETED, \
+    VOLUME_SNAPSHOT_NOT_FOUND, \
+    VOLUME_NEW_NAME_INVALID, VOLUME_ALREADY_UPDATED, VOLUME_DATA_REQUIRED, BULK_VOLUMES_DONE, BULK_VOLUMES_FAILED, \
+    BULK_STATE_NOT_SUPPORTED
+from hpOneView.exceptions import HPOneViewTaskError
 
 from utils import ModuleContructorTestCase
 from utils import ValidateEtagTestCase
@@ -72,6 +75,15 @@ PARAMS_FOR_ABSENT_EXPORT_ONLY = dict(
     export_only=True
 )
 
+PARAMS_FOR_BULK = dict(
+    config='config.json',
+    state='present',
+    data=PARAMS_FOR_CREATE['data'],
+    volumes=[dict(name=EXISTENT_VOLUME['name'], description='Changed description'),
+             dict(name=EXISTENT_VOLUME_WITH_NEW_NAME['name'], description=EXISTENT_VOLUME_WITH_NEW_NAME['description']),
+             dict(name='New Volume')]
+)
+
 PARAMS_FOR_REPAIR = dict(
     config='config.json',
     state='repaired',
@@ -141,6 +153,39 @@ class VolumeModuleSpec(unittest.TestCase,
             ansible_facts=dict(storage_volume=EXISTENT_VOLUME.copy())
         )
 
+    def test_should_not_update_volume_when_data_is_equal(self):
+        self.resource.get_by.return_value = [EXISTENT_VOLUME]
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_CREATE,
+                                               data=dict(PARAMS_FOR_CREATE['data'],
+                                                         description=EXISTENT_VOLUME['description']))
+
+        VolumeModule().run()
+
+        self.resource.update.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=VOLUME_ALREADY_UPDATED,
+            ansible_facts=dict(storage_volume=EXISTENT_VOLUME)
+        )
+
+    def test_should_not_update_volume_already_renamed(self):
+        renamed_volume = dict(EXISTENT_VOLUME_WITH_NEW_NAME, shareable=False)
+        self.resource.get_by.side_effect = [], [renamed_volume]
+
+        self.mock_ansible_module.params = PARAMS_FOR_UPDATE
+
+        VolumeModule().run()
+
+        self.assertEqual(self.resource.get_by.call_count, 2)
+        self.resource.create.assert_not_called()
+        self.resource.update.assert_not_called()
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=False,
+            msg=VOLUME_ALREADY_UPDATED,
+            ansible_facts=dict(storage_volume=renamed_volume)
+        )
+
     def test_should_raise_exception_when_new_name_already_used(self):
         self.resource.get_by.side_effect = [EXISTENT_VOLUME], [EXISTENT_VOLUME_WITH_NEW_NAME]
         self.resource.update.return_value = EXISTENT_VOLUME.copy()
@@ -217,6 +262,23 @@ class VolumeModuleSpec(unittest.TestCase,
             msg=VOLUME_SNAPSHOT_CREATED
         )
 
+    def test_should_return_the_task_uri_when_not_waiting_for_the_snapshot(self):
+        self.resource.get_by.return_value = [EXISTENT_VOLUME]
+        self.resource.create_snapshot.side_effect = lambda *args: \
+            self.resource._client._task_monitor.wait_for_task(dict(uri='/rest/tasks/1'))
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_SNAPSHOT_CREATED, wait=False)
+
+        VolumeModule().run()
+
+        self.resource.create_snapshot.assert_called_once_with(EXISTENT_VOLUME['uri'],
+                                                              dict(name='filename', type='Snapshot'))
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=VOLUME_SNAPSHOT_CREATION_STARTED,
+            ansible_facts=dict(task_uri='/rest/tasks/1')
+        )
+
     def test_should_not_create_snapshot_when_resource_not_exist(self):
         self.resource.get_by.return_value = []
 
@@ -264,6 +326,77 @@ class VolumeModuleSpec(unittest.TestCase,
             msg=VOLUME_SNAPSHOT_NOT_FOUND
         )
 
+    def test_should_fail_when_neither_data_nor_volumes_informed(self):
+        self.mock_ansible_module.params = dict(config='config.json', state='present')
+
+        VolumeModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=VOLUME_DATA_REQUIRED)
+
+    def test_should_create_and_update_volumes_in_bulk(self):
+        self.resource.get_all.return_value = [EXISTENT_VOLUME, EXISTENT_VOLUME_WITH_NEW_NAME]
+        self.resource.create.side_effect = lambda data: dict(name=data['name'], uri='/rest/storage-volumes/new')
+        self.resource.update.side_effect = lambda data: data
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK, max_workers=2)
+
+        VolumeModule().run()
+
+        self.resource.get_by.assert_not_called()
+        self.resource.create.assert_called_once_with(dict(PARAMS_FOR_CREATE['data'], name='New Volume'))
+        self.resource.update.assert_called_once_with(dict(EXISTENT_VOLUME, description='Changed description',
+                                                          provisioningParameters=PARAMS_FOR_CREATE['data'][
+                                                              'provisioningParameters']))
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=BULK_VOLUMES_DONE.format(1, 1, 0),
+            ansible_facts=dict(storage_volumes_bulk=[
+                dict(name=EXISTENT_VOLUME['name'], changed=True, msg=VOLUME_UPDATED, uri=EXISTENT_VOLUME['uri']),
+                dict(name=EXISTENT_VOLUME_WITH_NEW_NAME['name'], changed=False, msg=VOLUME_ALREADY_UPDATED,
+                     uri=EXISTENT_VOLUME_WITH_NEW_NAME['uri']),
+                dict(name='New Volume', changed=True, msg=VOLUME_CREATED, uri='/rest/storage-volumes/new')])
+        )
+
+    def test_should_delete_volumes_in_bulk(self):
+        self.resource.get_all.return_value = [EXISTENT_VOLUME]
+
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK, state='absent', export_only=True)
+
+        VolumeModule().run()
+
+        self.resource.delete.assert_called_once_with(EXISTENT_VOLUME, export_only=True)
+        self.mock_ansible_module.exit_json.assert_called_once_with(
+            changed=True,
+            msg=BULK_VOLUMES_DONE.format(0, 0, 1),
+            ansible_facts=dict(storage_volumes_bulk=[
+                dict(name=EXISTENT_VOLUME['name'], changed=True, msg=VOLUME_DELETED, uri=EXISTENT_VOLUME['uri']),
+                dict(name=EXISTENT_VOLUME_WITH_NEW_NAME['name'], changed=False, msg=VOLUME_ALREADY_ABSENT, uri=None),
+                dict(name='New Volume', changed=False, msg=VOLUME_ALREADY_ABSENT, uri=None)])
+        )
+
+    def test_should_report_the_failed_volumes_in_bulk(self):
+        self.resource.get_all.return_value = [EXISTENT_VOLUME, EXISTENT_VOLUME_WITH_NEW_NAME]
+        self.resource.create.side_effect = HPOneViewTaskError('Not enough capacity')
+        self.resource.update.side_effect = lambda data: data
+
+        self.mock_ansible_module.params = PARAMS_FOR_BULK
+
+        VolumeModule().run()
+
+        results = self.mock_ansible_module.fail_json.call_args[1]['storage_volumes_bulk']
+        self.mock_ansible_module.fail_json.assert_called_once_with(
+            msg=BULK_VOLUMES_FAILED.format(1, 3), storage_volumes_bulk=results)
+        self.assertEqual(results[2], dict(name='New Volume', changed=False, msg=None, uri=None,
+                                          error='Not enough capacity'))
+        self.assertEqual(results[0]['msg'], VOLUME_UPDATED)
+
+    def test_should_fail_when_bulk_state_not_supported(self):
+        self.mock_ansible_module.params = dict(PARAMS_FOR_BULK, state='repaired')
+
+        VolumeModule().run()
+
+        self.mock_ansible_module.fail_json.assert_called_once_with(msg=BULK_STATE_NOT_SUPPORTED)
+
 
 if __name__ == '__main__':
     unittest.main()